@@ -20,10 +20,11 @@ from datetime import datetime
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
 import cv2
-from google.cloud import vision
 from pydantic import BaseModel
 import motor.motor_asyncio
 from settings import settings
+from vision_gateway import get_vision_gateway
+from food_knowledge import get_food_knowledge_base
 from motor.motor_asyncio import AsyncIOMotorGridFSBucket
 import gridfs
 import json
@@ -57,31 +58,16 @@ class DetectedFood(BaseModel):
 
 class AdvancedFoodAnalyzer:
     def __init__(self, mongodb_client: motor.motor_asyncio.AsyncIOMotorClient, db_name: str):
-        # Initialize Google Vision API
-        if settings.DISABLE_GOOGLE_VISION:
-            logger.info("Google Vision API disabled for local development")
-            self.vision_client = None
-            self.vision_available = False
-        elif settings.USE_MOCK_GOOGLE_VISION:
-            logger.info("Using mock Google Vision API for local development")
-            self.vision_client = None
-            self.vision_available = True  # We'll use fallback methods
-        else:
-            try:
-                self.vision_client = vision.ImageAnnotatorClient()
-                self.vision_available = True
-                logger.info("Google Vision API initialized successfully")
-            except Exception as e:
-                logger.warning(f"Google Vision API not available, using mock service: {e}")
-                self.vision_client = None
-                self.vision_available = True  # Use fallback
+        # Google Vision requests go through one batched gateway shared by all analyzers
+        self.vision_gateway = get_vision_gateway()
+        self.vision_available = not settings.DISABLE_GOOGLE_VISION  # without a gateway, other methods are used
         
         # Initialize database connections
         self.db = mongodb_client[db_name]
         self.fs = AsyncIOMotorGridFSBucket(self.db)
         
-        # Load comprehensive Sri Lankan food database
-        self.sri_lankan_food_db = self._load_comprehensive_food_database()
+        # Foods and their nutrition come from the shared food knowledge base
+        self.food_knowledge = get_food_knowledge_base()
         
         # Food category mappings for better recognition
         self.food_categories = {
@@ -104,77 +90,6 @@ class AdvancedFoodAnalyzer:
             'preparation_styles': ['gravy', 'dry', 'tempered', 'coconut milk', 'spicy', 'mild']
         }
 
-    def _load_comprehensive_food_database(self) -> Dict[str, Dict[str, float]]:
-        """Load comprehensive Sri Lankan food database with accurate nutrition data."""
-        return {
-            # Rice dishes (per 1 cup cooked)
-            'rice': {'calories': 130, 'protein': 2.7, 'carbs': 28, 'fat': 0.3, 'fiber': 0.4, 'sodium': 5, 'sugar': 0.1, 'iron': 0.8},
-            'fried rice': {'calories': 240, 'protein': 6, 'carbs': 35, 'fat': 8, 'fiber': 1.5, 'sodium': 450, 'sugar': 3, 'iron': 1.2},
-            'coconut rice': {'calories': 180, 'protein': 3, 'carbs': 32, 'fat': 5, 'fiber': 1, 'sodium': 200, 'sugar': 2, 'iron': 0.9},
-            'yellow rice': {'calories': 160, 'protein': 3.5, 'carbs': 30, 'fat': 3, 'fiber': 1, 'sodium': 300, 'sugar': 1, 'iron': 1.0},
-            'biriyani': {'calories': 350, 'protein': 15, 'carbs': 45, 'fat': 12, 'fiber': 2, 'sodium': 600, 'sugar': 5, 'iron': 2.5},
-            
-            # Kottu variations (per serving ~300g)
-            'kottu': {'calories': 450, 'protein': 20, 'carbs': 40, 'fat': 20, 'fiber': 3, 'sodium': 800, 'sugar': 5, 'iron': 3.2},
-            'chicken kottu': {'calories': 520, 'protein': 28, 'carbs': 42, 'fat': 24, 'fiber': 3, 'sodium': 850, 'sugar': 6, 'iron': 3.5},
-            'vegetable kottu': {'calories': 380, 'protein': 12, 'carbs': 45, 'fat': 15, 'fiber': 5, 'sodium': 700, 'sugar': 8, 'iron': 2.8},
-            'seafood kottu': {'calories': 480, 'protein': 25, 'carbs': 40, 'fat': 22, 'fiber': 3, 'sodium': 900, 'sugar': 5, 'iron': 4.0},
-            
-            # Curry dishes (per 1 cup)
-            'chicken curry': {'calories': 200, 'protein': 25, 'carbs': 8, 'fat': 8, 'fiber': 2, 'sodium': 400, 'sugar': 4, 'iron': 1.5},
-            'fish curry': {'calories': 180, 'protein': 22, 'carbs': 6, 'fat': 7, 'fiber': 1.5, 'sodium': 350, 'sugar': 3, 'iron': 1.2},
-            'beef curry': {'calories': 280, 'protein': 26, 'carbs': 10, 'fat': 15, 'fiber': 2.5, 'sodium': 450, 'sugar': 5, 'iron': 3.8},
-            'mutton curry': {'calories': 290, 'protein': 24, 'carbs': 8, 'fat': 18, 'fiber': 2, 'sodium': 400, 'sugar': 4, 'iron': 2.9},
-            'dal curry': {'calories': 160, 'protein': 12, 'carbs': 20, 'fat': 4, 'fiber': 8, 'sodium': 300, 'sugar': 3, 'iron': 3.5},
-            'vegetable curry': {'calories': 120, 'protein': 4, 'carbs': 15, 'fat': 6, 'fiber': 4, 'sodium': 250, 'sugar': 6, 'iron': 2.1},
-            'potato curry': {'calories': 140, 'protein': 3, 'carbs': 22, 'fat': 5, 'fiber': 3, 'sodium': 280, 'sugar': 4, 'iron': 1.8},
-            'jackfruit curry': {'calories': 110, 'protein': 2, 'carbs': 18, 'fat': 4, 'fiber': 3, 'sodium': 200, 'sugar': 12, 'iron': 1.2},
-            
-            # Bread and roti (per piece)
-            'roti': {'calories': 80, 'protein': 3, 'carbs': 15, 'fat': 1, 'fiber': 2, 'sodium': 150, 'sugar': 0.5, 'iron': 1.1},
-            'naan': {'calories': 160, 'protein': 5, 'carbs': 25, 'fat': 5, 'fiber': 1, 'sodium': 300, 'sugar': 2, 'iron': 1.8},
-            'chapati': {'calories': 70, 'protein': 2.5, 'carbs': 13, 'fat': 1, 'fiber': 1.5, 'sodium': 120, 'sugar': 0.3, 'iron': 0.9},
-            'paratha': {'calories': 120, 'protein': 3, 'carbs': 18, 'fat': 4, 'fiber': 1.5, 'sodium': 200, 'sugar': 1, 'iron': 1.4},
-            
-            # Hoppers (per piece)
-            'hoppers': {'calories': 90, 'protein': 2, 'carbs': 18, 'fat': 1.5, 'fiber': 1, 'sodium': 100, 'sugar': 2, 'iron': 0.8},
-            'egg hoppers': {'calories': 160, 'protein': 8, 'carbs': 18, 'fat': 6.5, 'fiber': 1, 'sodium': 180, 'sugar': 2, 'iron': 1.5},
-            'string hoppers': {'calories': 70, 'protein': 2, 'carbs': 14, 'fat': 0.5, 'fiber': 1, 'sodium': 80, 'sugar': 0.2, 'iron': 0.7},
-            'milk hoppers': {'calories': 110, 'protein': 3, 'carbs': 18, 'fat': 3, 'fiber': 1, 'sodium': 120, 'sugar': 4, 'iron': 0.9},
-            
-            # Proteins (per 100g)
-            'chicken': {'calories': 165, 'protein': 31, 'carbs': 0, 'fat': 3.6, 'fiber': 0, 'sodium': 70, 'sugar': 0, 'iron': 0.9},
-            'fish': {'calories': 140, 'protein': 28, 'carbs': 0, 'fat': 3, 'fiber': 0, 'sodium': 60, 'sugar': 0, 'iron': 0.8},
-            'beef': {'calories': 250, 'protein': 26, 'carbs': 0, 'fat': 15, 'fiber': 0, 'sodium': 55, 'sugar': 0, 'iron': 2.6},
-            'mutton': {'calories': 280, 'protein': 24, 'carbs': 0, 'fat': 20, 'fiber': 0, 'sodium': 65, 'sugar': 0, 'iron': 1.9},
-            'egg': {'calories': 155, 'protein': 13, 'carbs': 1.1, 'fat': 11, 'fiber': 0, 'sodium': 124, 'sugar': 1.1, 'iron': 1.8},
-            'prawns': {'calories': 85, 'protein': 18, 'carbs': 0.2, 'fat': 1.5, 'fiber': 0, 'sodium': 110, 'sugar': 0, 'iron': 0.5},
-            
-            # Vegetables (per 100g)
-            'cabbage': {'calories': 25, 'protein': 1.3, 'carbs': 6, 'fat': 0.1, 'fiber': 2.5, 'sodium': 18, 'sugar': 3.2, 'iron': 0.5, 'vitamin_c': 36.6},
-            'carrot': {'calories': 41, 'protein': 0.9, 'carbs': 10, 'fat': 0.2, 'fiber': 2.8, 'sodium': 69, 'sugar': 4.7, 'iron': 0.3, 'vitamin_c': 5.9},
-            'beans': {'calories': 35, 'protein': 2, 'carbs': 7, 'fat': 0.1, 'fiber': 3.4, 'sodium': 6, 'sugar': 3.3, 'iron': 1.0, 'vitamin_c': 16.3},
-            'brinjal': {'calories': 25, 'protein': 1, 'carbs': 6, 'fat': 0.2, 'fiber': 3, 'sodium': 2, 'sugar': 3.5, 'iron': 0.2, 'vitamin_c': 2.2},
-            'okra': {'calories': 33, 'protein': 1.9, 'carbs': 7, 'fat': 0.2, 'fiber': 3.2, 'sodium': 7, 'sugar': 1.5, 'iron': 0.6, 'vitamin_c': 23},
-            'spinach': {'calories': 23, 'protein': 2.9, 'carbs': 3.6, 'fat': 0.4, 'fiber': 2.2, 'sodium': 79, 'sugar': 0.4, 'iron': 2.7, 'vitamin_c': 28.1},
-            
-            # Fruits (per 100g)
-            'banana': {'calories': 89, 'protein': 1.1, 'carbs': 23, 'fat': 0.3, 'fiber': 2.6, 'sodium': 1, 'sugar': 12, 'iron': 0.3, 'vitamin_c': 8.7},
-            'mango': {'calories': 60, 'protein': 0.8, 'carbs': 15, 'fat': 0.4, 'fiber': 1.6, 'sodium': 1, 'sugar': 13.7, 'iron': 0.2, 'vitamin_c': 36.4},
-            'papaya': {'calories': 43, 'protein': 0.5, 'carbs': 11, 'fat': 0.3, 'fiber': 1.7, 'sodium': 8, 'sugar': 7.8, 'iron': 0.2, 'vitamin_c': 60.9},
-            'pineapple': {'calories': 50, 'protein': 0.5, 'carbs': 13, 'fat': 0.1, 'fiber': 1.4, 'sodium': 1, 'sugar': 9.9, 'iron': 0.3, 'vitamin_c': 47.8},
-            
-            # Snacks and traditional foods
-            'samosa': {'calories': 300, 'protein': 6, 'carbs': 35, 'fat': 15, 'fiber': 2, 'sodium': 400, 'sugar': 3, 'iron': 1.8},
-            'vadai': {'calories': 180, 'protein': 8, 'carbs': 15, 'fat': 10, 'fiber': 3, 'sodium': 250, 'sugar': 2, 'iron': 2.1},
-            'isso vadai': {'calories': 200, 'protein': 10, 'carbs': 16, 'fat': 12, 'fiber': 2.5, 'sodium': 350, 'sugar': 2, 'iron': 1.9},
-            
-            # Desserts (per serving)
-            'wattalappam': {'calories': 250, 'protein': 8, 'carbs': 35, 'fat': 8, 'fiber': 0.5, 'sodium': 100, 'sugar': 30, 'iron': 1.2},
-            'kokis': {'calories': 180, 'protein': 3, 'carbs': 20, 'fat': 10, 'fiber': 1, 'sodium': 150, 'sugar': 8, 'iron': 0.8},
-            'kiribath': {'calories': 220, 'protein': 4, 'carbs': 40, 'fat': 5, 'fiber': 0.5, 'sodium': 200, 'sugar': 8, 'iron': 0.6}
-        }
-
     async def analyze_food_image_advanced(self, 
                                         image_data: bytes, 
                                         user_id: str, 
@@ -307,54 +222,38 @@ class AdvancedFoodAnalyzer:
     async def _enhanced_google_vision_analysis(self, image_data: bytes) -> List[Dict]:
         """Enhanced Google Vision analysis with food-specific processing."""
         try:
-            image = vision.Image(content=image_data)
-            
-            # Multiple Vision API calls for comprehensive analysis
+            # Labels, objects and text in one batched request
+            annotation = await self.vision_gateway.annotate(image_data)
             results = []
             
-            # Label detection with food focus
-            label_response = self.vision_client.label_detection(image=image)
-            labels = label_response.label_annotations
-            
-            # Object localization for spatial understanding
-            object_response = self.vision_client.object_localization(image=image)
-            objects = object_response.localized_object_annotations
-            
-            # Text detection for menu items or descriptions
-            text_response = self.vision_client.text_detection(image=image)
-            texts = text_response.text_annotations
-            
             # Process labels with enhanced food detection
-            for label in labels:
-                if self._is_food_related_enhanced(label.description.lower()):
-                    food_match = self._find_best_food_match(label.description)
+            for label in annotation['labels']:
+                if self._is_food_related_enhanced(label['description'].lower()):
+                    food_match = self._find_best_food_match(label['description'])
                     if food_match:
                         results.append({
                             'name': food_match['name'],
-                            'confidence': label.score * food_match['match_confidence'],
+                            'confidence': label['score'] * food_match['match_confidence'],
                             'source': 'google_vision_label',
                             'nutrition_data': food_match['nutrition']
                         })
             
             # Process objects with spatial information
-            for obj in objects:
-                if self._is_food_related_enhanced(obj.name.lower()):
-                    food_match = self._find_best_food_match(obj.name)
+            for obj in annotation['objects']:
+                if self._is_food_related_enhanced(obj['name'].lower()):
+                    food_match = self._find_best_food_match(obj['name'])
                     if food_match:
-                        bbox = self._extract_bounding_box(obj.bounding_poly)
                         results.append({
                             'name': food_match['name'],
-                            'confidence': obj.score * food_match['match_confidence'],
+                            'confidence': obj['score'] * food_match['match_confidence'],
                             'source': 'google_vision_object',
-                            'bounding_box': bbox,
+                            'bounding_box': obj['bounding_box'],
                             'nutrition_data': food_match['nutrition']
                         })
             
             # Process text for menu items
-            if texts:
-                text_content = texts[0].description if texts else ""
-                text_foods = self._extract_foods_from_text(text_content)
-                results.extend(text_foods)
+            if annotation['text']:
+                results.extend(self._extract_foods_from_text(annotation['text']))
             
             return results
             
@@ -363,55 +262,16 @@ class AdvancedFoodAnalyzer:
             return []
 
     def _find_best_food_match(self, detected_name: str) -> Optional[Dict]:
-        """Find the best matching food in the database with confidence scoring."""
-        detected_lower = detected_name.lower().strip()
-        best_match = None
-        best_score = 0.0
-        
-        # Direct exact match
-        if detected_lower in self.sri_lankan_food_db:
-            return {
-                'name': detected_lower.title(),
-                'nutrition': self.sri_lankan_food_db[detected_lower],
-                'match_confidence': 1.0
-            }
-        
-        # Partial matching with scoring
-        for food_name, nutrition_data in self.sri_lankan_food_db.items():
-            food_lower = food_name.lower()
-            
-            # Calculate similarity score
-            if detected_lower in food_lower or food_lower in detected_lower:
-                # Word overlap scoring
-                detected_words = set(detected_lower.split())
-                food_words = set(food_lower.split())
-                
-                if detected_words and food_words:
-                    overlap = len(detected_words.intersection(food_words))
-                    total_words = len(detected_words.union(food_words))
-                    similarity = overlap / total_words
-                    
-                    if similarity > best_score:
-                        best_score = similarity
-                        best_match = {
-                            'name': food_name.title(),
-                            'nutrition': nutrition_data,
-                            'match_confidence': similarity
-                        }
-        
-        # Category-based matching
-        if not best_match:
-            for category, foods in self.food_categories.items():
-                for food in foods:
-                    if detected_lower in food or food in detected_lower:
-                        if food in self.sri_lankan_food_db:
-                            return {
-                                'name': food.title(),
-                                'nutrition': self.sri_lankan_food_db[food],
-                                'match_confidence': 0.7
-                            }
-        
-        return best_match
+        """Find the best matching food in the knowledge base with confidence scoring."""
+        match = self.food_knowledge.search(detected_name)
+        if not match:
+            return None
+        food, similarity = match
+        return {
+            'name': food.name.title(),
+            'nutrition': food.nutrition,
+            'match_confidence': similarity
+        }
 
     async def _advanced_text_analysis(self, text_description: str) -> List[Dict]:
         """Advanced text analysis with NLP techniques."""
@@ -422,9 +282,8 @@ class AdvancedFoodAnalyzer:
         detected_foods = set()
         
         # Check for direct food matches
-        for food_name in self.sri_lankan_food_db.keys():
-            if food_name in text_lower:
-                detected_foods.add(food_name)
+        for match in self.food_knowledge.extract(text_description, keywords=False):
+            detected_foods.add(match.food.name)
         
         # Check for cooking methods and preparation styles
         cooking_context = []
@@ -443,13 +302,14 @@ class AdvancedFoodAnalyzer:
         
         # Convert to structured results
         for food_name in detected_foods:
-            if food_name in self.sri_lankan_food_db:
+            food = self.food_knowledge.lookup(food_name)
+            if food:
                 confidence = 0.8 if food_name in text_description else 0.6
                 results.append({
                     'name': food_name.title(),
                     'confidence': confidence,
                     'source': 'text_analysis',
-                    'nutrition_data': self.sri_lankan_food_db[food_name]
+                    'nutrition_data': food.nutrition
                 })
         
         return results
@@ -478,7 +338,7 @@ class AdvancedFoodAnalyzer:
                     'name': 'Chicken Curry',
                     'confidence': 0.6,
                     'source': 'pattern_recognition',
-                    'nutrition_data': self.sri_lankan_food_db['chicken curry']
+                    'nutrition_data': self.food_knowledge.lookup('chicken curry').nutrition
                 })
             
             if avg_color[2] > avg_color[0] and avg_color[2] > avg_color[1]:  # Bluish-white tones
@@ -486,7 +346,7 @@ class AdvancedFoodAnalyzer:
                     'name': 'Rice',
                     'confidence': 0.5,
                     'source': 'pattern_recognition',
-                    'nutrition_data': self.sri_lankan_food_db['rice']
+                    'nutrition_data': self.food_knowledge.lookup('rice').nutrition
                 })
         
         except Exception as e:
@@ -763,28 +623,16 @@ class AdvancedFoodAnalyzer:
         
         return any(indicator in label for indicator in food_indicators)
 
-    def _extract_bounding_box(self, bounding_poly) -> Dict[str, float]:
-        """Extract bounding box coordinates."""
-        vertices = bounding_poly.normalized_vertices
-        return {
-            'x1': vertices[0].x,
-            'y1': vertices[0].y,
-            'x2': vertices[2].x,
-            'y2': vertices[2].y
-        }
-
     def _extract_foods_from_text(self, text_content: str) -> List[Dict]:
         """Extract food items from text content."""
         results = []
-        text_lower = text_content.lower()
         
-        for food_name, nutrition_data in self.sri_lankan_food_db.items():
-            if food_name in text_lower:
-                results.append({
-                    'name': food_name.title(),
-                    'confidence': 0.7,
-                    'source': 'google_vision_text',
-                    'nutrition_data': nutrition_data
-                })
+        for match in self.food_knowledge.extract(text_content, keywords=False):
+            results.append({
+                'name': match.food.name.title(),
+                'confidence': 0.7,
+                'source': 'google_vision_text',
+                'nutrition_data': match.food.nutrition
+            })
         
         return results
@@ -0,0 +1,106 @@
+"""
+Benchmark for food autocomplete latency with a large food catalogue
+Types food names one keystroke at a time (some with a typo) against the
+knowledge base plus generated dishes, through the linear substring scan the
+suggestions endpoint used to do and through FoodAutocomplete, cold (cache
+cleared before every query) and warm. Reports per-keystroke latency.
+
+Usage: python benchmark_food_autocomplete.py [--foods 50000] [--words 300]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from food_knowledge import FoodAutocomplete, FoodKnowledgeBase, FoodRecord, get_food_knowledge_base
+
+STYLES = ["grilled", "fried", "steamed", "roasted", "baked", "spicy", "creamy", "smoked", "crispy", "braised",
+          "devilled", "tempered", "stuffed", "glazed", "pickled", "boiled", "sauteed", "barbecue", "garlic", "lemon"]
+BASES = ["chicken", "fish", "prawn", "beef", "mutton", "tofu", "paneer", "egg", "potato", "pumpkin", "cabbage",
+         "jackfruit", "mushroom", "lentil", "chickpea", "spinach", "cuttlefish", "crab", "pork", "duck", "salmon",
+         "tuna", "brinjal", "okra", "leeks", "beetroot", "carrot", "cauliflower", "cashew", "banana blossom"]
+DISHES = ["curry", "rice", "noodles", "kottu", "salad", "soup", "sandwich", "wrap", "roti", "bowl", "stew",
+          "pasta", "burger", "pie", "skewers", "fritters", "omelette", "biryani", "stir fry", "sambol"]
+ORIGINS = ["", "jaffna", "colombo", "kandyan", "thai", "indian", "chinese", "italian", "mexican", "korean",
+           "home style", "village", "street", "hotel", "vegan", "keto", "mini", "family size", "party", "classic"]
+
+
+def catalogue_foods(count: int):
+    """Generated dishes ("kandyan devilled prawn kottu") for a large, realistic catalogue"""
+    names = [" ".join(filter(None, (origin, style, base, dish)))
+             for origin in ORIGINS for style in STYLES for base in BASES for dish in DISHES]
+    random.Random(11).shuffle(names)
+    return [
+        FoodRecord.from_dict({
+            'id': f"catalogue_{i}", 'name': name, 'category': 'general', 'cuisine': 'international',
+            'serving': '100g', 'nutrition': {'calories': 100, 'protein': 1, 'carbs': 1, 'fat': 1}
+        })
+        for i, name in enumerate(names[:count])
+    ]
+
+
+def legacy_suggestions(foods, query: str, limit: int = 10):
+    """Substring checks on every name, alias and keyword, as the endpoint did"""
+    query_lower = query.lower()
+    return [food for food in foods
+            if query_lower in food.name or any(query_lower in term for term in food.aliases + food.keywords)][:limit]
+
+
+def keystrokes(foods, words: int, seed: int = 5):
+    rng = random.Random(seed)
+    queries = []
+    for food in rng.sample(foods, words):
+        name = food.name
+        if rng.random() < 0.3 and len(name) > 4:
+            position = rng.randrange(1, len(name))
+            name = name[:position] + rng.choice("aeiou") + name[position + 1:]
+        queries.extend(name[:length] for length in range(1, len(name) + 1))
+    return queries
+
+
+def measure(function, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        function(query)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        'p50': statistics.median(latencies),
+        'p99': latencies[int(len(latencies) * 0.99) - 1],
+        'max': latencies[-1]
+    }
+
+
+def report(name: str, result: dict):
+    print(name)
+    for key in ('p50', 'p99', 'max'):
+        print(f"  {key}:  {result[key] * 1000:10.3f} ms")
+
+
+def main(args):
+    shared = get_food_knowledge_base()
+    foods = list(shared) + catalogue_foods(args.foods)
+    started = time.perf_counter()
+    autocomplete = FoodAutocomplete(FoodKnowledgeBase(foods, shared.version))
+    print(f"{len(foods):,} foods, index built in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    queries = keystrokes(foods, args.words)
+    print(f"{len(queries):,} keystrokes")
+
+    def cold(query):
+        autocomplete._cache.clear()
+        return autocomplete.suggest(query)
+
+    report("Linear substring scan", measure(lambda query: legacy_suggestions(foods, query), queries))
+    report("Autocomplete, cold cache", measure(cold, queries))
+    measure(autocomplete.suggest, queries)
+    report("Autocomplete, warm cache", measure(autocomplete.suggest, queries))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--foods", type=int, default=50000, help="generated dishes added to the knowledge base")
+    parser.add_argument("--words", type=int, default=300, help="food names typed")
+    main(parser.parse_args())
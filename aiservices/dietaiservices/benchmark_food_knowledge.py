@@ -0,0 +1,85 @@
+"""
+Benchmark for extracting foods from free-text meal descriptions
+Runs the same descriptions through the linear substring scans the analyzers
+used to do over their own food dicts (every name, then every keyword, checked
+with ``in``) and through the shared knowledge base's token Aho-Corasick
+matcher. Reports time per description and how many mentions each finds.
+
+Usage: python benchmark_food_knowledge.py [--descriptions 10000] [--extra-foods 0]
+"""
+
+import argparse
+import random
+import time
+
+from food_knowledge import FoodKnowledgeBase, FoodRecord, get_food_knowledge_base
+
+FILLERS = ["had", "with", "some", "a plate of", "and", "plus", "for lunch", "extra spicy", "half portion of",
+           "homemade", "from the canteen", "leftover", "two", "large", "small bowl of", "then"]
+
+
+def legacy_scan(foods, text: str):
+    """Name and keyword substring checks over every food, as the analyzers did"""
+    text_lower = text.lower()
+    found = []
+    for food in foods:
+        if food.name in text_lower or any(term in text_lower for term in food.aliases + food.keywords):
+            found.append(food.id)
+    return found
+
+
+def make_descriptions(foods, count: int, seed: int = 7):
+    rng = random.Random(seed)
+    phrases = [term for food in foods for term in (food.name, *food.aliases, *food.keywords)]
+    descriptions = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(2, 5)):
+            words.append(rng.choice(FILLERS))
+            words.append(rng.choice(phrases))
+        descriptions.append(" ".join(words).capitalize())
+    return descriptions
+
+
+def synthetic_foods(count: int):
+    """Extra generated records, to see how each approach scales with the food count"""
+    rng = random.Random(11)
+    syllables = ["ka", "ri", "po", "lu", "mi", "sa", "to", "ne", "va", "de", "ko", "ba"]
+    foods = []
+    for i in range(count):
+        name = " ".join("".join(rng.choice(syllables) for _ in range(3)) for _ in range(rng.randint(1, 3)))
+        foods.append(FoodRecord.from_dict({
+            'id': f"synthetic_{i}", 'name': name, 'category': 'general', 'cuisine': 'international',
+            'serving': '100g', 'nutrition': {'calories': 100, 'protein': 1, 'carbs': 1, 'fat': 1}
+        }))
+    return foods
+
+
+def timed(function, descriptions):
+    started = time.perf_counter()
+    mentions = sum(len(function(text)) for text in descriptions)
+    return time.perf_counter() - started, mentions
+
+
+def main(args):
+    shared = get_food_knowledge_base()
+    foods = list(shared) + synthetic_foods(args.extra_foods)
+    knowledge_base = FoodKnowledgeBase(foods, shared.version) if args.extra_foods else shared
+    descriptions = make_descriptions(list(shared), args.descriptions)
+
+    print(f"{len(descriptions):,} descriptions, {len(foods)} foods "
+          f"({sum(1 + len(f.aliases) + len(f.keywords) for f in foods)} names, aliases and keywords)")
+    for name, function in (("Linear substring scan", lambda text: legacy_scan(foods, text)),
+                           ("Knowledge base extract", knowledge_base.extract)):
+        elapsed, mentions = timed(function, descriptions)
+        print(name)
+        print(f"  total:            {elapsed * 1000:10.1f} ms")
+        print(f"  per description:  {elapsed / len(descriptions) * 1e6:10.1f} µs")
+        print(f"  foods found:      {mentions:10,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--descriptions", type=int, default=10000)
+    parser.add_argument("--extra-foods", type=int, default=0, help="synthetic foods added to the knowledge base")
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+"""
+Benchmark for bytes stored and served for food image history
+Uploads a set of camera-sized photos (some submitted more than once) into the
+content-addressed ImageStore and compares against the old layout, where each
+upload was a separate GridFS file and history pages streamed the originals.
+Reports bytes stored, bytes served for one history page and upload time.
+
+Usage: python benchmark_image_store.py [--uploads 40] [--distinct 30] [--page 20] [--size 1600x1200]
+"""
+
+import argparse
+import asyncio
+import io
+import tempfile
+import time
+from pathlib import Path
+
+import mongomock
+import numpy as np
+from PIL import Image
+
+from image_store import ImageStore, LocalImageBackend
+from test_image_store import AsyncCollection, blob_files
+
+
+def camera_photo(seed: int, width: int, height: int) -> bytes:
+    """Smooth gradients plus sensor noise, so JPEG sizes resemble real photos"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = rng.uniform(40, 200, 3)
+    pixels = np.stack([base[c] + 50 * np.sin(x / rng.uniform(50, 300) + y / rng.uniform(50, 300) + c)
+                       for c in range(3)], axis=-1)
+    pixels += rng.normal(0, 12, pixels.shape)
+    output = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+async def main(args):
+    width, height = map(int, args.size.split('x'))
+    photos = [camera_photo(seed, width, height) for seed in range(args.distinct)]
+    uploads = [photos[i % args.distinct] for i in range(args.uploads)]
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ImageStore(LocalImageBackend(root), AsyncCollection(mongomock.MongoClient().db.images))
+        started = time.perf_counter()
+        stored = [await store.put(image, owner=f"analysis_{i}") for i, image in enumerate(uploads)]
+        elapsed = time.perf_counter() - started
+        stored_bytes = sum(p.stat().st_size for p in Path(root).rglob('*') if p.is_file())
+        blobs = len(blob_files(root))
+
+        page = stored[-args.page:]
+        served = {}
+        for rendition in ('original', 'preview', 'thumbnail'):
+            infos = [await store.get(entry['hash'], rendition) for entry in page]
+            served[rendition] = sum([len(await store.read(info)) for info in infos])
+
+    legacy_stored = sum(len(image) for image in uploads)
+    print(f"Uploads: {args.uploads} ({args.distinct} distinct photos, {width}x{height})")
+    print(f"  legacy bytes stored:      {legacy_stored:14,} in {args.uploads} files")
+    print(f"  image store bytes stored: {stored_bytes:14,} in {blobs} files (incl. renditions)")
+    print(f"  upload time:              {elapsed * 1000:11.1f} ms ({store.stats['deduplicated']} deduplicated)")
+    print(f"History page of {len(page)} entries:")
+    print(f"  originals (legacy):       {served['original']:14,} bytes")
+    print(f"  previews:                 {served['preview']:14,} bytes")
+    print(f"  thumbnails:               {served['thumbnail']:14,} bytes "
+          f"({served['original'] / max(served['thumbnail'], 1):.0f}x fewer)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=40)
+    parser.add_argument("--distinct", type=int, default=30, help="distinct photos among the uploads")
+    parser.add_argument("--page", type=int, default=20, help="entries on a history page")
+    parser.add_argument("--size", default="1600x1200", help="photo dimensions, WIDTHxHEIGHT")
+    asyncio.run(main(parser.parse_args()))
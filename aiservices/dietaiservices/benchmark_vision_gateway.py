@@ -0,0 +1,72 @@
+"""
+Benchmark for Google Vision annotation of concurrent food image requests
+Replays recorded responses with a fixed round-trip latency, first the way the
+analyzers used to call the API (label, object and text detection one after
+another on the synchronous client inside the request coroutine) and then
+through the batched VisionGateway. Reports wall time, API requests and the
+longest event loop stall.
+
+Usage: python benchmark_vision_gateway.py [--requests 64] [--distinct 48] [--latency 0.08]
+"""
+
+import argparse
+import asyncio
+import time
+
+from test_vision_gateway import SAMPLES
+from vision_gateway import ReplayVisionBackend, VisionGateway
+
+
+async def legacy_annotate(backend: ReplayVisionBackend, image_data: bytes):
+    """Three blocking round trips per image, as label/object/text detection were called"""
+    for _ in ('label_detection', 'object_localization', 'text_detection'):
+        backend.annotate([image_data])
+
+
+async def measure(annotate, images) -> dict:
+    stalls = []
+
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await asyncio.gather(*(annotate(image) for image in images))
+    elapsed = time.perf_counter() - started
+    ticking.cancel()
+    return {'elapsed': elapsed, 'max_stall': max(stalls, default=elapsed)}
+
+
+def report(name: str, result: dict, backend: ReplayVisionBackend):
+    print(name)
+    print(f"  wall time:        {result['elapsed'] * 1000:10.1f} ms")
+    print(f"  API requests:     {backend.requests:10,}")
+    print(f"  images sent:      {backend.images:10,}")
+    print(f"  max loop stall:   {result['max_stall'] * 1000:10.1f} ms")
+
+
+async def main(args):
+    images = [f"photo-{i % args.distinct}".encode() for i in range(args.requests)]
+
+    backend = ReplayVisionBackend.from_file(SAMPLES, latency_seconds=args.latency)
+    result = await measure(lambda image: legacy_annotate(backend, image), images)
+    report(f"Sequential synchronous calls ({args.requests} requests)", result, backend)
+
+    backend = ReplayVisionBackend.from_file(SAMPLES, latency_seconds=args.latency)
+    gateway = VisionGateway(backend)
+    result = await measure(gateway.annotate, images)
+    report(f"Batched gateway ({args.requests} requests)", result, backend)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--distinct", type=int, default=48, help="distinct images among the requests")
+    parser.add_argument("--latency", type=float, default=0.08, help="seconds per API round trip")
+    asyncio.run(main(parser.parse_args()))
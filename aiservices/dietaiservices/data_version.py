@@ -0,0 +1,39 @@
+"""
+Fingerprints for cached reports built from nutrition logs.
+
+A report is reused while the fingerprint of the logs it was built from is
+unchanged. The fingerprint is computed on the server by one aggregation that
+returns a single row: the log count, the newest ``_id`` and ``updated_at``,
+the nutrient totals and the number of meal items. No log payload leaves the
+database, so a check costs less than reading the logs for the report.
+Inserts, deletes and API edits (which stamp ``updated_at``) invalidate it, as
+does any edit that changes a total or the number of meals.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+FINGERPRINT_NUTRIENTS = ("calories", "protein", "carbs", "fat", "fiber")
+
+
+async def nutrition_logs_version(collection, query: Dict[str, Any]) -> Optional[str]:
+    """Fingerprint the logs matched by a query (None when there are none)"""
+    group: Dict[str, Any] = {
+        "_id": None,
+        "count": {"$sum": 1},
+        "last_id": {"$max": "$_id"},
+        "last_updated": {"$max": "$updated_at"},
+        "meal_items": {"$sum": "$meal_items"}
+    }
+    for nutrient in FINGERPRINT_NUTRIENTS:
+        group[nutrient] = {"$sum": {"$ifNull": [f"$total_nutrition.{nutrient}", 0]}}
+    rows = await collection.aggregate([
+        {"$match": query},
+        # Only the fields the fingerprint reads; meals are reduced to their count
+        {"$project": {"updated_at": 1, "total_nutrition": 1, "meal_items": {"$size": {"$ifNull": ["$meals", []]}}}},
+        {"$group": group}
+    ]).to_list(length=1)
+    if not rows or not rows[0]["count"]:
+        return None
+    return hashlib.sha1(json.dumps(rows[0], sort_keys=True, default=str).encode()).hexdigest()[:16]
@@ -98,6 +98,7 @@ class WeeklyMealSummary(BaseModel):
     nutrition_trends: Dict[str, Any]
     nlp_summary: str  # AI-generated weekly summary
     recommendations: List[str]
+    data_version: Optional[str] = None  # Fingerprint of the logs the summary was built from
 
 # ==================== COMPREHENSIVE FOOD DATABASE ====================
 
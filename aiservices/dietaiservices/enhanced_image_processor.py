@@ -17,13 +17,15 @@ import logging
 import asyncio
 from PIL import Image, ImageEnhance, ImageFilter
 import numpy as np
-from google.cloud import vision
 from pydantic import BaseModel
 import motor.motor_asyncio
 import json
 import uuid
 from bson import ObjectId
 from settings import settings
+from vision_gateway import get_vision_gateway
+from image_store import ImageStore, create_image_store
+from food_knowledge import get_food_knowledge_base
 
 from nutrition import BMICalculator, TDEECalculator
 
@@ -52,80 +54,29 @@ class ImageAnalysisResult(BaseModel):
     analysis_method: str  # 'google_vision', 'fallback', 'hybrid'
     processing_time_seconds: float
     image_url: Optional[str] = None
+    preview_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    image_content_hash: Optional[str] = None  # key in the content-addressed image store
     created_at: datetime
     meal_type: str
     text_description: Optional[str] = None
 
 class EnhancedFoodVisionAnalyzer:
     def __init__(self, mongodb_client: motor.motor_asyncio.AsyncIOMotorClient, db_name: str):
-        # Initialize Google Vision client
-        if settings.DISABLE_GOOGLE_VISION:
-            logger.info("Google Vision API disabled for local development")
-            self.vision_client = None
-            self.vision_available = False
-        elif settings.USE_MOCK_GOOGLE_VISION:
-            logger.info("Using mock Google Vision API for local development")
-            self.vision_client = None
-            self.vision_available = True  # We'll use fallback methods
-        else:
-            try:
-                self.vision_client = vision.ImageAnnotatorClient()
-                self.vision_available = True
-                logger.info("Google Vision API initialized successfully")
-            except Exception as e:
-                logger.warning(f"Google Vision API not available, using mock service: {e}")
-                self.vision_client = None
-                self.vision_available = True  # Use fallback
+        # Google Vision requests go through one batched gateway shared by all analyzers
+        self.vision_gateway = get_vision_gateway()
+        self.vision_available = not settings.DISABLE_GOOGLE_VISION  # without a gateway, the fallback is used
         
         # Initialize MongoDB and GridFS
         self.db = mongodb_client[db_name]
-        self.fs = motor.motor_asyncio.AsyncIOMotorGridFSBucket(self.db)
+        self.fs = motor.motor_asyncio.AsyncIOMotorGridFSBucket(self.db)  # images stored before the image store
+        self.image_store = create_image_store(self.db, settings)
         
         # Initialize nutrition calculator
         self.nutrition_calc = NutritionCalculator()
         
-        # Enhanced food database with Sri Lankan foods
-        self.food_database = {
-            # Rice dishes
-            'rice': {'calories': 130, 'protein': 2.7, 'carbs': 28, 'fat': 0.3, 'fiber': 0.4},
-            'fried rice': {'calories': 240, 'protein': 6, 'carbs': 35, 'fat': 8, 'fiber': 1.5},
-            'coconut rice': {'calories': 180, 'protein': 3, 'carbs': 32, 'fat': 5, 'fiber': 1},
-            
-            # Kottu variations
-            'kottu': {'calories': 450, 'protein': 20, 'carbs': 40, 'fat': 20, 'fiber': 3},
-            'chicken kottu': {'calories': 520, 'protein': 28, 'carbs': 42, 'fat': 24, 'fiber': 3},
-            'vegetable kottu': {'calories': 380, 'protein': 12, 'carbs': 45, 'fat': 15, 'fiber': 5},
-            
-            # Curries
-            'chicken curry': {'calories': 200, 'protein': 25, 'carbs': 8, 'fat': 8, 'fiber': 2},
-            'fish curry': {'calories': 180, 'protein': 22, 'carbs': 6, 'fat': 7, 'fiber': 1.5},
-            'dal curry': {'calories': 160, 'protein': 12, 'carbs': 20, 'fat': 4, 'fiber': 8},
-            'vegetable curry': {'calories': 120, 'protein': 4, 'carbs': 15, 'fat': 6, 'fiber': 4},
-            'potato curry': {'calories': 140, 'protein': 3, 'carbs': 22, 'fat': 5, 'fiber': 3},
-            
-            # Breads and rotis
-            'roti': {'calories': 80, 'protein': 3, 'carbs': 15, 'fat': 1, 'fiber': 2},
-            'naan': {'calories': 160, 'protein': 5, 'carbs': 25, 'fat': 5, 'fiber': 1},
-            'hoppers': {'calories': 90, 'protein': 2, 'carbs': 18, 'fat': 1.5, 'fiber': 1},
-            'string hoppers': {'calories': 70, 'protein': 2, 'carbs': 14, 'fat': 0.5, 'fiber': 1},
-            
-            # Proteins
-            'chicken': {'calories': 165, 'protein': 31, 'carbs': 0, 'fat': 3.6, 'fiber': 0},
-            'fish': {'calories': 140, 'protein': 28, 'carbs': 0, 'fat': 3, 'fiber': 0},
-            'beef': {'calories': 250, 'protein': 26, 'carbs': 0, 'fat': 15, 'fiber': 0},
-            'egg': {'calories': 70, 'protein': 6, 'carbs': 0.5, 'fat': 5, 'fiber': 0},
-            
-            # Vegetables
-            'cabbage': {'calories': 25, 'protein': 1.3, 'carbs': 6, 'fat': 0.1, 'fiber': 2.5},
-            'carrot': {'calories': 41, 'protein': 0.9, 'carbs': 10, 'fat': 0.2, 'fiber': 2.8},
-            'beans': {'calories': 35, 'protein': 2, 'carbs': 7, 'fat': 0.1, 'fiber': 3.4},
-            'brinjal': {'calories': 25, 'protein': 1, 'carbs': 6, 'fat': 0.2, 'fiber': 3},
-            
-            # Fruits
-            'banana': {'calories': 89, 'protein': 1.1, 'carbs': 23, 'fat': 0.3, 'fiber': 2.6},
-            'mango': {'calories': 60, 'protein': 0.8, 'carbs': 15, 'fat': 0.4, 'fiber': 1.6},
-            'papaya': {'calories': 43, 'protein': 0.5, 'carbs': 11, 'fat': 0.3, 'fiber': 1.7},
-        }
+        # Foods and their nutrition come from the shared food knowledge base
+        self.food_knowledge = get_food_knowledge_base()
         
         # Food keywords for better detection
         self.food_keywords = {
@@ -149,6 +100,7 @@ class EnhancedFoodVisionAnalyzer:
         # Generate unique analysis ID and image hash
         analysis_id = str(uuid.uuid4())
         image_hash = hashlib.md5(image_data).hexdigest()
+        content_hash = None
         
         try:
             # Check if this image was analyzed before
@@ -160,8 +112,8 @@ class EnhancedFoodVisionAnalyzer:
                 existing_analysis['created_at'] = datetime.now()
                 return ImageAnalysisResult(**existing_analysis)
             
-            # Store image in GridFS
-            image_url = await self._store_image(image_data, analysis_id, user_id)
+            # Store image (once per distinct photo) with its preview and thumbnail
+            content_hash = await self._store_image(image_data, analysis_id)
             
             # Preprocess image
             processed_image = await self._preprocess_image(image_data)
@@ -205,7 +157,10 @@ class EnhancedFoodVisionAnalyzer:
                 confidence_score=confidence_score,
                 analysis_method=analysis_method,
                 processing_time_seconds=processing_time,
-                image_url=image_url,
+                image_url=ImageStore.url(content_hash) if content_hash else None,
+                preview_url=ImageStore.url(content_hash, 'preview') if content_hash else None,
+                thumbnail_url=ImageStore.url(content_hash, 'thumbnail') if content_hash else None,
+                image_content_hash=content_hash,
                 created_at=datetime.now(),
                 meal_type=meal_type,
                 text_description=text_description
@@ -219,6 +174,8 @@ class EnhancedFoodVisionAnalyzer:
             
         except Exception as e:
             logger.error(f"Error in food image analysis: {e}")
+            if content_hash:
+                await self.image_store.release(content_hash, analysis_id)
             # Create minimal fallback result
             return ImageAnalysisResult(
                 analysis_id=analysis_id,
@@ -235,26 +192,11 @@ class EnhancedFoodVisionAnalyzer:
                 text_description=text_description
             )
 
-    async def _store_image(self, image_data: bytes, analysis_id: str, user_id: str) -> str:
-        """Store image in GridFS and return URL."""
+    async def _store_image(self, image_data: bytes, analysis_id: str) -> Optional[str]:
+        """Store image in the image store, referenced by the analysis, and return its content hash."""
         try:
-            # Create metadata
-            metadata = {
-                'analysis_id': analysis_id,
-                'user_id': user_id,
-                'upload_time': datetime.now(),
-                'content_type': 'image/jpeg'
-            }
-            
-            # Store in GridFS
-            file_id = await self.fs.put(
-                image_data,
-                filename=f"food_image_{analysis_id}.jpg",
-                metadata=metadata
-            )
-            
-            # Return GridFS URL (you can customize this based on your serving setup)
-            return f"/api/images/{file_id}"
+            stored = await self.image_store.put(image_data, owner=analysis_id, content_type='image/jpeg')
+            return stored['hash']
             
         except Exception as e:
             logger.error(f"Error storing image: {e}")
@@ -294,55 +236,41 @@ class EnhancedFoodVisionAnalyzer:
     async def _google_vision_analysis(self, image_data: bytes) -> Tuple[List[DetectedFood], float]:
         """Analyze image using Google Vision API."""
         try:
-            image = vision.Image(content=image_data)
-            
-            # Perform label detection
-            response = self.vision_client.label_detection(image=image)
-            labels = response.label_annotations
-            
-            # Perform object localization
-            objects = self.vision_client.object_localization(image=image).localized_object_annotations
+            # Labels and objects (with text) in one batched request
+            annotation = await self.vision_gateway.annotate(image_data)
             
             detected_foods = []
             confidence_scores = []
             
             # Process labels
-            for label in labels:
-                if self._is_food_related(label.description.lower()):
-                    food_info = self._get_nutrition_info(label.description.lower())
+            for label in annotation['labels']:
+                if self._is_food_related(label['description'].lower()):
+                    food_info = self._get_nutrition_info(label['description'].lower())
                     if food_info:
                         detected_food = DetectedFood(
-                            name=label.description,
-                            confidence=label.score,
-                            estimated_portion=self._estimate_portion(label.description),
+                            name=label['description'],
+                            confidence=label['score'],
+                            estimated_portion=self._estimate_portion(label['description']),
                             **food_info
                         )
                         detected_foods.append(detected_food)
-                        confidence_scores.append(label.score)
+                        confidence_scores.append(label['score'])
             
             # Process localized objects
-            for obj in objects:
-                if self._is_food_related(obj.name.lower()):
-                    food_info = self._get_nutrition_info(obj.name.lower())
+            for obj in annotation['objects']:
+                if self._is_food_related(obj['name'].lower()):
+                    food_info = self._get_nutrition_info(obj['name'].lower())
                     if food_info:
-                        # Calculate bounding box
-                        vertices = obj.bounding_poly.normalized_vertices
-                        bounding_box = {
-                            'x1': vertices[0].x,
-                            'y1': vertices[0].y,
-                            'x2': vertices[2].x,
-                            'y2': vertices[2].y
-                        }
-                        
+                        bounding_box = obj['bounding_box']
                         detected_food = DetectedFood(
-                            name=obj.name,
-                            confidence=obj.score,
+                            name=obj['name'],
+                            confidence=obj['score'],
                             estimated_portion=self._estimate_portion_from_bbox(bounding_box),
                             bounding_box=bounding_box,
                             **food_info
                         )
                         detected_foods.append(detected_food)
-                        confidence_scores.append(obj.score)
+                        confidence_scores.append(obj['score'])
             
             # Remove duplicates and sort
             detected_foods = self._deduplicate_foods(detected_foods)
@@ -389,27 +317,27 @@ class EnhancedFoodVisionAnalyzer:
         detected_foods = []
         confidence_scores = []
         
-        text_lower = text_description.lower()
+        text = text_description.strip()
         
-        # Check for food keywords
-        for food_name, nutrition in self.food_database.items():
-            if food_name in text_lower:
-                # Calculate confidence based on exact match vs partial match
-                if food_name == text_lower.strip():
-                    confidence = 0.9
-                elif text_lower.startswith(food_name) or text_lower.endswith(food_name):
-                    confidence = 0.8
-                else:
-                    confidence = 0.7
-                
-                detected_food = DetectedFood(
-                    name=food_name.title(),
-                    confidence=confidence,
-                    estimated_portion=self._estimate_portion_from_text(text_description, food_name),
-                    **nutrition
-                )
-                detected_foods.append(detected_food)
-                confidence_scores.append(confidence)
+        # Check for known foods
+        for match in self.food_knowledge.extract(text, keywords=False):
+            food_name = match.food.name
+            # Calculate confidence based on exact match vs partial match
+            if match.start == 0 and match.end == len(text):
+                confidence = 0.9
+            elif match.start == 0 or match.end == len(text):
+                confidence = 0.8
+            else:
+                confidence = 0.7
+            
+            detected_food = DetectedFood(
+                name=food_name.title(),
+                confidence=confidence,
+                estimated_portion=self._estimate_portion_from_text(text_description, food_name),
+                **match.food.nutrition
+            )
+            detected_foods.append(detected_food)
+            confidence_scores.append(confidence)
         
         # If no specific foods found, try to parse generic descriptions
         if not detected_foods:
@@ -432,14 +360,10 @@ class EnhancedFoodVisionAnalyzer:
 
     def _get_nutrition_info(self, food_name: str) -> Optional[Dict[str, float]]:
         """Get nutrition information for a food item."""
-        # Direct match
-        if food_name in self.food_database:
-            return self.food_database[food_name].copy()
-        
-        # Partial match
-        for key, nutrition in self.food_database.items():
-            if key in food_name or food_name in key:
-                return nutrition.copy()
+        # Direct or partial match
+        match = self.food_knowledge.search(food_name)
+        if match:
+            return dict(match[0].nutrition)
         
         # Generic fallback
         return {
@@ -513,13 +437,13 @@ class EnhancedFoodVisionAnalyzer:
                     name='Rice',
                     confidence=0.6,
                     estimated_portion='1 cup',
-                    **self.food_database['rice']
+                    **self.food_knowledge.lookup('rice').nutrition
                 ),
                 DetectedFood(
                     name='Curry',
                     confidence=0.5,
                     estimated_portion='1 cup',
-                    **self.food_database['chicken curry']
+                    **self.food_knowledge.lookup('chicken curry').nutrition
                 )
             ])
         
@@ -579,6 +503,7 @@ class EnhancedFoodVisionAnalyzer:
                 'detected_foods': [food.dict() for food in analysis_result.detected_foods],
                 'total_nutrition': analysis_result.total_nutrition,
                 'image_url': analysis_result.image_url,
+                'thumbnail_url': analysis_result.thumbnail_url,
                 'confidence_score': analysis_result.confidence_score,
                 'created_at': datetime.now(),
                 'date': datetime.now().strftime('%Y-%m-%d')
@@ -607,9 +532,13 @@ class EnhancedFoodVisionAnalyzer:
             logger.error(f"Error retrieving analysis history: {e}")
             return []
 
-    async def get_image_by_id(self, file_id: str) -> Tuple[bytes, str]:
-        """Retrieve image from GridFS."""
+    async def get_image_by_id(self, file_id: str, rendition: str = 'original') -> Tuple[bytes, str]:
+        """Retrieve an image by content hash (or GridFS id for images stored before the image store)."""
         try:
+            info = await self.image_store.get(file_id, rendition)
+            if info:
+                return await self.image_store.read(info), info['content_type']
+            
             grid_out = await self.fs.get(ObjectId(file_id))
             image_data = await grid_out.read()
             content_type = grid_out.metadata.get('content_type', 'image/jpeg')
@@ -619,6 +548,17 @@ class EnhancedFoodVisionAnalyzer:
             logger.error(f"Error retrieving image: {e}")
             return None, None
 
+    async def delete_analysis(self, analysis_id: str, user_id: str) -> bool:
+        """Delete an analysis and its meal entry, releasing its image."""
+        analysis = await self.db.food_analyses.find_one_and_delete({'analysis_id': analysis_id, 'user_id': user_id})
+        if not analysis:
+            return False
+        
+        await self.db.meal_entries.delete_many({'analysis_id': analysis_id, 'user_id': user_id})
+        if analysis.get('image_content_hash'):
+            await self.image_store.release(analysis['image_content_hash'], analysis_id)
+        return True
+
 # Nutrition Calculator Helper
 class NutritionCalculator:
     """Helper class for nutrition calculations."""
@@ -0,0 +1,24 @@
+"""
+Unified food knowledge base shared by the food analyzers and the backend
+nutrition routes. Pure standard library. This package lives in
+aiservices/dietaiservices; backend/food_knowledge is an identical copy inside
+the backend image's build context, kept in sync by the backend tests.
+"""
+
+from .autocomplete import FoodAutocomplete, Suggestion, get_food_autocomplete
+from .knowledge_base import (
+    DATA_FILE,
+    KEYWORD,
+    NAME,
+    FoodKnowledgeBase,
+    FoodMatch,
+    FoodRecord,
+    get_food_knowledge_base,
+)
+from .matcher import PhraseMatcher, normalize_token, phrase_key, tokenize
+
+__all__ = [
+    'DATA_FILE', 'KEYWORD', 'NAME', 'FoodAutocomplete', 'FoodKnowledgeBase', 'FoodMatch', 'FoodRecord',
+    'PhraseMatcher', 'Suggestion', 'get_food_autocomplete', 'get_food_knowledge_base', 'normalize_token',
+    'phrase_key', 'tokenize'
+]
@@ -0,0 +1,216 @@
+"""
+Food name autocomplete over the knowledge base.
+
+Every word start of every name, alias and keyword goes into one sorted
+array, so "cur" finds "curry" and "chicken curry" with two bisections
+instead of a scan of all foods. The same array is walked as an implicit
+trie for typo tolerance: a Levenshtein DP row is kept per depth, rows are
+reused for the prefix shared with the previous term, and whole subtrees are
+skipped (by bisection) once every cell of a row exceeds the typo budget.
+
+Suggestions are ranked by how the query matched (name start, alias start,
+later word, keyword; fewer typos first), weighted by how often each food
+was picked. Selections are applied in batches so a small per-query cache
+of ranked responses stays valid between batches.
+"""
+
+import heapq
+import math
+import threading
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from .knowledge_base import FoodKnowledgeBase, FoodRecord, get_food_knowledge_base
+
+# Base score by how the query matched
+NAME_START = 1.0
+ALIAS_START = 0.85
+LATER_WORD = 0.7
+KEYWORD_MATCH = 0.55
+
+TYPO_PENALTY = 0.5  # score multiplier per edit
+POPULARITY_WEIGHT = 0.3  # boost per log(1 + selections)
+MIN_FUZZY_LENGTH = 3  # shorter queries are matched by prefix only
+_END = '\uffff'
+_NO_MATCH = (0.0,)
+
+
+def normalize_query(text: str) -> str:
+    return ' '.join(text.lower().replace('_', ' ').split())
+
+
+class Suggestion(NamedTuple):
+    food: FoodRecord
+    score: float
+    matched: str  # the name, alias or keyword that matched
+    typos: int
+
+
+class FoodAutocomplete:
+    """Prefix and typo-tolerant suggestions, ranked by match quality and popularity"""
+
+    def __init__(self, knowledge_base: FoodKnowledgeBase, max_typos: int = 2,
+                 cache_size: int = 1024, refresh_every: int = 50):
+        self.max_typos = max_typos
+        self.cache_size = cache_size
+        self.refresh_every = refresh_every
+        self._foods = list(knowledge_base)
+
+        entries = []
+        for position, food in enumerate(self._foods):
+            terms = [(food.name, NAME_START)] + [(alias, ALIAS_START) for alias in food.aliases]
+            terms += [(keyword, KEYWORD_MATCH) for keyword in food.keywords]
+            for term, weight in terms:
+                term = normalize_query(term)
+                words = term.split(' ')
+                for word_index in range(len(words)):
+                    suffix = ' '.join(words[word_index:])
+                    later_weight = weight if word_index == 0 or weight == KEYWORD_MATCH else LATER_WORD
+                    entries.append((suffix, position, later_weight, term))
+        entries.sort(key=lambda entry: entry[0])
+        self._terms = [entry[0] for entry in entries]
+        self._entries = [entry[1:] for entry in entries]
+
+        self._popularity: Dict[int, float] = {}
+        self._counts: Counter = Counter()
+        self._pending = 0
+        self._positions = {food.id: position for position, food in enumerate(self._foods)}
+        self._tiebreak = [(len(food.name), food.name, food.id) for food in self._foods]
+        self._cache: 'OrderedDict[Tuple[str, int], List[Suggestion]]' = OrderedDict()
+        self.stats = {'queries': 0, 'cache_hits': 0, 'fuzzy_searches': 0, 'selections': 0}
+
+    # Popularity
+
+    def load_popularity(self, counts: Mapping[str, int]):
+        """Replace selection counts (by food id), e.g. from persisted logs"""
+        self._counts = Counter({food_id: count for food_id, count in counts.items() if food_id in self._positions})
+        self._apply_popularity()
+
+    def record_selection(self, food_id: str) -> bool:
+        """Count a picked suggestion; rankings update every refresh_every selections"""
+        if food_id not in self._positions:
+            return False
+        self._counts[food_id] += 1
+        self._pending += 1
+        self.stats['selections'] += 1
+        if self._pending >= self.refresh_every:
+            self._apply_popularity()
+        return True
+
+    def _apply_popularity(self):
+        self._popularity = {
+            self._positions[food_id]: 1 + POPULARITY_WEIGHT * math.log1p(count)
+            for food_id, count in self._counts.items()
+        }
+        self._pending = 0
+        self._cache.clear()
+
+    # Search
+
+    def suggest(self, query: str, limit: int = 10) -> List[Suggestion]:
+        key = normalize_query(query)
+        if not key or limit <= 0:
+            return []
+        self.stats['queries'] += 1
+        cached = self._cache.get((key, limit))
+        if cached is not None:
+            self._cache.move_to_end((key, limit))
+            self.stats['cache_hits'] += 1
+            return cached
+
+        best: Dict[int, Tuple[float, str, int]] = {}
+        for position, weight, term in self._entries[bisect_left(self._terms, key):bisect_left(self._terms, key + _END)]:
+            if weight > best.get(position, _NO_MATCH)[0]:
+                best[position] = (weight, term, 0)
+        if len(best) < limit and len(key) >= MIN_FUZZY_LENGTH:
+            self.stats['fuzzy_searches'] += 1
+            budget = min(self.max_typos, 1 if len(key) < 6 else 2)
+            for index, typos in self._within_typos(key, budget):
+                position, weight, term = self._entries[index]
+                score = weight * TYPO_PENALTY ** typos
+                if score > best.get(position, _NO_MATCH)[0]:
+                    best[position] = (score, term, typos)
+
+        popularity, tiebreak = self._popularity, self._tiebreak
+        top = heapq.nsmallest(limit, best.items(), key=lambda item: (
+            -item[1][0] * popularity.get(item[0], 1.0), item[1][2], tiebreak[item[0]]
+        ))
+        ranked = [
+            Suggestion(self._foods[position], score * popularity.get(position, 1.0), matched, typos)
+            for position, (score, matched, typos) in top
+        ]
+
+        self._cache[(key, limit)] = ranked
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return ranked
+
+    def _within_typos(self, query: str, budget: int) -> Iterator[Tuple[int, int]]:
+        """(entry index, edits) for terms with a prefix within budget edits of query
+
+        Typos are only looked for after the first character, which is taken as typed.
+        """
+        terms, size, over = self._terms, len(query), budget + 1
+        # rows[d]: edit distances after the first d characters of the term, capped at over;
+        # only cells within budget of the diagonal are computed
+        rows = [[min(column, over) for column in range(size + 1)]]
+        row_min = [0]
+        best_end = [min(size, over)]  # fewest edits for query against any term prefix up to depth d
+        previous = ''
+        index = bisect_left(terms, query[0])
+        stop = bisect_left(terms, query[0] + _END)
+        while index < stop:
+            term = terms[index]
+            shared = 0
+            bound = min(len(previous), len(term), len(rows) - 1)
+            while shared < bound and previous[shared] == term[shared]:
+                shared += 1
+            del rows[shared + 1:], row_min[shared + 1:], best_end[shared + 1:]
+
+            pruned_at = None
+            for depth in range(shared, len(term)):
+                if row_min[depth] > budget:
+                    pruned_at = depth
+                    break
+                row, char = rows[depth], term[depth]
+                following = [over] * (size + 1)
+                following[0] = min(depth + 1, over)
+                for column in range(max(1, depth + 1 - budget), min(size, depth + 1 + budget) + 1):
+                    following[column] = min(
+                        following[column - 1] + 1,
+                        row[column] + 1,
+                        row[column - 1] + (query[column - 1] != char),
+                        over
+                    )
+                rows.append(following)
+                row_min.append(min(following))
+                best_end.append(min(best_end[-1], following[size]))
+
+            previous = term
+            if pruned_at is not None:
+                # Row minimums never decrease with depth, so the edits found so far
+                # are final for every term continuing this prefix
+                end = bisect_left(terms, term[:pruned_at] + _END, index + 1)
+                if best_end[pruned_at] <= budget:
+                    for matched in range(index, end):
+                        yield matched, best_end[pruned_at]
+                index = end
+                continue
+            if best_end[len(term)] <= budget:
+                yield index, best_end[len(term)]
+            index += 1
+
+
+_autocomplete: Optional[FoodAutocomplete] = None
+_autocomplete_lock = threading.Lock()
+
+
+def get_food_autocomplete() -> FoodAutocomplete:
+    """The process-wide autocomplete over the shared knowledge base"""
+    global _autocomplete
+    if _autocomplete is None:
+        with _autocomplete_lock:
+            if _autocomplete is None:
+                _autocomplete = FoodAutocomplete(get_food_knowledge_base())
+    return _autocomplete
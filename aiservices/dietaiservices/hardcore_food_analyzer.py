@@ -36,7 +36,7 @@ import motor.motor_asyncio
 from motor.motor_asyncio import AsyncIOMotorGridFSBucket
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 import math
 
 # YOLOv8 + Tesseract imports (local computer vision)
@@ -46,6 +46,7 @@ from yolo_tesseract_analyzer import YOLOTesseractFoodAnalyzer
 
 # Enhanced nutrition system import
 from enhanced_nutrition import AccurateNutritionAnalyzer, DetailedNutritionInfo
+from food_knowledge import get_food_knowledge_base
 
 logger = logging.getLogger(__name__)
 
@@ -79,6 +80,8 @@ class NutritionProfile:
     potassium: Optional[float] = None
     magnesium: Optional[float] = None
 
+NUTRITION_PROFILE_FIELDS = {f.name for f in fields(NutritionProfile)}
+
 class AdvancedDetectedFood(BaseModel):
     """Enhanced food detection result with advanced metrics."""
     name: str
@@ -474,8 +477,8 @@ class HardcoreFoodAnalyzer:
         self.nutrition_analyzer = AccurateNutritionAnalyzer()
         self.enhanced_nutrition = AccurateNutritionAnalyzer()  # For compatibility
         
-        # Initialize advanced food database
-        self.food_database = self._load_hardcore_food_database()
+        # Foods, nutrition and health metadata come from the shared food knowledge base
+        self.food_knowledge = get_food_knowledge_base()
         
         # Initialize ML models (placeholders for now)
         self._init_ml_models()
@@ -508,132 +511,6 @@ class HardcoreFoodAnalyzer:
         self.ml_models_available = False
         logger.info("ML models initialization placeholder - ready for integration")
 
-    def _load_hardcore_food_database(self) -> Dict[str, Dict[str, Any]]:
-        """Load comprehensive food database with advanced nutrition data."""
-        return {
-            # Sri Lankan Rice Dishes
-            'rice': {
-                'nutrition': NutritionProfile(
-                    calories=130, protein=2.7, carbs=28, fat=0.3, fiber=0.4,
-                    sodium=5, sugar=0.1, iron=0.8, calcium=10, potassium=55
-                ),
-                'category': 'grains',
-                'glycemic_index': 73,
-                'allergens': ['gluten-free'],
-                'preparation_methods': ['boiled', 'steamed', 'fried'],
-                'health_score': 7.5
-            },
-            'fried_rice': {
-                'nutrition': NutritionProfile(
-                    calories=240, protein=6, carbs=35, fat=8, fiber=1.5,
-                    sodium=400, sugar=2, iron=1.2, calcium=25, potassium=120
-                ),
-                'category': 'grains',
-                'glycemic_index': 78,
-                'allergens': ['may contain eggs'],
-                'preparation_methods': ['fried', 'stir-fried'],
-                'health_score': 6.0
-            },
-            'coconut_rice': {
-                'nutrition': NutritionProfile(
-                    calories=180, protein=3, carbs=32, fat=5, fiber=1,
-                    sodium=200, sugar=1, iron=0.9, calcium=15, potassium=80
-                ),
-                'category': 'grains',
-                'glycemic_index': 75,
-                'allergens': ['coconut'],
-                'preparation_methods': ['boiled with coconut milk'],
-                'health_score': 7.0
-            },
-            
-            # Kottu Dishes
-            'kottu': {
-                'nutrition': NutritionProfile(
-                    calories=450, protein=20, carbs=40, fat=20, fiber=3,
-                    sodium=800, sugar=3, iron=2.5, calcium=60, potassium=300
-                ),
-                'category': 'mixed_dish',
-                'glycemic_index': 65,
-                'allergens': ['gluten', 'eggs'],
-                'preparation_methods': ['chopped and fried'],
-                'health_score': 6.5
-            },
-            'chicken_kottu': {
-                'nutrition': NutritionProfile(
-                    calories=520, protein=28, carbs=42, fat=24, fiber=3,
-                    sodium=900, sugar=3, iron=3.0, calcium=70, potassium=400
-                ),
-                'category': 'mixed_dish',
-                'glycemic_index': 68,
-                'allergens': ['gluten', 'eggs'],
-                'preparation_methods': ['chopped and fried with chicken'],
-                'health_score': 7.0
-            },
-            
-            # Curry Dishes
-            'chicken_curry': {
-                'nutrition': NutritionProfile(
-                    calories=200, protein=25, carbs=8, fat=8, fiber=2,
-                    sodium=600, sugar=2, iron=1.5, calcium=40, potassium=250
-                ),
-                'category': 'protein_curry',
-                'glycemic_index': 30,
-                'allergens': ['may contain dairy'],
-                'preparation_methods': ['curried', 'stewed'],
-                'health_score': 8.0
-            },
-            'fish_curry': {
-                'nutrition': NutritionProfile(
-                    calories=180, protein=22, carbs=6, fat=7, fiber=1.5,
-                    sodium=500, sugar=1.5, iron=1.2, calcium=80, potassium=300
-                ),
-                'category': 'protein_curry',
-                'glycemic_index': 25,
-                'allergens': ['fish'],
-                'preparation_methods': ['curried', 'coconut based'],
-                'health_score': 8.5
-            },
-            'dal_curry': {
-                'nutrition': NutritionProfile(
-                    calories=160, protein=12, carbs=20, fat=4, fiber=8,
-                    sodium=400, sugar=1, iron=2.5, calcium=50, potassium=400
-                ),
-                'category': 'legume_curry',
-                'glycemic_index': 35,
-                'allergens': ['legumes'],
-                'preparation_methods': ['boiled', 'tempered'],
-                'health_score': 9.0
-            },
-            
-            # Bread Items
-            'roti': {
-                'nutrition': NutritionProfile(
-                    calories=80, protein=3, carbs=15, fat=1, fiber=2,
-                    sodium=150, sugar=0.5, iron=0.8, calcium=20, potassium=60
-                ),
-                'category': 'bread',
-                'glycemic_index': 62,
-                'allergens': ['gluten'],
-                'preparation_methods': ['grilled', 'pan-cooked'],
-                'health_score': 7.0
-            },
-            
-            # Hoppers
-            'hoppers': {
-                'nutrition': NutritionProfile(
-                    calories=90, protein=2, carbs=18, fat=1.5, fiber=1,
-                    sodium=100, sugar=1, iron=0.5, calcium=15, potassium=40
-                ),
-                'category': 'fermented_bread',
-                'glycemic_index': 55,
-                'allergens': ['may contain coconut'],
-                'preparation_methods': ['fermented', 'steamed'],
-                'health_score': 7.5
-            },
-            
-            # Add more foods...
-        }
-
     async def analyze_food_image_hardcore(self, 
                                          image_data: bytes, 
                                          user_id: str,
@@ -1010,17 +887,15 @@ class HardcoreFoodAnalyzer:
                     food_name = detection.get('name', 'unknown_food').lower()
                     portion = detection.get('estimated_portion', 'medium')
                     
-                    # Use the hardcoded food database for accurate nutrition
+                    # Use the food knowledge base for accurate nutrition
                     nutrition_data = None
-                    if food_name in self.food_database:
-                        food_info = self.food_database[food_name]
-                        nutrition_data = food_info['nutrition']
-                    else:
-                        # Try partial matching
-                        for db_food, food_info in self.food_database.items():
-                            if db_food in food_name or food_name in db_food:
-                                nutrition_data = food_info['nutrition']
-                                break
+                    match = self.food_knowledge.search(food_name)
+                    food_info = match[0] if match else None
+                    if food_info:
+                        nutrition_data = NutritionProfile(**{
+                            nutrient: value for nutrient, value in food_info.nutrition.items()
+                            if nutrient in NUTRITION_PROFILE_FIELDS
+                        })
                     
                     # If no match found, use default values
                     if not nutrition_data:
@@ -1036,9 +911,9 @@ class HardcoreFoodAnalyzer:
                         nutrition=nutrition_data,
                         detection_method=detection.get('source', 'yolo_tesseract'),
                         portion_accuracy=0.8,
-                        food_category=self.food_database.get(food_name, {}).get('category', 'general'),
-                        glycemic_index=self.food_database.get(food_name, {}).get('glycemic_index', 50),
-                        health_score=self.food_database.get(food_name, {}).get('health_score', 7.0)
+                        food_category=food_info.category if food_info else 'general',
+                        glycemic_index=(food_info.glycemic_index or 50) if food_info else 50,
+                        health_score=(food_info.health_score or 7.0) if food_info else 7.0
                     )
                     validated_foods.append(food)
             
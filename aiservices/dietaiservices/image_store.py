@@ -0,0 +1,257 @@
+"""
+Content-addressed food image storage.
+
+Uploads used to go into GridFS under a fresh filename every time, even when
+the same photo was submitted again, and every history view streamed the
+full-resolution original back. ImageStore keys images by SHA-256 instead:
+
+- One copy per distinct image; each analysis referencing it is recorded in
+  the image's metadata document (``refs``), and the blobs are deleted when
+  the last reference is released
+- WebP preview and thumbnail renditions are rendered once at upload time
+  in a worker thread, so history pages can load small images
+- Renditions are immutable, so they are served with strong ETags and
+  byte-range support (see ``parse_byte_range``)
+- Blobs live in a pluggable backend: GridFS or a local directory
+  (IMAGE_STORE_BACKEND / IMAGE_STORE_PATH)
+
+Blob names carry a per-image generation, so an image collected while the
+same photo is being uploaded again never deletes the new upload's blobs.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+IMAGE_COLLECTION = "images"
+ORIGINAL = "original"
+RENDITION_SIZES = {'preview': 640, 'thumbnail': 160}  # longest side in pixels
+WEBP_QUALITY = 80
+RENDITIONS = (ORIGINAL,) + tuple(RENDITION_SIZES)
+
+
+def render_webp_renditions(image_data: bytes) -> Dict[str, Tuple[bytes, str]]:
+    """Preview and thumbnail renditions as WebP; empty if the image cannot be decoded"""
+    from PIL import Image, ImageOps
+
+    try:
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_data)))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+    except Exception as e:
+        logger.warning(f"Cannot render image renditions: {e}")
+        return {}
+
+    renditions = {}
+    for name, size in RENDITION_SIZES.items():
+        rendition = image.copy()
+        rendition.thumbnail((size, size), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        rendition.save(output, format='WEBP', quality=WEBP_QUALITY, method=4)
+        renditions[name] = (output.getvalue(), 'image/webp')
+    return renditions
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single-range Range header, None to send the whole body.
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise ValueError(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        raise ValueError(f"Invalid range: {header}")
+    if start >= size or start > end:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, end
+
+
+class LocalImageBackend:
+    """Blobs as files under a directory, fanned out by name prefix"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, name: str) -> Path:
+        return self.root / name[:2] / name
+
+    async def write(self, name: str, data: bytes, content_type: str):
+        def write():
+            path = self._path(name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            temp.write_bytes(data)
+            os.replace(temp, path)
+        await asyncio.to_thread(write)
+
+    async def read(self, name: str, start: int = 0, end: Optional[int] = None) -> Optional[bytes]:
+        def read():
+            try:
+                with open(self._path(name), 'rb') as f:
+                    f.seek(start)
+                    return f.read() if end is None else f.read(end - start + 1)
+            except FileNotFoundError:
+                return None
+        return await asyncio.to_thread(read)
+
+    async def delete(self, name: str):
+        await asyncio.to_thread(lambda: self._path(name).unlink(missing_ok=True))
+
+
+class GridFSImageBackend:
+    """Blobs in a Motor GridFS bucket, one file per blob name"""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    async def write(self, name: str, data: bytes, content_type: str):
+        await self.bucket.upload_from_stream(name, data, metadata={'content_type': content_type})
+
+    async def read(self, name: str, start: int = 0, end: Optional[int] = None) -> Optional[bytes]:
+        from gridfs.errors import NoFile
+
+        try:
+            stream = await self.bucket.open_download_stream_by_name(name)
+        except NoFile:
+            return None
+        stream.seek(start)
+        return await stream.read(-1 if end is None else end - start + 1)
+
+    async def delete(self, name: str):
+        async for grid_out in self.bucket.find({'filename': name}):
+            await self.bucket.delete(grid_out._id)
+
+
+Renderer = Callable[[bytes], Dict[str, Tuple[bytes, str]]]
+
+
+class ImageStore:
+    """Reference-counted, content-addressed images with precomputed renditions"""
+
+    def __init__(self, backend, collection, render: Renderer = render_webp_renditions):
+        self.backend = backend
+        self.collection = collection
+        self.render = render
+        self._uploads: Dict[str, asyncio.Future] = {}
+        self.stats = {'uploads': 0, 'deduplicated': 0, 'images_deleted': 0}
+
+    @staticmethod
+    def url(content_hash: str, rendition: str = ORIGINAL) -> str:
+        return f"/api/images/{content_hash}" + (f"?rendition={rendition}" if rendition != ORIGINAL else "")
+
+    async def put(self, image_data: bytes, owner: str, content_type: str = 'image/jpeg') -> Dict[str, Any]:
+        """Store an image (once per content) and add owner as a reference to it"""
+        content_hash = hashlib.sha256(image_data).hexdigest()
+        self.stats['uploads'] += 1
+        document = await self.collection.find_one_and_update(
+            {'_id': content_hash},
+            {
+                '$addToSet': {'refs': owner},
+                '$set': {'last_referenced_at': datetime.now()},
+                '$setOnInsert': {
+                    'generation': uuid.uuid4().hex[:12],
+                    'content_type': content_type,
+                    'size': len(image_data),
+                    'created_at': datetime.now()
+                }
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+        deduplicated = 'renditions' in document
+        if deduplicated:
+            self.stats['deduplicated'] += 1
+        else:
+            # Concurrent uploads of the same new image in this process write it once
+            upload = self._uploads.get(content_hash)
+            if upload is None:
+                upload = self._uploads[content_hash] = asyncio.ensure_future(self._write(document, image_data))
+                upload.add_done_callback(lambda _: self._uploads.pop(content_hash, None))
+            document = await asyncio.shield(upload)
+
+        return {
+            'hash': content_hash,
+            'size': document['size'],
+            'renditions': sorted(document['renditions']),
+            'deduplicated': deduplicated
+        }
+
+    async def _write(self, document: Dict[str, Any], image_data: bytes) -> Dict[str, Any]:
+        content_hash, generation = document['_id'], document['generation']
+        rendered = await asyncio.to_thread(self.render, image_data)
+        blobs = {ORIGINAL: (image_data, document['content_type']), **rendered}
+
+        renditions = {}
+        for name, (data, content_type) in blobs.items():
+            blob = f"{content_hash}-{generation}-{name}"
+            await self.backend.write(blob, data, content_type)
+            renditions[name] = {'blob': blob, 'size': len(data), 'content_type': content_type}
+
+        await self.collection.update_one(
+            {'_id': content_hash, 'generation': generation}, {'$set': {'renditions': renditions}}
+        )
+        return {**document, 'renditions': renditions}
+
+    async def get(self, content_hash: str, rendition: str = ORIGINAL) -> Optional[Dict[str, Any]]:
+        """Blob info of a rendition (the original if it has none), or None for unknown images"""
+        document = await self.collection.find_one({'_id': content_hash}, {'renditions': 1})
+        if not document or 'renditions' not in document:
+            return None
+        renditions = document['renditions']
+        name = rendition if rendition in renditions else ORIGINAL
+        return {**renditions[name], 'rendition': name, 'etag': f'"{content_hash}-{name}"'}
+
+    async def read(self, info: Dict[str, Any], start: int = 0, end: Optional[int] = None) -> Optional[bytes]:
+        """Bytes start..end (inclusive) of a rendition returned by get"""
+        return await self.backend.read(info['blob'], start, end)
+
+    async def release(self, content_hash: str, owner: str) -> bool:
+        """Drop owner's reference; True when that deleted the image"""
+        await self.collection.update_one({'_id': content_hash}, {'$pull': {'refs': owner}})
+        return await self._delete_if_unreferenced(content_hash)
+
+    async def collect_garbage(self) -> int:
+        """Delete images left without references (e.g. by a crash after release)"""
+        deleted = 0
+        async for document in self.collection.find({'refs': {'$size': 0}}, {'_id': 1}):
+            deleted += await self._delete_if_unreferenced(document['_id'])
+        return deleted
+
+    async def _delete_if_unreferenced(self, content_hash: str) -> bool:
+        document = await self.collection.find_one_and_delete({'_id': content_hash, 'refs': {'$size': 0}})
+        if not document:
+            return False
+        for rendition in document.get('renditions', {}).values():
+            await self.backend.delete(rendition['blob'])
+        self.stats['images_deleted'] += 1
+        return True
+
+
+def create_image_store(db, settings) -> ImageStore:
+    """ImageStore on the backend chosen in settings, with metadata in db.images"""
+    if settings.IMAGE_STORE_BACKEND == 'local':
+        backend = LocalImageBackend(settings.IMAGE_STORE_PATH)
+    else:
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+        backend = GridFSImageBackend(AsyncIOMotorGridFSBucket(db, bucket_name=IMAGE_COLLECTION))
+    return ImageStore(backend, db[IMAGE_COLLECTION])
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
 from pydantic import BaseModel
@@ -27,6 +27,8 @@ from nlp_insights import (
 )
 from enhanced_image_processor import EnhancedFoodVisionAnalyzer, ImageAnalysisResult
 from advanced_food_analyzer import AdvancedFoodAnalyzer
+from image_store import RENDITIONS, parse_byte_range
+from data_version import nutrition_logs_version
 from enhanced_rag_chatbot import enhanced_diet_rag_chatbot, ChatMessage
 from enhanced_image_processor import EnhancedFoodVisionAnalyzer, ImageAnalysisResult
 from advanced_food_analyzer import AdvancedFoodAnalyzer
@@ -61,6 +63,10 @@ nlp_diet_agent = NLPEnhancedDietAgent()
 image_processor = None  # Will be initialized in startup
 advanced_food_analyzer = None  # Will be initialized in startup
 
+# Weekly NLP reports keyed by (user_id, days, include_insights, end day, data version)
+weekly_report_cache: Dict[tuple, Dict[str, Any]] = {}
+WEEKLY_REPORT_CACHE_SIZE = 256
+
 # Request/Response Models
 class ImageAnalysisRequest(BaseModel):
     user_profile: UserProfile
@@ -330,6 +336,58 @@ async def analyze_food_image(
         logger.error(f"Error in image analysis: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/api/images/{image_id}")
+async def get_food_image(image_id: str, request: Request, rendition: str = "original"):
+    """Serve a stored food image or one of its renditions (preview, thumbnail) with ETag and Range support."""
+    if rendition not in RENDITIONS:
+        raise HTTPException(status_code=400, detail=f"rendition must be one of {', '.join(RENDITIONS)}")
+    if not image_processor:
+        raise HTTPException(status_code=503, detail="Image storage not available")
+    
+    info = await image_processor.image_store.get(image_id, rendition)
+    if info is None:
+        # Images stored in GridFS before the image store, by file id
+        image_data, content_type = await image_processor.get_image_by_id(image_id)
+        if image_data is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        return Response(content=image_data, media_type=content_type)
+    
+    # Content-addressed renditions never change; meal photos are personal, so only the browser may cache them
+    headers = {
+        'ETag': info['etag'],
+        'Cache-Control': 'private, max-age=31536000, immutable',
+        'Accept-Ranges': 'bytes'
+    }
+    if info['etag'] in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        byte_range = parse_byte_range(request.headers.get('range'), info['size'])
+    except ValueError:
+        return Response(status_code=416, headers={**headers, 'Content-Range': f"bytes */{info['size']}"})
+    
+    if byte_range is None:
+        return Response(content=await image_processor.image_store.read(info), media_type=info['content_type'],
+                        headers=headers)
+    
+    start, end = byte_range
+    return Response(
+        content=await image_processor.image_store.read(info, start, end),
+        status_code=206,
+        media_type=info['content_type'],
+        headers={**headers, 'Content-Range': f"bytes {start}-{end}/{info['size']}"}
+    )
+
+@app.delete("/analysis/{user_id}/{analysis_id}")
+async def delete_food_analysis(user_id: str, analysis_id: str):
+    """Delete a food analysis; its image is deleted once no analysis references it."""
+    if not image_processor:
+        raise HTTPException(status_code=503, detail="Image analysis not available")
+    
+    if not await image_processor.delete_analysis(analysis_id, user_id):
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return {"analysis_id": analysis_id, "status": "deleted"}
+
 # ===========================
 # RAG CHATBOT ENDPOINTS
 # ===========================
@@ -726,14 +784,30 @@ async def generate_weekly_report_nlp(
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        # Query MongoDB
-        cursor = nutrition_logs_collection.find({
+        query = {
             "user_id": user_id,
             "date": {
                 "$gte": start_date.isoformat(),
                 "$lte": end_date.isoformat()
             }
-        }).sort("date", -1).limit(10)  # Get up to 10 logs
+        }
+        
+        # Serve the previous report while the period's logs are unchanged
+        data_version = await nutrition_logs_version(nutrition_logs_collection, query)
+        if data_version is None:
+            return {
+                "success": False,
+                "message": "No nutrition data found for the specified period",
+                "logs_count": 0
+            }
+        
+        cache_key = (user_id, days, include_insights, end_date.strftime('%Y-%m-%d'), data_version)
+        if cache_key in weekly_report_cache:
+            logger.info("♻️ Weekly report unchanged, serving cached report")
+            return weekly_report_cache[cache_key]
+        
+        # Query MongoDB
+        cursor = nutrition_logs_collection.find(query).sort("date", -1).limit(10)  # Get up to 10 logs
         
         logs = await cursor.to_list(length=10)
         
@@ -777,7 +851,7 @@ async def generate_weekly_report_nlp(
         avg_protein = total_protein / len(logs) if logs else 0
         
         # Build response
-        return {
+        response = {
             "success": True,
             "period": f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
             "logs_count": len(logs),
@@ -794,9 +868,16 @@ async def generate_weekly_report_nlp(
                 "fat": [log.get("total_nutrition", {}).get("fat", 0) for log in logs]
             },
             "generated_at": datetime.now().isoformat(),
-            "analysis_method": "nlp_enhanced"
+            "analysis_method": "nlp_enhanced",
+            "data_version": data_version
         }
         
+        weekly_report_cache[cache_key] = response
+        if len(weekly_report_cache) > WEEKLY_REPORT_CACHE_SIZE:
+            del weekly_report_cache[next(iter(weekly_report_cache))]
+        
+        return response
+        
     except Exception as e:
         logger.error(f"❌ Weekly report generation error: {e}", exc_info=True)
         raise HTTPException(
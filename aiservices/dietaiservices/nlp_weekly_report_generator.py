@@ -7,10 +7,12 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import json
 from bson import ObjectId
+from pymongo import ReturnDocument
 import openai
 from transformers import pipeline
 import numpy as np
 
+from data_version import nutrition_logs_version
 from enhanced_accurate_food_analysis import (
     FoodNutrition, FoodAnalysisResult, NutritionLogEntry, 
     WeeklyMealSummary, AccurateFoodDatabase, db, logger
@@ -328,12 +330,28 @@ class NLPWeeklyReportGenerator:
         
         logger.info(f"📊 Generating weekly report for {user_id}: {week_start.date()} to {week_end.date()}")
         
-        # Fetch nutrition logs for the week
         logs_collection = db["nutrition_logs"]
-        cursor = logs_collection.find({
+        query = {
             "user_id": user_id,
             "date": {"$gte": week_start, "$lt": week_end}
-        }).sort("date", 1)
+        }
+        
+        # Reuse the stored summary while the week's logs are unchanged
+        data_version = await nutrition_logs_version(logs_collection, query)
+        if data_version is None:
+            return await self._create_empty_report(user_id, week_start, week_end)
+        
+        cached = await db["weekly_meal_summaries"].find_one({
+            "user_id": user_id,
+            "week_start": week_start,
+            "data_version": data_version
+        })
+        if cached:
+            logger.info(f"♻️ Weekly report unchanged, using stored summary: {cached['summary_id']}")
+            return WeeklyMealSummary(**cached)
+        
+        # Fetch nutrition logs for the week
+        cursor = logs_collection.find(query).sort("date", 1)
         
         logs = await cursor.to_list(length=1000)
         
@@ -367,7 +385,8 @@ class NLPWeeklyReportGenerator:
             top_foods=top_foods,
             nutrition_trends=nutrition_trends,
             nlp_summary=nlp_summary,
-            recommendations=recommendations
+            recommendations=recommendations,
+            data_version=data_version
         )
         
         # Save to MongoDB
@@ -526,12 +545,22 @@ Overall, you're maintaining consistent nutrition tracking - keep up the great wo
         return recommendations[:5]  # Return top 5 recommendations
     
     async def _save_weekly_summary(self, summary: WeeklyMealSummary):
-        """Save weekly summary to MongoDB"""
+        """Save weekly summary to MongoDB, replacing the previous version for the week"""
         try:
             collection = db["weekly_meal_summaries"]
-            summary_dict = summary.dict()
-            summary_dict["_id"] = summary.summary_id
-            await collection.insert_one(summary_dict)
+            summary_dict = summary.dict(exclude={"summary_id"})
+            stored = await collection.find_one_and_update(
+                {"user_id": summary.user_id, "week_start": summary.week_start},
+                {
+                    "$set": summary_dict,
+                    "$setOnInsert": {"_id": summary.summary_id, "summary_id": summary.summary_id}
+                },
+                upsert=True,
+                projection={"summary_id": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            if stored:
+                summary.summary_id = stored["summary_id"]
             logger.info(f"✅ Weekly summary saved: {summary.summary_id}")
         except Exception as e:
             logger.error(f"Failed to save weekly summary: {e}")
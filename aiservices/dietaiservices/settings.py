@@ -40,6 +40,16 @@ class Settings(BaseSettings):
     USE_MOCK_GOOGLE_VISION: bool = False
     USE_SIMPLE_MQ: bool = False
     
+    # Google Vision gateway (see vision_gateway.py)
+    VISION_REPLAY_FILE: Optional[str] = None  # recorded responses served when USE_MOCK_GOOGLE_VISION is set
+    VISION_BATCH_MAX_IMAGES: int = 16
+    VISION_BATCH_WAIT_MS: int = 10
+    VISION_CACHE_SIZE: int = 1024
+    
+    # Food image storage (see image_store.py)
+    IMAGE_STORE_BACKEND: str = "gridfs"  # or "local"
+    IMAGE_STORE_PATH: str = "./image_store"
+    
     # Pydantic v2 configuration
     model_config = {
         "env_file": "../.env",
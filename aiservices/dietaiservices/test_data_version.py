@@ -0,0 +1,125 @@
+"""
+Test the nutrition log fingerprints that key cached weekly reports.
+A cached report must be invalidated by inserts, deletes, API edits and edits
+to the totals, and reused while nothing changed; the fingerprint is one
+aggregated row, not the logs.
+"""
+
+import asyncio
+from datetime import datetime
+
+import mongomock
+
+from data_version import nutrition_logs_version
+
+
+class AsyncAggregation:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    async def to_list(self, length=None):
+        return self.rows[:length]
+
+
+class AsyncCollection:
+    """Minimal Motor-style wrapper around a mongomock collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def aggregate(self, *args, **kwargs):
+        return AsyncAggregation(self.collection.aggregate(*args, **kwargs))
+
+
+QUERY = {"user_id": "u", "date": {"$gte": "2025-01-06", "$lt": "2025-01-13"}}
+
+
+def make_logs():
+    collection = mongomock.MongoClient().db.nutrition_logs
+    collection.insert_many([
+        {"user_id": "u", "date": f"2025-01-0{day}", "meals": [{"name": "rice", "calories": 400}],
+         "total_nutrition": {"calories": 400, "protein": 10, "carbs": 80, "fat": 5, "fiber": 2}}
+        for day in (6, 7, 8)
+    ])
+    collection.insert_one({"user_id": "other", "date": "2025-01-07", "meals": [],
+                           "total_nutrition": {"calories": 900}})
+    return collection
+
+
+def version(collection):
+    return asyncio.run(nutrition_logs_version(AsyncCollection(collection), QUERY))
+
+
+def test_unchanged_logs_keep_their_version():
+    collection = make_logs()
+    cached = version(collection)
+    assert version(collection) == cached
+    # Other users' logs are outside the query
+    collection.update_many({"user_id": "other"}, {"$inc": {"total_nutrition.calories": 100}})
+    assert version(collection) == cached
+    assert asyncio.run(nutrition_logs_version(AsyncCollection(collection), {"user_id": "nobody"})) is None
+
+
+def test_every_edit_invalidates_the_cached_report():
+    edits = {
+        "insert": lambda c: c.insert_one({"user_id": "u", "date": "2025-01-09", "meals": [],
+                                          "total_nutrition": {"calories": 0}}),
+        "delete": lambda c: c.delete_one({"date": "2025-01-06"}),
+        # Calories unchanged, so the old calories-only fingerprint missed these
+        "protein": lambda c: c.update_one({"date": "2025-01-07"}, {"$set": {"total_nutrition.protein": 30}}),
+        "fiber": lambda c: c.update_one({"date": "2025-01-07"}, {"$set": {"total_nutrition.fiber": 9}}),
+        # Totals unchanged; the API stamps updated_at on every edit
+        "swap via API": lambda c: (
+            c.update_one({"date": "2025-01-06"}, {"$inc": {"total_nutrition.fat": 4},
+                                                  "$set": {"updated_at": datetime(2025, 1, 9, 8, 0)}}),
+            c.update_one({"date": "2025-01-07"}, {"$inc": {"total_nutrition.fat": -4},
+                                                  "$set": {"updated_at": datetime(2025, 1, 9, 8, 1)}})),
+        "replaced": lambda c: (c.delete_one({"date": "2025-01-08"}),
+                               c.insert_one({"user_id": "u", "date": "2025-01-08", "meals": [{"name": "rice"}],
+                                             "total_nutrition": {"calories": 400, "protein": 10, "carbs": 80,
+                                                                 "fat": 5, "fiber": 2}})),
+        "meal added": lambda c: c.update_one({"date": "2025-01-08"},
+                                             {"$push": {"meals": {"name": "water", "calories": 0}}}),
+        "renamed via API": lambda c: c.update_one({"date": "2025-01-08"}, {
+            "$set": {"meals.0.name": "red rice", "updated_at": datetime(2025, 1, 9, 8, 0)}}),
+    }
+    for name, edit in edits.items():
+        collection = make_logs()
+        cached = version(collection)
+        edit(collection)
+        assert version(collection) != cached, name
+
+    # A later edit to an already edited log still moves the version
+    collection = make_logs()
+    collection.update_one({"date": "2025-01-06"}, {"$set": {"updated_at": datetime(2025, 1, 9, 8, 0)}})
+    cached = version(collection)
+    collection.update_one({"date": "2025-01-06"}, {"$set": {"updated_at": datetime(2025, 1, 9, 9, 0)}})
+    assert version(collection) != cached
+
+
+def test_fingerprint_is_computed_on_the_server():
+    """One row comes back, with no log payload in it"""
+    collection = make_logs()
+    pipelines = []
+
+    class Recording(AsyncCollection):
+        def aggregate(self, pipeline, *args, **kwargs):
+            pipelines.append(pipeline)
+            return super().aggregate(pipeline, *args, **kwargs)
+
+    asyncio.run(nutrition_logs_version(Recording(collection), QUERY))
+    (pipeline,) = pipelines
+    assert "$group" in pipeline[-1]
+    rows = list(collection.aggregate(pipeline))
+    assert len(rows) == 1 and rows[0]["count"] == 3 and "meals" not in rows[0]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Nutrition Log Fingerprints")
+    test_unchanged_logs_keep_their_version()
+    print("✅ Unchanged logs keep their version")
+    test_every_edit_invalidates_the_cached_report()
+    print("✅ Every edit invalidates the cached report")
+    test_fingerprint_is_computed_on_the_server()
+    print("✅ Fingerprint is computed on the server")
+    print("\n🎉 All nutrition log fingerprint tests passed!")
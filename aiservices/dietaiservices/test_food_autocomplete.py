@@ -0,0 +1,124 @@
+"""
+Test food autocomplete.
+Checks prefix ranking order and its stability, popularity updates in batches,
+typo matches against a brute-force edit distance, and the response cache.
+"""
+
+import random
+
+from food_knowledge import FoodAutocomplete, FoodKnowledgeBase, FoodRecord, get_food_knowledge_base
+
+
+def make_food(food_id: str, name: str, aliases=(), keywords=()):
+    return FoodRecord.from_dict({
+        'id': food_id, 'name': name, 'aliases': list(aliases), 'keywords': list(keywords),
+        'category': 'general', 'cuisine': 'sri_lankan', 'serving': '100g',
+        'nutrition': {'calories': 100, 'protein': 1, 'carbs': 1, 'fat': 1}
+    })
+
+
+FOODS = [
+    make_food("rice", "rice", keywords=["basmati"]),
+    make_food("rice_and_curry", "rice and curry"),
+    make_food("fried_rice", "fried rice"),
+    make_food("red_rice", "red rice", aliases=["rice red"]),
+    make_food("ribbon_cake", "ribbon cake"),
+    make_food("curry", "chicken curry", keywords=["rich gravy"]),
+]
+
+
+def ids(suggestions):
+    return [suggestion.food.id for suggestion in suggestions]
+
+
+def edit_distance(a: str, b: str) -> int:
+    row = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j, other in enumerate(b, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (char != other))
+    return row[-1]
+
+
+def test_prefix_ranking_is_deterministic():
+    autocomplete = FoodAutocomplete(FoodKnowledgeBase(FOODS, "test"))
+    # Name starts (shorter, then alphabetical), alias starts, later words, then keywords
+    assert ids(autocomplete.suggest("ri")) == [
+        "rice", "ribbon_cake", "rice_and_curry", "red_rice", "fried_rice", "curry"]
+    assert [s.matched for s in autocomplete.suggest("Rice")[:4]] == ["rice", "rice and curry", "rice red", "fried rice"]
+    assert ids(autocomplete.suggest("bas")) == ["rice"]
+    assert ids(autocomplete.suggest("ri", limit=2)) == ["rice", "ribbon_cake"]
+
+    for seed in range(5):
+        shuffled = FOODS[:]
+        random.Random(seed).shuffle(shuffled)
+        other = FoodAutocomplete(FoodKnowledgeBase(shuffled, "test"))
+        for query in ("r", "ri", "rice", "c", "cur", "ric"):
+            assert autocomplete.suggest(query) == other.suggest(query), query
+
+
+def test_popularity_applies_in_batches():
+    autocomplete = FoodAutocomplete(FoodKnowledgeBase(FOODS, "test"), refresh_every=3)
+    assert ids(autocomplete.suggest("ri"))[:2] == ["rice", "ribbon_cake"]
+    assert not autocomplete.record_selection("ice_cream")
+
+    for _ in range(2):
+        assert autocomplete.record_selection("ribbon_cake")
+    assert ids(autocomplete.suggest("ri"))[:2] == ["rice", "ribbon_cake"]
+    autocomplete.record_selection("ribbon_cake")
+    assert ids(autocomplete.suggest("ri"))[:2] == ["ribbon_cake", "rice"]
+
+    # Loaded counts replace recorded ones; unknown ids are ignored
+    autocomplete.load_popularity({"fried_rice": 20, "unknown": 10})
+    assert ids(autocomplete.suggest("ri"))[:2] == ["fried_rice", "rice"]
+    assert ids(autocomplete.suggest("c")) == ["curry", "ribbon_cake", "rice_and_curry"]
+
+
+def test_typo_matches_agree_with_brute_force():
+    kb = get_food_knowledge_base()
+    autocomplete = FoodAutocomplete(kb)
+    terms = list(autocomplete._terms)
+    rng = random.Random(8)
+    for _ in range(150):
+        term = rng.choice(terms)
+        query = term[:rng.randint(3, min(len(term), 9))]
+        position = rng.randrange(1, len(query))
+        query = query[:position] + rng.choice("aeiourst") + query[position + 1:]
+        budget = 1 if len(query) < 6 else 2
+
+        expected = {}
+        for index, candidate in enumerate(terms):
+            if candidate[0] == query[0]:
+                typos = min(edit_distance(query, candidate[:length]) for length in range(len(candidate) + 1))
+                if typos <= budget:
+                    expected[index] = typos
+        assert dict(autocomplete._within_typos(query, budget)) == expected, query
+
+    assert ids(autocomplete.suggest("kotu"))[0] == "kottu"
+    assert ids(autocomplete.suggest("chiken cur"))[0] == "chicken_curry"
+    assert all(s.typos == 0 for s in autocomplete.suggest("ko"))
+
+
+def test_repeated_queries_are_cached():
+    autocomplete = FoodAutocomplete(FoodKnowledgeBase(FOODS, "test"), cache_size=2)
+    first = autocomplete.suggest("ri")
+    assert autocomplete.suggest("  RI ") is first
+    assert autocomplete.stats['cache_hits'] == 1
+
+    autocomplete.suggest("fr")
+    autocomplete.suggest("re")
+    assert autocomplete.suggest("ri") is not first  # evicted, least recently used
+    assert autocomplete.suggest("") == [] and autocomplete.suggest("ri", limit=0) == []
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Food Autocomplete")
+    test_prefix_ranking_is_deterministic()
+    print("✅ Prefix ranking is deterministic")
+    test_popularity_applies_in_batches()
+    print("✅ Popularity applies in batches")
+    test_typo_matches_agree_with_brute_force()
+    print("✅ Typo matches agree with brute force")
+    test_repeated_queries_are_cached()
+    print("✅ Repeated queries are cached")
+    print("\n🎉 All food autocomplete tests passed!")
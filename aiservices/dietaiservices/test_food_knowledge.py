@@ -0,0 +1,91 @@
+"""
+Test the shared food knowledge base.
+Checks the token Aho-Corasick matcher against a brute-force scan, free-text
+extraction, name lookups and the consistency of foods.json.
+"""
+
+import dataclasses
+import json
+import random
+
+from food_knowledge import DATA_FILE, KEYWORD, NAME, PhraseMatcher, get_food_knowledge_base
+
+
+def test_matcher_finds_every_phrase_occurrence():
+    rng = random.Random(3)
+    vocabulary = ["rice", "curry", "chicken", "fish", "dal", "with", "and"]
+    phrases = {tuple(rng.choices(vocabulary, k=rng.randint(1, 3))) for _ in range(40)}
+    matcher = PhraseMatcher((phrase, phrase) for phrase in phrases)
+
+    for _ in range(200):
+        tokens = rng.choices(vocabulary, k=rng.randint(0, 12))
+        expected = sorted(
+            (start, start + len(phrase), phrase)
+            for phrase in phrases for start in range(len(tokens) - len(phrase) + 1)
+            if tuple(tokens[start:start + len(phrase)]) == phrase
+        )
+        assert sorted(matcher.find_all(tokens)) == expected
+
+
+def test_extract_prefers_longest_whole_word_mentions():
+    kb = get_food_knowledge_base()
+    names = lambda text, **kwargs: [m.food.name for m in kb.extract(text, **kwargs)]
+
+    assert names("Fried rice and Chicken Curry with 2 eggs") == ["fried rice", "chicken curry", "egg"]
+    assert names("string hoppers, dal curry and more string hoppers") == ["string hoppers", "dal curry"]
+    assert names("kottu roti") == ["kottu"]
+    # Whole words only: no rice in "price", no egg in "eggplant"
+    assert names("price of eggplant") == []
+
+    matches = kb.extract("spicy chicken with basmati and a pizza")
+    assert [(m.food.name, m.kind) for m in matches] == [
+        ("chicken curry", KEYWORD), ("rice", KEYWORD), ("pizza margherita", KEYWORD)]
+    assert "spicy chicken with basmati and a pizza"[matches[1].start:matches[1].end] == "basmati"
+    assert names("spicy chicken with basmati", keywords=False) == ["chicken"]
+    # A food's own name is never a keyword for another food
+    assert [m.kind for m in kb.extract("fish")] == [NAME]
+
+
+def test_lookup_and_search():
+    kb = get_food_knowledge_base()
+    assert kb.lookup("Fried_Rice").id == "fried_rice" and kb.lookup("steamed white rice").id == "rice"
+    assert kb.lookup("Egg Hopper").id == "egg_hoppers" and kb.lookup("ice cream") is None
+
+    food, score = kb.search("chicken kottu")
+    assert (food.id, score) == ("chicken_kottu", 1.0)
+    food, score = kb.search("Grilled fish fillet")
+    assert food.id == "fish" and score == 1 / 3
+    assert kb.search("ice cream") is None
+
+
+def test_knowledge_base_is_shared_and_read_only():
+    kb = get_food_knowledge_base()
+    assert get_food_knowledge_base() is kb
+    food = kb.get("rice")
+    for mutate in (lambda: setattr(food, 'name', "bread"), lambda: food.nutrition.update(calories=0)):
+        try:
+            mutate()
+            raise AssertionError("record was modified")
+        except (dataclasses.FrozenInstanceError, AttributeError, TypeError):
+            pass
+
+    with open(DATA_FILE, encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['version'] == kb.version and len(data['foods']) == len(kb)
+    assert len({food['id'] for food in data['foods']}) == len(kb)
+    names = [name for food in kb for name in (food.name, *food.aliases)]
+    assert len(names) == len(set(names)), "a name or alias identifies more than one food"
+    assert all({'calories', 'protein', 'carbs', 'fat'} <= set(food.nutrition) for food in kb)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Food Knowledge Base")
+    test_matcher_finds_every_phrase_occurrence()
+    print("✅ Matcher finds every phrase occurrence")
+    test_extract_prefers_longest_whole_word_mentions()
+    print("✅ Extraction prefers longest whole-word mentions")
+    test_lookup_and_search()
+    print("✅ Lookup and search")
+    test_knowledge_base_is_shared_and_read_only()
+    print("✅ Knowledge base is shared and read-only")
+    print("\n🎉 All food knowledge base tests passed!")
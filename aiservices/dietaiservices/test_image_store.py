@@ -0,0 +1,168 @@
+"""
+Test the content-addressed image store on the local filesystem backend.
+Checks deduplication of repeated uploads, reference counting and garbage
+collection, WebP renditions and ranged reads.
+"""
+
+import asyncio
+import io
+import tempfile
+from pathlib import Path
+
+import mongomock
+from PIL import Image
+
+from image_store import ImageStore, LocalImageBackend, parse_byte_range
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self.cursor = iter(cursor)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    """Minimal Motor-style wrapper around a mongomock collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+        return call
+
+
+def photo(color, size=(1600, 1200)) -> bytes:
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, format='JPEG', quality=95)
+    return output.getvalue()
+
+
+def blob_files(root):
+    return sorted(p.name for p in Path(root).rglob('*') if p.is_file())
+
+
+def new_store(root):
+    return ImageStore(LocalImageBackend(root), AsyncCollection(mongomock.MongoClient().db.images))
+
+
+def test_repeated_uploads_are_stored_once():
+    with tempfile.TemporaryDirectory() as root:
+        store = new_store(root)
+        image = photo('orange')
+
+        async def run():
+            concurrent = await asyncio.gather(*(store.put(image, owner=f"analysis_{i}") for i in range(3)))
+            later = await store.put(image, owner="analysis_3")
+            other = await store.put(photo('green'), owner="analysis_4")
+            return concurrent, later, other, await store.collection.find_one({'_id': later['hash']})
+
+        concurrent, later, other, document = asyncio.run(run())
+        assert len({r['hash'] for r in concurrent}) == 1 and later['deduplicated']
+        assert later['renditions'] == ['original', 'preview', 'thumbnail']
+        assert sorted(document['refs']) == [f"analysis_{i}" for i in range(4)]
+        # Original plus two renditions for each distinct photo
+        assert len(blob_files(root)) == 6 and other['hash'] != later['hash']
+        assert store.stats['deduplicated'] == 1
+
+
+def test_image_deleted_with_its_last_reference():
+    with tempfile.TemporaryDirectory() as root:
+        store = new_store(root)
+        image = photo('orange')
+
+        async def run():
+            stored = await store.put(image, owner="a1")
+            await store.put(image, owner="a2")
+            first = await store.release(stored['hash'], "a1")
+            files_after_first = blob_files(root)
+            repeated = await store.release(stored['hash'], "a1")
+            last = await store.release(stored['hash'], "a2")
+            gone = await store.get(stored['hash'])
+            reuploaded = await store.put(image, owner="a3")
+            return first, files_after_first, repeated, last, gone, reuploaded, blob_files(root)
+
+        first, files_after_first, repeated, last, gone, reuploaded, files = asyncio.run(run())
+        assert (first, repeated, last) == (False, False, True)
+        assert len(files_after_first) == 3 and gone is None
+        # A new upload of the same photo gets fresh blobs under a new generation
+        assert not reuploaded['deduplicated'] and len(files) == 3 and files != files_after_first
+
+
+def test_collect_garbage_removes_unreferenced_images():
+    with tempfile.TemporaryDirectory() as root:
+        store = new_store(root)
+
+        async def run():
+            kept = await store.put(photo('orange'), owner="a1")
+            orphan = await store.put(photo('green'), owner="a2")
+            # Crash between dropping the reference and deleting the image
+            await store.collection.update_one({'_id': orphan['hash']}, {'$pull': {'refs': "a2"}})
+            return kept, await store.collect_garbage()
+
+        kept, collected = asyncio.run(run())
+        assert collected == 1 and len(blob_files(root)) == 3
+        assert all(name.startswith(kept['hash']) for name in blob_files(root))
+
+
+def test_renditions_and_ranged_reads():
+    with tempfile.TemporaryDirectory() as root:
+        store = new_store(root)
+        image = photo('orange')
+
+        async def run():
+            stored = await store.put(image, owner="a1")
+            thumbnail = await store.get(stored['hash'], 'thumbnail')
+            thumbnail_bytes = await store.read(thumbnail)
+            original = await store.get(stored['hash'])
+            head = await store.read(original, 0, 99)
+            tail = await store.read(original, *parse_byte_range("bytes=-10", original['size']))
+            unreadable = await store.put(b"not an image", owner="a2")
+            fallback = await store.get(unreadable['hash'], 'thumbnail')
+            return thumbnail, thumbnail_bytes, original, head, tail, unreadable, fallback
+
+        thumbnail, thumbnail_bytes, original, head, tail, unreadable, fallback = asyncio.run(run())
+        assert thumbnail['content_type'] == 'image/webp' and thumbnail['etag'].endswith('-thumbnail"')
+        assert Image.open(io.BytesIO(thumbnail_bytes)).size == (160, 120)
+        assert thumbnail['size'] < original['size'] / 10
+        assert head == image[:100] and tail == image[-10:]
+        # Uploads that cannot be decoded are kept, and every rendition serves the original
+        assert unreadable['renditions'] == ['original'] and fallback['rendition'] == 'original'
+
+    assert parse_byte_range(None, 1000) is None and parse_byte_range("bytes=0-99,200-299", 1000) is None
+    assert parse_byte_range("bytes=900-", 1000) == (900, 999)
+    assert parse_byte_range("bytes=990-2000", 1000) == (990, 999)
+    for unsatisfiable in ("bytes=1000-", "bytes=5-2", "bytes=abc-"):
+        try:
+            parse_byte_range(unsatisfiable, 1000)
+            raise AssertionError(unsatisfiable)
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Image Store")
+    test_repeated_uploads_are_stored_once()
+    print("✅ Repeated uploads are stored once")
+    test_image_deleted_with_its_last_reference()
+    print("✅ Image deleted with its last reference")
+    test_collect_garbage_removes_unreferenced_images()
+    print("✅ Garbage collection removes unreferenced images")
+    test_renditions_and_ranged_reads()
+    print("✅ Renditions and ranged reads")
+    print("\n🎉 All image store tests passed!")
@@ -0,0 +1,155 @@
+"""
+Test the batched Google Vision gateway against the recorded-response backend.
+Checks batching across concurrent requests, caching and sharing of requests
+for the same image, that the event loop keeps running while a batch is out,
+per-image error handling and conversion of API responses.
+"""
+
+import asyncio
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from vision_gateway import GoogleVisionBackend, ReplayVisionBackend, VisionAnnotationError, VisionGateway
+
+SAMPLES = str(Path(__file__).parent / "vision_replay_samples.json")
+
+
+def sample_image(name: str) -> bytes:
+    """Bytes whose recorded annotations are in vision_replay_samples.json"""
+    return f"sample:{name}".encode()
+
+
+def test_concurrent_requests_share_batches():
+    backend = ReplayVisionBackend.from_file(SAMPLES, latency_seconds=0.05)
+    gateway = VisionGateway(backend, max_batch_images=16, max_wait_seconds=0.01)
+
+    async def run():
+        images = [sample_image("rice_and_curry")] + [f"photo-{i}".encode() for i in range(19)]
+        return await asyncio.gather(*(gateway.annotate(image) for image in images))
+
+    annotations = asyncio.run(run())
+    assert [label['description'] for label in annotations[0]['labels'][:3]] == ["Food", "Rice", "Curry"]
+    assert annotations[0]['objects'][0]['bounding_box'] == {'x1': 0.12, 'y1': 0.1, 'x2': 0.86, 'y2': 0.9}
+    assert all(a == backend.responses['default'] for a in annotations[1:])
+    # One full batch of 16 and one of the remaining 4, instead of 3 calls per image
+    assert backend.requests == 2 and backend.images == 20
+    assert gateway.get_stats()['batches_sent'] == 2
+
+
+def test_same_image_is_requested_once_and_cached():
+    backend = ReplayVisionBackend.from_file(SAMPLES, latency_seconds=0.02)
+    gateway = VisionGateway(backend)
+
+    async def run():
+        first = await asyncio.gather(*(gateway.annotate(sample_image("menu_board")) for _ in range(5)))
+        again = await gateway.annotate(sample_image("menu_board"))
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert all(a['text'].startswith("STRING HOPPERS") for a in first) and again is first[0]
+    assert backend.images == 1
+    stats = gateway.get_stats()
+    assert stats['coalesced'] == 4 and stats['cache_hits'] == 1 and stats['images_pending'] == 0
+
+
+def test_event_loop_keeps_running_during_a_batch():
+    gateway = VisionGateway(ReplayVisionBackend.from_file(SAMPLES, latency_seconds=0.2))
+
+    async def run():
+        gaps = []
+
+        async def ticker():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        ticking = asyncio.create_task(ticker())
+        await gateway.annotate(sample_image("chicken_kottu"))
+        ticking.cancel()
+        return gaps
+
+    gaps = asyncio.run(run())
+    assert len(gaps) > 10 and max(gaps) < 0.1, max(gaps)
+
+
+def test_errors_stay_with_their_image_and_are_not_cached():
+    class FlakyBackend(ReplayVisionBackend):
+        def annotate(self, images):
+            if self.requests == 0 and len(images) == 1:
+                self.requests += 1
+                raise ConnectionError("deadline exceeded")
+            annotations = super().annotate(images)
+            return [{'error': "Bad image data"} if image == b"corrupt" else a for image, a in zip(images, annotations)]
+
+    backend = FlakyBackend()
+    gateway = VisionGateway(backend)
+
+    async def run():
+        outcomes = []
+        for images in ([b"photo"], [b"photo", b"corrupt"]):
+            results = await asyncio.gather(*(gateway.annotate(image) for image in images), return_exceptions=True)
+            outcomes.append(results)
+        return outcomes
+
+    (failed_batch,), (ok, bad) = asyncio.run(run())
+    assert isinstance(failed_batch, VisionAnnotationError) and "deadline" in str(failed_batch)
+    assert ok == {'labels': [], 'objects': [], 'text': ''}
+    assert isinstance(bad, VisionAnnotationError) and str(bad) == "Bad image data"
+    assert gateway.get_stats()['cached_images'] == 1
+
+
+def test_images_missing_from_a_short_response_fail():
+    class ShortBackend(ReplayVisionBackend):
+        def annotate(self, images):
+            return super().annotate(images)[:1]
+
+    gateway = VisionGateway(ShortBackend())
+
+    async def run():
+        images = [b"first", b"second", b"third"]
+        return await asyncio.wait_for(asyncio.gather(*(gateway.annotate(image) for image in images),
+                                                     return_exceptions=True), timeout=1)
+
+    first, *missing = asyncio.run(run())
+    assert first == {'labels': [], 'objects': [], 'text': ''}
+    assert all(isinstance(result, VisionAnnotationError) for result in missing)
+    assert gateway.get_stats()['images_pending'] == 0
+
+
+def test_api_responses_become_plain_annotations():
+    vertex = lambda x, y: SimpleNamespace(x=x, y=y)
+    response = SimpleNamespace(
+        error=SimpleNamespace(message=""),
+        label_annotations=[SimpleNamespace(description="Rice", score=0.9)],
+        localized_object_annotations=[SimpleNamespace(name="Food", score=0.8, bounding_poly=SimpleNamespace(
+            normalized_vertices=[vertex(0.1, 0.2), vertex(0.9, 0.2), vertex(0.9, 0.7), vertex(0.1, 0.7)]))],
+        text_annotations=[SimpleNamespace(description="DAL CURRY"), SimpleNamespace(description="DAL")]
+    )
+    assert GoogleVisionBackend._to_annotation(response) == {
+        'labels': [{'description': "Rice", 'score': 0.9}],
+        'objects': [{'name': "Food", 'score': 0.8, 'bounding_box': {'x1': 0.1, 'y1': 0.2, 'x2': 0.9, 'y2': 0.7}}],
+        'text': "DAL CURRY"
+    }
+    failed = SimpleNamespace(error=SimpleNamespace(message="Bad image data"))
+    assert GoogleVisionBackend._to_annotation(failed) == {'error': "Bad image data"}
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Vision Gateway")
+    test_concurrent_requests_share_batches()
+    print("✅ Concurrent requests share batches")
+    test_same_image_is_requested_once_and_cached()
+    print("✅ Same image is requested once and cached")
+    test_event_loop_keeps_running_during_a_batch()
+    print("✅ Event loop keeps running during a batch")
+    test_errors_stay_with_their_image_and_are_not_cached()
+    print("✅ Errors stay with their image and are not cached")
+    test_images_missing_from_a_short_response_fail()
+    print("✅ Images missing from a short response fail")
+    test_api_responses_become_plain_annotations()
+    print("✅ API responses become plain annotations")
+    print("\n🎉 All vision gateway tests passed!")
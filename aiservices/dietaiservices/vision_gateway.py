@@ -0,0 +1,257 @@
+"""
+Batched Google Vision gateway shared by the food analyzers.
+
+The analyzers used to call label_detection, object_localization and
+text_detection one after another on the synchronous client, straight from
+async code, blocking the event loop for three round trips per image. The
+gateway instead:
+
+- Sends one batch_annotate_images request with all three features
+- Runs it in a worker thread, so the event loop keeps serving requests
+- Groups images from concurrent requests into one batch (up to
+  MAX_BATCH_IMAGES, waiting at most VISION_BATCH_WAIT_MS for company)
+- Caches annotations by image hash and shares in-flight requests for
+  the same image
+
+Annotations are plain dicts (labels, objects with normalised bounding boxes,
+full text), so a ReplayVisionBackend serving recorded responses can stand in
+for the API in tests, benchmarks and local development
+(USE_MOCK_GOOGLE_VISION with VISION_REPLAY_FILE).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_IMAGES = 16  # images per batch_annotate_images request allowed by the API
+MAX_LABELS = 20
+MAX_OBJECTS = 20
+
+EMPTY_ANNOTATION = {'labels': [], 'objects': [], 'text': ''}
+
+
+class VisionAnnotationError(Exception):
+    """The Vision API returned an error for an image"""
+
+
+def image_key(image_data: bytes) -> str:
+    return hashlib.sha256(image_data).hexdigest()
+
+
+class GoogleVisionBackend:
+    """Synchronous Google Vision client annotating a list of images in one request"""
+
+    def __init__(self, client=None):
+        from google.cloud import vision
+        self.vision = vision
+        self.client = client or vision.ImageAnnotatorClient()
+        self.features = [
+            vision.Feature(type_=vision.Feature.Type.LABEL_DETECTION, max_results=MAX_LABELS),
+            vision.Feature(type_=vision.Feature.Type.OBJECT_LOCALIZATION, max_results=MAX_OBJECTS),
+            vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+        ]
+
+    def annotate(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        requests = [
+            self.vision.AnnotateImageRequest(image=self.vision.Image(content=image_data), features=self.features)
+            for image_data in images
+        ]
+        response = self.client.batch_annotate_images(requests=requests)
+        return [self._to_annotation(image_response) for image_response in response.responses]
+
+    @staticmethod
+    def _to_annotation(response) -> Dict[str, Any]:
+        if response.error.message:
+            return {'error': response.error.message}
+
+        objects = []
+        for obj in response.localized_object_annotations:
+            vertices = obj.bounding_poly.normalized_vertices
+            objects.append({
+                'name': obj.name,
+                'score': obj.score,
+                'bounding_box': {'x1': vertices[0].x, 'y1': vertices[0].y, 'x2': vertices[2].x, 'y2': vertices[2].y}
+            })
+        return {
+            'labels': [{'description': label.description, 'score': label.score} for label in response.label_annotations],
+            'objects': objects,
+            'text': response.text_annotations[0].description if response.text_annotations else ''
+        }
+
+
+class ReplayVisionBackend:
+    """Serves recorded annotations by image hash, with optional per-request latency"""
+
+    def __init__(self, responses: Dict[str, Dict[str, Any]] = None, latency_seconds: float = 0.0):
+        self.responses = responses or {}
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+        self.images = 0
+
+    @classmethod
+    def from_file(cls, path: str, latency_seconds: float = 0.0) -> "ReplayVisionBackend":
+        with open(path) as f:
+            return cls(json.load(f), latency_seconds)
+
+    def record(self, image_data: bytes, annotation: Dict[str, Any]):
+        self.responses[image_key(image_data)] = annotation
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.responses, f, indent=2, sort_keys=True)
+
+    def annotate(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        self.requests += 1
+        self.images += len(images)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        default = self.responses.get('default', EMPTY_ANNOTATION)
+        return [self.responses.get(image_key(image_data), default) for image_data in images]
+
+
+class RecordingVisionBackend:
+    """Passes requests to another backend and records its answers for replay"""
+
+    def __init__(self, backend, replay: ReplayVisionBackend = None):
+        self.backend = backend
+        self.replay = replay or ReplayVisionBackend()
+
+    def annotate(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        annotations = self.backend.annotate(images)
+        for image_data, annotation in zip(images, annotations):
+            if 'error' not in annotation:
+                self.replay.record(image_data, annotation)
+        return annotations
+
+
+class VisionGateway:
+    """Batches, caches and de-duplicates image annotation requests off the event loop"""
+
+    def __init__(self, backend, max_batch_images: int = MAX_BATCH_IMAGES, max_wait_seconds: float = 0.01,
+                 cache_size: int = 1024, cache_ttl_seconds: float = 3600):
+        self.backend = backend
+        self.max_batch_images = min(max_batch_images, MAX_BATCH_IMAGES)
+        self.max_wait_seconds = max_wait_seconds
+        self.cache_size = cache_size
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._queue: List[Tuple[str, bytes]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches = set()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'batches_sent': 0, 'images_sent': 0}
+
+    async def annotate(self, image_data: bytes) -> Dict[str, Any]:
+        """Labels, objects and text of an image (shared; do not modify)"""
+        self.stats['requests'] += 1
+        key = image_key(image_data)
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self._cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return cached[1]
+
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            self._queue.append((key, image_data))
+            if len(self._queue) >= self.max_batch_images:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_wait_seconds, self._dispatch)
+        else:
+            self.stats['coalesced'] += 1
+
+        # A cancelled caller must not cancel the request other callers are waiting on
+        return await asyncio.shield(future)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'cached_images': len(self._cache), 'images_pending': len(self._pending)}
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch_images], self._queue[self.max_batch_images:]
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send(self, batch: List[Tuple[str, bytes]]):
+        self.stats['batches_sent'] += 1
+        self.stats['images_sent'] += len(batch)
+        try:
+            annotations = await asyncio.to_thread(self.backend.annotate, [image_data for _, image_data in batch])
+        except Exception as e:
+            logger.error(f"Vision batch of {len(batch)} images failed: {e}")
+            for key, _ in batch:
+                self._pending.pop(key).set_exception(VisionAnnotationError(str(e)))
+            return
+
+        for (key, _), annotation in zip(batch, annotations):
+            future = self._pending.pop(key)
+            if 'error' in annotation:
+                future.set_exception(VisionAnnotationError(annotation['error']))
+                continue
+            self._remember(key, annotation)
+            future.set_result(annotation)
+
+        # A short response must not leave callers waiting forever
+        if len(annotations) < len(batch):
+            logger.error(f"Vision batch of {len(batch)} images returned {len(annotations)} annotations")
+            for key, _ in batch[len(annotations):]:
+                self._pending.pop(key).set_exception(VisionAnnotationError("No annotation returned for this image"))
+
+    def _remember(self, key: str, annotation: Dict[str, Any]):
+        self._cache[key] = (time.monotonic() + self.cache_ttl_seconds, annotation)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+_gateway: Optional[VisionGateway] = None
+_gateway_initialized = False
+
+
+def get_vision_gateway() -> Optional[VisionGateway]:
+    """Process-wide gateway from settings, or None when Google Vision is unavailable"""
+    global _gateway, _gateway_initialized
+    if _gateway_initialized:
+        return _gateway
+    _gateway_initialized = True
+
+    if settings.DISABLE_GOOGLE_VISION:
+        logger.info("Google Vision API disabled for local development")
+        return None
+
+    if settings.USE_MOCK_GOOGLE_VISION:
+        if not settings.VISION_REPLAY_FILE:
+            logger.info("Using mock Google Vision API for local development")
+            return None
+        backend = ReplayVisionBackend.from_file(settings.VISION_REPLAY_FILE)
+        logger.info(f"Replaying recorded Google Vision responses from {settings.VISION_REPLAY_FILE}")
+    else:
+        try:
+            backend = GoogleVisionBackend()
+            logger.info("Google Vision API initialized successfully")
+        except Exception as e:
+            logger.warning(f"Google Vision API not available, using mock service: {e}")
+            return None
+
+    _gateway = VisionGateway(
+        backend,
+        max_batch_images=settings.VISION_BATCH_MAX_IMAGES,
+        max_wait_seconds=settings.VISION_BATCH_WAIT_MS / 1000,
+        cache_size=settings.VISION_CACHE_SIZE
+    )
+    return _gateway
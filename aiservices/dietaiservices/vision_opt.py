@@ -1,12 +1,12 @@
 import io
 import base64
 from typing import List, Dict, Optional
-from google.cloud import vision
 from PIL import Image
 import numpy as np
 from pydantic import BaseModel
 import logging
 from settings import settings
+from vision_gateway import get_vision_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -18,23 +18,9 @@ class DetectedFood(BaseModel):
 
 class FoodVisionAnalyzer:
     def __init__(self):
-        if settings.DISABLE_GOOGLE_VISION:
-            logger.info("Google Vision API disabled for local development")
-            self.client = None
-            self.vision_available = False
-        elif settings.USE_MOCK_GOOGLE_VISION:
-            logger.info("Using mock Google Vision API for local development")
-            self.client = None
-            self.vision_available = True  # We'll use fallback methods
-        else:
-            try:
-                self.client = vision.ImageAnnotatorClient()
-                self.vision_available = True
-                logger.info("Google Vision API initialized successfully")
-            except Exception as e:
-                logger.warning(f"Google Vision API not available, using mock service: {e}")
-                self.client = None
-                self.vision_available = True  # Use fallback
+        # Google Vision requests go through one batched gateway shared by all analyzers
+        self.vision_gateway = get_vision_gateway()
+        self.vision_available = self.vision_gateway is not None
         
         self.food_keywords = {
             'fruits': ['apple', 'banana', 'orange', 'grape', 'strawberry', 'mango', 'pineapple'],
@@ -47,46 +33,32 @@ class FoodVisionAnalyzer:
     
     async def analyze_food_image(self, image_data: bytes) -> List[DetectedFood]:
         """Analyze food image and detect food items."""
-        if not self.client or not self.vision_available:
+        if not self.vision_available:
             return await self._fallback_analysis(image_data)
         
         try:
-            image = vision.Image(content=image_data)
-            
-            # Perform label detection
-            response = self.client.label_detection(image=image)
-            labels = response.label_annotations
-            
-            # Perform object localization
-            objects = self.client.object_localization(image=image).localized_object_annotations
+            # Labels and objects (with text) in one batched request
+            annotation = await self.vision_gateway.annotate(image_data)
             
             detected_foods = []
             
             # Process labels to find food items
-            for label in labels:
-                if self._is_food_label(label.description.lower()):
+            for label in annotation['labels']:
+                if self._is_food_label(label['description'].lower()):
                     food_item = DetectedFood(
-                        name=label.description,
-                        confidence=label.score,
-                        estimated_portion=self._estimate_portion(label.description)
+                        name=label['description'],
+                        confidence=label['score'],
+                        estimated_portion=self._estimate_portion(label['description'])
                     )
                     detected_foods.append(food_item)
             
             # Process localized objects
-            for obj in objects:
-                if self._is_food_label(obj.name.lower()):
-                    # Extract bounding box
-                    vertices = obj.bounding_poly.normalized_vertices
-                    bounding_box = {
-                        'x1': vertices[0].x,
-                        'y1': vertices[0].y,
-                        'x2': vertices[2].x,
-                        'y2': vertices[2].y
-                    }
-                    
+            for obj in annotation['objects']:
+                if self._is_food_label(obj['name'].lower()):
+                    bounding_box = obj['bounding_box']
                     food_item = DetectedFood(
-                        name=obj.name,
-                        confidence=obj.score,
+                        name=obj['name'],
+                        confidence=obj['score'],
                         estimated_portion=self._estimate_portion_from_bbox(bounding_box),
                         bounding_box=bounding_box
                     )
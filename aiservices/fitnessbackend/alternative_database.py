@@ -1,84 +1,375 @@
 """
 Alternative Database Configuration for Testing
 This provides a simple file-based storage for immediate testing
+
+Each collection is an append-only JSON-lines log (``<collection>.jsonl``)
+replayed into memory on first use. Finds are served from an in-memory
+primary index (record id -> document) and secondary hash indexes on
+equality fields; writes append one line under a per-collection asyncio lock.
+fsync is batched: the log is synced every FSYNC_BATCH_SIZE writes or
+FSYNC_INTERVAL_SECONDS, whichever comes first, and on flush()/close().
+The log is rewritten (compacted) once it holds COMPACT_RATIO times more
+lines than live documents. A torn last line from a crash is dropped on load;
+an unreadable line elsewhere is skipped with a warning, never truncated.
 """
+import asyncio
+import copy
 import json
+import logging
 import os
-from typing import Dict, List, Any
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Fields indexed in every collection; create_index adds more
+DEFAULT_INDEXED_FIELDS = ("id", "user_id")
+FSYNC_BATCH_SIZE = 256
+FSYNC_INTERVAL_SECONDS = 0.05
+COMPACT_RATIO = 2.0
+COMPACT_MIN_LINES = 1000
+
+
+class InsertResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+def _hashable(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool, type(None)))
+
+
+def _matches(document: Dict, query: Dict) -> bool:
+    for key, value in query.items():
+        if key not in document or document[key] != value:
+            return False
+    return True
+
+
+class _Collection:
+    """In-memory state and log file of one collection"""
+
+    def __init__(self, path: str, legacy_path: str, indexed_fields: Iterable[str]):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.documents: Dict[int, Dict] = {}
+        self.indexes: Dict[str, Dict[Any, Set[int]]] = {field: {} for field in indexed_fields}
+        self.next_rid = 1
+        self.log_lines = 0
+        self.pending_sync = 0
+        self.lock = asyncio.Lock()
+        self.file = None
+        self._load()
+
+    # Recovery
+
+    def _load(self):
+        compact_tmp = self.path + ".compact"
+        if os.path.exists(compact_tmp):
+            # Crashed mid-compaction; the original log is still complete
+            os.remove(compact_tmp)
+
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                lines = f.readlines()
+            for number, raw in enumerate(lines, 1):
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    entry = None
+                if number == len(lines) and (entry is None or not raw.endswith(b"\n")):
+                    # Torn write at the tail from a crash; only this line is discarded
+                    with open(self.path, "r+b") as f:
+                        f.truncate(os.path.getsize(self.path) - len(raw))
+                    break
+                if entry is None:
+                    # Complete lines follow, so this is corruption rather than a crash:
+                    # keep the file intact and replay around it
+                    logger.warning(f"Skipping unreadable line {number} of {self.path}")
+                else:
+                    self._replay(entry)
+                self.log_lines += 1
+        elif os.path.exists(self.legacy_path):
+            # Import a collection written by the old whole-file JSON format
+            with open(self.legacy_path, "r") as f:
+                legacy = json.load(f)
+            with open(self.path, "w") as f:
+                for document in legacy:
+                    line = self._line("put", self.next_rid, document)
+                    self._replay(json.loads(line))
+                    f.write(line)
+                    self.log_lines += 1
+                f.flush()
+                os.fsync(f.fileno())
+
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self, entry: Dict):
+        rid = entry["rid"]
+        if entry["op"] == "put":
+            self._apply_put(rid, entry["doc"])
+        elif entry["op"] == "del":
+            self._apply_delete(rid)
+        self.next_rid = max(self.next_rid, rid + 1)
+
+    # In-memory state
+
+    def _apply_put(self, rid: int, document: Dict):
+        if rid in self.documents:
+            self._unindex(rid, self.documents[rid])
+        self.documents[rid] = document
+        for field, index in self.indexes.items():
+            value = document.get(field)
+            if field in document and _hashable(value):
+                index.setdefault(value, set()).add(rid)
+
+    def _apply_delete(self, rid: int):
+        document = self.documents.pop(rid, None)
+        if document is not None:
+            self._unindex(rid, document)
+
+    def _unindex(self, rid: int, document: Dict):
+        for field, index in self.indexes.items():
+            value = document.get(field)
+            if field in document and _hashable(value):
+                rids = index.get(value)
+                if rids:
+                    rids.discard(rid)
+                    if not rids:
+                        del index[value]
+
+    def add_index(self, field: str):
+        if field in self.indexes:
+            return
+        index: Dict[Any, Set[int]] = {}
+        for rid, document in self.documents.items():
+            value = document.get(field)
+            if field in document and _hashable(value):
+                index.setdefault(value, set()).add(rid)
+        self.indexes[field] = index
+
+    def candidates(self, query: Dict) -> Iterable[int]:
+        """Record ids that may match, using the most selective indexed field"""
+        best: Optional[Set[int]] = None
+        for field, value in query.items():
+            if field in self.indexes:
+                if not _hashable(value):
+                    continue
+                rids = self.indexes[field].get(value, set())
+                if best is None or len(rids) < len(best):
+                    best = rids
+        if best is None:
+            return list(self.documents)
+        return sorted(best)
+
+    def match(self, query: Dict, limit: Optional[int] = None) -> List[Tuple[int, Dict]]:
+        results = []
+        for rid in self.candidates(query):
+            document = self.documents.get(rid)
+            if document is not None and _matches(document, query):
+                results.append((rid, document))
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    # Log
+
+    @staticmethod
+    def _line(op: str, rid: int, document: Optional[Dict] = None) -> str:
+        entry = {"op": op, "rid": rid}
+        if document is not None:
+            entry["doc"] = document
+        return json.dumps(entry, default=str) + "\n"
+
+    def append(self, op: str, rid: int, document: Optional[Dict] = None) -> Optional[Dict]:
+        """Write one log entry and apply it; returns the stored (JSON-normalized) document"""
+        line = self._line(op, rid, document)
+        self.file.write(line)
+        self.log_lines += 1
+        self.pending_sync += 1
+        if op == "put":
+            stored = json.loads(line)["doc"]
+            self._apply_put(rid, stored)
+            return stored
+        self._apply_delete(rid)
+        return None
+
+    def sync(self):
+        if self.pending_sync and self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending_sync = 0
+
+    def needs_compaction(self) -> bool:
+        return self.log_lines >= COMPACT_MIN_LINES and self.log_lines > COMPACT_RATIO * max(1, len(self.documents))
+
+    def compact(self):
+        """Rewrite the log with one line per live document"""
+        self.sync()
+        tmp_path = self.path + ".compact"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for rid, document in self.documents.items():
+                f.write(self._line("put", rid, document))
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.log_lines = len(self.documents)
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
 class SimpleFileDatabase:
     """Simple file-based database for testing without MongoDB"""
-    
-    def __init__(self, data_dir: str = "data"):
+
+    def __init__(self, data_dir: str = "data", indexed_fields: Iterable[str] = DEFAULT_INDEXED_FIELDS,
+                 fsync_batch_size: int = FSYNC_BATCH_SIZE, fsync_interval: float = FSYNC_INTERVAL_SECONDS):
         self.data_dir = data_dir
+        self.indexed_fields = tuple(indexed_fields)
+        self.fsync_batch_size = fsync_batch_size
+        self.fsync_interval = fsync_interval
+        self._collections: Dict[str, _Collection] = {}
+        self._flusher: Optional[asyncio.Task] = None
         os.makedirs(data_dir, exist_ok=True)
-        
+
     def _get_file_path(self, collection: str) -> str:
-        return os.path.join(self.data_dir, f"{collection}.json")
-    
-    def _load_collection(self, collection: str) -> List[Dict]:
-        file_path = self._get_file_path(collection)
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        return []
-    
-    def _save_collection(self, collection: str, data: List[Dict]):
-        file_path = self._get_file_path(collection)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
-    
+        return os.path.join(self.data_dir, f"{collection}.jsonl")
+
+    def _collection(self, collection: str) -> _Collection:
+        state = self._collections.get(collection)
+        if state is None:
+            state = _Collection(
+                self._get_file_path(collection),
+                os.path.join(self.data_dir, f"{collection}.json"),
+                self.indexed_fields
+            )
+            self._collections[collection] = state
+        return state
+
+    def _after_write(self, state: _Collection):
+        if state.pending_sync >= self.fsync_batch_size:
+            state.sync()
+        if state.needs_compaction():
+            state.compact()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        """Sync writes that did not fill a batch within fsync_interval"""
+        while any(state.pending_sync for state in self._collections.values()):
+            await asyncio.sleep(self.fsync_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Make every write so far durable"""
+        for state in list(self._collections.values()):
+            async with state.lock:
+                state.sync()
+
+    async def compact(self, collection: str):
+        state = self._collection(collection)
+        async with state.lock:
+            state.compact()
+
+    async def close(self):
+        await self.flush()
+        for state in self._collections.values():
+            state.close()
+        self._collections.clear()
+
+    async def create_index(self, collection: str, field: str):
+        """Add a secondary equality index on a field"""
+        state = self._collection(collection)
+        async with state.lock:
+            state.add_index(field)
+
     async def insert_one(self, collection: str, document: Dict):
         """Insert a document into a collection"""
-        data = self._load_collection(collection)
-        
+        state = self._collection(collection)
+
         # Add timestamp if not present
         if 'created_at' not in document:
             document['created_at'] = datetime.utcnow().isoformat()
-        
-        data.append(document)
-        self._save_collection(collection, data)
-        
+
+        async with state.lock:
+            rid = state.next_rid
+            state.next_rid += 1
+            state.append("put", rid, document)
+            self._after_write(state)
+
         # Return object with inserted_id attribute (like pymongo)
-        class InsertResult:
-            def __init__(self, inserted_id):
-                self.inserted_id = inserted_id
-        
-        return InsertResult(document.get('id', len(data)))
-    
+        return InsertResult(document.get('id', rid))
+
+    async def update_one(self, collection: str, query: Dict, update: Dict, upsert: bool = False) -> UpdateResult:
+        """Apply $set/$unset/$inc (or a replacement document) to the first match"""
+        state = self._collection(collection)
+        async with state.lock:
+            found = state.match(query, limit=1)
+            if found:
+                rid, document = found[0]
+            elif upsert:
+                rid, document = state.next_rid, {k: v for k, v in query.items() if not k.startswith("$")}
+                state.next_rid += 1
+            else:
+                return UpdateResult(0, 0)
+
+            updated = copy.deepcopy(document)
+            if any(key.startswith("$") for key in update):
+                updated.update(update.get("$set", {}))
+                for key in update.get("$unset", {}):
+                    updated.pop(key, None)
+                for key, amount in update.get("$inc", {}).items():
+                    updated[key] = updated.get(key, 0) + amount
+                if not found:
+                    updated.update(update.get("$setOnInsert", {}))
+            else:
+                updated = dict(update)
+
+            state.append("put", rid, updated)
+            self._after_write(state)
+        return UpdateResult(1 if found else 0, 1, None if found else updated.get('id', rid))
+
+    async def delete_one(self, collection: str, query: Dict) -> DeleteResult:
+        state = self._collection(collection)
+        async with state.lock:
+            found = state.match(query, limit=1)
+            if not found:
+                return DeleteResult(0)
+            state.append("del", found[0][0])
+            self._after_write(state)
+        return DeleteResult(1)
+
+    async def count_documents(self, collection: str, query: Dict = None) -> int:
+        state = self._collection(collection)
+        if not query:
+            return len(state.documents)
+        return len(state.match(query))
+
     async def find_one(self, collection: str, query: Dict) -> Dict:
         """Find one document matching the query"""
-        data = self._load_collection(collection)
-        
-        for item in data:
-            match = True
-            for key, value in query.items():
-                if key not in item or item[key] != value:
-                    match = False
-                    break
-            if match:
-                return item
-        return None
-    
+        found = self._collection(collection).match(query or {}, limit=1)
+        return dict(found[0][1]) if found else None
+
     async def find(self, collection: str, query: Dict = None) -> List[Dict]:
-        """Find all documents matching the query"""
-        data = self._load_collection(collection)
-        
-        if not query:
-            return data
-        
-        results = []
-        for item in data:
-            match = True
-            for key, value in query.items():
-                if key not in item or item[key] != value:
-                    match = False
-                    break
-            if match:
-                results.append(item)
-        
-        return results
+        """Find all documents matching the query, in insertion order"""
+        return [dict(document) for _, document in self._collection(collection).match(query or {})]
 
 # Alternative database setup for testing
 simple_db = SimpleFileDatabase()
@@ -86,35 +377,64 @@ simple_db = SimpleFileDatabase()
 class MockCollection:
     def __init__(self, collection_name: str):
         self.collection_name = collection_name
-    
+
     async def insert_one(self, document: Dict):
         return await simple_db.insert_one(self.collection_name, document)
-    
+
     async def find_one(self, query: Dict = None):
         return await simple_db.find_one(self.collection_name, query or {})
-    
+
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False):
+        return await simple_db.update_one(self.collection_name, query, update, upsert=upsert)
+
+    async def delete_one(self, query: Dict):
+        return await simple_db.delete_one(self.collection_name, query)
+
+    async def count_documents(self, query: Dict = None):
+        return await simple_db.count_documents(self.collection_name, query or {})
+
+    async def create_index(self, field, **kwargs):
+        # Only single-field equality indexes are supported
+        if isinstance(field, list):
+            field = field[0][0]
+        await simple_db.create_index(self.collection_name, field)
+
     def find(self, query: Dict = None):
         class AsyncCursor:
             def __init__(self, collection_name, query):
                 self.collection_name = collection_name
                 self.query = query
-            
+                self._sort: List[Tuple[str, int]] = []
+                self._limit = 0
+                self._results = None
+
             def __aiter__(self):
                 return self
-            
+
             async def __anext__(self):
-                # This is a simple implementation - in real use you'd want proper cursor behavior
-                data = await simple_db.find(self.collection_name, self.query)
-                for item in data:
-                    return item
-                raise StopAsyncIteration
-            
-            def sort(self, *args):
+                if self._results is None:
+                    results = await simple_db.find(self.collection_name, self.query)
+                    for key, direction in reversed(self._sort):
+                        results.sort(key=lambda d: (d.get(key) is not None, d.get(key)), reverse=direction < 0)
+                    if self._limit:
+                        results = results[:self._limit]
+                    self._results = iter(results)
+                try:
+                    return next(self._results)
+                except StopIteration:
+                    raise StopAsyncIteration
+
+            def sort(self, key, direction=1):
+                self._sort = key if isinstance(key, list) else [(key, direction)]
                 return self
-            
+
             def limit(self, limit):
+                self._limit = limit
                 return self
-        
+
+            async def to_list(self, length=None):
+                return [item async for item in self][:length] if length else [item async for item in self]
+
         return AsyncCursor(self.collection_name, query or {})
 
 class MockDatabase:
@@ -123,4 +443,4 @@ class MockDatabase:
 
 async def get_test_database():
     """Alternative database for testing without MongoDB"""
-    return MockDatabase()
\ No newline at end of file
+    return MockDatabase()
@@ -0,0 +1,77 @@
+"""
+Motor-style async wrappers around mongomock, shared by the fitness backend tests.
+Collection methods become coroutines that yield to the event loop (so
+concurrent callers interleave like real I/O); find and aggregate return
+cursors with async iteration and to_list.
+"""
+import asyncio
+
+import mongomock
+
+
+class AsyncCursor:
+    """Async iteration and to_list over a mongomock cursor or aggregation result"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, count):
+        self.cursor = self.cursor.limit(count)
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(0)
+        documents = list(self.cursor)
+        return documents if length is None else documents[:length]
+
+
+class AsyncCollection:
+    """Minimal Motor-style wrapper around a mongomock collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    def aggregate(self, *args, **kwargs):
+        return AsyncCursor(self.collection.aggregate(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    """Collections by attribute or item; the same wrapper is returned for a name every time"""
+
+    def __init__(self, database=None):
+        self.database = database if database is not None else mongomock.MongoClient().db
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = AsyncCollection(self.database[name])
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,108 @@
+"""
+Benchmark for SimpleFileDatabase
+Inserts records and runs indexed queries with the append-only log store,
+then does the same with the old whole-file JSON store for comparison.
+The old store rewrites the file on every insert (O(n) per write), so it is
+measured on a smaller record count.
+
+Usage: python benchmark_file_database.py [--records 100000] [--legacy-records 2000] [--queries 10000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from alternative_database import SimpleFileDatabase
+
+
+class LegacyFileDatabase:
+    """The previous implementation: load and rewrite the whole file, linear scans"""
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+
+    def _path(self, collection: str) -> str:
+        return os.path.join(self.data_dir, f"{collection}.json")
+
+    def _load(self, collection: str):
+        path = self._path(collection)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return []
+
+    async def insert_one(self, collection: str, document: dict):
+        data = self._load(collection)
+        data.append(document)
+        with open(self._path(collection), "w") as f:
+            json.dump(data, f, indent=2, default=str)
+
+    async def find(self, collection: str, query: dict):
+        return [d for d in self._load(collection) if all(d.get(k) == v for k, v in query.items())]
+
+
+def make_record(i: int, users: int) -> dict:
+    return {
+        "id": f"hr_{i}",
+        "user_id": f"user_{i % users}",
+        "bpm": 55 + i % 60,
+        "timestamp": f"2025-01-01T00:{i % 60:02d}:00",
+        "source": "wearable"
+    }
+
+
+async def bench(db, records: int, queries: int, users: int, close=None):
+    started = time.perf_counter()
+    for i in range(records):
+        await db.insert_one("heart_rate_metrics", make_record(i, users))
+    if close:
+        await close()
+    insert_seconds = time.perf_counter() - started
+
+    random.seed(7)
+    started = time.perf_counter()
+    matched = 0
+    for _ in range(queries):
+        matched += len(await db.find("heart_rate_metrics", {"user_id": f"user_{random.randrange(users)}"}))
+    query_seconds = time.perf_counter() - started
+    return records / insert_seconds, queries / query_seconds, matched
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as data_dir:
+        db = SimpleFileDatabase(data_dir)
+        inserts, finds, _ = await bench(db, args.records, args.queries, args.users, close=db.flush)
+        await db.close()
+
+        started = time.perf_counter()
+        reopened = SimpleFileDatabase(data_dir)
+        count = await reopened.count_documents("heart_rate_metrics")
+        recovery_seconds = time.perf_counter() - started
+        await reopened.close()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        legacy_queries = max(1, args.queries // 100)
+        legacy_inserts, legacy_finds, _ = await bench(
+            LegacyFileDatabase(data_dir), args.legacy_records, legacy_queries, args.users
+        )
+
+    print(f"Append-only log ({args.records:,} records, {args.users} users)")
+    print(f"  inserts:        {inserts:12,.0f} /s")
+    print(f"  indexed finds:  {finds:12,.0f} /s")
+    print(f"  recovery:       {recovery_seconds:12.2f} s to replay {count:,} records")
+    print(f"Whole-file JSON ({args.legacy_records:,} records)")
+    print(f"  inserts:        {legacy_inserts:12,.0f} /s (falls further as the file grows)")
+    print(f"  finds:          {legacy_finds:12,.0f} /s")
+    print(f"Speed-up: inserts x{inserts / legacy_inserts:,.0f}, finds x{finds / legacy_finds:,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--legacy-records", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,211 @@
+"""
+Benchmark for workout plan generation
+Generates plans for random (goal, level, equipment, weeks, days) requests with the
+indexed catalog and memoized generator in utils, then with the previous generator,
+which rebuilt the exercise library and re-derived every plan from scratch.
+
+Usage: python benchmark_workout_plans.py [--plans 10000] [--legacy-plans 1000]
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime
+
+from models import Workout, WorkoutExercise, WorkoutPlan, WorkoutPlanRequest
+from utils import _build_demo_exercises, _week_workouts, clear_plan_cache, generate_workout_plan, get_demo_workouts
+
+GOALS = ["strength", "muscle_gain", "weight_loss", "fat_loss", "endurance", "flexibility", "general_fitness"]
+LEVELS = ["beginner", "intermediate", "advanced"]
+EQUIPMENT = [[], ["none"], ["dumbbells"], ["barbell", "bench"], ["gym"]]
+
+
+def legacy_generate_workout_plan(plan_request: WorkoutPlanRequest, user_id: str) -> WorkoutPlan:
+    """The previous generator: rebuilds the exercise list, list scans, re-parses sets×reps"""
+    exercises = _build_demo_exercises()
+    
+    # Filter exercises by difficulty
+    difficulty_mapping = {
+        "beginner": "Beginner",
+        "intermediate": "Intermediate",
+        "advanced": "Advanced"
+    }
+    
+    target_difficulty = difficulty_mapping.get(plan_request.fitness_level, "Intermediate")
+    
+    # Adjust difficulty based on user level
+    if plan_request.fitness_level == "beginner":
+        filtered_exercises = [ex for ex in exercises if ex.difficulty in ["Beginner", "Intermediate"]]
+    elif plan_request.fitness_level == "advanced":
+        filtered_exercises = [ex for ex in exercises if ex.difficulty in ["Intermediate", "Advanced"]]
+    else:
+        filtered_exercises = exercises
+    
+    # Adjust workouts based on specific fitness goal
+    goal_focused_exercises = []
+    if plan_request.goal.lower() == "weight_loss" or plan_request.goal.lower() == "fat_loss":
+        # For weight loss, focus on cardio and full-body exercises with higher rep ranges
+        goal_focused_exercises = [ex for ex in filtered_exercises if ex.type in ["Cardio", "HIIT"]]
+        # Add some strength exercises for muscle retention
+        strength_exercises = [ex for ex in filtered_exercises if ex.type == "Strength"][:3]
+        goal_focused_exercises.extend(strength_exercises)
+        
+    elif plan_request.goal.lower() == "muscle_gain" or plan_request.goal.lower() == "strength":
+        # For muscle gain, focus on strength exercises with progressive overload
+        goal_focused_exercises = [ex for ex in filtered_exercises if ex.type == "Strength"]
+        # Add some compound exercises
+        compound_exercises = [ex for ex in goal_focused_exercises 
+                             if len(ex.muscle_groups) > 2][:5]
+        goal_focused_exercises = compound_exercises + [ex for ex in goal_focused_exercises 
+                                                      if ex not in compound_exercises][:5]
+        
+    elif plan_request.goal.lower() == "endurance":
+        # For endurance, focus on higher rep ranges and cardio
+        goal_focused_exercises = [ex for ex in filtered_exercises if ex.type in ["Cardio", "HIIT"]]
+        # Include bodyweight exercises for muscular endurance
+        bodyweight_exercises = [ex for ex in filtered_exercises if ex.type == "Bodyweight"]
+        goal_focused_exercises.extend(bodyweight_exercises)
+        
+    elif plan_request.goal.lower() == "flexibility":
+        # For flexibility, include stretching exercises
+        # Note: In a real implementation, you'd have stretching exercises in the database
+        # For demo, we'll use a mix of bodyweight exercises
+        goal_focused_exercises = [ex for ex in filtered_exercises if ex.type == "Bodyweight"]
+        
+    else:
+        # Default to a balanced approach
+        goal_focused_exercises = filtered_exercises
+    
+    # If we don't have enough exercises after filtering, add some from the filtered list
+    if len(goal_focused_exercises) < 10:
+        remaining_needed = 10 - len(goal_focused_exercises)
+        additional_exercises = [ex for ex in filtered_exercises if ex not in goal_focused_exercises][:remaining_needed]
+        goal_focused_exercises.extend(additional_exercises)
+    
+    # Create progression plan - adjust workout intensity based on weeks
+    progression_workouts = []
+    
+    # Generate base workouts
+    workouts = get_demo_workouts(goal_focused_exercises)
+    
+    # Implement progression logic based on fitness level and duration
+    for week in range(1, plan_request.duration_weeks + 1):
+        week_workouts = []
+        progression_factor = min(1.0 + (week - 1) * 0.1, 1.5)  # Progressive increase up to 50%
+        
+        # Create weekly workout rotation based on frequency
+        for day in range(plan_request.frequency):
+            if day < len(workouts):
+                base_workout = workouts[day]
+                
+                # Create a progressively more intense version of the workout
+                progressed_exercises = []
+                for workout_ex in base_workout.exercises:
+                    # Parse the sets and reps
+                    parts = workout_ex.sets_reps.split("×")
+                    if len(parts) == 2:
+                        sets = int(parts[0])
+                        if parts[1].endswith("s"):  # Duration-based exercise
+                            duration_secs = int(parts[1][:-1])
+                            new_duration = min(int(duration_secs * progression_factor), 60)  # Cap at 60 seconds
+                            progressed_sets_reps = f"{sets}×{new_duration}s"
+                        else:  # Rep-based exercise
+                            reps = int(parts[1])
+                            # Adjust reps based on goal and progression
+                            if plan_request.goal.lower() in ["endurance", "weight_loss"]:
+                                # Higher reps for endurance/weight loss
+                                new_reps = min(int(reps * progression_factor), 30)  # Cap at 30 reps
+                            elif plan_request.goal.lower() in ["muscle_gain", "strength"]:
+                                # Keep reps lower for strength but increase sets
+                                new_reps = min(int(reps * 0.9 * progression_factor), 12)  # Cap at 12 reps
+                                sets = min(sets + (week // 2), 5)  # Increase sets every 2 weeks, cap at 5
+                            else:
+                                new_reps = min(int(reps * progression_factor), 20)  # Default cap at 20
+                            
+                            progressed_sets_reps = f"{sets}×{new_reps}"
+                    else:
+                        progressed_sets_reps = workout_ex.sets_reps
+                    
+                    progressed_exercises.append(
+                        WorkoutExercise(
+                            exercise=workout_ex.exercise,
+                            sets_reps=progressed_sets_reps,
+                            duration=workout_ex.duration
+                        )
+                    )
+                
+                # Create the progressed workout
+                week_workout = Workout(
+                    id=f"{base_workout.id}-w{week}",
+                    name=f"{base_workout.name} - Week {week}",
+                    focus=base_workout.focus,
+                    total_duration=base_workout.total_duration,
+                    total_calories=int(base_workout.total_calories * progression_factor),
+                    rest_day=base_workout.rest_day,
+                    exercises=progressed_exercises,
+                    instructions=f"Week {week}: {base_workout.instructions} As you progress, focus on maintaining proper form while increasing intensity."
+                )
+                week_workouts.append(week_workout)
+        
+        progression_workouts.extend(week_workouts)
+    
+    # Create the workout plan
+    plan_id = str(uuid.uuid4())
+    plan_name = f"Custom {plan_request.goal.replace('_', ' ').title()} Plan"
+    
+    return WorkoutPlan(
+        id=plan_id,
+        user_id=user_id,
+        name=plan_name,
+        description=f"A personalized {plan_request.duration_weeks}-week {plan_request.goal.replace('_', ' ')} program tailored for {plan_request.fitness_level} level with progressive intensity",
+        goal=plan_request.goal,
+        difficulty=target_difficulty,
+        duration_weeks=plan_request.duration_weeks,
+        workouts_per_week=plan_request.frequency,
+        focus_areas=plan_request.preferences.get("focusAreas", ["Upper Body", "Lower Body", "Core"]),
+        workouts=progression_workouts,
+        created_at=datetime.now()
+    )
+
+
+def make_requests(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [
+        WorkoutPlanRequest(
+            goal=rng.choice(GOALS),
+            fitness_level=rng.choice(LEVELS),
+            duration_weeks=rng.randint(4, 12),
+            frequency=rng.randint(2, 5),
+            preferences={"availableEquipment": rng.choice(EQUIPMENT)}
+        )
+        for _ in range(count)
+    ]
+
+
+def bench(generate, requests: list) -> float:
+    started = time.perf_counter()
+    for request in requests:
+        generate(request, "bench_user")
+    return len(requests) / (time.perf_counter() - started)
+
+
+def main(args):
+    requests = make_requests(args.plans)
+    clear_plan_cache()
+    plans_per_second = bench(generate_workout_plan, requests)
+    cache = _week_workouts.cache_info()
+    legacy_plans_per_second = bench(legacy_generate_workout_plan, requests[:args.legacy_plans])
+
+    print(f"Indexed catalog + memoized plans ({args.plans:,} requests)")
+    print(f"  plans:      {plans_per_second:12,.0f} /s")
+    print(f"  week cache: {cache.hits:,} hits, {cache.misses:,} misses")
+    print(f"Previous generator ({args.legacy_plans:,} requests)")
+    print(f"  plans:      {legacy_plans_per_second:12,.0f} /s")
+    print(f"Speed-up: x{plans_per_second / legacy_plans_per_second:,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=10000)
+    parser.add_argument("--legacy-plans", type=int, default=1000)
+    main(parser.parse_args())
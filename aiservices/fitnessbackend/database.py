@@ -23,6 +23,7 @@ else:
 COLLECTIONS = {
     # Health tracking collections
     "heart_rate": "heart_rate_metrics",
+    "heart_rate_baselines": "heart_rate_baselines",
     "steps": "step_metrics",
     "sleep": "sleep_metrics", 
     "calories": "calorie_metrics",
@@ -127,3 +127,16 @@ class RecoveryAdvice(BaseModel):
     expected_recovery_time: str = ""
     
     generated_at: datetime
+
+
+class HeartRateBaseline(BaseModel):
+    """Running heart rate statistics for one user and activity state"""
+    user_id: str
+    activity_state: str
+    count: int = 0  # Raw number of samples seen
+    weight: float = 0.0  # Sum of time-decayed sample weights
+    mean: float = 0.0  # Time-decayed mean bpm
+    m2: float = 0.0  # Time-decayed sum of squared deviations
+    last_timestamp: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None  # Bumped on every save; None until first stored
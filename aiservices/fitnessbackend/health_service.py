@@ -1,43 +1,52 @@
+import asyncio
 import uuid
 from datetime import datetime, date, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional
 import json
-import statistics
 from fastapi.encoders import jsonable_encoder
 
 from health_models import HealthInsight, RecoveryAdvice
+from heart_rate_baseline import heart_rate_baselines, baseline_stdev
 
 
-async def analyze_heart_rate_anomalies(db, heart_rate_metric):
+async def analyze_heart_rate_anomalies(db, heart_rate_metric, baseline=None):
     """
     Analyze heart rate data for anomalies and generate insights
     
     Args:
         db: Database connection
         heart_rate_metric: The new heart rate metric to analyze
+        baseline: The user's baseline before this sample; when omitted the sample
+            is folded into the streaming baseline store here
     """
-    user_id = heart_rate_metric.user_id
+    # Compare against the running baseline for this user in the same activity state
+    if baseline is None:
+        baseline = await heart_rate_baselines.observe(db, heart_rate_metric)
     
-    # Get recent heart rate data for this user in the same activity state
-    query = {
-        "user_id": user_id,
-        "activity_state": heart_rate_metric.activity_state,
-        "timestamp": {
-            "$gte": datetime.now() - timedelta(days=30)
-        }
-    }
+    insight = build_heart_rate_anomaly_insight(heart_rate_metric, baseline)
     
-    cursor = db["heart_rate_metrics"].find(query)
-    recent_data = await cursor.to_list(length=1000)
+    if insight:
+        # Save to database
+        await db["health_insights"].insert_one(jsonable_encoder(insight))
+    
+    return insight
+
+
+def build_heart_rate_anomaly_insight(heart_rate_metric, baseline) -> Optional[HealthInsight]:
+    """
+    Check a heart rate sample against a baseline and build an insight if it is anomalous
     
-    if len(recent_data) < 10:
+    Args:
+        heart_rate_metric: The heart rate metric to check
+        baseline: The user's baseline as it was before this sample
+    """
+    if baseline.count < 10:
         # Not enough data to establish a baseline
-        return
+        return None
     
-    # Calculate the user's typical heart rate range for this activity state
-    heart_rates = [hr["bpm"] for hr in recent_data]
-    avg_heart_rate = statistics.mean(heart_rates)
-    stdev_heart_rate = statistics.stdev(heart_rates) if len(heart_rates) > 1 else 5
+    # The user's typical heart rate range for this activity state
+    avg_heart_rate = baseline.mean
+    stdev_heart_rate = baseline_stdev(baseline) or 5
     
     # Define anomaly thresholds
     high_threshold = avg_heart_rate + (2 * stdev_heart_rate)
@@ -47,53 +56,48 @@ async def analyze_heart_rate_anomalies(db, heart_rate_metric):
     current_bpm = heart_rate_metric.bpm
     is_anomalous = current_bpm > high_threshold or current_bpm < low_threshold
     
-    if is_anomalous:
-        # Create insight for this anomaly
-        if current_bpm > high_threshold:
-            insight_type = "elevated_heart_rate"
-            title = "Elevated Heart Rate Detected"
-            description = f"Your heart rate of {current_bpm} bpm during {heart_rate_metric.activity_state} " \
-                         f"is higher than your typical range of {int(avg_heart_rate-stdev_heart_rate)}-" \
-                         f"{int(avg_heart_rate+stdev_heart_rate)} bpm."
-            severity = "medium" if current_bpm > high_threshold + stdev_heart_rate else "low"
-            actions = [
-                "Take a few minutes to rest and breathe deeply",
-                "Stay hydrated",
-                "If this persists while at rest, consider consulting a healthcare professional"
-            ]
-        else:
-            insight_type = "low_heart_rate"
-            title = "Lower Than Usual Heart Rate Detected"
-            description = f"Your heart rate of {current_bpm} bpm during {heart_rate_metric.activity_state} " \
-                         f"is lower than your typical range of {int(avg_heart_rate-stdev_heart_rate)}-" \
-                         f"{int(avg_heart_rate+stdev_heart_rate)} bpm."
-            severity = "low"
-            actions = [
-                "This could be a sign of improved fitness if you're exercising regularly",
-                "If you feel dizzy or fatigued, take a rest",
-                "If this persists and you feel unwell, consider consulting a healthcare professional"
-            ]
-        
-        # Create the insight
-        insight = HealthInsight(
-            id=str(uuid.uuid4()),
-            user_id=user_id,
-            type=insight_type,
-            title=title,
-            description=description,
-            severity=severity,
-            metrics_referenced=[str(heart_rate_metric.timestamp)],
-            generated_at=datetime.now(),
-            dismissed=False,
-            actions=actions
-        )
-        
-        # Save to database
-        await db["health_insights"].insert_one(jsonable_encoder(insight))
-        
-        return insight
+    if not is_anomalous:
+        return None
+    
+    # Create insight for this anomaly
+    if current_bpm > high_threshold:
+        insight_type = "elevated_heart_rate"
+        title = "Elevated Heart Rate Detected"
+        description = f"Your heart rate of {current_bpm} bpm during {heart_rate_metric.activity_state} " \
+                     f"is higher than your typical range of {int(avg_heart_rate-stdev_heart_rate)}-" \
+                     f"{int(avg_heart_rate+stdev_heart_rate)} bpm."
+        severity = "medium" if current_bpm > high_threshold + stdev_heart_rate else "low"
+        actions = [
+            "Take a few minutes to rest and breathe deeply",
+            "Stay hydrated",
+            "If this persists while at rest, consider consulting a healthcare professional"
+        ]
+    else:
+        insight_type = "low_heart_rate"
+        title = "Lower Than Usual Heart Rate Detected"
+        description = f"Your heart rate of {current_bpm} bpm during {heart_rate_metric.activity_state} " \
+                     f"is lower than your typical range of {int(avg_heart_rate-stdev_heart_rate)}-" \
+                     f"{int(avg_heart_rate+stdev_heart_rate)} bpm."
+        severity = "low"
+        actions = [
+            "This could be a sign of improved fitness if you're exercising regularly",
+            "If you feel dizzy or fatigued, take a rest",
+            "If this persists and you feel unwell, consider consulting a healthcare professional"
+        ]
     
-    return None
+    # Create the insight
+    return HealthInsight(
+        id=str(uuid.uuid4()),
+        user_id=heart_rate_metric.user_id,
+        type=insight_type,
+        title=title,
+        description=description,
+        severity=severity,
+        metrics_referenced=[str(heart_rate_metric.timestamp)],
+        generated_at=datetime.now(),
+        dismissed=False,
+        actions=actions
+    )
 
 
 async def analyze_sleep_quality(db, sleep_metric):
@@ -174,7 +178,11 @@ async def analyze_sleep_quality(db, sleep_metric):
     
     if len(recent_sleep) >= 5:  # Need at least 5 days to detect patterns
         # Check for inconsistent bedtimes
-        bedtimes = [datetime.fromisoformat(sleep["start_time"]).time() for sleep in recent_sleep]
+        bedtimes = [
+            (sleep["start_time"] if isinstance(sleep["start_time"], datetime)
+             else datetime.fromisoformat(sleep["start_time"])).time()
+            for sleep in recent_sleep
+        ]
         bedtime_hours = [bt.hour + bt.minute/60 for bt in bedtimes]
         
         if max(bedtime_hours) - min(bedtime_hours) > 2:  # More than 2 hour variation
@@ -614,6 +622,163 @@ async def generate_recovery_advice(db, user_id: str, target_date: date) -> Recov
     return recovery_advice
 
 
+# Resting heart rate baselines per (user_id, date). The 14-day window ends before the day, so only
+# late-synced samples change it; ingestion evicts the days they fall into
+RECOVERY_BASELINE_CACHE_SIZE = 1024
+_recovery_baseline_cache: Dict[Tuple[str, date], Optional[float]] = {}
+
+# A sample on day d is in the baseline windows [T-15, T-2) of the days T = d+3 .. d+15
+RECOVERY_BASELINE_OFFSETS = range(3, 16)
+
+
+def invalidate_recovery_baselines(user_id: str, sample_dates: Iterable[date]):
+    """
+    Drop the cached baselines whose window contains newly stored resting samples
+    
+    Args:
+        user_id: The user the samples belong to
+        sample_dates: Dates of the stored resting heart rate samples
+    """
+    for sample_date in set(sample_dates):
+        for offset in RECOVERY_BASELINE_OFFSETS:
+            _recovery_baseline_cache.pop((user_id, sample_date + timedelta(days=offset)), None)
+
+
+async def get_recovery_baseline(db, user_id: str, target_date: date) -> Optional[float]:
+    """
+    Average resting heart rate over the 14 days before the recovery window, cached per user/day
+    
+    Args:
+        db: Database connection
+        user_id: The user ID
+        target_date: The date the recovery score is calculated for
+    """
+    key = (user_id, target_date)
+    if key in _recovery_baseline_cache:
+        return _recovery_baseline_cache[key]
+    
+    start_datetime = datetime.combine(target_date - timedelta(days=1), datetime.min.time())
+    pipeline = [
+        {"$match": {
+            "user_id": user_id,
+            "activity_state": "rest",
+            "timestamp": {
+                "$gte": start_datetime - timedelta(days=14),
+                "$lt": start_datetime - timedelta(days=1)
+            }
+        }},
+        {"$group": {"_id": None, "avg": {"$avg": "$bpm"}}}
+    ]
+    rows = await db["heart_rate_metrics"].aggregate(pipeline).to_list(length=1)
+    baseline_avg = rows[0]["avg"] if rows else None
+    
+    # Today's baseline can still gain late-synced samples, so only past days are cached
+    if target_date < date.today():
+        _recovery_baseline_cache[key] = baseline_avg
+        if len(_recovery_baseline_cache) > RECOVERY_BASELINE_CACHE_SIZE:
+            del _recovery_baseline_cache[next(iter(_recovery_baseline_cache))]
+    return baseline_avg
+
+
+async def get_daily_health_summary(db, user_id: str, target_date: date) -> Dict:
+    """
+    Compute the daily health summary and recovery score with concurrent aggregate-only queries
+    
+    Every collection is read once: heart rate through one $facet (the day's stats and
+    the recovery window's resting average), steps and calories as sums, sleep for the
+    day and the previous night in one find, and the cached resting baseline.
+    
+    Args:
+        db: Database connection
+        user_id: The user ID to summarize
+        target_date: The day to summarize
+        
+    Returns:
+        Dict with steps, sleep, calories, heart_rate and recovery sections
+    """
+    start_datetime = datetime.combine(target_date, datetime.min.time())
+    end_datetime = datetime.combine(target_date, datetime.max.time())
+    recovery_start = datetime.combine(target_date - timedelta(days=1), datetime.min.time())
+    day_query = {"user_id": user_id, "timestamp": {"$gte": start_datetime, "$lte": end_datetime}}
+    
+    heart_rate_pipeline = [
+        {"$match": {"user_id": user_id, "timestamp": {"$gte": recovery_start, "$lte": end_datetime}}},
+        {"$facet": {
+            "day": [
+                {"$match": {"timestamp": {"$gte": start_datetime}}},
+                {"$group": {"_id": None, "avg": {"$avg": "$bpm"}, "min": {"$min": "$bpm"}, "max": {"$max": "$bpm"}}}
+            ],
+            "recovery_rest": [
+                {"$match": {"activity_state": "rest", "timestamp": {"$lte": start_datetime}}},
+                {"$group": {"_id": None, "avg": {"$avg": "$bpm"}}}
+            ]
+        }}
+    ]
+    
+    heart_rate_rows, step_rows, calorie_rows, sleep_docs, workout_data, baseline_avg = await asyncio.gather(
+        db["heart_rate_metrics"].aggregate(heart_rate_pipeline).to_list(length=1),
+        db["step_metrics"].aggregate([
+            {"$match": day_query},
+            {"$group": {"_id": None, "total": {"$sum": "$count"}}}
+        ]).to_list(length=1),
+        db["calorie_metrics"].aggregate([
+            {"$match": day_query},
+            {"$group": {"_id": None, "total": {"$sum": "$total"}}}
+        ]).to_list(length=1),
+        db["sleep_metrics"].find(
+            {"user_id": user_id, "end_time": {"$gte": recovery_start, "$lte": end_datetime}},
+            {"_id": 0, "end_time": 1, "duration_minutes": 1, "sleep_score": 1, "deep_sleep_minutes": 1}
+        ).to_list(length=10),
+        _recent_workouts(db, user_id, recovery_start),
+        get_recovery_baseline(db, user_id, target_date)
+    )
+    
+    facets = heart_rate_rows[0] if heart_rate_rows else {}
+    day_heart_rate = (facets.get("day") or [None])[0]
+    recovery_rest = (facets.get("recovery_rest") or [None])[0]
+    
+    # Sleep ending on the day is shown in the summary; the previous night drives recovery
+    day_sleep = next((doc for doc in sleep_docs if doc["end_time"] >= start_datetime), None)
+    recovery_sleep = next((doc for doc in sleep_docs if doc["end_time"] <= start_datetime), None)
+    
+    score, factors = score_recovery(
+        recovery_sleep,
+        recovery_rest["avg"] if recovery_rest else None,
+        baseline_avg,
+        workout_data,
+        recovery_start
+    )
+    
+    total_steps = step_rows[0]["total"] if step_rows else 0
+    
+    return {
+        "date": target_date,
+        "steps": {
+            "total": total_steps,
+            "goal_progress": min(1.0, total_steps / 10000) if total_steps else 0  # Assuming 10k step goal
+        },
+        "sleep": {
+            "duration_hours": day_sleep["duration_minutes"] / 60 if day_sleep else None,
+            "quality_score": day_sleep.get("sleep_score") if day_sleep else None,
+            "deep_sleep_hours": day_sleep["deep_sleep_minutes"] / 60 if day_sleep and day_sleep.get("deep_sleep_minutes") is not None else None
+        },
+        "calories": {
+            "total": calorie_rows[0]["total"] if calorie_rows else 0,
+        },
+        "heart_rate": {
+            "average": round(day_heart_rate["avg"]) if day_heart_rate else None,
+            "min": day_heart_rate["min"] if day_heart_rate else None,
+            "max": day_heart_rate["max"] if day_heart_rate else None
+        },
+        "recovery": {
+            "score": score,
+            "status": recovery_status(score),
+            "factors": factors,
+            "date": target_date
+        }
+    }
+
+
 async def calculate_recovery_score(db, user_id: str, target_date: date) -> Tuple[int, Dict[str, float]]:
     """
     Calculate a recovery score based on various health metrics
@@ -623,6 +788,74 @@ async def calculate_recovery_score(db, user_id: str, target_date: date) -> Tuple
         user_id: The user ID to calculate score for
         target_date: The date to calculate score for
         
+    Returns:
+        Tuple of (recovery_score, factor_scores)
+    """
+    start_datetime = datetime.combine(target_date - timedelta(days=1), datetime.min.time())
+    end_datetime = datetime.combine(target_date, datetime.min.time())
+    
+    sleep_query = {
+        "user_id": user_id,
+        "end_time": {"$gte": start_datetime, "$lte": end_datetime}
+    }
+    rhr_pipeline = [
+        {"$match": {
+            "user_id": user_id,
+            "activity_state": "rest",
+            "timestamp": {"$gte": start_datetime, "$lte": end_datetime}
+        }},
+        {"$group": {"_id": None, "avg": {"$avg": "$bpm"}}}
+    ]
+    
+    sleep_data, rhr_rows, baseline_avg, workout_data = await asyncio.gather(
+        db["sleep_metrics"].find_one(sleep_query),
+        db["heart_rate_metrics"].aggregate(rhr_pipeline).to_list(length=1),
+        get_recovery_baseline(db, user_id, target_date),
+        _recent_workouts(db, user_id, start_datetime)
+    )
+    
+    return score_recovery(
+        sleep_data,
+        rhr_rows[0]["avg"] if rhr_rows else None,
+        baseline_avg,
+        workout_data,
+        start_datetime
+    )
+
+
+async def _recent_workouts(db, user_id: str, start_datetime: datetime) -> List[Dict]:
+    """Workouts completed in the 3 days before the recovery window"""
+    workout_query = {
+        "user_id": user_id,
+        "completed_at": {"$gte": start_datetime - timedelta(days=3), "$lt": start_datetime}
+    }
+    cursor = db["workout_history"].find(workout_query, {"_id": 0, "calories_burned": 1, "completed_at": 1})
+    return await cursor.to_list(length=10)
+
+
+def recovery_status(score: int) -> str:
+    """Map a recovery score to its status label"""
+    if score >= 80:
+        return "optimal"
+    elif score >= 60:
+        return "good"
+    elif score >= 40:
+        return "moderate"
+    return "needs_recovery"
+
+
+def score_recovery(sleep_data: Optional[Dict], avg_rhr: Optional[float], baseline_avg: Optional[float],
+                   workout_data: List[Dict], start_datetime: datetime) -> Tuple[int, Dict[str, float]]:
+    """
+    Score recovery from pre-aggregated inputs
+    
+    Args:
+        sleep_data: The previous night's sleep document, if any
+        avg_rhr: Average resting heart rate in the recovery window
+        baseline_avg: Average resting heart rate over the preceding two weeks
+        workout_data: Workouts from the 3 days before the recovery window
+        start_datetime: Start of the recovery window
+        
     Returns:
         Tuple of (recovery_score, factor_scores)
     """
@@ -635,16 +868,7 @@ async def calculate_recovery_score(db, user_id: str, target_date: date) -> Tuple
         "muscle_fatigue": 70,  # Estimated muscle fatigue
     }
     
-    start_datetime = datetime.combine(target_date - timedelta(days=1), datetime.min.time())
-    end_datetime = datetime.combine(target_date, datetime.min.time())
-    
     # Analyze sleep
-    sleep_query = {
-        "user_id": user_id,
-        "end_time": {"$gte": start_datetime, "$lte": end_datetime}
-    }
-    sleep_data = await db["sleep_metrics"].find_one(sleep_query)
-    
     if sleep_data:
         sleep_duration_hours = sleep_data["duration_minutes"] / 60
         
@@ -686,36 +910,9 @@ async def calculate_recovery_score(db, user_id: str, target_date: date) -> Tuple
         factors["sleep"] = (duration_score * 0.6) + (quality_score * 0.4)
     
     # Analyze heart rate
-    rhr_query = {
-        "user_id": user_id,
-        "activity_state": "rest",
-        "timestamp": {"$gte": start_datetime, "$lte": end_datetime}
-    }
-    rhr_cursor = db["heart_rate_metrics"].find(rhr_query)
-    rhr_data = await rhr_cursor.to_list(length=100)
-    
-    if rhr_data:
-        # Calculate resting heart rate
-        resting_hrs = [hr["bpm"] for hr in rhr_data]
-        avg_rhr = statistics.mean(resting_hrs)
-        
-        # Get baseline RHR (previous 7-14 days)
-        baseline_query = {
-            "user_id": user_id,
-            "activity_state": "rest",
-            "timestamp": {
-                "$gte": start_datetime - timedelta(days=14),
-                "$lt": start_datetime - timedelta(days=1)
-            }
-        }
-        baseline_cursor = db["heart_rate_metrics"].find(baseline_query)
-        baseline_data = await baseline_cursor.to_list(length=1000)
-        
-        if baseline_data:
-            baseline_hrs = [hr["bpm"] for hr in baseline_data]
-            baseline_avg = statistics.mean(baseline_hrs)
-            baseline_stdev = statistics.stdev(baseline_hrs) if len(baseline_hrs) > 1 else 3
-            
+    if avg_rhr is not None:
+        # Compare resting heart rate with the baseline (previous 7-14 days)
+        if baseline_avg is not None:
             # Score based on deviation from baseline
             # Lower RHR than baseline is generally good, higher can indicate fatigue/stress
             rhr_delta = avg_rhr - baseline_avg
@@ -735,14 +932,6 @@ async def calculate_recovery_score(db, user_id: str, target_date: date) -> Tuple
     
     # Analyze recent activity strain
     # Look at workout history for past 3 days
-    three_days_ago = start_datetime - timedelta(days=3)
-    workout_query = {
-        "user_id": user_id,
-        "completed_at": {"$gte": three_days_ago, "$lt": start_datetime}
-    }
-    workout_cursor = db["workout_history"].find(workout_query)
-    workout_data = await workout_cursor.to_list(length=10)
-    
     if workout_data:
         # Calculate strain based on workout intensity, duration, and recency
         total_strain = 0
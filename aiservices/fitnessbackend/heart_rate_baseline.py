@@ -0,0 +1,240 @@
+"""
+Streaming heart rate baselines
+
+Keeps per-(user, activity_state) running statistics that are updated in O(1)
+per sample, so anomaly checks no longer need to re-read the heart rate history.
+Older samples fade out with an exponential time decay, which plays the role of
+the old 30-day query window.
+"""
+import asyncio
+import math
+import random
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from health_models import HeartRateBaseline
+
+BASELINE_COLLECTION = "heart_rate_baselines"
+
+# A sample's weight halves every HALF_LIFE_DAYS
+HALF_LIFE_DAYS = 10.0
+
+# History window used to seed a baseline that has never been persisted
+SEED_WINDOW_DAYS = 30
+
+# Baselines kept in memory per process (least recently used are dropped)
+MAX_CACHED_BASELINES = 4096
+
+# Conditional writes tried before giving up on a baseline that keeps changing
+MAX_SAVE_ATTEMPTS = 10
+SAVE_RETRY_DELAY_SECONDS = 0.01
+
+
+def _naive_utc(timestamp: datetime) -> datetime:
+    """Compare device timestamps with the naive UTC datetimes Mongo hands back"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def decay_factor(baseline: HeartRateBaseline, timestamp: datetime) -> float:
+    """Weight multiplier for the existing statistics when a sample at `timestamp` arrives"""
+    timestamp = _naive_utc(timestamp)
+    if baseline.last_timestamp is None or timestamp <= baseline.last_timestamp:
+        return 1.0
+    elapsed_days = (timestamp - baseline.last_timestamp).total_seconds() / 86400
+    return math.pow(0.5, elapsed_days / HALF_LIFE_DAYS)
+
+
+def update_baseline(baseline: HeartRateBaseline, bpm: float, timestamp: datetime) -> HeartRateBaseline:
+    """Fold one sample into the baseline (weighted Welford update with time decay)"""
+    timestamp = _naive_utc(timestamp)
+    decay = decay_factor(baseline, timestamp)
+    weight = baseline.weight * decay + 1.0
+    delta = bpm - baseline.mean
+    mean = baseline.mean + delta / weight
+    
+    baseline.m2 = baseline.m2 * decay + delta * (bpm - mean)
+    baseline.mean = mean
+    baseline.weight = weight
+    baseline.count += 1
+    if baseline.last_timestamp is None or timestamp > baseline.last_timestamp:
+        baseline.last_timestamp = timestamp
+    baseline.updated_at = datetime.now()
+    return baseline
+
+
+def baseline_stdev(baseline: HeartRateBaseline) -> Optional[float]:
+    """Sample standard deviation of the baseline, or None with fewer than two samples"""
+    if baseline.count < 2 or baseline.weight <= 1.0:
+        return None
+    return math.sqrt(max(baseline.m2, 0.0) / (baseline.weight - 1.0))
+
+
+class HeartRateBaselineStore:
+    """
+    In-process cache of heart rate baselines backed by the heart_rate_baselines collection.
+    
+    A baseline is read from the database once per process (or seeded from recent
+    history if it was never stored); after that every batch of samples costs one
+    write and no reads. Each write is conditional on the stored ``version``, so
+    when another process saved first the samples are folded into its copy
+    instead of overwriting it.
+    """
+    
+    def __init__(self, max_cached: int = MAX_CACHED_BASELINES):
+        self.max_cached = max_cached
+        self._baselines: "OrderedDict[Tuple[str, str], HeartRateBaseline]" = OrderedDict()
+        self._locks: Dict[Tuple[str, str], List] = {}
+        self._indexed = False
+    
+    async def get(self, db, user_id: str, activity_state: str) -> HeartRateBaseline:
+        """Get the current baseline for a user and activity state"""
+        key = (user_id, activity_state)
+        baseline = self._baselines.get(key)
+        if baseline is None:
+            baseline = await self._load(db, user_id, activity_state)
+            self._remember(baseline)
+        else:
+            self._baselines.move_to_end(key)
+        return baseline
+    
+    async def observe(self, db, heart_rate_metric) -> HeartRateBaseline:
+        """
+        Fold a new heart rate sample into its baseline.
+        
+        Returns a snapshot of the baseline as it was before the sample, which is
+        what the sample should be judged against.
+        """
+        judged = await self._fold(db, heart_rate_metric.user_id, heart_rate_metric.activity_state, [heart_rate_metric])
+        return judged[0][1]
+    
+    async def observe_many(self, db, heart_rate_metrics: Iterable) -> List[Tuple[object, HeartRateBaseline]]:
+        """
+        Fold a batch of samples into their baselines with one write per baseline.
+        
+        Returns (metric, baseline before the metric) pairs in timestamp order.
+        """
+        grouped: Dict[Tuple[str, str], List] = {}
+        for metric in sorted(heart_rate_metrics, key=lambda m: m.timestamp):
+            grouped.setdefault((metric.user_id, metric.activity_state), []).append(metric)
+        results = []
+        for (user_id, activity_state), metrics in grouped.items():
+            results.extend(await self._fold(db, user_id, activity_state, metrics))
+        return sorted(results, key=lambda pair: pair[0].timestamp)
+    
+    def clear(self):
+        """Drop all cached baselines (they are reloaded from the database on next use)"""
+        self._baselines.clear()
+    
+    def _remember(self, baseline: HeartRateBaseline):
+        key = (baseline.user_id, baseline.activity_state)
+        self._baselines[key] = baseline
+        self._baselines.move_to_end(key)
+        while len(self._baselines) > self.max_cached:
+            self._baselines.popitem(last=False)
+    
+    @asynccontextmanager
+    async def _locked(self, key: Tuple[str, str]):
+        """Serialize this process's updates to one baseline; the lock is dropped once unused"""
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+    
+    async def _fold(self, db, user_id: str, activity_state: str, metrics: List) -> List[Tuple[object, HeartRateBaseline]]:
+        """Apply samples to the baseline and save it, retrying on a concurrent save"""
+        async with self._locked((user_id, activity_state)):
+            return await self._fold_and_save(db, user_id, activity_state, metrics)
+    
+    async def _fold_and_save(self, db, user_id: str, activity_state: str,
+                             metrics: List) -> List[Tuple[object, HeartRateBaseline]]:
+        baseline = await self.get(db, user_id, activity_state)
+        for attempt in range(MAX_SAVE_ATTEMPTS):
+            updated = baseline.model_copy()
+            judged = []
+            for metric in metrics:
+                judged.append((metric, updated.model_copy()))
+                update_baseline(updated, metric.bpm, metric.timestamp)
+            result = await db[BASELINE_COLLECTION].update_one(
+                {"user_id": user_id, "activity_state": activity_state, "version": baseline.version},
+                {"$set": updated.model_dump(exclude={"version"}), "$inc": {"version": 1}}
+            )
+            if result.matched_count:
+                updated.version = (baseline.version or 0) + 1
+                self._remember(updated)
+                return judged
+            # Another process saved first; back off and start again from its copy
+            await asyncio.sleep(random.uniform(0, SAVE_RETRY_DELAY_SECONDS * (attempt + 1)))
+            baseline = await self._load(db, user_id, activity_state)
+            self._remember(baseline)
+        raise RuntimeError(f"Heart rate baseline for {user_id}/{activity_state} kept changing; samples not saved")
+    
+    async def _load(self, db, user_id: str, activity_state: str) -> HeartRateBaseline:
+        collection = db[BASELINE_COLLECTION]
+        key = {"user_id": user_id, "activity_state": activity_state}
+        stored = await collection.find_one(key)
+        if stored is None:
+            if not self._indexed:
+                await collection.create_index([("user_id", 1), ("activity_state", 1)], unique=True)
+                self._indexed = True
+            seeded = await self._seed_from_history(db, user_id, activity_state)
+            seeded.version = 1
+            try:
+                # Only the first process to seed stores its copy
+                await collection.update_one(
+                    key, {"$setOnInsert": seeded.model_dump(exclude={"user_id", "activity_state"})}, upsert=True
+                )
+            except DuplicateKeyError:
+                pass
+            stored = await collection.find_one(key)
+        stored.pop("_id", None)
+        return HeartRateBaseline(**stored)
+    
+    async def _seed_from_history(self, db, user_id: str, activity_state: str) -> HeartRateBaseline:
+        """Build a first baseline from existing samples with a single aggregation"""
+        baseline = HeartRateBaseline(user_id=user_id, activity_state=activity_state)
+        since = datetime.now() - timedelta(days=SEED_WINDOW_DAYS)
+        pipeline = [
+            {"$match": {
+                "user_id": user_id,
+                "activity_state": activity_state,
+                # Metrics are stored via jsonable_encoder, so timestamps may be ISO strings
+                "$or": [
+                    {"timestamp": {"$gte": since}},
+                    {"timestamp": {"$gte": since.isoformat()}}
+                ]
+            }},
+            {"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "total": {"$sum": "$bpm"},
+                "total_squares": {"$sum": {"$multiply": ["$bpm", "$bpm"]}},
+                "last_timestamp": {"$max": "$timestamp"}
+            }}
+        ]
+        rows = await db["heart_rate_metrics"].aggregate(pipeline).to_list(length=1)
+        if rows and rows[0]["count"]:
+            row = rows[0]
+            baseline.count = row["count"]
+            baseline.weight = float(row["count"])
+            baseline.mean = row["total"] / row["count"]
+            baseline.m2 = max(row["total_squares"] - row["count"] * baseline.mean ** 2, 0.0)
+            last_timestamp = row["last_timestamp"]
+            if isinstance(last_timestamp, str):
+                last_timestamp = datetime.fromisoformat(last_timestamp)
+            baseline.last_timestamp = _naive_utc(last_timestamp)
+        return baseline
+
+
+# Shared store used by the health routes
+heart_rate_baselines = HeartRateBaselineStore()
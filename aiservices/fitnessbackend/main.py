@@ -48,6 +48,13 @@ app.include_router(fitness_messaging_router)  # New RabbitMQ messaging routes
 @app.on_event("startup")
 async def startup_event():
     """Initialize RabbitMQ client and register handlers on startup."""
+    try:
+        # New deployments store wearable metrics in time-series collections
+        from wearable_ingest import ensure_time_series_collections
+        await ensure_time_series_collections(await get_database())
+    except Exception as e:
+        logger.warning(f"Could not prepare time-series collections: {e}")
+
     try:
         # connect to rabbitmq (diet exchange)
         await rabbitmq_client.connect()
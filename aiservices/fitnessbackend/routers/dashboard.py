@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 from auth import get_current_user
 from models import DashboardData, WeeklyActivitySummary, FitnessStats, Exercise
 from settings import settings
-from utils import get_demo_dashboard_data, get_demo_exercises
+from utils import EXERCISE_CATALOG, get_demo_dashboard_data
 
 router = APIRouter(prefix=f"{settings.API_PREFIX}/dashboard", tags=["dashboard"])
 
@@ -33,20 +33,8 @@ async def get_exercises(
     current_user: dict = Depends(get_current_user)
 ):
     """Get exercises with optional filters"""
-    exercises = get_demo_exercises()
-    
-    # Apply filters
-    if muscle_group:
-        exercises = [e for e in exercises if muscle_group in e.muscle_groups]
-    
-    if difficulty:
-        exercises = [e for e in exercises if e.difficulty.lower() == difficulty.lower()]
-    
-    if equipment:
-        if equipment == "none":
-            exercises = [e for e in exercises if not e.equipment]
-        else:
-            exercises = [e for e in exercises if equipment in e.equipment]
+    # Indexed filters; "none" selects bodyweight exercises
+    exercises = EXERCISE_CATALOG.filter(muscle_group=muscle_group, difficulty=difficulty, equipment=equipment)
     
     if search:
         search = search.lower()
@@ -65,11 +53,9 @@ async def get_exercise(
     current_user: dict = Depends(get_current_user)
 ):
     """Get a specific exercise by ID"""
-    exercises = get_demo_exercises()
-    
-    for exercise in exercises:
-        if exercise.id == exercise_id:
-            return exercise
+    exercise = EXERCISE_CATALOG.get(exercise_id)
+    if exercise:
+        return exercise
     
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from typing import List, Optional
 from datetime import datetime, date, timedelta
+import json
 import uuid
 from fastapi.encoders import jsonable_encoder
 
@@ -22,8 +23,13 @@ from health_service import (
     analyze_heart_rate_anomalies,
     analyze_sleep_quality,
     generate_recovery_advice,
-    calculate_recovery_score
+    calculate_recovery_score,
+    get_daily_health_summary,
+    invalidate_recovery_baselines,
+    recovery_status
 )
+from heart_rate_baseline import heart_rate_baselines
+from wearable_ingest import BulkIngestError, parse_json_lines, parse_columnar, ingest_bulk
 
 router = APIRouter(
     prefix=f"{settings.API_PREFIX}/health",
@@ -47,10 +53,15 @@ async def record_heart_rate(
         raise HTTPException(status_code=403, detail="Cannot record data for another user")
     
     # Insert into database
-    result = await db[COLLECTIONS["heart_rate"]].insert_one(jsonable_encoder(metric))
+    result = await db[COLLECTIONS["heart_rate"]].insert_one(metric.model_dump())
+    
+    # Fold the stored sample into the streaming baseline; it is judged against the baseline before it
+    baseline = await heart_rate_baselines.observe(db, metric)
+    if metric.activity_state == "rest":
+        invalidate_recovery_baselines(metric.user_id, [metric.timestamp.date()])
     
     # Analyze for anomalies
-    await analyze_heart_rate_anomalies(db, metric)
+    await analyze_heart_rate_anomalies(db, metric, baseline)
     
     # Return the recorded metric
     return metric
@@ -88,6 +99,38 @@ async def get_heart_rate_data(
     return heart_rate_data
 
 
+# Bulk ingestion endpoint
+@router.post("/bulk")
+async def ingest_bulk_metrics(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """
+    Record a whole wearable sync in one request
+    
+    Accepts either JSON lines (Content-Type: application/x-ndjson), one sample per
+    line with a "metric" field, or a columnar JSON body of the form
+    {"batches": [{"metric": "heart_rate", "fields": {...}, "columns": {...}}]}.
+    Metric types: heart_rate, steps, sleep, calories.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    
+    try:
+        if "ndjson" in content_type or "jsonl" in content_type:
+            columns = parse_json_lines(body)
+        else:
+            payload = json.loads(body)
+            if not isinstance(payload, dict):
+                raise BulkIngestError("Columnar body must be a JSON object")
+            columns = parse_columnar(payload)
+        
+        return await ingest_bulk(db, columns, current_user["user_id"])
+    except (BulkIngestError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # Step count endpoints
 @router.post("/steps", response_model=StepMetric)
 async def record_steps(
@@ -101,7 +144,7 @@ async def record_steps(
         raise HTTPException(status_code=403, detail="Cannot record data for another user")
     
     # Insert into database
-    result = await db[COLLECTIONS["steps"]].insert_one(jsonable_encoder(metric))
+    result = await db[COLLECTIONS["steps"]].insert_one(metric.model_dump())
     
     # Return the recorded metric
     return metric
@@ -151,7 +194,7 @@ async def record_sleep_data(
         raise HTTPException(status_code=403, detail="Cannot record data for another user")
     
     # Insert into database
-    result = await db[COLLECTIONS["sleep"]].insert_one(jsonable_encoder(metric))
+    result = await db[COLLECTIONS["sleep"]].insert_one(metric.model_dump())
     
     # Analyze sleep quality
     await analyze_sleep_quality(db, metric)
@@ -204,7 +247,7 @@ async def record_calorie_data(
         raise HTTPException(status_code=403, detail="Cannot record data for another user")
     
     # Insert into database
-    result = await db[COLLECTIONS["calories"]].insert_one(jsonable_encoder(metric))
+    result = await db[COLLECTIONS["calories"]].insert_one(metric.model_dump())
     
     # Return the recorded metric
     return metric
@@ -427,18 +470,9 @@ async def get_recovery_score(
     # Calculate recovery score
     score, factors = await calculate_recovery_score(db, current_user["user_id"], date)
     
-    # Determine status based on score
-    status = "needs_recovery"
-    if score >= 80:
-        status = "optimal"
-    elif score >= 60:
-        status = "good"
-    elif score >= 40:
-        status = "moderate"
-    
     return {
         "score": score,
-        "status": status,
+        "status": recovery_status(score),
         "factors": factors,
         "date": date
     }
@@ -456,81 +490,4 @@ async def get_health_summary(
     if not date:
         date = datetime.now().date()
     
-    start_datetime = datetime.combine(date, datetime.min.time())
-    end_datetime = datetime.combine(date, datetime.max.time())
-    
-    # Get step data
-    step_query = {
-        "user_id": current_user["user_id"],
-        "timestamp": {"$gte": start_datetime, "$lte": end_datetime}
-    }
-    step_cursor = db[COLLECTIONS["steps"]].find(step_query)
-    step_data = await step_cursor.to_list(length=100)
-    
-    # Calculate total steps
-    total_steps = sum(metric["count"] for metric in step_data) if step_data else 0
-    
-    # Get sleep data
-    sleep_query = {
-        "user_id": current_user["user_id"],
-        "end_time": {"$gte": start_datetime, "$lte": end_datetime}
-    }
-    sleep_cursor = db[COLLECTIONS["sleep"]].find(sleep_query)
-    sleep_data = await sleep_cursor.to_list(length=1)
-    
-    # Get calorie data
-    calorie_query = {
-        "user_id": current_user["user_id"],
-        "timestamp": {"$gte": start_datetime, "$lte": end_datetime}
-    }
-    calorie_cursor = db[COLLECTIONS["calories"]].find(calorie_query)
-    calorie_data = await calorie_cursor.to_list(length=100)
-    
-    # Calculate total calories
-    total_calories = sum(metric["total"] for metric in calorie_data) if calorie_data else 0
-    
-    # Get heart rate data (average, min, max)
-    heart_rate_query = {
-        "user_id": current_user["user_id"],
-        "timestamp": {"$gte": start_datetime, "$lte": end_datetime}
-    }
-    heart_rate_cursor = db[COLLECTIONS["heart_rate"]].find(heart_rate_query)
-    heart_rate_data = await heart_rate_cursor.to_list(length=1000)
-    
-    # Calculate heart rate statistics
-    if heart_rate_data:
-        avg_heart_rate = sum(hr["bpm"] for hr in heart_rate_data) / len(heart_rate_data)
-        min_heart_rate = min(hr["bpm"] for hr in heart_rate_data)
-        max_heart_rate = max(hr["bpm"] for hr in heart_rate_data)
-    else:
-        avg_heart_rate = None
-        min_heart_rate = None
-        max_heart_rate = None
-    
-    # Get recovery score
-    score_response = await get_recovery_score(date, current_user, db)
-    
-    # Build summary
-    summary = {
-        "date": date,
-        "steps": {
-            "total": total_steps,
-            "goal_progress": min(1.0, total_steps / 10000) if total_steps else 0  # Assuming 10k step goal
-        },
-        "sleep": {
-            "duration_hours": sleep_data[0]["duration_minutes"] / 60 if sleep_data else None,
-            "quality_score": sleep_data[0]["sleep_score"] if sleep_data and "sleep_score" in sleep_data[0] else None,
-            "deep_sleep_hours": sleep_data[0]["deep_sleep_minutes"] / 60 if sleep_data and "deep_sleep_minutes" in sleep_data[0] else None
-        },
-        "calories": {
-            "total": total_calories,
-        },
-        "heart_rate": {
-            "average": round(avg_heart_rate) if avg_heart_rate is not None else None,
-            "min": min_heart_rate,
-            "max": max_heart_rate
-        },
-        "recovery": score_response
-    }
-    
-    return summary
+    return await get_daily_health_summary(db, current_user["user_id"], date)
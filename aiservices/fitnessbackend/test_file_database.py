@@ -0,0 +1,142 @@
+"""
+Tests for the append-only SimpleFileDatabase
+Covers concurrent writers, indexed finds, updates/deletes, compaction,
+crash recovery and import of the old whole-file JSON format
+"""
+import asyncio
+import json
+import os
+import tempfile
+
+from alternative_database import SimpleFileDatabase, COMPACT_MIN_LINES
+
+
+def test_concurrent_writers_lose_nothing():
+    with tempfile.TemporaryDirectory() as data_dir:
+        async def run():
+            db = SimpleFileDatabase(data_dir)
+            await asyncio.gather(*(
+                db.insert_one("workout_plans", {"id": f"plan_{i}", "user_id": f"user_{i % 10}"}) for i in range(500)
+            ))
+            await db.close()
+            reopened = SimpleFileDatabase(data_dir)
+            return await reopened.count_documents("workout_plans"), await reopened.find("workout_plans", {"user_id": "user_3"})
+
+        count, user_plans = asyncio.run(run())
+        assert count == 500
+        assert len(user_plans) == 50 and all(p["user_id"] == "user_3" for p in user_plans)
+
+
+def test_updates_and_deletes_survive_restart():
+    with tempfile.TemporaryDirectory() as data_dir:
+        async def run():
+            db = SimpleFileDatabase(data_dir)
+            await db.insert_one("devices", {"id": "watch", "user_id": "u1", "battery": 80})
+            await db.insert_one("devices", {"id": "ring", "user_id": "u1", "battery": 60})
+            await db.update_one("devices", {"id": "watch"}, {"$set": {"battery": 75}, "$inc": {"syncs": 1}})
+            await db.update_one("devices", {"id": "band"}, {"$set": {"user_id": "u2"}}, upsert=True)
+            await db.delete_one("devices", {"id": "ring"})
+            await db.close()
+            reopened = SimpleFileDatabase(data_dir)
+            return await reopened.find("devices")
+
+        devices = {d["id"]: d for d in asyncio.run(run())}
+        assert set(devices) == {"watch", "band"}
+        assert devices["watch"]["battery"] == 75 and devices["watch"]["syncs"] == 1
+        assert devices["band"]["user_id"] == "u2"
+
+
+def test_compaction_shrinks_log():
+    with tempfile.TemporaryDirectory() as data_dir:
+        async def run():
+            db = SimpleFileDatabase(data_dir)
+            await db.insert_one("sessions", {"id": "s1", "step": 0})
+            for step in range(COMPACT_MIN_LINES * 2):
+                await db.update_one("sessions", {"id": "s1"}, {"$set": {"step": step}})
+            await db.close()
+            with open(os.path.join(data_dir, "sessions.jsonl")) as f:
+                lines = sum(1 for _ in f)
+            return lines, await SimpleFileDatabase(data_dir).find_one("sessions", {"id": "s1"})
+
+        lines, session = asyncio.run(run())
+        assert lines < COMPACT_MIN_LINES
+        assert session["step"] == COMPACT_MIN_LINES * 2 - 1
+
+
+def test_torn_tail_is_dropped_on_recovery():
+    with tempfile.TemporaryDirectory() as data_dir:
+        async def write():
+            db = SimpleFileDatabase(data_dir)
+            for i in range(10):
+                await db.insert_one("heart_rate_metrics", {"id": f"hr_{i}", "bpm": 60 + i})
+            await db.close()
+
+        asyncio.run(write())
+        path = os.path.join(data_dir, "heart_rate_metrics.jsonl")
+        with open(path, "a") as f:
+            f.write('{"op": "put", "rid": 11, "doc": {"id": "hr_')
+
+        async def recover():
+            db = SimpleFileDatabase(data_dir)
+            count = await db.count_documents("heart_rate_metrics")
+            await db.insert_one("heart_rate_metrics", {"id": "hr_after_crash"})
+            await db.close()
+            return count, await SimpleFileDatabase(data_dir).count_documents("heart_rate_metrics")
+
+        assert asyncio.run(recover()) == (10, 11)
+
+
+def test_corrupt_middle_line_keeps_later_records():
+    with tempfile.TemporaryDirectory() as data_dir:
+        async def write():
+            db = SimpleFileDatabase(data_dir)
+            for i in range(10):
+                await db.insert_one("heart_rate_metrics", {"id": f"hr_{i}", "bpm": 60 + i})
+            await db.close()
+
+        asyncio.run(write())
+        path = os.path.join(data_dir, "heart_rate_metrics.jsonl")
+        with open(path) as f:
+            lines = f.readlines()
+        lines[3] = '{"op": "put", "rid": 4, "doc": {"id": "hr_\n'
+        with open(path, "w") as f:
+            f.writelines(lines)
+        size = os.path.getsize(path)
+
+        async def recover():
+            db = SimpleFileDatabase(data_dir)
+            ids = {doc["id"] for doc in await db.find("heart_rate_metrics")}
+            await db.close()
+            return ids
+
+        ids = asyncio.run(recover())
+        assert ids == {f"hr_{i}" for i in range(10) if i != 3}
+        assert os.path.getsize(path) == size
+
+
+def test_legacy_json_is_imported():
+    with tempfile.TemporaryDirectory() as data_dir:
+        with open(os.path.join(data_dir, "fitness_goals.json"), "w") as f:
+            json.dump([{"id": "goal_1", "user_id": "u1"}, {"id": "goal_2", "user_id": "u2"}], f)
+
+        async def run():
+            db = SimpleFileDatabase(data_dir)
+            return await db.find_one("fitness_goals", {"user_id": "u2"})
+
+        assert asyncio.run(run())["id"] == "goal_2"
+
+
+if __name__ == "__main__":
+    print("🗄️ Testing SimpleFileDatabase")
+    test_concurrent_writers_lose_nothing()
+    print("✅ Concurrent writers lose nothing")
+    test_updates_and_deletes_survive_restart()
+    print("✅ Updates and deletes survive a restart")
+    test_compaction_shrinks_log()
+    print("✅ Compaction shrinks the log")
+    test_torn_tail_is_dropped_on_recovery()
+    print("✅ Torn tail dropped on recovery")
+    test_corrupt_middle_line_keeps_later_records()
+    print("✅ Corrupt middle line keeps later records")
+    test_legacy_json_is_imported()
+    print("✅ Legacy JSON collections imported")
@@ -0,0 +1,137 @@
+"""
+Daily Health Summary Test
+Checks the aggregated daily summary and recovery score against hand-computed
+values, and that late-synced resting samples refresh the cached baselines
+"""
+import asyncio
+import sys
+import os
+from datetime import date, datetime, timedelta
+
+# Add current directory to path
+sys.path.append(os.path.dirname(__file__))
+
+from async_mongomock import AsyncDatabase
+from health_service import (
+    _recovery_baseline_cache,
+    calculate_recovery_score,
+    get_daily_health_summary,
+    score_recovery,
+)
+from heart_rate_baseline import heart_rate_baselines
+from wearable_ingest import ingest_bulk, parse_columnar
+
+USER_ID = "user_123"
+DAY = date.today() - timedelta(days=5)
+
+
+def at(days_before: int, hour: int, minute: int = 0) -> datetime:
+    return datetime.combine(DAY - timedelta(days=days_before), datetime.min.time()) + timedelta(hours=hour, minutes=minute)
+
+
+def heart_rate(timestamp, bpm, activity_state="rest"):
+    return {"user_id": USER_ID, "timestamp": timestamp, "bpm": bpm, "activity_state": activity_state,
+            "source": "garmin"}
+
+
+def seeded_database() -> AsyncDatabase:
+    db = AsyncDatabase()
+    db.database.heart_rate_metrics.insert_many([
+        heart_rate(at(10, 6), 60),  # Baseline window
+        heart_rate(at(1, 12), 62),  # Recovery window
+        heart_rate(at(0, 8), 58),
+        heart_rate(at(0, 9), 60),
+        heart_rate(at(0, 18), 120, "active"),
+    ])
+    db.database.step_metrics.insert_many([
+        {"user_id": USER_ID, "timestamp": at(0, 9), "count": 4000},
+        {"user_id": USER_ID, "timestamp": at(0, 17), "count": 1000},
+        {"user_id": USER_ID, "timestamp": at(1, 17), "count": 9000},
+    ])
+    db.database.calorie_metrics.insert_one({"user_id": USER_ID, "timestamp": at(0, 12), "total": 2100})
+    db.database.sleep_metrics.insert_many([
+        {"user_id": USER_ID, "end_time": at(1, 23, 30), "duration_minutes": 480, "sleep_score": 90},
+        {"user_id": USER_ID, "end_time": at(0, 7), "duration_minutes": 420, "deep_sleep_minutes": 84},
+    ])
+    db.database.workout_history.insert_one({"user_id": USER_ID, "completed_at": at(2, 10), "calories_burned": 600})
+    return db
+
+
+def test_daily_summary_and_recovery_score():
+    """Every section of the summary matches the seeded data"""
+    _recovery_baseline_cache.clear()
+    db = seeded_database()
+    summary = asyncio.run(get_daily_health_summary(db, USER_ID, DAY))
+
+    assert summary["steps"] == {"total": 5000, "goal_progress": 0.5}
+    assert summary["calories"] == {"total": 2100}
+    assert summary["sleep"] == {"duration_hours": 7.0, "quality_score": None, "deep_sleep_hours": 1.4}
+    assert summary["heart_rate"] == {"average": 79, "min": 58, "max": 120}
+
+    # Last night 8 h scored 90, resting 62 vs a baseline of 60, 600 kcal workout the day before
+    recovery = summary["recovery"]
+    assert recovery["factors"] == {"sleep": 96.0, "resting_heart_rate": 75, "heart_rate_variability": 70,
+                                   "activity_strain": 85, "muscle_fatigue": 70}
+    assert recovery["score"] == 83 and recovery["status"] == "optimal"
+    assert asyncio.run(calculate_recovery_score(db, USER_ID, DAY)) == (83, recovery["factors"])
+
+
+def test_score_recovery():
+    """Scores from pre-aggregated inputs, including the no-data defaults"""
+    start = at(1, 0)
+    assert score_recovery(None, None, None, [], start) == (70, {
+        "sleep": 70, "resting_heart_rate": 70, "heart_rate_variability": 70,
+        "activity_strain": 70, "muscle_fatigue": 70})
+
+    # A short night estimated from deep sleep, a raised resting rate and heavy recent training
+    score, factors = score_recovery(
+        {"duration_minutes": 330, "deep_sleep_minutes": 30}, 68, 60,
+        [{"calories_burned": 1500, "completed_at": start - timedelta(hours=5)},
+         {"calories_burned": 1000, "completed_at": start - timedelta(days=1, hours=5)}],
+        start
+    )
+    assert factors["sleep"] == 60 * 0.6 + 45 * 0.4
+    assert factors["resting_heart_rate"] == 40
+    assert factors["activity_strain"] == 30  # 15 + 10 * 0.8 = 23 strain points
+    assert score == round(54 * 0.35 + 40 * 0.25 + 70 * 0.15 + 30 * 0.15 + 70 * 0.10)
+
+    # No baseline yet: the resting rate cannot be judged
+    assert score_recovery(None, 80, None, [], start)[1]["resting_heart_rate"] == 70
+
+
+def test_late_samples_refresh_cached_baselines():
+    """A bulk sync that backfills resting samples changes the recovery score of the days it affects"""
+    _recovery_baseline_cache.clear()
+    heart_rate_baselines.clear()
+    db = seeded_database()
+    assert asyncio.run(get_daily_health_summary(db, USER_ID, DAY))["recovery"]["score"] == 83
+    unrelated = (USER_ID, DAY - timedelta(days=30))
+    _recovery_baseline_cache[unrelated] = 50.0
+
+    late = at(8, 3)
+    columns = parse_columnar({"batches": [{
+        "metric": "heart_rate",
+        "fields": {"source": "garmin", "activity_state": "rest"},
+        "columns": {"timestamp": [(late + timedelta(minutes=i)).isoformat() for i in range(3)], "bpm": [40, 40, 40]}
+    }]})
+    try:
+        asyncio.run(ingest_bulk(db, columns, USER_ID))
+    finally:
+        heart_rate_baselines.clear()
+
+    # Baseline (60 + 3 * 40) / 4 = 45, so resting 62 is now very elevated
+    recovery = asyncio.run(get_daily_health_summary(db, USER_ID, DAY))["recovery"]
+    assert recovery["factors"]["resting_heart_rate"] == 25
+    assert recovery["score"] == 70
+    assert _recovery_baseline_cache[unrelated] == 50.0
+
+
+if __name__ == "__main__":
+    print("🩺 TESTING DAILY HEALTH SUMMARY")
+    print("=" * 60)
+    test_daily_summary_and_recovery_score()
+    print("✅ Daily summary and recovery score")
+    test_score_recovery()
+    print("✅ Recovery scoring")
+    test_late_samples_refresh_cached_baselines()
+    print("✅ Late samples refresh cached baselines")
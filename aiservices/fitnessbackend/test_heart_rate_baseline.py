@@ -0,0 +1,128 @@
+"""
+Streaming Heart Rate Baseline Test
+Checks the O(1) running statistics against a full recomputation
+"""
+import asyncio
+import random
+import statistics
+import sys
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add current directory to path
+sys.path.append(os.path.dirname(__file__))
+
+import mongomock
+
+from async_mongomock import AsyncDatabase
+from health_models import HeartRateBaseline
+from heart_rate_baseline import update_baseline, baseline_stdev, HALF_LIFE_DAYS, HeartRateBaselineStore
+
+
+def sample(bpm, user_id="user_123", activity_state="rest"):
+    return SimpleNamespace(user_id=user_id, activity_state=activity_state, bpm=bpm,
+                           timestamp=datetime(2025, 1, 1, 8, 0))
+
+
+def test_matches_full_recomputation_without_decay():
+    """Samples with the same timestamp carry equal weight, so the result equals statistics.mean/stdev"""
+    random.seed(7)
+    samples = [random.randint(55, 95) for _ in range(500)]
+    now = datetime(2025, 1, 1, 8, 0)
+    
+    baseline = HeartRateBaseline(user_id="user_123", activity_state="rest")
+    for bpm in samples:
+        update_baseline(baseline, bpm, now)
+    
+    assert baseline.count == len(samples)
+    assert abs(baseline.mean - statistics.mean(samples)) < 1e-9
+    assert abs(baseline_stdev(baseline) - statistics.stdev(samples)) < 1e-9
+
+
+def test_old_samples_fade_out():
+    """After a long gap the baseline follows the recent readings"""
+    start = datetime(2025, 1, 1)
+    baseline = HeartRateBaseline(user_id="user_123", activity_state="rest")
+    for i in range(200):
+        update_baseline(baseline, 80, start + timedelta(minutes=i))
+    
+    later = start + timedelta(days=HALF_LIFE_DAYS * 6)
+    for i in range(50):
+        update_baseline(baseline, 60, later + timedelta(minutes=i))
+    
+    assert baseline.count == 250
+    assert baseline.mean < 62
+
+
+def test_out_of_order_samples_are_not_decayed():
+    """A late sample must not decay the statistics or move last_timestamp backwards"""
+    now = datetime(2025, 1, 1, 12, 0)
+    baseline = HeartRateBaseline(user_id="user_123", activity_state="active")
+    update_baseline(baseline, 100, now)
+    update_baseline(baseline, 110, now - timedelta(hours=3))
+    
+    assert baseline.last_timestamp == now
+    assert baseline.weight == 2.0
+    assert baseline.mean == 105
+
+
+def test_processes_never_overwrite_each_other():
+    """Two processes saving the same baseline keep every sample, and a first load seeds it once"""
+    random.seed(11)
+    samples = [random.randint(55, 95) for _ in range(60)]
+    database = mongomock.MongoClient().db
+    database.heart_rate_metrics.insert_many([
+        {"user_id": "user_123", "activity_state": "rest", "bpm": 70, "timestamp": datetime.now() - timedelta(hours=1)}
+    ])
+    db = AsyncDatabase(database)
+    processes = [HeartRateBaselineStore(), HeartRateBaselineStore()]
+    
+    async def run():
+        # Both processes miss the cache and seed from history at the same time
+        await asyncio.gather(*(store.get(db, "user_123", "rest") for store in processes))
+        await asyncio.gather(*(
+            processes[i % 2].observe(db, sample(bpm)) if i % 3 else processes[i % 2].observe_many(db, [sample(bpm)])
+            for i, bpm in enumerate(samples)
+        ))
+    
+    asyncio.run(run())
+    stored = list(database.heart_rate_baselines.find())
+    assert len(stored) == 1
+    # The seeded sample is an hour older; with a 10-day half-life it barely decays
+    everything = [70] + samples
+    assert stored[0]["count"] == len(everything)
+    assert stored[0]["version"] == 1 + len(samples)
+    assert abs(stored[0]["mean"] - statistics.mean(everything)) < 0.01
+
+
+def test_cache_is_bounded():
+    """The least recently used baselines are dropped from the process cache"""
+    db = AsyncDatabase(mongomock.MongoClient().db)
+    store = HeartRateBaselineStore(max_cached=2)
+    
+    async def run():
+        await store.observe(db, sample(60, user_id="a"))
+        await store.observe(db, sample(61, user_id="b"))
+        await store.get(db, "a", "rest")
+        await store.observe(db, sample(62, user_id="c"))
+        return await store.get(db, "b", "rest")
+    
+    reloaded = asyncio.run(run())
+    assert list(store._baselines) == [("c", "rest"), ("b", "rest")]
+    assert reloaded.count == 1 and reloaded.mean == 61
+
+
+if __name__ == "__main__":
+    print("💓 TESTING STREAMING HEART RATE BASELINE")
+    print("=" * 60)
+    test_matches_full_recomputation_without_decay()
+    print("✅ Running stats match full recomputation")
+    test_old_samples_fade_out()
+    print("✅ Old samples fade out with time decay")
+    test_out_of_order_samples_are_not_decayed()
+    print("✅ Out-of-order samples handled")
+    test_processes_never_overwrite_each_other()
+    print("✅ Concurrent processes keep every sample")
+    test_cache_is_bounded()
+    print("✅ Baseline cache is bounded")
@@ -0,0 +1,175 @@
+"""
+Bulk Wearable Ingestion Test
+Checks parsing and column validation for JSON lines and columnar sync bodies
+"""
+import asyncio
+import json
+import sys
+import os
+from datetime import datetime
+
+# Add current directory to path
+sys.path.append(os.path.dirname(__file__))
+
+from async_mongomock import AsyncDatabase
+from heart_rate_baseline import heart_rate_baselines
+from wearable_ingest import BulkIngestError, parse_json_lines, parse_columnar, validate_columns, ingest_bulk
+
+
+def test_json_lines_become_columns():
+    """Samples of different metrics and with different optional fields end up in aligned columns"""
+    lines = [
+        {"metric": "heart_rate", "timestamp": "2025-01-01T08:00:00Z", "source": "garmin", "bpm": 61, "activity_state": "rest"},
+        {"metric": "steps", "timestamp": "2025-01-01T08:00:00", "source": "garmin", "count": 120},
+        {"metric": "heart_rate", "timestamp": 1735718460, "source": "garmin", "bpm": 64, "activity_state": "rest", "confidence": 0.9},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines).encode()
+    
+    columns = parse_json_lines(body)
+    
+    assert set(columns) == {"heart_rate", "steps"}
+    assert columns["heart_rate"]["bpm"] == [61, 64]
+    assert columns["heart_rate"]["confidence"] == [None, 0.9]
+    
+    documents, rejected = validate_columns("heart_rate", columns["heart_rate"], "user_123")
+    assert rejected == []
+    assert [doc["timestamp"] for doc in documents] == [datetime(2025, 1, 1, 8, 0), datetime(2025, 1, 1, 8, 1)]
+    assert all(doc["user_id"] == "user_123" for doc in documents)
+    assert "confidence" not in documents[0]
+
+
+def test_columnar_rejects_only_bad_rows():
+    """Invalid values, missing required values and foreign user ids reject single rows"""
+    payload = {
+        "batches": [{
+            "metric": "heart_rate",
+            "fields": {"source": "fitbit", "activity_state": "active"},
+            "columns": {
+                "timestamp": ["2025-01-01T10:00:00", "2025-01-01T10:00:05", "not a date", "2025-01-01T10:00:15"],
+                "bpm": [120, None, 118, 119],
+                "user_id": [None, None, None, "someone_else"],
+            }
+        }]
+    }
+    
+    columns = parse_columnar(payload)
+    documents, rejected = validate_columns("heart_rate", columns["heart_rate"], "user_123")
+    
+    assert len(documents) == 1
+    assert documents[0]["bpm"] == 120
+    assert documents[0]["activity_state"] == "active"
+    assert [row["index"] for row in rejected] == [1, 2, 3]
+
+
+def test_missing_required_column_rejects_batch():
+    """A metric without a required column cannot be stored at all"""
+    columns = {"timestamp": ["2025-01-01T10:00:00"], "source": ["garmin"]}
+    documents, rejected = validate_columns("steps", columns, "user_123")
+    
+    assert documents == []
+    assert rejected[0]["error"] == "Missing required field: count"
+
+
+def test_malformed_columnar_bodies_are_rejected():
+    """Batches that are not objects or columns that are not lists are a 400, not a 500"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from auth import get_current_user
+    from database import get_database
+    from routers.health import router
+    
+    malformed = [
+        {"batches": ["heart_rate"]},
+        {"batches": [{"metric": "heart_rate", "columns": ["bpm"]}]},
+        {"batches": [{"metric": "heart_rate", "columns": {"timestamp": "2025-01-01T10:00:00", "bpm": 120}}]},
+        {"batches": [{"metric": "heart_rate", "fields": ["garmin"], "columns": {"bpm": [120]}}]},
+    ]
+    for payload in malformed:
+        try:
+            parse_columnar(payload)
+            raise AssertionError(payload)
+        except BulkIngestError:
+            pass
+    
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "user_123"}
+    app.dependency_overrides[get_database] = lambda: AsyncDatabase()
+    client = TestClient(app)
+    bulk_path = next(route.path for route in router.routes if route.path.endswith("/bulk"))
+    for payload in malformed:
+        response = client.post(bulk_path, json=payload)
+        assert response.status_code == 400, (payload, response.status_code)
+
+
+def test_baselines_follow_stored_samples_only():
+    """A failed insert leaves the heart rate baselines untouched"""
+    class FailingInserts(AsyncDatabase):
+        def __getitem__(self, name):
+            collection = super().__getitem__(name)
+            if name == "heart_rate_metrics":
+                async def insert_many(*args, **kwargs):
+                    raise ConnectionError("primary stepped down")
+                collection.insert_many = insert_many
+            return collection
+    
+    columns = parse_columnar({"batches": [{
+        "metric": "heart_rate",
+        "fields": {"source": "garmin", "activity_state": "rest"},
+        "columns": {"timestamp": ["2025-01-01T10:00:00", "2025-01-01T10:00:05"], "bpm": [61, 63]}
+    }]})
+    heart_rate_baselines.clear()
+    try:
+        db = FailingInserts()
+        try:
+            asyncio.run(ingest_bulk(db, columns, "user_123"))
+            raise AssertionError("insert failure was swallowed")
+        except ConnectionError:
+            pass
+        assert db.database.heart_rate_baselines.count_documents({"count": {"$gt": 0}}) == 0
+        
+        db = AsyncDatabase()
+        result = asyncio.run(ingest_bulk(db, columns, "user_123"))
+        assert result["accepted"] == {"heart_rate": 2}
+        assert db.database.heart_rate_baselines.find_one({"user_id": "user_123"})["count"] == 2
+    finally:
+        heart_rate_baselines.clear()
+
+
+def test_write_errors_point_at_the_submitted_rows():
+    """A duplicate after a row dropped by validation is reported at its own position"""
+    db = AsyncDatabase()
+    db.database.heart_rate_metrics.create_index([("user_id", 1), ("timestamp", 1)], unique=True)
+    db.database.heart_rate_metrics.insert_one(
+        {"user_id": "user_123", "timestamp": datetime(2025, 1, 1, 10, 0, 10), "bpm": 70})
+    columns = parse_columnar({"batches": [{
+        "metric": "heart_rate",
+        "fields": {"source": "garmin", "activity_state": "rest"},
+        "columns": {"timestamp": ["2025-01-01T10:00:00", "2025-01-01T10:00:05", "2025-01-01T10:00:10",
+                                  "2025-01-01T10:00:15"],
+                    "bpm": [61, "fast", 63, 64]}
+    }]})
+    heart_rate_baselines.clear()
+    try:
+        result = asyncio.run(ingest_bulk(db, columns, "user_123"))
+    finally:
+        heart_rate_baselines.clear()
+    assert result["accepted"] == {"heart_rate": 2}
+    assert sorted(row["index"] for row in result["rejected"]) == [1, 2]
+
+
+if __name__ == "__main__":
+    print("⌚ TESTING BULK WEARABLE INGESTION")
+    print("=" * 60)
+    test_json_lines_become_columns()
+    print("✅ JSON lines parsed into aligned columns")
+    test_columnar_rejects_only_bad_rows()
+    print("✅ Bad rows rejected individually")
+    test_missing_required_column_rejects_batch()
+    print("✅ Missing required column rejected")
+    test_malformed_columnar_bodies_are_rejected()
+    print("✅ Malformed columnar bodies rejected with 400")
+    test_baselines_follow_stored_samples_only()
+    print("✅ Baselines updated only after the insert succeeds")
+    test_write_errors_point_at_the_submitted_rows()
+    print("✅ Write errors point at the submitted rows")
@@ -0,0 +1,76 @@
+"""
+Tests for the indexed exercise catalog and memoized workout plan generator
+Plans must match the previous generator exactly (apart from id and created_at),
+and catalog filters must match the linear scans they replaced
+"""
+from models import WorkoutPlanRequest
+from utils import EXERCISE_CATALOG, available_equipment, generate_workout_plan, get_demo_exercises
+
+from benchmark_workout_plans import GOALS, LEVELS, legacy_generate_workout_plan
+
+
+def plan_fields(plan):
+    return plan.model_dump(exclude={"id", "created_at"})
+
+
+def test_plans_match_previous_generator():
+    for goal in GOALS + ["Strength", "unknown_goal"]:
+        for level in LEVELS + ["expert"]:
+            for weeks in (1, 4, 9):
+                for frequency in range(0, 6):
+                    request = WorkoutPlanRequest(goal=goal, fitness_level=level, duration_weeks=weeks,
+                                                 frequency=frequency, preferences={"focusAreas": ["Core"]})
+                    expected = legacy_generate_workout_plan(request, "user_1")
+                    # Twice: once building the cache, once served from it
+                    for _ in range(2):
+                        assert plan_fields(generate_workout_plan(request, "user_1")) == plan_fields(expected), \
+                            (goal, level, weeks, frequency)
+
+
+def test_cached_plans_get_fresh_identity():
+    request = WorkoutPlanRequest(goal="endurance", duration_weeks=6, frequency=4)
+    first = generate_workout_plan(request, "user_1")
+    second = generate_workout_plan(request, "user_2")
+    assert first.id != second.id and second.user_id == "user_2"
+    assert len(second.workouts) == 6 * 4
+
+
+def test_catalog_filters_match_linear_scan():
+    exercises = get_demo_exercises()
+    muscle_groups = {m for ex in exercises for m in ex.muscle_groups} | {"Unknown"}
+    equipment = {e for ex in exercises for e in ex.equipment} | {"none"}
+    for muscle_group in muscle_groups:
+        expected = [ex for ex in exercises if muscle_group in ex.muscle_groups]
+        assert EXERCISE_CATALOG.filter(muscle_group=muscle_group) == expected
+    for name in equipment:
+        expected = [ex for ex in exercises if (not ex.equipment if name == "none" else name in ex.equipment)]
+        assert EXERCISE_CATALOG.filter(equipment=name) == expected
+    assert EXERCISE_CATALOG.filter(difficulty="BEGINNER", muscle_group="Core") == [
+        ex for ex in exercises if ex.difficulty == "Beginner" and "Core" in ex.muscle_groups
+    ]
+    assert EXERCISE_CATALOG.get("ex4").name == "Deadlift" and EXERCISE_CATALOG.get("missing") is None
+
+
+def test_available_equipment_limits_exercises():
+    assert available_equipment({}) is None
+    assert available_equipment({"availableEquipment": ["gym"]}) is None
+
+    for owned in (["none"], ["dumbbells"], ["barbell", "bench"]):
+        usable = available_equipment({"availableEquipment": owned})
+        request = WorkoutPlanRequest(goal="general_fitness", duration_weeks=1, frequency=4,
+                                     preferences={"availableEquipment": owned})
+        plan = generate_workout_plan(request, "user_1")
+        used = [ex.exercise for workout in plan.workouts for ex in workout.exercises]
+        assert used and all(set(exercise.equipment) <= usable for exercise in used), owned
+
+
+if __name__ == "__main__":
+    print("🏋️ Testing exercise catalog and plan generation")
+    test_plans_match_previous_generator()
+    print("✅ Plans match the previous generator")
+    test_cached_plans_get_fresh_identity()
+    print("✅ Cached plans get a fresh id per request")
+    test_catalog_filters_match_linear_scan()
+    print("✅ Catalog filters match linear scans")
+    test_available_equipment_limits_exercises()
+    print("✅ Available equipment limits plan exercises")
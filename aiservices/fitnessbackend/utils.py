@@ -1,6 +1,8 @@
 import uuid
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
 import random
 
 from models import (
@@ -27,8 +29,8 @@ def get_demo_user_profile() -> UserProfile:
     )
 
 
-def get_demo_exercises() -> List[Exercise]:
-    """Get a list of demo exercises"""
+def _build_demo_exercises() -> List[Exercise]:
+    """Build the demo exercise library (called once, see EXERCISE_CATALOG)"""
     return [
         Exercise(
             id="ex1",
@@ -245,6 +247,105 @@ def get_demo_exercises() -> List[Exercise]:
     ]
 
 
+BODYWEIGHT = "none"
+DEFAULT_HOLD_SECONDS = 30
+COMPOUND_MIN_MUSCLE_GROUPS = 3
+
+# Equipment names used by the planner form, mapped to catalog equipment
+EQUIPMENT_ALIASES = {
+    "none": (),
+    "dumbbells": ("Dumbbells", "Dumbbell"),
+    "barbell": ("Barbell", "Weight Plates", "Squat Rack"),
+    "kettlebell": ("Kettlebell",),
+    "resistance_bands": ("Resistance Bands",),
+    "pull_up_bar": ("Pull-Up Bar",),
+    "bench": ("Bench",),
+}
+
+
+class ExerciseVolume(NamedTuple):
+    """Recommended volume for an exercise, parsed once"""
+    sets: int
+    reps: Optional[int]
+    duration: Optional[int]  # seconds, for timed exercises without reps
+
+    @classmethod
+    def from_exercise(cls, exercise: Exercise) -> "ExerciseVolume":
+        if exercise.recommended_reps:
+            return cls(exercise.recommended_sets, exercise.recommended_reps, None)
+        return cls(exercise.recommended_sets, None, DEFAULT_HOLD_SECONDS)
+
+
+def _index(exercises: Iterable[Exercise], keys: Callable[[Exercise], Iterable[str]]) -> Mapping[str, FrozenSet[str]]:
+    index: Dict[str, set] = {}
+    for exercise in exercises:
+        for key in keys(exercise):
+            index.setdefault(key, set()).add(exercise.id)
+    return MappingProxyType({key: frozenset(ids) for key, ids in index.items()})
+
+
+class ExerciseCatalog:
+    """
+    Read-only exercise library, indexed by muscle group, equipment, difficulty and type.
+    Indexes map a key to a frozenset of exercise ids, so filters combine with set
+    operations; select() returns exercises in catalog order.
+    """
+
+    def __init__(self, exercises: Iterable[Exercise]):
+        self.exercises: Tuple[Exercise, ...] = tuple(exercises)
+        self.all_ids = frozenset(ex.id for ex in self.exercises)
+        self._by_id = MappingProxyType({ex.id: ex for ex in self.exercises})
+        self._order = MappingProxyType({ex.id: position for position, ex in enumerate(self.exercises)})
+        self.by_muscle_group = _index(self.exercises, lambda ex: ex.muscle_groups)
+        self.by_equipment = _index(self.exercises, lambda ex: ex.equipment or [BODYWEIGHT])
+        self.by_difficulty = _index(self.exercises, lambda ex: [ex.difficulty.lower()])
+        self.by_type = _index(self.exercises, lambda ex: [ex.type])
+        self.compound_ids = frozenset(
+            ex.id for ex in self.exercises if len(ex.muscle_groups) >= COMPOUND_MIN_MUSCLE_GROUPS
+        )
+        self.volume = MappingProxyType({ex.id: ExerciseVolume.from_exercise(ex) for ex in self.exercises})
+
+    def get(self, exercise_id: str) -> Optional[Exercise]:
+        return self._by_id.get(exercise_id)
+
+    def select(self, ids: Iterable[str]) -> List[Exercise]:
+        """Exercises for the given ids, in catalog order"""
+        return [self._by_id[exercise_id] for exercise_id in sorted(ids, key=self._order.__getitem__)]
+
+    def ids_for(self, index: Mapping[str, FrozenSet[str]], keys: Iterable[str]) -> FrozenSet[str]:
+        """Ids matching any of the keys in one index"""
+        return frozenset().union(*(index.get(key, frozenset()) for key in keys))
+
+    def usable_with(self, equipment: FrozenSet[str]) -> FrozenSet[str]:
+        """Ids of exercises that need nothing beyond the available equipment"""
+        missing = [name for name in self.by_equipment if name != BODYWEIGHT and name not in equipment]
+        return self.all_ids - self.ids_for(self.by_equipment, missing)
+
+    def filter(
+        self,
+        muscle_group: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        equipment: Optional[str] = None
+    ) -> List[Exercise]:
+        """Filter as the exercise endpoints do: exact muscle group and equipment, any-case difficulty"""
+        ids = self.all_ids
+        if muscle_group:
+            ids &= self.by_muscle_group.get(muscle_group, frozenset())
+        if difficulty:
+            ids &= self.by_difficulty.get(difficulty.lower(), frozenset())
+        if equipment:
+            ids &= self.by_equipment.get(equipment, frozenset())
+        return self.select(ids)
+
+
+EXERCISE_CATALOG = ExerciseCatalog(_build_demo_exercises())
+
+
+def get_demo_exercises() -> List[Exercise]:
+    """Get a list of demo exercises"""
+    return list(EXERCISE_CATALOG.exercises)
+
+
 def get_demo_workouts(exercise_list: Optional[List[Exercise]] = None) -> List[Workout]:
     """Get a list of demo workouts"""
     if exercise_list is None:
@@ -352,150 +453,159 @@ def get_demo_workout_plan(user_id: str) -> WorkoutPlan:
     )
 
 
+BASE_CACHE_SIZE = 128
+WEEK_CACHE_SIZE = 4096
+BASE_WORKOUTS = 4  # upper body, lower body, rest day, core (see get_demo_workouts)
+MIN_PLAN_EXERCISES = 10
+
+LEVEL_DIFFICULTIES = {
+    "beginner": ("beginner", "intermediate"),
+    "advanced": ("intermediate", "advanced"),
+}
+
+
+def available_equipment(preferences: Dict[str, Any]) -> Optional[FrozenSet[str]]:
+    """Catalog equipment names from the planner's availableEquipment, or None for no restriction"""
+    requested = preferences.get("availableEquipment") or []
+    if not requested or "gym" in requested:
+        return None
+    equipment = set()
+    for name in requested:
+        equipment.update(EQUIPMENT_ALIASES.get(name, (name,)))
+    return frozenset(equipment)
+
+
+def _select_plan_exercises(goal: str, fitness_level: str, equipment: Optional[FrozenSet[str]]) -> List[Exercise]:
+    catalog = EXERCISE_CATALOG
+    ids = catalog.all_ids
+    if fitness_level in LEVEL_DIFFICULTIES:
+        ids = catalog.ids_for(catalog.by_difficulty, LEVEL_DIFFICULTIES[fitness_level])
+    if equipment is not None:
+        ids &= catalog.usable_with(equipment)
+
+    cardio = ids & catalog.ids_for(catalog.by_type, ("Cardio", "HIIT"))
+    strength = ids & catalog.by_type.get("Strength", frozenset())
+    bodyweight = ids & catalog.by_type.get("Bodyweight", frozenset())
+
+    if goal in ("weight_loss", "fat_loss"):
+        # Cardio first, plus a few strength exercises for muscle retention
+        selected = catalog.select(cardio) + catalog.select(strength)[:3]
+    elif goal in ("muscle_gain", "strength"):
+        # Compound lifts first, then the remaining strength exercises
+        compound = catalog.select(strength & catalog.compound_ids)[:5]
+        selected = compound + catalog.select(strength - {ex.id for ex in compound})[:5]
+    elif goal == "endurance":
+        selected = catalog.select(cardio) + catalog.select(bodyweight)
+    elif goal == "flexibility":
+        # No stretching exercises in the demo library yet, so use bodyweight work
+        selected = catalog.select(bodyweight)
+    else:
+        selected = catalog.select(ids)
+
+    # Top up from the level-filtered exercises
+    if len(selected) < MIN_PLAN_EXERCISES:
+        chosen = {ex.id for ex in selected}
+        selected += catalog.select(ids - chosen)[:MIN_PLAN_EXERCISES - len(selected)]
+    return selected
+
+
+def _progress_sets_reps(volume: ExerciseVolume, goal: str, week: int, progression_factor: float) -> str:
+    sets = volume.sets
+    if volume.reps is None:
+        # Duration-based exercise, capped at 60 seconds
+        return f"{sets}×{min(int(volume.duration * progression_factor), 60)}s"
+    if goal in ("endurance", "weight_loss"):
+        # Higher reps for endurance/weight loss
+        reps = min(int(volume.reps * progression_factor), 30)
+    elif goal in ("muscle_gain", "strength"):
+        # Keep reps lower for strength but add a set every 2 weeks, up to 5
+        reps = min(int(volume.reps * 0.9 * progression_factor), 12)
+        sets = min(sets + (week // 2), 5)
+    else:
+        reps = min(int(volume.reps * progression_factor), 20)
+    return f"{sets}×{reps}"
+
+
+@lru_cache(maxsize=BASE_CACHE_SIZE)
+def _base_workouts(goal: str, fitness_level: str, equipment: Optional[FrozenSet[str]]) -> Tuple[Workout, ...]:
+    return tuple(get_demo_workouts(_select_plan_exercises(goal, fitness_level, equipment)))
+
+
+@lru_cache(maxsize=WEEK_CACHE_SIZE)
+def _week_workouts(
+    goal: str,
+    fitness_level: str,
+    equipment: Optional[FrozenSet[str]],
+    frequency: int,
+    week: int
+) -> Tuple[Workout, ...]:
+    """
+    Progressed workouts for one week of a plan. Memoized, so the returned
+    workouts are shared between plans and must not be modified.
+    """
+    progression_factor = min(1.0 + (week - 1) * 0.1, 1.5)  # Progressive increase up to 50%
+    workouts = []
+    for base_workout in _base_workouts(goal, fitness_level, equipment)[:frequency]:
+        exercises = [
+            WorkoutExercise(
+                exercise=workout_ex.exercise,
+                sets_reps=_progress_sets_reps(
+                    EXERCISE_CATALOG.volume[workout_ex.exercise.id], goal, week, progression_factor
+                ),
+                duration=workout_ex.duration
+            )
+            for workout_ex in base_workout.exercises
+        ]
+        workouts.append(Workout(
+            id=f"{base_workout.id}-w{week}",
+            name=f"{base_workout.name} - Week {week}",
+            focus=base_workout.focus,
+            total_duration=base_workout.total_duration,
+            total_calories=int(base_workout.total_calories * progression_factor),
+            rest_day=base_workout.rest_day,
+            exercises=exercises,
+            instructions=f"Week {week}: {base_workout.instructions} As you progress, focus on maintaining proper form while increasing intensity."
+        ))
+    return tuple(workouts)
+
+
+def clear_plan_cache():
+    """Drop memoized plan workouts (e.g. after the exercise library changes)"""
+    _base_workouts.cache_clear()
+    _week_workouts.cache_clear()
+
+
 def generate_workout_plan(plan_request: WorkoutPlanRequest, user_id: str) -> WorkoutPlan:
     """Generate a workout plan based on user preferences"""
-    exercises = get_demo_exercises()
-    
-    # Filter exercises by difficulty
+    # Weeks are memoized per (goal, level, equipment, days), so plans of any length share them
+    key = (
+        plan_request.goal.lower(),
+        plan_request.fitness_level,
+        available_equipment(plan_request.preferences),
+        max(0, min(plan_request.frequency, BASE_WORKOUTS))
+    )
+    workouts = [
+        workout
+        for week in range(1, plan_request.duration_weeks + 1)
+        for workout in _week_workouts(*key, week)
+    ]
     difficulty_mapping = {
         "beginner": "Beginner",
         "intermediate": "Intermediate",
         "advanced": "Advanced"
     }
-    
-    target_difficulty = difficulty_mapping.get(plan_request.fitness_level, "Intermediate")
-    
-    # Adjust difficulty based on user level
-    if plan_request.fitness_level == "beginner":
-        filtered_exercises = [ex for ex in exercises if ex.difficulty in ["Beginner", "Intermediate"]]
-    elif plan_request.fitness_level == "advanced":
-        filtered_exercises = [ex for ex in exercises if ex.difficulty in ["Intermediate", "Advanced"]]
-    else:
-        filtered_exercises = exercises
-    
-    # Adjust workouts based on specific fitness goal
-    goal_focused_exercises = []
-    if plan_request.goal.lower() == "weight_loss" or plan_request.goal.lower() == "fat_loss":
-        # For weight loss, focus on cardio and full-body exercises with higher rep ranges
-        goal_focused_exercises = [ex for ex in filtered_exercises if ex.type in ["Cardio", "HIIT"]]
-        # Add some strength exercises for muscle retention
-        strength_exercises = [ex for ex in filtered_exercises if ex.type == "Strength"][:3]
-        goal_focused_exercises.extend(strength_exercises)
-        
-    elif plan_request.goal.lower() == "muscle_gain" or plan_request.goal.lower() == "strength":
-        # For muscle gain, focus on strength exercises with progressive overload
-        goal_focused_exercises = [ex for ex in filtered_exercises if ex.type == "Strength"]
-        # Add some compound exercises
-        compound_exercises = [ex for ex in goal_focused_exercises 
-                             if len(ex.muscle_groups) > 2][:5]
-        goal_focused_exercises = compound_exercises + [ex for ex in goal_focused_exercises 
-                                                      if ex not in compound_exercises][:5]
-        
-    elif plan_request.goal.lower() == "endurance":
-        # For endurance, focus on higher rep ranges and cardio
-        goal_focused_exercises = [ex for ex in filtered_exercises if ex.type in ["Cardio", "HIIT"]]
-        # Include bodyweight exercises for muscular endurance
-        bodyweight_exercises = [ex for ex in filtered_exercises if ex.type == "Bodyweight"]
-        goal_focused_exercises.extend(bodyweight_exercises)
-        
-    elif plan_request.goal.lower() == "flexibility":
-        # For flexibility, include stretching exercises
-        # Note: In a real implementation, you'd have stretching exercises in the database
-        # For demo, we'll use a mix of bodyweight exercises
-        goal_focused_exercises = [ex for ex in filtered_exercises if ex.type == "Bodyweight"]
-        
-    else:
-        # Default to a balanced approach
-        goal_focused_exercises = filtered_exercises
-    
-    # If we don't have enough exercises after filtering, add some from the filtered list
-    if len(goal_focused_exercises) < 10:
-        remaining_needed = 10 - len(goal_focused_exercises)
-        additional_exercises = [ex for ex in filtered_exercises if ex not in goal_focused_exercises][:remaining_needed]
-        goal_focused_exercises.extend(additional_exercises)
-    
-    # Create progression plan - adjust workout intensity based on weeks
-    progression_workouts = []
-    
-    # Generate base workouts
-    workouts = get_demo_workouts(goal_focused_exercises)
-    
-    # Implement progression logic based on fitness level and duration
-    for week in range(1, plan_request.duration_weeks + 1):
-        week_workouts = []
-        progression_factor = min(1.0 + (week - 1) * 0.1, 1.5)  # Progressive increase up to 50%
-        
-        # Create weekly workout rotation based on frequency
-        for day in range(plan_request.frequency):
-            if day < len(workouts):
-                base_workout = workouts[day]
-                
-                # Create a progressively more intense version of the workout
-                progressed_exercises = []
-                for workout_ex in base_workout.exercises:
-                    # Parse the sets and reps
-                    parts = workout_ex.sets_reps.split("×")
-                    if len(parts) == 2:
-                        sets = int(parts[0])
-                        if parts[1].endswith("s"):  # Duration-based exercise
-                            duration_secs = int(parts[1][:-1])
-                            new_duration = min(int(duration_secs * progression_factor), 60)  # Cap at 60 seconds
-                            progressed_sets_reps = f"{sets}×{new_duration}s"
-                        else:  # Rep-based exercise
-                            reps = int(parts[1])
-                            # Adjust reps based on goal and progression
-                            if plan_request.goal.lower() in ["endurance", "weight_loss"]:
-                                # Higher reps for endurance/weight loss
-                                new_reps = min(int(reps * progression_factor), 30)  # Cap at 30 reps
-                            elif plan_request.goal.lower() in ["muscle_gain", "strength"]:
-                                # Keep reps lower for strength but increase sets
-                                new_reps = min(int(reps * 0.9 * progression_factor), 12)  # Cap at 12 reps
-                                sets = min(sets + (week // 2), 5)  # Increase sets every 2 weeks, cap at 5
-                            else:
-                                new_reps = min(int(reps * progression_factor), 20)  # Default cap at 20
-                            
-                            progressed_sets_reps = f"{sets}×{new_reps}"
-                    else:
-                        progressed_sets_reps = workout_ex.sets_reps
-                    
-                    progressed_exercises.append(
-                        WorkoutExercise(
-                            exercise=workout_ex.exercise,
-                            sets_reps=progressed_sets_reps,
-                            duration=workout_ex.duration
-                        )
-                    )
-                
-                # Create the progressed workout
-                week_workout = Workout(
-                    id=f"{base_workout.id}-w{week}",
-                    name=f"{base_workout.name} - Week {week}",
-                    focus=base_workout.focus,
-                    total_duration=base_workout.total_duration,
-                    total_calories=int(base_workout.total_calories * progression_factor),
-                    rest_day=base_workout.rest_day,
-                    exercises=progressed_exercises,
-                    instructions=f"Week {week}: {base_workout.instructions} As you progress, focus on maintaining proper form while increasing intensity."
-                )
-                week_workouts.append(week_workout)
-        
-        progression_workouts.extend(week_workouts)
-    
-    # Create the workout plan
-    plan_id = str(uuid.uuid4())
-    plan_name = f"Custom {plan_request.goal.replace('_', ' ').title()} Plan"
-    
+
     return WorkoutPlan(
-        id=plan_id,
+        id=str(uuid.uuid4()),
         user_id=user_id,
-        name=plan_name,
+        name=f"Custom {plan_request.goal.replace('_', ' ').title()} Plan",
         description=f"A personalized {plan_request.duration_weeks}-week {plan_request.goal.replace('_', ' ')} program tailored for {plan_request.fitness_level} level with progressive intensity",
         goal=plan_request.goal,
-        difficulty=target_difficulty,
+        difficulty=difficulty_mapping.get(plan_request.fitness_level, "Intermediate"),
         duration_weeks=plan_request.duration_weeks,
         workouts_per_week=plan_request.frequency,
         focus_areas=plan_request.preferences.get("focusAreas", ["Upper Body", "Lower Body", "Core"]),
-        workouts=progression_workouts,
+        workouts=workouts,
         created_at=datetime.now()
     )
 
@@ -0,0 +1,315 @@
+"""
+Bulk wearable ingestion
+
+Parses a whole wearable sync (JSON lines or columnar JSON) into per-metric
+columns, validates each column in one pass, writes every metric type with a
+single unordered insert_many and runs insight detection once for the batch.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import BulkWriteError
+
+from database import COLLECTIONS
+from health_models import HeartRateMetric, StepMetric, SleepMetric, CalorieMetric
+from health_service import build_heart_rate_anomaly_insight, analyze_sleep_quality, invalidate_recovery_baselines
+from heart_rate_baseline import heart_rate_baselines
+
+# Metric types accepted by the bulk endpoint
+METRIC_MODELS = {
+    "heart_rate": HeartRateMetric,
+    "steps": StepMetric,
+    "sleep": SleepMetric,
+    "calories": CalorieMetric,
+}
+
+# Bucket granularity for the time-series collections
+TIME_SERIES_GRANULARITY = {
+    "heart_rate": "seconds",
+    "steps": "minutes",
+    "sleep": "hours",
+    "calories": "minutes",
+}
+
+MAX_BULK_SAMPLES = 50000
+
+# Rejected rows echoed back to the client
+MAX_REPORTED_ERRORS = 100
+
+
+class BulkIngestError(ValueError):
+    """Raised when a bulk body cannot be parsed at all"""
+
+
+def _parse_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, (int, float)):
+        # Epoch seconds, as most wearable SDKs export them
+        parsed = datetime.fromtimestamp(value, tz=timezone.utc)
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _parse_int(value) -> int:
+    if isinstance(value, bool):
+        raise ValueError("boolean is not an integer")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value} is not an integer")
+    return int(value)
+
+
+def _parse_float(value) -> float:
+    if isinstance(value, bool):
+        raise ValueError("boolean is not a number")
+    return float(value)
+
+
+def _parse_str(value) -> str:
+    if not isinstance(value, str):
+        raise ValueError("expected a string")
+    return value
+
+
+_CONVERTERS: Dict[Any, Callable[[Any], Any]] = {
+    datetime: _parse_datetime,
+    int: _parse_int,
+    float: _parse_float,
+    str: _parse_str,
+}
+
+
+def _field_specs(model) -> List[Tuple[str, Callable[[Any], Any], bool]]:
+    """(name, converter, required) for every field of a metric model"""
+    specs = []
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        # Optional[X] -> X
+        args = [arg for arg in getattr(annotation, "__args__", ()) if arg is not type(None)]
+        base = args[0] if args else annotation
+        specs.append((name, _CONVERTERS[base], field.is_required()))
+    return specs
+
+
+FIELD_SPECS = {metric: _field_specs(model) for metric, model in METRIC_MODELS.items()}
+
+
+def parse_json_lines(body: bytes) -> Dict[str, Dict[str, list]]:
+    """
+    Parse a JSON lines body into per-metric columns.
+
+    Each line is one sample: {"metric": "heart_rate", "timestamp": ..., "bpm": 72, ...}
+    """
+    columns: Dict[str, Dict[str, list]] = {}
+    counts: Dict[str, int] = {}
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            sample = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BulkIngestError(f"Line {line_number} is not valid JSON: {e}")
+        if not isinstance(sample, dict):
+            raise BulkIngestError(f"Line {line_number} is not a JSON object")
+
+        metric = sample.pop("metric", None)
+        if metric not in METRIC_MODELS:
+            raise BulkIngestError(f"Line {line_number} has unknown metric type: {metric}")
+
+        metric_columns = columns.setdefault(metric, {})
+        index = counts.get(metric, 0)
+        for key, value in sample.items():
+            # Fill the gap for fields that earlier samples did not have
+            metric_columns.setdefault(key, [None] * index).append(value)
+        counts[metric] = index + 1
+        for values in metric_columns.values():
+            if len(values) < index + 1:
+                values.append(None)
+    return columns
+
+
+def parse_columnar(payload: Dict[str, Any]) -> Dict[str, Dict[str, list]]:
+    """
+    Parse a columnar JSON body into per-metric columns.
+
+    {"batches": [{"metric": "heart_rate",
+                  "fields": {"source": "garmin", "activity_state": "rest"},
+                  "columns": {"timestamp": [...], "bpm": [...]}}]}
+
+    "fields" holds values shared by every sample of the batch.
+    """
+    batches = payload.get("batches")
+    if not isinstance(batches, list):
+        raise BulkIngestError("Columnar body must contain a 'batches' list")
+
+    columns: Dict[str, Dict[str, list]] = {}
+    for position, batch in enumerate(batches):
+        if not isinstance(batch, dict):
+            raise BulkIngestError(f"Batch {position} is not a JSON object")
+        metric = batch.get("metric")
+        if metric not in METRIC_MODELS:
+            raise BulkIngestError(f"Batch {position} has unknown metric type: {metric}")
+
+        batch_columns = batch.get("columns") or {}
+        if not isinstance(batch_columns, dict):
+            raise BulkIngestError(f"Batch {position} 'columns' must be an object of lists")
+        for key, values in batch_columns.items():
+            if not isinstance(values, list):
+                raise BulkIngestError(f"Batch {position} column '{key}' is not a list")
+        lengths = {len(values) for values in batch_columns.values()}
+        if len(lengths) > 1:
+            raise BulkIngestError(f"Batch {position} has columns of different lengths")
+        size = lengths.pop() if lengths else 0
+
+        shared = batch.get("fields") or {}
+        if not isinstance(shared, dict):
+            raise BulkIngestError(f"Batch {position} 'fields' must be an object")
+        metric_columns = columns.setdefault(metric, {})
+        existing = len(next(iter(metric_columns.values()), []))
+        keys = set(metric_columns) | set(batch_columns) | set(shared)
+        for key in keys:
+            values = metric_columns.setdefault(key, [None] * existing)
+            if key in batch_columns:
+                values.extend(batch_columns[key])
+            else:
+                values.extend([shared.get(key)] * size)
+    return columns
+
+
+def validate_columns(metric: str, columns: Dict[str, list], user_id: str) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Validate one metric's columns field by field.
+
+    Returns (documents, rejected rows). Rows belonging to another user or with a
+    missing/invalid field are rejected individually; the rest of the batch is kept.
+    """
+    size = len(next(iter(columns.values()), []))
+    # The authenticated user owns every sample; an explicit user_id must agree
+    user_ids = columns.get("user_id") or [None] * size
+    errors: Dict[int, str] = {
+        index: "Cannot record data for another user"
+        for index, value in enumerate(user_ids) if value not in (None, user_id)
+    }
+    columns = {**columns, "user_id": [user_id] * size}
+
+    converted: Dict[str, list] = {}
+    for name, convert, required in FIELD_SPECS[metric]:
+        values = columns.get(name)
+        if values is None:
+            if required:
+                return [], [{"metric": metric, "index": None, "error": f"Missing required field: {name}"}]
+            continue
+
+        out = []
+        for index, value in enumerate(values):
+            if value is None:
+                if required and index not in errors:
+                    errors[index] = f"Missing required field: {name}"
+                out.append(None)
+                continue
+            try:
+                out.append(convert(value))
+            except (TypeError, ValueError, OverflowError) as e:
+                if index not in errors:
+                    errors[index] = f"Invalid {name}: {e}"
+                out.append(None)
+        converted[name] = out
+
+    names = list(converted)
+    documents = [
+        {name: value for name, value in zip(names, row) if value is not None}
+        for index, row in enumerate(zip(*converted.values()))
+        if index not in errors
+    ]
+    rejected = [{"metric": metric, "index": index, "error": error} for index, error in sorted(errors.items())]
+    return documents, rejected
+
+
+async def ensure_time_series_collections(db):
+    """Create the wearable metric collections as time-series collections if they do not exist yet"""
+    existing = set(await db.list_collection_names())
+    for metric, granularity in TIME_SERIES_GRANULARITY.items():
+        name = COLLECTIONS[metric]
+        if name in existing:
+            continue
+        await db.create_collection(
+            name,
+            timeseries={"timeField": "timestamp", "metaField": "user_id", "granularity": granularity}
+        )
+
+
+async def ingest_bulk(db, columns: Dict[str, Dict[str, list]], user_id: str) -> Dict[str, Any]:
+    """Validate, store and analyze a parsed bulk sync"""
+    total = sum(len(next(iter(metric_columns.values()), [])) for metric_columns in columns.values())
+    if total > MAX_BULK_SAMPLES:
+        raise BulkIngestError(f"At most {MAX_BULK_SAMPLES} samples can be sent per request")
+
+    accepted: Dict[str, int] = {}
+    rejected: List[Dict] = []
+    insights = []
+    sleep_analyzed = False
+
+    for metric, metric_columns in columns.items():
+        documents, metric_rejected = validate_columns(metric, metric_columns, user_id)
+        rejected.extend(metric_rejected)
+        if not documents:
+            continue
+
+        model = METRIC_MODELS[metric]
+        metrics = [model.model_construct(**document) for document in documents]
+        # Write errors index the validated documents; report them by the row the client sent
+        invalid_rows = {row["index"] for row in metric_rejected}
+        rows = [index for index in range(len(next(iter(metric_columns.values())))) if index not in invalid_rows]
+
+        failed = set()
+        try:
+            result = await db[COLLECTIONS[metric]].insert_many(documents, ordered=False)
+            accepted[metric] = len(result.inserted_ids)
+        except BulkWriteError as e:
+            accepted[metric] = e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                failed.add(write_error.get("index"))
+                rejected.append({"metric": metric, "index": rows[write_error["index"]], "error": write_error.get("errmsg")})
+
+        if metric == "heart_rate":
+            # Only stored samples are folded into the baselines, each judged against the baseline before it
+            stored = [sample for index, sample in enumerate(metrics) if index not in failed]
+            insights = _batch_heart_rate_insights(await heart_rate_baselines.observe_many(db, stored))
+            invalidate_recovery_baselines(
+                user_id, (sample.timestamp.date() for sample in stored if sample.activity_state == "rest")
+            )
+        elif metric == "sleep":
+            # Only the most recent night is worth analysing after a sync
+            await analyze_sleep_quality(db, max(metrics, key=lambda m: m.end_time))
+            sleep_analyzed = True
+
+    if insights:
+        await db[COLLECTIONS["insights"]].insert_many([jsonable_encoder(insight) for insight in insights])
+
+    return {
+        "accepted": accepted,
+        "accepted_count": sum(accepted.values()),
+        "rejected_count": len(rejected),
+        "rejected": rejected[:MAX_REPORTED_ERRORS],
+        "heart_rate_insights": [insight.id for insight in insights],
+        "sleep_analyzed": sleep_analyzed,
+    }
+
+
+def _batch_heart_rate_insights(judged) -> List:
+    """One heart rate insight per (activity state, anomaly type): the most extreme sample of the batch"""
+    strongest: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+    for metric, baseline in judged:
+        insight = build_heart_rate_anomaly_insight(metric, baseline)
+        if not insight:
+            continue
+        key = (metric.activity_state, insight.type)
+        distance = abs(metric.bpm - baseline.mean)
+        if key not in strongest or distance > strongest[key][0]:
+            strongest[key] = (distance, insight)
+    return [insight for _, insight in strongest.values()]
@@ -10,6 +10,14 @@ import asyncio
 from datetime import datetime, timezone
 
 from settings import settings
+from conversation_memory import ConversationMemoryStore, ConversationTurn, make_llm_summarizer
+from llm_gateway import (
+    LLMGateway,
+    fallback_wellness_tip,
+    keyword_mood_advice,
+    mood_cache_key,
+    seconds_until_next_day,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +49,7 @@ class MentalHealthAdvice(BaseModel):
     breathing_exercise: Optional[str] = None
 
 class MentalHealthAgentChain:
-    def __init__(self):
+    def __init__(self, memory_collection=None):
         self.llm = ChatOpenAI(
             model_name=settings.MODEL_NAME,
             temperature=0.7,  # Slightly higher for empathetic responses
@@ -49,8 +57,14 @@ class MentalHealthAgentChain:
             openai_api_key=settings.OPENAI_API_KEY
         )
         
-        # Initialize conversation history for context
-        self.conversation_history = []
+        # Cached, de-duplicated and concurrency-limited access to the model
+        self.gateway = LLMGateway(self.llm)
+        
+        # Per-user conversation memory for context, persisted when a collection is given
+        self.memory = ConversationMemoryStore(
+            summarizer=make_llm_summarizer(self.llm),
+            collection=memory_collection
+        )
         
         # Mental health specific prompts
         self.mood_analysis_prompt = ChatPromptTemplate.from_messages([
@@ -118,8 +132,8 @@ class MentalHealthAgentChain:
                 "timestamp": mood_entry.timestamp.isoformat()
             }
             
-            # Format conversation history for context
-            history_context = self._format_conversation_history()
+            # Format this user's conversation history for context
+            history_context = await self.memory.render(mood_entry.user_id)
             
             mood_data = f"""
             Current Mood Analysis Request:
@@ -131,18 +145,25 @@ class MentalHealthAgentChain:
             Please analyze this mood data and provide appropriate mental health guidance.
             """
             
-            response = await self.llm.ainvoke(
-                self.mood_analysis_prompt.format(mood_data=mood_data)
+            # Near-duplicate check-ins from this user share advice
+            cache_key = mood_cache_key(mood_entry, mood_context["user_profile"])
+            
+            content = await self.gateway.invoke(
+                self.mood_analysis_prompt.format(mood_data=mood_data),
+                cache_key=cache_key,
+                fallback=lambda: json.dumps(keyword_mood_advice(
+                    mood_entry.mood_score, mood_entry.stress_level, mood_entry.energy_level, mood_entry.notes
+                ))
             )
             
             # Parse response
             try:
-                advice_data = json.loads(response.content)
+                advice_data = json.loads(content)
                 advice = MentalHealthAdvice(**advice_data)
             except json.JSONDecodeError:
                 # Fallback if JSON parsing fails
                 advice = MentalHealthAdvice(
-                    recommendation=response.content,
+                    recommendation=content,
                     reasoning="AI analysis of current mood state",
                     intervention_type="daily_practice",
                     resources=["Consider speaking with a mental health professional"],
@@ -150,11 +171,11 @@ class MentalHealthAgentChain:
                 )
             
             # Update conversation history
-            self.conversation_history.append({
-                "timestamp": mood_entry.timestamp.isoformat(),
-                "mood_score": mood_entry.mood_score,
-                "advice": advice.recommendation
-            })
+            await self.memory.append(mood_entry.user_id, ConversationTurn(
+                timestamp=mood_entry.timestamp.isoformat(),
+                mood_score=mood_entry.mood_score,
+                advice=advice.recommendation
+            ))
             
             return advice
             
@@ -248,32 +269,29 @@ class MentalHealthAgentChain:
             "SAMHSA National Helpline: 1-800-662-4357"
         ]
 
-    def _format_conversation_history(self) -> str:
-        """Format recent conversation history for context"""
-        if not self.conversation_history:
-            return "No previous conversation history."
-        
-        # Get last 3 entries for context
-        recent_history = self.conversation_history[-3:]
-        formatted = []
-        
-        for entry in recent_history:
-            formatted.append(f"- {entry['timestamp']}: Mood {entry['mood_score']}/10 - {entry['advice'][:100]}...")
-        
-        return "\n".join(formatted)
-
     async def get_daily_wellness_tip(self) -> str:
-        """Generate daily mental wellness tip"""
+        """Generate daily mental wellness tip, shared by all users until UTC midnight"""
         tips_prompt = """Generate a brief, encouraging mental wellness tip for today. 
         Include a practical action the user can take to improve their mental well-being.
         Keep it positive, actionable, and under 100 words."""
         
+        today = datetime.now(timezone.utc).date()
         try:
-            response = await self.llm.ainvoke([HumanMessage(content=tips_prompt)])
-            return response.content
+            return await self.gateway.invoke(
+                [HumanMessage(content=tips_prompt)],
+                cache_key=f"wellness_tip:{today.isoformat()}",
+                fallback=lambda: fallback_wellness_tip(today),
+                ttl_seconds=seconds_until_next_day()
+            )
         except Exception as e:
             logger.error(f"Error generating wellness tip: {str(e)}")
-            return "Take a moment today to practice gratitude. Write down three things you're thankful for, no matter how small. This simple practice can help shift your mindset and improve your overall mood."
+            return fallback_wellness_tip(today)
+
+    async def precompute_daily_wellness_tips(self):
+        """Generate each day's tip right after midnight so requests never wait on the model"""
+        while True:
+            await self.get_daily_wellness_tip()
+            await asyncio.sleep(seconds_until_next_day() + 1)
 
 # Initialize the chain
 mental_health_chain = MentalHealthAgentChain()
\ No newline at end of file
@@ -0,0 +1,179 @@
+from pydantic import BaseModel, Field
+from typing import Awaitable, Callable, Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime, timezone
+import asyncio
+import logging
+import statistics
+
+logger = logging.getLogger(__name__)
+
+# Tokens of recent turns kept verbatim in a prompt
+MEMORY_WINDOW_TOKENS = 400
+# Tokens for the digest of everything older than the window
+MEMORY_DIGEST_TOKENS = 150
+# Sessions kept in memory; idle or least recently used ones are dropped first
+MEMORY_MAX_SESSIONS = 5000
+MEMORY_IDLE_SECONDS = 3600
+
+Summarizer = Callable[[str, List["ConversationTurn"]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+class ConversationTurn(BaseModel):
+    timestamp: str
+    mood_score: int
+    advice: str
+
+    def render(self) -> str:
+        return f"- {self.timestamp}: Mood {self.mood_score}/10 - {self.advice[:100]}..."
+
+
+class ConversationSession(BaseModel):
+    user_id: str
+    digest: str = ""
+    turns: List[ConversationTurn] = []
+    total_turns: int = 0
+    last_active: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+async def keyword_digest(previous_digest: str, turns: List[ConversationTurn]) -> str:
+    """Deterministic digest used when no LLM summarizer is available or it fails"""
+    scores = [turn.mood_score for turn in turns]
+    summary = (
+        f"{len(turns)} earlier check-ins from {turns[0].timestamp[:10]} to {turns[-1].timestamp[:10]}: "
+        f"mood avg {statistics.mean(scores):.1f}/10 (range {min(scores)}-{max(scores)})."
+    )
+    digest = f"{previous_digest} {summary}".strip()
+    # Keep the most recent part when the digest outgrows its budget
+    max_chars = MEMORY_DIGEST_TOKENS * 4
+    return digest if len(digest) <= max_chars else "..." + digest[-(max_chars - 3):]
+
+
+def make_llm_summarizer(llm) -> Summarizer:
+    """Summarizer that asks the chat model to fold old turns into the digest"""
+    async def summarize(previous_digest: str, turns: List[ConversationTurn]) -> str:
+        prompt = (
+            "Condense this mental health check-in history into a short factual digest "
+            f"(under {MEMORY_DIGEST_TOKENS * 3 // 4} words) covering mood trends and advice already given.\n\n"
+            f"Existing digest: {previous_digest or 'none'}\n\n"
+            "Older check-ins:\n" + "\n".join(turn.render() for turn in turns)
+        )
+        try:
+            response = await llm.ainvoke(prompt)
+            return response.content
+        except Exception as e:
+            logger.error(f"Error summarizing conversation history: {str(e)}")
+            return await keyword_digest(previous_digest, turns)
+    return summarize
+
+
+class ConversationMemoryStore:
+    """
+    Per-user conversation memory with a token-budgeted sliding window
+
+    Recent turns are kept verbatim up to MEMORY_WINDOW_TOKENS; when the window
+    overflows, its older half is folded into a digest capped at
+    MEMORY_DIGEST_TOKENS. Sessions live in an LRU dict and are optionally
+    written through to a Mongo collection so they survive restarts.
+    """
+
+    def __init__(self, summarizer: Optional[Summarizer] = None, collection=None,
+                 window_tokens: int = MEMORY_WINDOW_TOKENS, digest_tokens: int = MEMORY_DIGEST_TOKENS,
+                 max_sessions: int = MEMORY_MAX_SESSIONS, idle_seconds: float = MEMORY_IDLE_SECONDS):
+        self.summarizer = summarizer or keyword_digest
+        self.collection = collection
+        self.window_tokens = window_tokens
+        self.digest_tokens = digest_tokens
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get_session(self, user_id: str) -> ConversationSession:
+        session = self.sessions.get(user_id)
+        if session is None:
+            session = await self._load(user_id) or ConversationSession(user_id=user_id)
+            self.sessions[user_id] = session
+        self.sessions.move_to_end(user_id)
+        session.last_active = datetime.now(timezone.utc)
+        self._evict()
+        return session
+
+    async def render(self, user_id: str) -> str:
+        """History context for a prompt; bounded by window_tokens + digest_tokens"""
+        session = await self.get_session(user_id)
+        if not session.digest and not session.turns:
+            return "No previous conversation history."
+        lines = []
+        if session.digest:
+            lines.append(f"Summary of earlier check-ins: {session.digest}")
+        lines.extend(turn.render() for turn in session.turns)
+        return "\n".join(lines)
+
+    async def append(self, user_id: str, turn: ConversationTurn):
+        """Record a turn, summarizing older turns once the window is over budget"""
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            session = await self.get_session(user_id)
+            session.turns.append(turn)
+            session.total_turns += 1
+            if self._window_tokens(session) > self.window_tokens:
+                await self._summarize(session)
+            await self._save(session)
+
+    def _window_tokens(self, session: ConversationSession) -> int:
+        return sum(estimate_tokens(turn.render()) for turn in session.turns)
+
+    async def _summarize(self, session: ConversationSession):
+        # Fold the older half so summarization runs once per several turns, not every turn
+        keep = len(session.turns) // 2
+        older, session.turns = session.turns[:len(session.turns) - keep], session.turns[len(session.turns) - keep:]
+        digest = await self.summarizer(session.digest, older)
+        session.digest = truncate_to_tokens(digest, self.digest_tokens)
+        while session.turns and self._window_tokens(session) > self.window_tokens:
+            # A single oversized turn: drop it rather than exceed the budget
+            session.turns.pop(0)
+
+    def _evict(self):
+        now = datetime.now(timezone.utc)
+        while self.sessions:
+            user_id, oldest = next(iter(self.sessions.items()))
+            idle = (now - oldest.last_active).total_seconds() > self.idle_seconds
+            if not idle and len(self.sessions) <= self.max_sessions:
+                break
+            del self.sessions[user_id]
+            lock = self._locks.get(user_id)
+            if lock is not None and not lock.locked():
+                del self._locks[user_id]
+
+    async def _load(self, user_id: str) -> Optional[ConversationSession]:
+        if self.collection is None:
+            return None
+        try:
+            document = await self.collection.find_one({"user_id": user_id}, {"_id": 0})
+            return ConversationSession(**document) if document else None
+        except Exception as e:
+            logger.error(f"Error loading conversation memory: {str(e)}")
+            return None
+
+    async def _save(self, session: ConversationSession):
+        if self.collection is None:
+            return
+        try:
+            await self.collection.update_one(
+                {"user_id": session.user_id},
+                {"$set": session.model_dump()},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error saving conversation memory: {str(e)}")
@@ -0,0 +1,278 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = 8
+LLM_TIMEOUT_SECONDS = 20.0
+LLM_CACHE_SIZE = 2048
+LLM_CACHE_TTL_SECONDS = 6 * 3600
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Exact-match form of a prompt: lowercased with whitespace collapsed"""
+    return " ".join(prompt.lower().split())
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    Near-duplicate form of free text: case and punctuation are ignored, so
+    "Tired, stressed" and "tired... STRESSED!" match. Word order is kept, as it
+    carries meaning ("not tired, just stressed" vs "not stressed, just tired")
+    """
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def make_key(*parts: Any) -> str:
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def mood_cache_key(mood_entry, user_profile: Optional[Dict[str, Any]]) -> str:
+    """
+    Semantic key for mood advice
+
+    Check-ins from one user with the same scores, emotions, note wording and
+    profile share advice. The conversation history is left out: every check-in
+    appends to it, so a key over it would never match for a returning user.
+    Reuse is bounded by the cache TTL instead. Timestamps only vary the exact
+    prompt.
+    """
+    return json.dumps([
+        "mood",
+        mood_entry.user_id,
+        mood_entry.mood_score,
+        mood_entry.stress_level,
+        mood_entry.energy_level,
+        sorted(normalize_text(emotion) for emotion in mood_entry.emotions),
+        normalize_text(mood_entry.notes),
+        user_profile,
+    ], sort_keys=True, default=str)
+
+
+def seconds_until_next_day(now: Optional[datetime] = None) -> float:
+    now = now or datetime.now(timezone.utc)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return (tomorrow - now).total_seconds()
+
+
+class LLMGateway:
+    """
+    Single entry point for chat model calls
+
+    - results are cached under the normalized prompt (exact) and under an
+      optional caller-supplied semantic key (near-duplicate)
+    - identical prompts in flight share one call
+    - a semaphore caps concurrent calls and each call has a timeout; on
+      timeout or error the caller's deterministic fallback is returned and
+      not cached
+    """
+
+    def __init__(self, llm, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+                 cache_size: int = LLM_CACHE_SIZE, cache_ttl_seconds: float = LLM_CACHE_TTL_SECONDS):
+        self.llm = llm
+        self.timeout_seconds = timeout_seconds
+        self.cache_size = cache_size
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"exact_hits": 0, "near_hits": 0, "coalesced": 0, "misses": 0, "timeouts": 0, "errors": 0, "fallbacks": 0}
+        self.latency_counts = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+
+    async def invoke(self, prompt: Any, cache_key: Optional[str] = None,
+                     fallback: Optional[Callable[[], str]] = None, ttl_seconds: Optional[float] = None) -> str:
+        """
+        Return the model's text for a prompt, from cache when possible
+
+        Args:
+            prompt: Anything the chat model's ainvoke accepts
+            cache_key: Semantic key; prompts that differ only in irrelevant detail share it
+            fallback: Produces a deterministic answer when the model times out or fails
+            ttl_seconds: Cache lifetime for this result (defaults to LLM_CACHE_TTL_SECONDS)
+        """
+        exact_key = make_key("prompt", normalize_prompt(str(prompt)))
+        near_key = make_key("semantic", cache_key) if cache_key else None
+
+        cached = self._get(exact_key)
+        if cached is not None:
+            self.stats["exact_hits"] += 1
+            return cached
+        if near_key:
+            cached = self._get(near_key)
+            if cached is not None:
+                self.stats["near_hits"] += 1
+                return cached
+
+        flight_key = near_key or exact_key
+        inflight = self._inflight.get(flight_key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            result, _ = await asyncio.shield(inflight)
+            return result
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight_key] = future
+        try:
+            result, from_model = await self._call(prompt, fallback)
+            if from_model:
+                ttl = ttl_seconds if ttl_seconds is not None else self.cache_ttl_seconds
+                self._put(exact_key, result, ttl)
+                if near_key:
+                    self._put(near_key, result, ttl)
+            future.set_result((result, from_model))
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[flight_key]
+
+    async def _call(self, prompt: Any, fallback: Optional[Callable[[], str]]) -> Tuple[str, bool]:
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(self.llm.ainvoke(prompt), self.timeout_seconds)
+                self._observe_latency(time.perf_counter() - started)
+                return response.content, True
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                logger.warning(f"LLM call timed out after {self.timeout_seconds}s")
+                if fallback is None:
+                    raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"LLM call failed: {str(e)}")
+                if fallback is None:
+                    raise
+        self.stats["fallbacks"] += 1
+        return fallback(), False
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[1]
+
+    def _put(self, key: str, value: str, ttl_seconds: float):
+        self._cache[key] = (time.monotonic() + ttl_seconds, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _observe_latency(self, seconds: float):
+        self.latency_sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_counts[i] += 1
+                break
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["exact_hits"] + self.stats["near_hits"] + self.stats["coalesced"]
+        lookups = hits + self.stats["misses"]
+        calls = sum(self.latency_counts)
+        return {
+            **self.stats,
+            "cache_size": len(self._cache),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "latency_seconds": {
+                "count": calls,
+                "sum": round(self.latency_sum, 4),
+                "mean": round(self.latency_sum / calls, 4) if calls else None,
+                # Cumulative counts per upper bound, Prometheus style
+                "buckets": {
+                    ("+Inf" if bound == float("inf") else str(bound)): sum(self.latency_counts[:i + 1])
+                    for i, bound in enumerate(LATENCY_BUCKETS)
+                },
+            },
+        }
+
+
+# Deterministic fallbacks used when the model is slow or unavailable
+
+WELLNESS_TIPS: List[str] = [
+    "Take a moment today to practice gratitude. Write down three things you're thankful for, no matter how small. This simple practice can help shift your mindset and improve your overall mood.",
+    "Step outside for a ten-minute walk today. Daylight and gentle movement lift mood and ease stress, even on busy days.",
+    "Try box breathing when you feel tense: breathe in for 4 counts, hold for 4, out for 4, hold for 4. Repeat four times.",
+    "Reach out to someone you care about today, even with a short message. Connection is one of the strongest buffers against stress.",
+    "Set a gentle screen curfew tonight: put devices away 30 minutes before bed and let your mind wind down.",
+    "Notice one thing you did well today and acknowledge it. Small moments of self-recognition build resilience.",
+    "Drink a glass of water and stretch for two minutes. Caring for your body is a quick way to reset your mind.",
+]
+
+CRISIS_KEYWORDS = [
+    "suicide", "kill myself", "end it all", "can't go on", "worthless",
+    "hopeless", "self-harm", "hurt myself", "want to die", "no point"
+]
+
+
+def fallback_wellness_tip(day: date) -> str:
+    """Same tip for everyone on a given day"""
+    return WELLNESS_TIPS[day.toordinal() % len(WELLNESS_TIPS)]
+
+
+def keyword_mood_advice(mood_score: int, stress_level: int, energy_level: int, notes: Optional[str] = None) -> Dict[str, Any]:
+    """Rule-based advice in the MentalHealthAdvice shape"""
+    text = (notes or "").lower()
+    if any(keyword in text for keyword in CRISIS_KEYWORDS):
+        return {
+            "recommendation": "It sounds like you're going through something very painful. Please reach out right now to a crisis line or someone you trust - you don't have to face this alone.",
+            "reasoning": "Crisis language detected in your notes",
+            "intervention_type": "immediate",
+            "resources": ["National Suicide Prevention Lifeline: 988", "Crisis Text Line: Text HOME to 741741", "Emergency Services: 911"],
+            "crisis_level": 5,
+        }
+    if stress_level >= 7:
+        return {
+            "recommendation": "Your stress is high right now. Pause for a few minutes of slow breathing and pick one small task to focus on.",
+            "reasoning": f"Stress level {stress_level}/10",
+            "intervention_type": "immediate",
+            "resources": ["Consider speaking with a mental health professional"],
+            "crisis_level": 2 if mood_score <= 3 else 1,
+            "breathing_exercise": "Breathe in for 4 counts, hold for 4, and breathe out for 6. Repeat for two minutes.",
+        }
+    if mood_score <= 3:
+        return {
+            "recommendation": "It seems like a difficult day. Be gentle with yourself, get some rest and consider talking to someone you trust.",
+            "reasoning": f"Low mood score {mood_score}/10",
+            "intervention_type": "daily_practice",
+            "resources": ["Consider speaking with a mental health professional"],
+            "crisis_level": 2,
+        }
+    if energy_level <= 3:
+        return {
+            "recommendation": "Your energy is low. A short walk, some water and a regular sleep schedule can help you recharge.",
+            "reasoning": f"Low energy level {energy_level}/10",
+            "intervention_type": "daily_practice",
+            "resources": [],
+            "crisis_level": 1,
+        }
+    return {
+        "recommendation": "You're doing well. Keep up the routines that support you, and take a moment to notice what's going right today.",
+        "reasoning": f"Mood {mood_score}/10 with manageable stress",
+        "intervention_type": "long_term",
+        "resources": [],
+        "crisis_level": 1,
+        "meditation_suggestion": "A five-minute mindfulness session focusing on your breath.",
+    }
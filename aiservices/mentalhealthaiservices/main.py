@@ -37,9 +37,11 @@ db = client[settings.DATABASE_NAME]
 mental_health_collection = db["mental_health_data"]
 mood_entries_collection = db["mood_entries"]
 meditation_sessions_collection = db["meditation_sessions"]
+conversation_memory_collection = db["conversation_memory"]
 
 # Initialize Mental Health Chain
-mental_health_chain = MentalHealthAgentChain()
+mental_health_chain = MentalHealthAgentChain(memory_collection=conversation_memory_collection)
+wellness_tip_task: Optional[asyncio.Task] = None
 
 # Pydantic models for API
 class MoodAnalysisRequest(BaseModel):
@@ -66,6 +68,11 @@ class WellnessTipRequest(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
+    # Generate today's wellness tip ahead of the first request; this must not
+    # depend on MongoDB or RabbitMQ being reachable
+    global wellness_tip_task
+    wellness_tip_task = asyncio.create_task(mental_health_chain.precompute_daily_wellness_tips())
+    
     try:
         # Test database connection
         await client.admin.command('ping')
@@ -82,6 +89,8 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     try:
+        if wellness_tip_task:
+            wellness_tip_task.cancel()
         await simple_mq.close()
         client.close()
         logger.info("Connections closed successfully")
@@ -93,6 +102,11 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "mental_health_ai", "timestamp": datetime.now(timezone.utc)}
 
+@app.get("/llm-stats")
+async def llm_stats():
+    """LLM cache hit rate, fallbacks and latency histogram"""
+    return mental_health_chain.gateway.get_stats()
+
 @app.post("/analyze-mood")
 async def analyze_mood(request: MoodAnalysisRequest) -> Dict[str, Any]:
     """Analyze user mood and provide mental health recommendations"""
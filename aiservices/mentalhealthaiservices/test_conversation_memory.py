@@ -0,0 +1,139 @@
+"""
+Conversation Memory Test
+Checks that prompt history stays bounded per user with a stub LLM summarizer
+"""
+import asyncio
+import random
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.append(os.path.dirname(__file__))
+
+import mongomock
+
+from conversation_memory import (
+    ConversationMemoryStore,
+    ConversationTurn,
+    estimate_tokens,
+    make_llm_summarizer,
+    MEMORY_WINDOW_TOKENS,
+    MEMORY_DIGEST_TOKENS,
+)
+
+
+class StubResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class StubLLM:
+    """Stands in for ChatOpenAI: echoes a long-winded digest and counts calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.max_prompt_tokens = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        self.max_prompt_tokens = max(self.max_prompt_tokens, estimate_tokens(prompt))
+        return StubResponse("User reported varied moods; advice covered breathing and sleep. " * 20)
+
+
+class AsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return self.collection.update_one(*args, **kwargs)
+
+
+def make_turn(i, start=datetime(2025, 1, 1)):
+    return ConversationTurn(
+        timestamp=(start + timedelta(minutes=i)).isoformat(),
+        mood_score=random.randint(1, 10),
+        advice="Try a short breathing exercise and write down what is on your mind. " * random.randint(1, 3)
+    )
+
+
+def test_prompt_size_bounded_over_10k_turns():
+    """10k turns spread over 1k users never push a rendered history past the budget"""
+    random.seed(3)
+    llm = StubLLM()
+    store = ConversationMemoryStore(summarizer=make_llm_summarizer(llm))
+    users = [f"user_{i}" for i in range(1000)]
+
+    async def run():
+        largest = 0
+        for i in range(10000):
+            user_id = random.choice(users)
+            await store.append(user_id, make_turn(i))
+            largest = max(largest, estimate_tokens(await store.render(user_id)))
+        return largest
+
+    largest = asyncio.run(run())
+    assert largest <= MEMORY_WINDOW_TOKENS + MEMORY_DIGEST_TOKENS + 20
+    # Summarization prompts are bounded too, and run far less often than once per turn
+    assert llm.max_prompt_tokens <= MEMORY_WINDOW_TOKENS + MEMORY_DIGEST_TOKENS + 100
+    assert 0 < llm.calls < 10000 / 2
+    print(f"  largest history: {largest} tokens, summarizer calls: {llm.calls}")
+
+
+def test_users_do_not_share_context():
+    store = ConversationMemoryStore()
+
+    async def run():
+        await store.append("alice", ConversationTurn(timestamp="2025-01-01T08:00:00", mood_score=2, advice="Call a friend"))
+        return await store.render("alice"), await store.render("bob")
+
+    alice, bob = asyncio.run(run())
+    assert "Call a friend" in alice
+    assert bob == "No previous conversation history."
+
+
+def test_idle_and_lru_sessions_are_evicted():
+    store = ConversationMemoryStore(max_sessions=100)
+
+    async def run():
+        for i in range(500):
+            await store.append(f"user_{i}", make_turn(i))
+        store.sessions["user_450"].last_active -= timedelta(seconds=store.idle_seconds + 1)
+        store.sessions.move_to_end("user_450", last=False)
+        await store.get_session("user_499")
+
+    asyncio.run(run())
+    assert len(store.sessions) == 99
+    assert "user_450" not in store.sessions
+    assert "user_0" not in store.sessions
+
+
+def test_sessions_survive_restart():
+    collection = AsyncCollection(mongomock.MongoClient().db.conversation_memory)
+
+    async def run():
+        first = ConversationMemoryStore(collection=collection)
+        for i in range(40):
+            await first.append("alice", make_turn(i))
+        restarted = ConversationMemoryStore(collection=collection)
+        return await first.render("alice"), await restarted.render("alice")
+
+    before, after = asyncio.run(run())
+    assert before == after
+    assert "Summary of earlier check-ins" in after
+
+
+if __name__ == "__main__":
+    print("🧠 TESTING CONVERSATION MEMORY")
+    print("=" * 60)
+    test_prompt_size_bounded_over_10k_turns()
+    print("✅ Prompt history bounded over 10k turns / 1k users")
+    test_users_do_not_share_context()
+    print("✅ Users do not share context")
+    test_idle_and_lru_sessions_are_evicted()
+    print("✅ Idle and least recently used sessions evicted")
+    test_sessions_survive_restart()
+    print("✅ Sessions survive a restart")
@@ -0,0 +1,214 @@
+"""
+LLM Gateway Test
+Checks caching, in-flight de-duplication, concurrency limits and fallbacks
+against a fake chat model that counts invocations
+"""
+import asyncio
+import json
+import sys
+import os
+from datetime import date, datetime
+from types import SimpleNamespace
+
+# Add current directory to path
+sys.path.append(os.path.dirname(__file__))
+
+from llm_gateway import LLMGateway, fallback_wellness_tip, keyword_mood_advice, mood_cache_key, normalize_text
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    """Stands in for ChatOpenAI: answers after a delay and records concurrency"""
+
+    def __init__(self, delay=0.01, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("model unavailable")
+            return FakeResponse(f"answer {self.calls}")
+        finally:
+            self.active -= 1
+
+
+def test_exact_and_near_duplicate_hits():
+    llm = FakeLLM()
+    gateway = LLMGateway(llm)
+
+    async def run():
+        first = await gateway.invoke("How  are you?")
+        exact = await gateway.invoke("how are you?\n")
+        key = normalize_text("Tired, stressed")
+        third = await gateway.invoke("prompt at 08:00", cache_key=key)
+        near = await gateway.invoke("prompt at 09:30", cache_key=normalize_text("tired... STRESSED!"))
+        return first, exact, third, near
+
+    first, exact, third, near = asyncio.run(run())
+    assert first == exact and third == near
+    assert llm.calls == 2
+    stats = gateway.get_stats()
+    assert stats["exact_hits"] == 1 and stats["near_hits"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["latency_seconds"]["count"] == 2
+
+
+def test_identical_prompts_in_flight_share_one_call():
+    llm = FakeLLM(delay=0.05)
+    gateway = LLMGateway(llm)
+
+    async def run():
+        return await asyncio.gather(*(gateway.invoke("daily tip", cache_key="wellness_tip:2025-01-01") for _ in range(100)))
+
+    results = asyncio.run(run())
+    assert llm.calls == 1
+    assert len(set(results)) == 1
+    assert gateway.get_stats()["coalesced"] == 99
+
+
+def test_concurrency_is_bounded():
+    llm = FakeLLM(delay=0.01)
+    gateway = LLMGateway(llm, max_concurrency=3)
+
+    async def run():
+        await asyncio.gather(*(gateway.invoke(f"prompt {i}") for i in range(30)))
+
+    asyncio.run(run())
+    assert llm.calls == 30
+    assert llm.max_active == 3
+
+
+def test_timeout_uses_fallback_and_is_not_cached():
+    llm = FakeLLM(delay=1.0)
+    gateway = LLMGateway(llm, timeout_seconds=0.05)
+    tip = fallback_wellness_tip(date(2025, 1, 1))
+
+    async def run():
+        first = await gateway.invoke("daily tip", fallback=lambda: tip)
+        second = await gateway.invoke("daily tip", fallback=lambda: tip)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == tip
+    assert llm.calls == 2
+    stats = gateway.get_stats()
+    assert stats["timeouts"] == 2 and stats["fallbacks"] == 2 and stats["cache_size"] == 0
+
+
+def test_errors_without_fallback_propagate():
+    gateway = LLMGateway(FakeLLM(fail=True))
+
+    async def run():
+        try:
+            await gateway.invoke("anything")
+        except RuntimeError:
+            return True
+        return False
+
+    assert asyncio.run(run())
+    assert gateway.get_stats()["errors"] == 1
+
+
+def test_keyword_fallbacks_are_deterministic():
+    crisis = keyword_mood_advice(2, 9, 2, "I feel hopeless")
+    assert crisis["crisis_level"] == 5
+    assert keyword_mood_advice(2, 9, 2, "I feel hopeless") == crisis
+    assert keyword_mood_advice(7, 8, 6)["breathing_exercise"]
+    assert keyword_mood_advice(8, 2, 8)["intervention_type"] == "long_term"
+    json.dumps(crisis)
+    assert fallback_wellness_tip(date(2025, 1, 1)) == fallback_wellness_tip(date(2025, 1, 1))
+    assert fallback_wellness_tip(date(2025, 1, 1)) != fallback_wellness_tip(date(2025, 1, 2))
+
+
+def mood(user_id="user_1", notes="Tired, stressed", emotions=("Anxious", "tired")):
+    return SimpleNamespace(user_id=user_id, timestamp=datetime(2025, 1, 1, 8, 0), mood_score=4, stress_level=7,
+                           energy_level=3, emotions=list(emotions), notes=notes)
+
+
+def test_mood_keys_keep_meaning():
+    """Case and punctuation are folded, but word order and negation are not"""
+    assert normalize_text("Tired, stressed") == normalize_text("tired... STRESSED!")
+    assert normalize_text("not tired, just stressed") != normalize_text("not stressed, just tired")
+    assert normalize_text("I am not okay") != normalize_text("I am okay")
+    assert normalize_text("very very tired") != normalize_text("very tired")
+
+    key = mood_cache_key(mood(), None)
+    assert mood_cache_key(mood(notes="tired - stressed", emotions=("tired", "ANXIOUS")), None) == key
+    assert mood_cache_key(mood(notes="Not tired, stressed"), None) != key
+
+
+def test_mood_advice_is_not_shared_across_users():
+    """Identical check-ins from two users never share cached advice"""
+    llm = FakeLLM()
+    gateway = LLMGateway(llm)
+
+    async def check_in(entry):
+        return await gateway.invoke(f"{entry.user_id} at {entry.timestamp}", cache_key=mood_cache_key(entry, None))
+
+    async def run():
+        first = await check_in(mood("user_1"))
+        repeat = await check_in(mood("user_1", notes="tired; stressed"))
+        other_user = await check_in(mood("user_2"))
+        return first, repeat, other_user
+
+    first, repeat, other_user = asyncio.run(run())
+    assert repeat == first
+    assert other_user != first
+    assert llm.calls == 2
+
+
+def test_repeated_check_ins_hit_the_cache_as_history_grows():
+    """The prompt carries the growing history, but the second identical check-in is still a hit"""
+    llm = FakeLLM()
+    gateway = LLMGateway(llm)
+    history = []
+
+    async def check_in(entry):
+        advice = await gateway.invoke(f"{entry.timestamp}: {entry.mood_score}\n" + "\n".join(history),
+                                      cache_key=mood_cache_key(entry, None))
+        history.append(f"- {entry.timestamp}: Mood {entry.mood_score}/10 - {advice}")
+        return advice
+
+    async def run():
+        first = await check_in(mood())
+        second = await check_in(SimpleNamespace(**{**vars(mood()), "timestamp": datetime(2025, 1, 1, 12, 0)}))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second == first
+    assert llm.calls == 1 and gateway.get_stats()["near_hits"] == 1
+
+
+if __name__ == "__main__":
+    print("🤖 TESTING LLM GATEWAY")
+    print("=" * 60)
+    test_exact_and_near_duplicate_hits()
+    print("✅ Exact and near-duplicate prompts served from cache")
+    test_identical_prompts_in_flight_share_one_call()
+    print("✅ 100 identical prompts in flight made 1 model call")
+    test_concurrency_is_bounded()
+    print("✅ Concurrent model calls bounded")
+    test_timeout_uses_fallback_and_is_not_cached()
+    print("✅ Timeouts fall back without caching")
+    test_errors_without_fallback_propagate()
+    print("✅ Errors without a fallback propagate")
+    test_keyword_fallbacks_are_deterministic()
+    print("✅ Keyword fallbacks are deterministic")
+    test_mood_keys_keep_meaning()
+    print("✅ Mood keys keep word order and negation")
+    test_mood_advice_is_not_shared_across_users()
+    print("✅ Mood advice not shared across users")
+    test_repeated_check_ins_hit_the_cache_as_history_grows()
+    print("✅ Repeated check-ins hit the cache as history grows")
@@ -5,6 +5,7 @@ from typing import Optional, Dict, Any
 
 from app.auth.jwt import decode_token
 from app.auth.users import get_user_by_id
+from app.auth.principal_cache import principal_cache
 
 # OAuth2PasswordBearer for token extraction from request
 oauth2_scheme = OAuth2PasswordBearer(
@@ -33,15 +34,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any
     if token_data is None:
         raise credentials_exception
     
-    # Get user from database
-    user = await get_user_by_id(token_data.sub)
+    # Get user from the principal cache, falling back to the database
+    user = await principal_cache.get(token_data, get_user_by_id)
     if user is None:
         raise credentials_exception
     
-    # Remove sensitive data
-    user.pop("password", None)
-    user.pop("refresh_tokens", None)
-    
     return user
 
 async def get_optional_user(token: str = Depends(oauth2_scheme)) -> Optional[Dict[str, Any]]:
@@ -59,16 +56,8 @@ async def get_optional_user(token: str = Depends(oauth2_scheme)) -> Optional[Dic
         if token_data is None:
             return None
         
-        # Get user from database
-        user = await get_user_by_id(token_data.sub)
-        if user is None:
-            return None
-        
-        # Remove sensitive data
-        user.pop("password", None)
-        user.pop("refresh_tokens", None)
-        
-        return user
+        # Get user from the principal cache, falling back to the database
+        return await principal_cache.get(token_data, get_user_by_id)
     except:
         return None
 
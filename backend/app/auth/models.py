@@ -40,6 +40,13 @@ class TokenData(BaseModel):
     sub: str
     name: Optional[str] = None
     exp: datetime
+    jti: Optional[str] = None
+
+
+class PasswordChange(BaseModel):
+    """Schema for changing the signed-in user's password"""
+    current_password: str
+    new_password: str = Field(..., min_length=8)
 
 
 class RefreshToken(BaseModel):
@@ -0,0 +1,157 @@
+"""
+Authenticated principal cache
+
+Keeps the user document behind a verified access token in memory so that the
+many API calls a dashboard fires with the same token share one database read.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from app.auth.models import TokenData
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+# Upper bound on how stale a cached profile may be; tokens expiring sooner cap it further
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+
+# Never returned to route handlers
+SENSITIVE_FIELDS = ("password", "refresh_tokens")
+
+
+class PrincipalCache:
+    """
+    LRU cache of user principals keyed by access token
+
+    Concurrent misses for the same token share a single load, and every entry
+    for a user can be dropped at once when their profile, password or session
+    changes.
+    """
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[Hashable]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Bumped on invalidation so a load that started earlier is not cached; only
+        # users with a load in flight need one, so both are dropped when it finishes
+        self._generations: Dict[str, int] = {}
+        self._loading: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(token_data: TokenData) -> Hashable:
+        # Tokens issued before jti was added are identified by subject and expiry
+        return token_data.jti or (token_data.sub, token_data.exp)
+
+    async def get(self, token_data: TokenData,
+                  loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """
+        Return the principal for a decoded token, loading it at most once
+
+        Args:
+            token_data: The verified token payload
+            loader: Loads the user document by id on a miss
+
+        Returns:
+            A copy of the user without sensitive fields, or None if the user does not exist
+        """
+        key = self._key(token_data)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[2])
+            self._remove(key)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            principal = await asyncio.shield(inflight)
+            return dict(principal) if principal is not None else None
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        user_id = token_data.sub
+        generation = self._generations.get(user_id, 0)
+        self._loading[user_id] = self._loading.get(user_id, 0) + 1
+        try:
+            user = await loader(user_id)
+            principal = None
+            if user is not None:
+                principal = {k: v for k, v in user.items() if k not in SENSITIVE_FIELDS}
+                if self._generations.get(user_id, 0) == generation:
+                    self._store(key, token_data, principal)
+            future.set_result(principal)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters retrieve it; mark it retrieved here so an unwaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+            remaining = self._loading.get(user_id, 1) - 1
+            if remaining:
+                self._loading[user_id] = remaining
+            else:
+                self._loading.pop(user_id, None)
+                self._generations.pop(user_id, None)
+        return dict(principal) if principal is not None else None
+
+    def _store(self, key: Hashable, token_data: TokenData, principal: Dict[str, Any]):
+        token_seconds_left = (token_data.exp.replace(tzinfo=None) - datetime.utcnow()).total_seconds()
+        ttl = min(self.ttl_seconds, token_seconds_left)
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, token_data.sub, principal)
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(token_data.sub, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable):
+        _, user_id, _ = self._entries.pop(key)
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached principal for a user (profile update, password change, logout)"""
+        self.invalidations += 1
+        if user_id in self._loading:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for key in self._keys_by_user.pop(user_id, set()):
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_user.clear()
+        self._generations.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+principal_cache = PrincipalCache()
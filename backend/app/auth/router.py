@@ -8,12 +8,14 @@ from app.auth.models import (
     UserProfile, 
     Token, 
     RefreshToken, 
-    OAuthRequest
+    OAuthRequest,
+    PasswordChange
 )
 from app.auth.jwt import (
     create_access_token, 
     create_refresh_token, 
-    decode_refresh_token
+    decode_refresh_token,
+    verify_password
 )
 from app.auth.users import (
     create_user, 
@@ -22,6 +24,7 @@ from app.auth.users import (
     verify_refresh_token,
     invalidate_refresh_token,
     invalidate_all_refresh_tokens,
+    change_user_password,
     get_user_by_id
 )
 from app.auth.dependencies import get_current_user
@@ -226,6 +229,33 @@ async def logout(
     return {"message": "Successfully logged out"}
 
 
+@router.post("/change-password")
+async def change_password(
+    password_change: PasswordChange,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Change password
+    
+    Requires the current password; signs the user out of every device
+    """
+    user_id = current_user["_id"]
+    user = await get_user_by_id(user_id)
+    if not user or not verify_password(password_change.current_password, user["password"]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Current password is incorrect"
+        )
+    
+    if not await change_user_password(user_id, password_change.new_password):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Password could not be changed"
+        )
+    
+    return {"message": "Password changed; please sign in again"}
+
+
 # For Token acquisition from form data (Swagger UI compatibility)
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -3,6 +3,7 @@ from datetime import datetime
 from app.core.database import get_database
 from app.auth.jwt import get_password_hash, verify_password
 from app.auth.models import UserCreate, UserProfile
+from app.auth.principal_cache import principal_cache
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
@@ -141,6 +142,7 @@ async def invalidate_refresh_token(user_id: str, refresh_token: str) -> bool:
             {"_id": ObjectId(user_id)},
             {"$pull": {"refresh_tokens": {"token": refresh_token}}}
         )
+        principal_cache.invalidate_user(user_id)
         return result.modified_count > 0
     except:
         return False
@@ -154,6 +156,7 @@ async def invalidate_all_refresh_tokens(user_id: str) -> bool:
             {"_id": ObjectId(user_id)},
             {"$set": {"refresh_tokens": []}}
         )
+        principal_cache.invalidate_user(user_id)
         return result.modified_count > 0
     except:
         return False
@@ -174,6 +177,7 @@ async def update_user_profile(user_id: str, profile_data: Dict[str, Any]) -> Opt
             {"_id": ObjectId(user_id)},
             {"$set": profile_data}
         )
+        principal_cache.invalidate_user(user_id)
         
         if result.modified_count > 0:
             updated_user = await get_user_by_id(user_id)
@@ -187,6 +191,20 @@ async def update_user_profile(user_id: str, profile_data: Dict[str, Any]) -> Opt
     return None
 
 
+async def change_user_password(user_id: str, new_password: str) -> bool:
+    """Set a new password and sign the user out of every device"""
+    db = get_database()
+    try:
+        result = await db.users.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": {"password": get_password_hash(new_password), "refresh_tokens": []}}
+        )
+        principal_cache.invalidate_user(user_id)
+        return result.modified_count > 0
+    except:
+        return False
+
+
 async def setup_user_collection():
     """Setup user collection with proper indexes"""
     print("🔄 Setting up user collection...")
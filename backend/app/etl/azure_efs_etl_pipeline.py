@@ -12,6 +12,7 @@ Features:
 - Retrieve and process data from Azure EFS
 - Handle food analysis, nutrition logs, user profiles, and meal data
 - Support for batch and real-time processing
+- Incremental runs that resume from per-source watermarks (see watermarks.py)
 """
 
 import os
@@ -32,6 +33,8 @@ import motor.motor_asyncio
 from bson import ObjectId
 import numpy as np
 
+from .watermarks import ETL_SOURCES, WATERMARK_COLLECTION, IncrementalExtractor, WatermarkStore, chunk_name
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -175,16 +178,22 @@ class DietDataExtractor:
         self.database_name = database_name
         self.client = None
         self.db = None
+        self._connections = 0
     
     async def connect(self):
-        """Connect to MongoDB"""
-        self.client = motor.motor_asyncio.AsyncIOMotorClient(self.mongodb_uri)
-        self.db = self.client[self.database_name]
+        """Connect to MongoDB; concurrent pipeline runs share one client"""
+        if self.client is None:
+            self.client = motor.motor_asyncio.AsyncIOMotorClient(self.mongodb_uri)
+            self.db = self.client[self.database_name]
+        self._connections += 1
     
     async def disconnect(self):
-        """Disconnect from MongoDB"""
-        if self.client:
+        """Disconnect from MongoDB once the last run using the client is done"""
+        self._connections = max(0, self._connections - 1)
+        if self.client and self._connections == 0:
             self.client.close()
+            self.client = None
+            self.db = None
     
     async def extract_nutrition_logs(self, 
                                    start_date: datetime = None, 
@@ -529,10 +538,18 @@ class DietDataLoader:
         self.config = config
         self.temp_dir = Path("./temp_etl")
         self.temp_dir.mkdir(exist_ok=True)
+        # The partition index is read-modified-written; data types loaded in parallel take turns
+        self._index_lock = asyncio.Lock()
     
     async def load_data(self, transformed_data: Dict[str, Any], 
-                       partition_key: str = None) -> bool:
-        """Load transformed data to Azure EFS"""
+                       partition_key: str = None,
+                       filename: str = None) -> bool:
+        """
+        Load transformed data to Azure EFS
+        
+        A fixed filename makes the write idempotent (incremental chunks); by
+        default each call writes a new timestamped snapshot file.
+        """
         try:
             data_type = transformed_data.get('data_type', 'unknown')
             timestamp = datetime.now()
@@ -546,10 +563,12 @@ class DietDataLoader:
             
             # Generate unique filename
             file_hash = hashlib.md5(
-                json.dumps(transformed_data, sort_keys=True).encode()
+                json.dumps(transformed_data, sort_keys=True, default=str).encode()
             ).hexdigest()[:8]
             
-            filename = f"{data_type}_{timestamp.strftime('%Y%m%d_%H%M%S')}_{file_hash}"
+            incremental = filename is not None
+            if not incremental:
+                filename = f"{data_type}_{timestamp.strftime('%Y%m%d_%H%M%S')}_{file_hash}"
             
             # Prepare data with metadata
             final_data = {
@@ -595,7 +614,7 @@ class DietDataLoader:
                 logger.info(f"Successfully loaded {len(transformed_data.get('records', []))} records to {remote_path}")
                 
                 # Create partition index
-                await self._update_partition_index(partition_key, data_type, final_data)
+                await self._update_partition_index(partition_key, data_type, final_data, incremental)
                 
                 return True
             else:
@@ -606,8 +625,13 @@ class DietDataLoader:
             logger.error(f"Failed to load data: {e}")
             return False
     
-    async def _update_partition_index(self, partition_key: str, data_type: str, data: Dict):
+    async def _update_partition_index(self, partition_key: str, data_type: str, data: Dict,
+                                      incremental: bool = False):
         """Update partition index for efficient querying"""
+        async with self._index_lock:
+            await self._write_partition_index(partition_key, data_type, data, incremental)
+    
+    async def _write_partition_index(self, partition_key: str, data_type: str, data: Dict, incremental: bool):
         try:
             index_path = f"{self.config.azure_base_directory}/indexes/partitions.json"
             
@@ -632,11 +656,15 @@ class DietDataLoader:
                 'compression_enabled': self.config.compression_enabled
             }
             
-            # Remove existing entry for same partition/data_type
-            index['partitions'] = [
+            # Replace existing entry for same partition/data_type; incremental
+            # chunks add to its record count instead of replacing it
+            existing = [
                 p for p in index['partitions'] 
-                if not (p['partition_key'] == partition_key and p['data_type'] == data_type)
+                if p['partition_key'] == partition_key and p['data_type'] == data_type
             ]
+            if incremental and existing:
+                partition_info['record_count'] += existing[0].get('record_count', 0)
+            index['partitions'] = [p for p in index['partitions'] if p not in existing]
             
             index['partitions'].append(partition_info)
             index['last_updated'] = datetime.now().isoformat()
@@ -651,6 +679,13 @@ class DietDataLoader:
         except Exception as e:
             logger.warning(f"Failed to update partition index: {e}")
 
+# Field identifying a record across partition files, per data type
+RECORD_ID_FIELDS = {
+    'nutrition_logs': 'log_id',
+    'food_analyses': 'analysis_id',
+    'user_profiles': 'user_id'
+}
+
 class DietDataRetriever:
     """Retrieve and process data from Azure EFS"""
     
@@ -771,40 +806,60 @@ class DietDataRetriever:
                 logger.warning(f"No files found in partition {partition_key}")
                 return {}
             
-            # Get the most recent file (in case there are multiple)
             data_files = [f for f in files if not f['is_directory']]
             if not data_files:
                 return {}
             
-            # Sort by name (contains timestamp) and get latest
-            latest_file = sorted(data_files, key=lambda x: x['name'])[-1]
-            
-            remote_path = latest_file['path']
-            temp_file = self.temp_dir / f"temp_partition_{partition_key}.json"
-            
-            if remote_path.endswith('.gz'):
-                temp_file = temp_file.with_suffix('.json.gz')
-            
-            success = await self.azure_client.download_file(remote_path, str(temp_file))
-            
-            if not success:
-                return {}
-            
-            # Load data
-            if temp_file.suffix == '.gz':
-                with gzip.open(temp_file, 'rt', encoding='utf-8') as f:
-                    data = json.load(f)
-            else:
-                with open(temp_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            
-            temp_file.unlink()
+            # Latest full snapshot (names contain a timestamp) plus every incremental
+            # delta; later files win when a record was exported more than once
+            snapshots = sorted((f for f in data_files if '_delta_' not in f['name']), key=lambda x: x['name'])
+            deltas = sorted((f for f in data_files if '_delta_' in f['name']), key=lambda x: str(x.get('last_modified') or ''))
+            selected = snapshots[-1:] + deltas
+            
+            data = {}
+            records: Dict[Any, Dict] = {}
+            id_field = RECORD_ID_FIELDS.get(data_type)
+            for file_info in selected:
+                file_data = await self._download_json(file_info['path'], partition_key)
+                if not file_data:
+                    continue
+                data = {**file_data, 'records': []}
+                for i, record in enumerate(file_data.get('records', [])):
+                    key = record.get(id_field) if id_field else None
+                    records[key if key is not None else (file_info['name'], i)] = record
+            
+            if data:
+                data['records'] = list(records.values())
+                data['total_records'] = len(data['records'])
             return data
             
         except Exception as e:
             logger.error(f"Failed to load partition data {partition_key}: {e}")
             return {}
     
+    async def _download_json(self, remote_path: str, partition_key: str) -> Dict:
+        """Download and parse one partition file"""
+        temp_file = self.temp_dir / f"temp_partition_{partition_key}.json"
+        
+        if remote_path.endswith('.gz'):
+            temp_file = temp_file.with_suffix('.json.gz')
+        
+        success = await self.azure_client.download_file(remote_path, str(temp_file))
+        
+        if not success:
+            return {}
+        
+        # Load data
+        if temp_file.suffix == '.gz':
+            with gzip.open(temp_file, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            with open(temp_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        
+        temp_file.unlink()
+        return data
+    
     async def get_user_nutrition_history(self, 
                                         user_id: str,
                                         days: int = 30) -> Dict[str, List]:
@@ -934,6 +989,121 @@ class DietAgentETLPipeline:
             logger.error(f"ETL Pipeline failed: {e}")
             return {'success': False, 'error': str(e)}
     
+    def _transform_records(self, data_type: str, records: List[Dict]) -> Optional[Dict[str, Any]]:
+        """Transform extracted records of a data type, None if it has no transformer"""
+        if data_type == 'nutrition_logs':
+            return self.transformer.transform_nutrition_logs(records)
+        elif data_type == 'food_analyses':
+            return self.transformer.transform_food_analyses(records)
+        elif data_type == 'user_profiles':
+            return self.transformer.transform_user_profiles(records)
+        return None
+    
+    @staticmethod
+    def _exportable(record: Dict) -> Dict:
+        """Copy of a raw document with ObjectIds converted for JSON serialization"""
+        record = dict(record)
+        record["_id"] = str(record["_id"])
+        if "user_id" in record:
+            record["user_id"] = str(record["user_id"])
+        return record
+    
+    def _chunk_writer(self, data_type: str, partition_key: str):
+        async def write_chunk(records: List[Dict], first: Dict, last: Dict) -> bool:
+            transformed_data = self._transform_records(data_type, [self._exportable(r) for r in records])
+            return await self.loader.load_data(
+                transformed_data, partition_key, filename=chunk_name(data_type, first, last)
+            )
+        return write_chunk
+    
+    async def load_batch(self, data_type: str, partition_key: str, records: List[Dict], filename: str) -> bool:
+        """Load already transformed records as one partition file (the write-behind sink's WriteBatch)"""
+        transformed_data = {
+            'data_type': data_type,
+            'transformation_timestamp': datetime.now().isoformat(),
+            'total_records': len(records),
+            'records': records
+        }
+        return await self.loader.load_data(transformed_data, partition_key, filename=filename)
+    
+    async def run_incremental_etl(self, data_types: List[str] = None) -> Dict[str, Any]:
+        """
+        Run ETL for records added or changed since the last run
+        
+        Each data type resumes from its persisted watermark and is exported in
+        chunks of config.batch_size; the watermark is committed after every
+        chunk written, so an interrupted run continues where it stopped.
+        """
+        try:
+            if not data_types:
+                data_types = list(ETL_SOURCES)
+            
+            await self.extractor.connect()
+            watermarks = WatermarkStore(self.extractor.db[WATERMARK_COLLECTION])
+            incremental = IncrementalExtractor(self.extractor.db, watermarks, self.config.batch_size)
+            partition_key = datetime.now().strftime('%Y-%m-%d')
+            
+            results = {
+                'pipeline_start': datetime.now().isoformat(),
+                'mode': 'incremental',
+                'data_types_processed': [],
+                'total_records_processed': 0,
+                'errors': []
+            }
+            
+            for data_type in data_types:
+                source = ETL_SOURCES.get(data_type)
+                if not source:
+                    logger.warning(f"Unknown data type: {data_type}")
+                    continue
+                
+                logger.info(f"Incrementally processing data type: {data_type}")
+                outcome = await incremental.export(
+                    data_type, source['collection'], source['order_field'],
+                    self._chunk_writer(data_type, partition_key)
+                )
+                
+                results['data_types_processed'].append({
+                    'data_type': data_type,
+                    'records_count': outcome.records_exported,
+                    'chunks_written': outcome.chunks_written,
+                    'status': 'failed' if outcome.errors else 'success'
+                })
+                results['total_records_processed'] += outcome.records_exported
+                results['errors'].extend(outcome.errors)
+            
+            await self.extractor.disconnect()
+            
+            results['pipeline_end'] = datetime.now().isoformat()
+            results['success'] = len(results['errors']) == 0
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"Incremental ETL Pipeline failed: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    async def stream_changes(self, data_type: str, stop: asyncio.Event = None, max_wait_seconds: float = 5.0):
+        """Tail a source's change stream and export changes in near real time (replica sets only)"""
+        source = ETL_SOURCES[data_type]
+        
+        async def write_chunk(records: List[Dict], first: Dict, last: Dict) -> bool:
+            # Partition by the day the change was exported
+            partition_key = datetime.now().strftime('%Y-%m-%d')
+            return await self._chunk_writer(data_type, partition_key)(records, first, last)
+        
+        await self.extractor.connect()
+        try:
+            watermarks = WatermarkStore(self.extractor.db[WATERMARK_COLLECTION])
+            incremental = IncrementalExtractor(self.extractor.db, watermarks, self.config.batch_size)
+            await incremental.tail_changes(
+                f"{data_type}_stream", source['collection'], write_chunk,
+                max_wait_seconds=max_wait_seconds,
+                stop=stop
+            )
+        finally:
+            await self.extractor.disconnect()
+    
     async def get_nutrition_insights(self, user_id: str, days: int = 30) -> Dict[str, Any]:
         """Get comprehensive nutrition insights for a user"""
         try:
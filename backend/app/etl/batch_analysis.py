@@ -0,0 +1,164 @@
+"""
+Concurrent batch image analysis
+===============================
+
+Batch analysis used to run each image's pipeline after the previous one had
+finished, so a batch took the sum of its images. BatchAnalysisEngine runs
+every image as its own task behind one semaphore shared by all requests, so
+a batch takes about as long as its slowest image while the server never
+analyzes more than ``max_concurrency`` images at once:
+
+- Each image result is recorded as soon as it finishes and can be streamed
+  (``stream``) or polled (``get_status``) while the rest are still running
+- An image that fails becomes an error entry for that image only
+- Finished batches are kept for ``retention_seconds`` so clients that
+  submitted without waiting can collect the results
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchImage(NamedTuple):
+    """One uploaded image of a batch, read before the request returns"""
+    index: int
+    filename: Optional[str]
+    content_type: Optional[str]
+    data: bytes
+    meal_type: str
+    text_description: Optional[str] = None
+    dietary_restrictions: Optional[List[str]] = None
+
+
+# (user_id, image) -> result fields for that image, including 'status'
+AnalyzeImage = Callable[[str, BatchImage], Awaitable[Dict[str, Any]]]
+
+
+class _Batch:
+    def __init__(self, batch_id: str, user_id: str, total: int):
+        self.batch_id = batch_id
+        self.user_id = user_id
+        self.total = total
+        self.results: List[Dict[str, Any]] = []  # in completion order
+        self.submitted_at = datetime.now()
+        self.completed_at: Optional[datetime] = None
+        self.expires_at: Optional[float] = None
+        self.tasks: List[asyncio.Task] = []
+        self.changed = asyncio.Event()
+
+
+class BatchAnalysisEngine:
+    """Runs batch image analyses concurrently under a server-wide limit"""
+
+    def __init__(self, analyze: AnalyzeImage, max_concurrency: int = 4, retention_seconds: float = 3600):
+        self.analyze = analyze
+        self.max_concurrency = max_concurrency
+        self.retention_seconds = retention_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._batches: "OrderedDict[str, _Batch]" = OrderedDict()
+        self.stats = {'batches_submitted': 0, 'images_analyzed': 0, 'images_failed': 0,
+                      'in_flight': 0, 'peak_in_flight': 0}
+
+    def submit(self, user_id: str, images: List[BatchImage]) -> str:
+        """Start analyzing a batch and return its ID"""
+        self._expire()
+        batch = _Batch(f"batch_{user_id}_{uuid.uuid4().hex[:12]}", user_id, len(images))
+        self._batches[batch.batch_id] = batch
+        batch.tasks = [asyncio.create_task(self._run(batch, image)) for image in images]
+        if not images:
+            self._complete(batch)
+        self.stats['batches_submitted'] += 1
+        return batch.batch_id
+
+    async def _run(self, batch: _Batch, image: BatchImage):
+        async with self._semaphore:
+            self.stats['in_flight'] += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+            try:
+                result = await self.analyze(batch.user_id, image)
+            except Exception as e:
+                logger.error(f"Batch {batch.batch_id} image {image.index} failed: {e}")
+                result = {'status': 'error', 'error': str(e)}
+            finally:
+                self.stats['in_flight'] -= 1
+
+        self.stats['images_analyzed'] += 1
+        if result.get('status') != 'success':
+            self.stats['images_failed'] += 1
+        batch.results.append({'file_index': image.index, 'filename': image.filename, **result})
+        if len(batch.results) == batch.total:
+            self._complete(batch)
+        # Wake everyone streaming this batch
+        changed, batch.changed = batch.changed, asyncio.Event()
+        changed.set()
+
+    async def stream(self, batch_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Image results in the order they finish (earlier ones first on late subscription)"""
+        batch = self._batches[batch_id]
+        sent = 0
+        while True:
+            while sent < len(batch.results):
+                yield batch.results[sent]
+                sent += 1
+            if batch.completed_at:
+                return
+            await batch.changed.wait()
+
+    async def wait(self, batch_id: str) -> Dict[str, Any]:
+        """Summary of a batch once every image has finished"""
+        async for _ in self.stream(batch_id):
+            pass
+        return self.get_status(batch_id)
+
+    def get_status(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Progress and the results so far, or None for unknown or expired batches"""
+        self._expire()
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            return None
+
+        successful = [r for r in batch.results if r.get('status') == 'success']
+        return {
+            'batch_id': batch.batch_id,
+            'user_id': batch.user_id,
+            'status': 'completed' if batch.completed_at else 'processing',
+            'total_images': batch.total,
+            'completed_images': len(batch.results),
+            'successful_analyses': len(successful),
+            'failed_analyses': len(batch.results) - len(successful),
+            'total_calories_detected': sum(r.get('total_calories', 0) for r in successful),
+            'submitted_at': batch.submitted_at.isoformat(),
+            'processing_completed_at': batch.completed_at.isoformat() if batch.completed_at else None,
+            'results': sorted(batch.results, key=lambda r: r['file_index'])
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'max_concurrency': self.max_concurrency,
+            'batches_processing': sum(1 for b in self._batches.values() if not b.completed_at),
+            'batches_retained': len(self._batches)
+        }
+
+    async def shutdown(self):
+        """Cancel images still being analyzed"""
+        tasks = [task for batch in self._batches.values() for task in batch.tasks if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _complete(self, batch: _Batch):
+        batch.completed_at = datetime.now()
+        batch.expires_at = time.monotonic() + self.retention_seconds
+
+    def _expire(self):
+        now = time.monotonic()
+        for batch_id in [b.batch_id for b in self._batches.values() if b.expires_at and b.expires_at <= now]:
+            del self._batches[batch_id]
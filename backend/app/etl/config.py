@@ -36,6 +36,15 @@ class AzureETLConfig:
     partition_by_user: bool = False
     max_partition_size_mb: int = 100
     
+    # Write-behind buffering of real-time ETL records
+    spool_directory: str = "./etl_spool"
+    write_behind_max_records: int = 500
+    write_behind_max_delay_seconds: float = 2.0
+    
+    # Batch food image analysis (concurrency is shared by all batch requests)
+    batch_analysis_concurrency: int = 4
+    batch_analysis_retention_seconds: int = 3600
+    
     # Monitoring and Logging
     enable_metrics: bool = True
     log_level: str = "INFO"
@@ -68,6 +77,13 @@ class ETLEnvironment:
             partition_by_user=os.getenv('ETL_PARTITION_BY_USER', 'false').lower() == 'true',
             max_partition_size_mb=int(os.getenv('ETL_MAX_PARTITION_SIZE_MB', '100')),
             
+            spool_directory=os.getenv('ETL_SPOOL_DIRECTORY', './etl_spool'),
+            write_behind_max_records=int(os.getenv('ETL_WRITE_BEHIND_MAX_RECORDS', '500')),
+            write_behind_max_delay_seconds=float(os.getenv('ETL_WRITE_BEHIND_MAX_DELAY_SECONDS', '2.0')),
+            
+            batch_analysis_concurrency=int(os.getenv('ETL_BATCH_ANALYSIS_CONCURRENCY', '4')),
+            batch_analysis_retention_seconds=int(os.getenv('ETL_BATCH_ANALYSIS_RETENTION_SECONDS', '3600')),
+            
             enable_metrics=os.getenv('ETL_ENABLE_METRICS', 'true').lower() == 'true',
             log_level=os.getenv('ETL_LOG_LEVEL', 'INFO'),
             metrics_retention_days=int(os.getenv('ETL_METRICS_RETENTION_DAYS', '30'))
@@ -25,6 +25,9 @@ import hashlib
 from .azure_efs_etl_pipeline import DietAgentETLPipeline, DietDataExtractor, DietDataTransformer, DietDataLoader, DietDataRetriever
 from .config import AzureETLConfig
 from .scheduler import ETLScheduler, ETLJobMonitor
+from .write_behind import WriteBehindSink
+from .nutrition_profile import PROFILE_COLLECTION, NutritionProfileStore
+from .nutrition_analytics import AnalyticsCache, NutritionAnalytics
 
 # Import Food Vision Pipeline (assuming it's available)
 try:
@@ -48,11 +51,31 @@ class FoodVisionETLIntegration:
     def __init__(self, 
                  etl_config: AzureETLConfig,
                  mongodb_client = None,
-                 enable_real_time_processing: bool = True):
+                 enable_real_time_processing: bool = True,
+                 etl_pipeline = None):
         """Initialize the integrated system"""
         
         # Initialize ETL Pipeline
-        self.etl_pipeline = DietAgentETLPipeline(etl_config, mongodb_client)
+        self.etl_pipeline = etl_pipeline or DietAgentETLPipeline(etl_config)
+        self.transformer = DietDataTransformer()
+        
+        # Real-time results are spooled locally and loaded in batches
+        self.etl_sink = WriteBehindSink(
+            self._load_batch,
+            spool_dir=etl_config.spool_directory,
+            max_batch_records=etl_config.write_behind_max_records,
+            max_delay_seconds=etl_config.write_behind_max_delay_seconds
+        )
+        
+        # Rolling per-user intake profiles for comparing each meal with recent history
+        self.nutrition_profiles = (
+            NutritionProfileStore(mongodb_client[etl_config.mongodb_database][PROFILE_COLLECTION])
+            if mongodb_client is not None else None
+        )
+        
+        # Analytics reports per (user, date range, data version)
+        self.analytics_cache = AnalyticsCache()
+        self._analytics_versions: Dict[str, int] = {}
         
         # Initialize Food Vision Pipelines
         if FOOD_VISION_AVAILABLE:
@@ -77,6 +100,14 @@ class FoodVisionETLIntegration:
         
         logger.info("✅ Food Vision ETL Integration initialized")
     
+    async def start(self):
+        """Recover spooled ETL records left by a previous run and start batch loading"""
+        await self.etl_sink.start()
+    
+    async def shutdown(self):
+        """Load all buffered ETL records"""
+        await self.etl_sink.stop()
+    
     async def analyze_and_store_food_image(self,
                                          image_data: bytes,
                                          user_id: str,
@@ -128,14 +159,14 @@ class FoodVisionETLIntegration:
                 )
                 analysis_method = 'mock_analysis'
             
-            # Step 2: Real-time ETL Processing (if enabled)
+            # Step 2: Generate Enhanced Insights (before this meal joins the history it is compared with)
+            insights = await self._generate_nutrition_insights(vision_result, user_id)
+            
+            # Step 3: Real-time ETL Processing (if enabled)
             etl_result = None
             if self.enable_real_time:
                 etl_result = await self._process_analysis_via_etl(vision_result, analysis_method)
             
-            # Step 3: Generate Enhanced Insights
-            insights = await self._generate_nutrition_insights(vision_result, user_id)
-            
             # Step 4: Calculate processing metrics
             processing_time = (datetime.now() - analysis_start).total_seconds()
             self._update_processing_stats(processing_time, etl_result is not None)
@@ -201,15 +232,29 @@ class FoodVisionETLIntegration:
             }
     
     async def _process_analysis_via_etl(self, vision_result: Dict[str, Any], method: str) -> Dict[str, Any]:
-        """Process food analysis result through ETL pipeline"""
+        """
+        Process food analysis result through ETL pipeline
+        
+        The transformed record is queued in the write-behind sink, which loads
+        it to Azure EFS together with other recent analyses.
+        """
+        etl_start = datetime.now()
         try:
+            nutrition_summary = vision_result.get('nutrition_summary', {})
+            
             # Create ETL-compatible data structure
             etl_data = {
+                '_id': vision_result.get('analysis_id'),
                 'analysis_id': vision_result.get('analysis_id'),
                 'user_id': vision_result.get('user_id'),
                 'created_at': datetime.now(),
                 'detected_foods': vision_result.get('detected_foods', []),
-                'total_nutrition': vision_result.get('nutrition_summary', {}),
+                'total_nutrition': {
+                    'calories': nutrition_summary.get('total_calories', 0),
+                    'protein': nutrition_summary.get('total_protein_g', 0),
+                    'carbs': nutrition_summary.get('total_carbohydrates_g', 0),
+                    'fat': nutrition_summary.get('total_fat_g', 0)
+                },
                 'confidence_score': vision_result.get('confidence_metrics', {}).get('overall_confidence', 0),
                 'analysis_method': method,
                 'processing_time_seconds': vision_result.get('processing_metrics', {}).get('total_time', 0),
@@ -223,19 +268,20 @@ class FoodVisionETLIntegration:
             }
             
             # Transform data for ETL
-            transformer = DietDataTransformer()
-            transformed_data = transformer.transform_food_analyses([etl_data])
+            transformed_data = self.transformer.transform_food_analyses([etl_data])
             
-            # Load to Azure EFS
-            loader = DietDataLoader(self.config)
-            storage_result = await loader.load_food_analyses(transformed_data)
+            # Queue for batched loading to Azure EFS
+            acknowledgement = None
+            for record in transformed_data['records']:
+                acknowledgement = await self.etl_sink.submit('food_analyses', record)
+                await self._update_nutrition_profile(record)
             
+            partition_key = acknowledgement['partition_key'] if acknowledgement else None
             return {
-                'status': 'success',
-                'storage_location': storage_result.get('file_path'),
-                'records_stored': storage_result.get('records_count', 1),
-                'processing_time': storage_result.get('processing_time', 0),
-                'compression_ratio': storage_result.get('compression_ratio', 1.0)
+                'status': acknowledgement['status'] if acknowledgement else 'failed',
+                'storage_location': f"{self.config.azure_base_directory}/food_analyses/{partition_key}" if partition_key else None,
+                'records_stored': len(transformed_data['records']),
+                'processing_time': (datetime.now() - etl_start).total_seconds()
             }
             
         except Exception as e:
@@ -246,6 +292,15 @@ class FoodVisionETLIntegration:
                 'processing_time': 0
             }
     
+    async def _load_batch(self, data_type: str, partition_key: str, records: List[Dict], filename: str) -> bool:
+        """Load a write-behind batch, then invalidate the analytics reports of its users"""
+        loaded = await self.etl_pipeline.load_batch(data_type, partition_key, records, filename)
+        if loaded:
+            # Reports read the loaded partitions, so a report cached before this point is stale now
+            for user_id in {record.get('user_id') for record in records if record.get('user_id')}:
+                self._analytics_versions[user_id] = self._analytics_versions.get(user_id, 0) + 1
+        return loaded
+    
     async def _generate_nutrition_insights(self, vision_result: Dict[str, Any], user_id: str) -> Dict[str, Any]:
         """Generate enhanced nutrition insights from analysis result"""
         insights_start = datetime.now()
@@ -472,40 +527,22 @@ class FoodVisionETLIntegration:
         
         return recommendations
     
+    async def _update_nutrition_profile(self, record: Dict[str, Any]):
+        """Fold a stored analysis into the user's rolling profile (best effort)"""
+        if self.nutrition_profiles is None:
+            return
+        try:
+            await self.nutrition_profiles.record(record)
+        except Exception as e:
+            logger.warning(f"Failed to update nutrition profile for {record.get('user_id')}: {e}")
+    
     async def _get_user_nutrition_history(self, user_id: str, days: int = 7) -> Dict[str, Any]:
-        """Retrieve user's nutrition history for comparison"""
+        """Retrieve user's nutrition history for comparison (one read of the rolling profile)"""
+        if self.nutrition_profiles is None:
+            return {'status': 'unavailable', 'days_analyzed': days}
+        
         try:
-            # Use ETL retriever to get historical data
-            retriever = DietDataRetriever(self.config)
-            
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            historical_data = await retriever.retrieve_nutrition_data(
-                data_types=['nutrition_logs', 'food_analyses'],
-                start_date=start_date,
-                end_date=end_date,
-                user_ids=[user_id]
-            )
-            
-            if not historical_data.get('records'):
-                return {'status': 'no_history', 'days_analyzed': days}
-            
-            # Calculate averages
-            total_records = len(historical_data['records'])
-            total_calories = sum(record.get('total_nutrition', {}).get('calories', 0) 
-                               for record in historical_data['records'])
-            total_protein = sum(record.get('total_nutrition', {}).get('protein', 0) 
-                              for record in historical_data['records'])
-            
-            return {
-                'status': 'available',
-                'days_analyzed': days,
-                'total_meals_recorded': total_records,
-                'avg_daily_calories': total_calories / max(1, days),
-                'avg_daily_protein': total_protein / max(1, days),
-                'data_quality': 'good' if total_records >= days * 2 else 'limited'
-            }
+            return await self.nutrition_profiles.history(user_id, days)
             
         except Exception as e:
             logger.error(f"Failed to retrieve user history: {e}")
@@ -598,6 +635,10 @@ class FoodVisionETLIntegration:
         """
         Get comprehensive nutrition analytics for a user
         
+        Records are read once into a columnar NutritionAnalytics engine and
+        the report is cached per (user, date range, data version); loading a
+        batch holding the user's analyses bumps the version.
+        
         Args:
             user_id: User identifier
             start_date: Start date for analysis (default: 30 days ago)
@@ -614,17 +655,18 @@ class FoodVisionETLIntegration:
             start_date = end_date - timedelta(days=30)
         
         try:
-            # Retrieve user data using ETL system
-            retriever = DietDataRetriever(self.config)
-            
-            user_data = await retriever.retrieve_nutrition_data(
-                data_types=['nutrition_logs', 'food_analyses'],
-                start_date=start_date,
-                end_date=end_date,
-                user_ids=[user_id]
-            )
-            
-            if not user_data.get('records'):
+            start_day, end_day = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+            # Consistency scores count days up to today, so the day is part of the version
+            cache_key = (user_id, start_day, end_day, self._analytics_versions.get(user_id, 0), datetime.now().date())
+            report = self.analytics_cache.get(cache_key)
+            if report is None:
+                records = []
+                for data_type in ('nutrition_logs', 'food_analyses'):
+                    records.extend(await self.etl_pipeline.retriever.retrieve_data(data_type, start_day, end_day, [user_id]))
+                report = NutritionAnalytics(records).report()
+                self.analytics_cache.put(cache_key, report)
+            
+            if not report['total_records']:
                 return {
                     'user_id': user_id,
                     'status': 'no_data',
@@ -635,9 +677,7 @@ class FoodVisionETLIntegration:
                     }
                 }
             
-            records = user_data['records']
-            
-            # Calculate comprehensive analytics
+            total_records = report['total_records']
             analytics = {
                 'user_id': user_id,
                 'status': 'success',
@@ -647,18 +687,18 @@ class FoodVisionETLIntegration:
                     'days_analyzed': (end_date - start_date).days
                 },
                 
-                'summary_statistics': self._calculate_summary_statistics(records),
-                'nutrition_trends': self._analyze_nutrition_trends(records),
-                'meal_patterns': self._analyze_meal_patterns(records),
-                'food_preferences': self._analyze_food_preferences(records),
-                'health_indicators': self._calculate_health_indicators(records),
-                'recommendations': self._generate_analytics_recommendations(records),
+                'summary_statistics': report['summary_statistics'],
+                'nutrition_trends': report['nutrition_trends'],
+                'meal_patterns': report['meal_patterns'],
+                'food_preferences': report['food_preferences'],
+                'health_indicators': report['health_indicators'],
+                'recommendations': report['recommendations'],
                 
                 'data_quality': {
-                    'total_records': len(records),
-                    'days_with_data': len(set(r.get('date', '')[:10] for r in records)),
-                    'average_meals_per_day': len(records) / max(1, (end_date - start_date).days),
-                    'completeness_score': min(len(records) / ((end_date - start_date).days * 3) * 100, 100)
+                    'total_records': total_records,
+                    'days_with_data': report['days_with_data'],
+                    'average_meals_per_day': total_records / max(1, (end_date - start_date).days),
+                    'completeness_score': min(total_records / max(1, (end_date - start_date).days * 3) * 100, 100)
                 },
                 
                 'generated_at': datetime.now().isoformat()
@@ -666,7 +706,7 @@ class FoodVisionETLIntegration:
             
             # Add predictions if requested
             if include_predictions:
-                analytics['predictions'] = await self._generate_nutrition_predictions(records, user_id)
+                analytics['predictions'] = report['predictions']
             
             return analytics
             
@@ -679,381 +719,6 @@ class FoodVisionETLIntegration:
                 'generated_at': datetime.now().isoformat()
             }
     
-    def _calculate_summary_statistics(self, records: List[Dict]) -> Dict[str, Any]:
-        """Calculate summary nutrition statistics"""
-        
-        total_calories = []
-        total_protein = []
-        total_carbs = []
-        total_fat = []
-        
-        for record in records:
-            nutrition = record.get('total_nutrition', {})
-            total_calories.append(nutrition.get('calories', 0))
-            total_protein.append(nutrition.get('protein', 0))
-            total_carbs.append(nutrition.get('carbs', 0))
-            total_fat.append(nutrition.get('fat', 0))
-        
-        return {
-            'calories': {
-                'average': sum(total_calories) / len(total_calories) if total_calories else 0,
-                'min': min(total_calories) if total_calories else 0,
-                'max': max(total_calories) if total_calories else 0,
-                'total': sum(total_calories)
-            },
-            'protein_g': {
-                'average': sum(total_protein) / len(total_protein) if total_protein else 0,
-                'min': min(total_protein) if total_protein else 0,
-                'max': max(total_protein) if total_protein else 0,
-                'total': sum(total_protein)
-            },
-            'carbohydrates_g': {
-                'average': sum(total_carbs) / len(total_carbs) if total_carbs else 0,
-                'min': min(total_carbs) if total_carbs else 0,
-                'max': max(total_carbs) if total_carbs else 0,
-                'total': sum(total_carbs)
-            },
-            'fat_g': {
-                'average': sum(total_fat) / len(total_fat) if total_fat else 0,
-                'min': min(total_fat) if total_fat else 0,
-                'max': max(total_fat) if total_fat else 0,
-                'total': sum(total_fat)
-            }
-        }
-    
-    def _analyze_nutrition_trends(self, records: List[Dict]) -> Dict[str, Any]:
-        """Analyze nutrition trends over time"""
-        
-        # Group records by date
-        daily_nutrition = {}
-        
-        for record in records:
-            date_str = record.get('date', record.get('created_at', ''))[:10]  # YYYY-MM-DD
-            
-            if date_str not in daily_nutrition:
-                daily_nutrition[date_str] = {
-                    'calories': 0,
-                    'protein': 0,
-                    'carbs': 0,
-                    'fat': 0,
-                    'meals': 0
-                }
-            
-            nutrition = record.get('total_nutrition', {})
-            daily_nutrition[date_str]['calories'] += nutrition.get('calories', 0)
-            daily_nutrition[date_str]['protein'] += nutrition.get('protein', 0)
-            daily_nutrition[date_str]['carbs'] += nutrition.get('carbs', 0)
-            daily_nutrition[date_str]['fat'] += nutrition.get('fat', 0)
-            daily_nutrition[date_str]['meals'] += 1
-        
-        # Calculate trends
-        sorted_dates = sorted(daily_nutrition.keys())
-        
-        if len(sorted_dates) < 2:
-            return {'status': 'insufficient_data'}
-        
-        # Simple trend calculation (last 7 days vs previous 7 days)
-        mid_point = len(sorted_dates) // 2
-        recent_dates = sorted_dates[mid_point:]
-        earlier_dates = sorted_dates[:mid_point]
-        
-        recent_avg_calories = sum(daily_nutrition[d]['calories'] for d in recent_dates) / len(recent_dates)
-        earlier_avg_calories = sum(daily_nutrition[d]['calories'] for d in earlier_dates) / len(earlier_dates)
-        
-        calorie_trend = ((recent_avg_calories - earlier_avg_calories) / earlier_avg_calories * 100) if earlier_avg_calories > 0 else 0
-        
-        return {
-            'status': 'available',
-            'daily_averages': {
-                'recent_period': {
-                    'calories': recent_avg_calories,
-                    'days': len(recent_dates)
-                },
-                'earlier_period': {
-                    'calories': earlier_avg_calories,
-                    'days': len(earlier_dates)
-                }
-            },
-            'trends': {
-                'calorie_change_percent': round(calorie_trend, 1),
-                'trend_direction': 'increasing' if calorie_trend > 5 else 'decreasing' if calorie_trend < -5 else 'stable'
-            },
-            'daily_data': daily_nutrition
-        }
-    
-    def _analyze_meal_patterns(self, records: List[Dict]) -> Dict[str, Any]:
-        """Analyze meal timing and frequency patterns"""
-        
-        meal_types = {}
-        meal_times = {}
-        
-        for record in records:
-            meal_type = record.get('meal_type', 'unknown')
-            created_at = record.get('created_at', '')
-            
-            # Count meal types
-            meal_types[meal_type] = meal_types.get(meal_type, 0) + 1
-            
-            # Analyze meal times (if timestamp available)
-            if created_at and 'T' in created_at:
-                try:
-                    time_part = created_at.split('T')[1][:5]  # HH:MM
-                    hour = int(time_part[:2])
-                    
-                    if meal_type not in meal_times:
-                        meal_times[meal_type] = []
-                    meal_times[meal_type].append(hour)
-                    
-                except (ValueError, IndexError):
-                    pass
-        
-        # Calculate average meal times
-        avg_meal_times = {}
-        for meal_type, hours in meal_times.items():
-            if hours:
-                avg_meal_times[meal_type] = sum(hours) / len(hours)
-        
-        return {
-            'meal_frequency': meal_types,
-            'average_meal_times': avg_meal_times,
-            'meal_regularity': {
-                'total_meals': len(records),
-                'most_common_meal': max(meal_types.items(), key=lambda x: x[1])[0] if meal_types else 'none',
-                'meal_diversity': len(meal_types)
-            }
-        }
-    
-    def _analyze_food_preferences(self, records: List[Dict]) -> Dict[str, Any]:
-        """Analyze user's food preferences and dietary patterns"""
-        
-        food_frequency = {}
-        
-        for record in records:
-            food_items = record.get('food_items', record.get('detected_foods', []))
-            
-            for food_item in food_items:
-                if isinstance(food_item, dict):
-                    food_name = food_item.get('name', food_item.get('food_name', 'unknown'))
-                elif isinstance(food_item, str):
-                    food_name = food_item
-                else:
-                    continue
-                
-                food_name = food_name.lower().strip()
-                food_frequency[food_name] = food_frequency.get(food_name, 0) + 1
-        
-        # Get top foods
-        top_foods = sorted(food_frequency.items(), key=lambda x: x[1], reverse=True)[:10]
-        
-        # Categorize preferences
-        categories = self._categorize_food_preferences(food_frequency)
-        
-        return {
-            'top_foods': [{'name': name, 'frequency': freq} for name, freq in top_foods],
-            'food_categories': categories,
-            'dietary_patterns': {
-                'total_unique_foods': len(food_frequency),
-                'most_frequent_food': top_foods[0][0] if top_foods else 'none',
-                'food_diversity_score': min(len(food_frequency) * 10, 100)
-            }
-        }
-    
-    def _categorize_food_preferences(self, food_frequency: Dict[str, int]) -> Dict[str, int]:
-        """Categorize foods into dietary categories"""
-        
-        categories = {
-            'grains': 0,
-            'proteins': 0,
-            'vegetables': 0,
-            'fruits': 0,
-            'dairy': 0,
-            'snacks': 0,
-            'beverages': 0,
-            'other': 0
-        }
-        
-        for food_name, frequency in food_frequency.items():
-            if any(grain in food_name for grain in ['rice', 'bread', 'roti', 'noodles', 'pasta']):
-                categories['grains'] += frequency
-            elif any(protein in food_name for protein in ['chicken', 'fish', 'meat', 'egg', 'dal', 'beans', 'lentils']):
-                categories['proteins'] += frequency
-            elif any(veg in food_name for veg in ['vegetable', 'curry', 'salad', 'greens', 'spinach']):
-                categories['vegetables'] += frequency
-            elif any(fruit in food_name for fruit in ['fruit', 'banana', 'apple', 'mango', 'orange']):
-                categories['fruits'] += frequency
-            elif any(dairy in food_name for dairy in ['milk', 'yogurt', 'cheese', 'curd']):
-                categories['dairy'] += frequency
-            elif any(snack in food_name for snack in ['biscuit', 'cake', 'chips', 'chocolate']):
-                categories['snacks'] += frequency
-            elif any(bev in food_name for bev in ['tea', 'coffee', 'juice', 'water']):
-                categories['beverages'] += frequency
-            else:
-                categories['other'] += frequency
-        
-        return categories
-    
-    def _calculate_health_indicators(self, records: List[Dict]) -> Dict[str, Any]:
-        """Calculate health-related indicators from nutrition data"""
-        
-        if not records:
-            return {'status': 'no_data'}
-        
-        # Calculate daily averages
-        summary_stats = self._calculate_summary_statistics(records)
-        avg_calories = summary_stats['calories']['average']
-        avg_protein = summary_stats['protein_g']['average']
-        avg_carbs = summary_stats['carbohydrates_g']['average']
-        avg_fat = summary_stats['fat_g']['average']
-        
-        # Health indicators
-        indicators = {
-            'caloric_balance': {
-                'daily_average': avg_calories,
-                'assessment': self._assess_caloric_intake(avg_calories),
-                'target_range': '1800-2200 calories/day (varies by individual)'
-            },
-            
-            'protein_adequacy': {
-                'daily_average_g': avg_protein,
-                'percentage_of_calories': (avg_protein * 4 / avg_calories * 100) if avg_calories > 0 else 0,
-                'assessment': 'adequate' if avg_protein >= 50 else 'may_need_increase',
-                'target_range': '15-35% of total calories'
-            },
-            
-            'macronutrient_balance': {
-                'protein_percent': (avg_protein * 4 / avg_calories * 100) if avg_calories > 0 else 0,
-                'carbs_percent': (avg_carbs * 4 / avg_calories * 100) if avg_calories > 0 else 0,
-                'fat_percent': (avg_fat * 9 / avg_calories * 100) if avg_calories > 0 else 0,
-                'balance_assessment': self._assess_macro_balance(avg_protein, avg_carbs, avg_fat, avg_calories)
-            },
-            
-            'meal_consistency': {
-                'meals_per_day': len(records) / max(1, len(set(r.get('date', '')[:10] for r in records))),
-                'consistency_score': self._calculate_consistency_score(records),
-                'assessment': 'needs_improvement'  # Would be calculated based on actual data
-            }
-        }
-        
-        return indicators
-    
-    def _assess_caloric_intake(self, avg_calories: float) -> str:
-        """Assess whether caloric intake is appropriate"""
-        if avg_calories < 1200:
-            return 'too_low'
-        elif avg_calories < 1600:
-            return 'low'
-        elif avg_calories <= 2200:
-            return 'appropriate'
-        elif avg_calories <= 2800:
-            return 'high'
-        else:
-            return 'too_high'
-    
-    def _assess_macro_balance(self, protein: float, carbs: float, fat: float, calories: float) -> str:
-        """Assess macronutrient balance"""
-        if calories == 0:
-            return 'insufficient_data'
-        
-        protein_pct = (protein * 4 / calories) * 100
-        carbs_pct = (carbs * 4 / calories) * 100
-        fat_pct = (fat * 9 / calories) * 100
-        
-        balanced = (15 <= protein_pct <= 35 and 45 <= carbs_pct <= 65 and 20 <= fat_pct <= 35)
-        
-        if balanced:
-            return 'well_balanced'
-        elif protein_pct > 35:
-            return 'high_protein'
-        elif carbs_pct > 65:
-            return 'high_carbohydrate'
-        elif fat_pct > 35:
-            return 'high_fat'
-        else:
-            return 'needs_adjustment'
-    
-    def _calculate_consistency_score(self, records: List[Dict]) -> float:
-        """Calculate meal consistency score"""
-        if len(records) < 7:
-            return 50.0  # Insufficient data
-        
-        # Simple consistency measure based on meal frequency
-        dates = [r.get('date', r.get('created_at', ''))[:10] for r in records]
-        unique_dates = len(set(dates))
-        total_days = (datetime.now() - datetime.fromisoformat(min(dates) + 'T00:00:00')).days + 1
-        
-        consistency = (unique_dates / total_days) * 100
-        return min(consistency, 100)
-    
-    def _generate_analytics_recommendations(self, records: List[Dict]) -> List[str]:
-        """Generate recommendations based on analytics"""
-        recommendations = []
-        
-        if not records:
-            return ["Start tracking your meals to get personalized recommendations"]
-        
-        summary_stats = self._calculate_summary_statistics(records)
-        avg_calories = summary_stats['calories']['average']
-        
-        # Caloric recommendations
-        if avg_calories < 1200:
-            recommendations.append("Consider increasing your caloric intake with nutrient-dense foods")
-        elif avg_calories > 2500:
-            recommendations.append("Consider reducing portion sizes or choosing lower-calorie options")
-        
-        # Meal frequency
-        unique_dates = len(set(r.get('date', '')[:10] for r in records))
-        if len(records) / max(1, unique_dates) < 2:
-            recommendations.append("Try to eat more regular meals throughout the day")
-        
-        # Default encouragement
-        if not recommendations:
-            recommendations.append("Keep up the good work with consistent meal tracking!")
-        
-        return recommendations
-    
-    async def _generate_nutrition_predictions(self, records: List[Dict], user_id: str) -> Dict[str, Any]:
-        """Generate predictive nutrition insights"""
-        
-        try:
-            if len(records) < 7:
-                return {
-                    'status': 'insufficient_data',
-                    'message': 'Need at least 7 days of data for predictions'
-                }
-            
-            # Simple trend-based predictions
-            summary_stats = self._calculate_summary_statistics(records)
-            trends = self._analyze_nutrition_trends(records)
-            
-            predictions = {
-                'status': 'available',
-                'confidence': 'low',  # Simple predictions have low confidence
-                
-                'weekly_projections': {
-                    'estimated_weekly_calories': summary_stats['calories']['average'] * 7,
-                    'estimated_weekly_protein': summary_stats['protein_g']['average'] * 7,
-                    'trend_direction': trends.get('trends', {}).get('trend_direction', 'stable')
-                },
-                
-                'health_trajectory': {
-                    'current_pattern': 'maintenance' if trends.get('trends', {}).get('trend_direction') == 'stable' else 'changing',
-                    'sustainability_score': 75,  # Default reasonable score
-                    'areas_for_improvement': ['meal_consistency', 'nutrient_diversity']
-                },
-                
-                'goal_recommendations': {
-                    'weight_management': 'maintain_current_intake' if 1600 <= summary_stats['calories']['average'] <= 2200 else 'adjust_intake',
-                    'nutrition_optimization': 'increase_variety',
-                    'meal_planning': 'establish_routine'
-                }
-            }
-            
-            return predictions
-            
-        except Exception as e:
-            logger.error(f"Failed to generate predictions: {e}")
-            return {'status': 'error', 'error': str(e)}
-    
     async def get_system_status(self) -> Dict[str, Any]:
         """Get comprehensive system status and health metrics"""
         
@@ -1063,6 +728,7 @@ class FoodVisionETLIntegration:
             
             # Processing statistics
             stats = self.processing_stats.copy()
+            stats['write_behind'] = self.etl_sink.get_stats()
             
             # Food Vision Pipeline status
             vision_status = {
@@ -1129,8 +795,8 @@ async def create_integrated_food_vision_etl(
         azure_connection_string=azure_connection_string,
         azure_share_name=azure_share_name,
         mongodb_uri="",  # Will use provided client
-        enable_compression=True,
-        enable_backup=True
+        compression_enabled=True,
+        backup_enabled=True
     )
     
     integration = FoodVisionETLIntegration(
@@ -1138,6 +804,7 @@ async def create_integrated_food_vision_etl(
         mongodb_client=mongodb_client,
         enable_real_time_processing=enable_real_time
     )
+    await integration.start()
     
     logger.info("✅ Integrated Food Vision ETL system created successfully")
     return integration
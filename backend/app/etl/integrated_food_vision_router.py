@@ -7,7 +7,7 @@ This combines food image analysis with automatic data storage and comprehensive
 """
 
 from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, BackgroundTasks, Query, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
@@ -19,11 +19,19 @@ from ..auth.dependencies import get_current_user
 from .food_vision_etl_integration import FoodVisionETLIntegration, create_integrated_food_vision_etl
 from .config import AzureETLConfig
 from .scheduler import ETLScheduler
+from .batch_analysis import BatchAnalysisEngine, BatchImage
 
 logger = logging.getLogger(__name__)
 
 # Global integrated system instance
 integrated_system: Optional[FoodVisionETLIntegration] = None
+_integrated_system_lock = asyncio.Lock()
+
+# Batch image analyses, sharing one concurrency limit across requests
+batch_engine: Optional[BatchAnalysisEngine] = None
+
+# ETL statuses of an analysis that was loaded, or durably queued for loading
+ETL_STORED_STATUSES = ('success', 'queued')
 
 # Request/Response Models
 class FoodAnalysisRequest(BaseModel):
@@ -82,24 +90,50 @@ async def get_integrated_system() -> FoodVisionETLIntegration:
     """Get or initialize the integrated system"""
     global integrated_system
     
-    if integrated_system is None:
-        # Initialize with environment variables or default config
-        # In production, these would come from proper configuration
-        azure_connection_string = "your_azure_connection_string_here"
-        azure_share_name = "diet-agent-data"
-        
-        # This would typically be injected via dependency injection
-        mongodb_client = None  # Get from your existing MongoDB setup
-        
-        integrated_system = await create_integrated_food_vision_etl(
-            azure_connection_string=azure_connection_string,
-            azure_share_name=azure_share_name,
-            mongodb_client=mongodb_client,
-            enable_real_time=True
-        )
+    # Concurrent first requests must share one system (and its model handles)
+    async with _integrated_system_lock:
+        if integrated_system is None:
+            # Initialize with environment variables or default config
+            # In production, these would come from proper configuration
+            azure_connection_string = "your_azure_connection_string_here"
+            azure_share_name = "diet-agent-data"
+            
+            # This would typically be injected via dependency injection
+            mongodb_client = None  # Get from your existing MongoDB setup
+            
+            integrated_system = await create_integrated_food_vision_etl(
+                azure_connection_string=azure_connection_string,
+                azure_share_name=azure_share_name,
+                mongodb_client=mongodb_client,
+                enable_real_time=True
+            )
     
     return integrated_system
 
+async def get_batch_engine() -> BatchAnalysisEngine:
+    """Get or initialize the batch analysis engine on top of the integrated system"""
+    global batch_engine
+    
+    system = await get_integrated_system()
+    if batch_engine is None:
+        async def analyze(user_id: str, image: BatchImage) -> Dict[str, Any]:
+            return await _analyze_batch_image(system, user_id, image)
+        
+        batch_engine = BatchAnalysisEngine(
+            analyze,
+            max_concurrency=system.config.batch_analysis_concurrency,
+            retention_seconds=system.config.batch_analysis_retention_seconds
+        )
+    
+    return batch_engine
+
+async def shutdown_integrated_system():
+    """Stop batch analyses and load ETL records still buffered by the integrated system"""
+    if batch_engine is not None:
+        await batch_engine.shutdown()
+    if integrated_system is not None:
+        await integrated_system.shutdown()
+
 @router.post("/analyze", 
              response_model=FoodAnalysisResponse,
              summary="Analyze food image with integrated ETL processing",
@@ -163,8 +197,8 @@ async def analyze_food_image_integrated(
         insights = result.get('nutrition_insights', {})
         performance = result.get('performance_metrics', {})
         
-        # Schedule background analytics update if ETL processing was successful
-        if etl_processing.get('status') == 'success':
+        # Schedule background analytics update once the analysis is stored or queued
+        if etl_processing.get('status') in ETL_STORED_STATUSES:
             background_tasks.add_task(
                 update_user_analytics_cache,
                 user_id,
@@ -479,12 +513,16 @@ async def get_nutrition_insights(
 
 @router.post("/batch-analyze",
              summary="Batch analyze multiple food images",
-             description="Upload and analyze multiple food images in a single request.")
+             description="Upload and analyze multiple food images in a single request. Images are analyzed "
+                         "concurrently; mode=stream returns one NDJSON line per image as it finishes and "
+                         "mode=async returns a batch ID to poll at /batch-analyze/{batch_id}.")
 async def batch_analyze_food_images(
     files: List[UploadFile] = File(..., description="List of food image files"),
     meal_types: str = Form(..., description="Comma-separated meal types corresponding to each image"),
     text_descriptions: Optional[str] = Form(None, description="Comma-separated text descriptions (optional)"),
     dietary_restrictions: Optional[str] = Form(None, description="Comma-separated dietary restrictions"),
+    mode: str = Query(default="sync", pattern="^(sync|stream|async)$",
+                      description="sync: wait for all images; stream: NDJSON per image; async: return a batch ID"),
     current_user = Depends(get_current_user),
     background_tasks: BackgroundTasks = BackgroundTasks()
 ):
@@ -508,79 +546,42 @@ async def batch_analyze_food_images(
         )
     
     try:
-        system = await get_integrated_system()
+        engine = await get_batch_engine()
         user_id = current_user.get('user_id', 'unknown_user')
         
-        batch_results = []
-        
+        # Uploads are only readable during the request, so read them before analyzing
+        images = []
         for i, file in enumerate(files):
-            if not file.content_type.startswith('image/'):
-                batch_results.append({
-                    'file_index': i,
-                    'filename': file.filename,
-                    'status': 'error',
-                    'error': 'File is not an image'
-                })
-                continue
-            
-            try:
-                image_data = await file.read()
-                meal_type = meal_type_list[i]
-                text_desc = description_list[i] if i < len(description_list) else None
-                
-                # Analyze image
-                result = await system.analyze_and_store_food_image(
-                    image_data=image_data,
-                    user_id=user_id,
-                    meal_type=meal_type,
-                    text_description=text_desc,
-                    dietary_restrictions=restriction_list,
-                    use_complete_pipeline=True
-                )
-                
-                batch_results.append({
-                    'file_index': i,
-                    'filename': file.filename,
-                    'analysis_id': result.get('analysis_id'),
-                    'status': result.get('status', 'unknown'),
-                    'detected_foods_count': len(result.get('food_analysis', {}).get('detected_foods', [])),
-                    'total_calories': result.get('food_analysis', {}).get('nutrition_summary', {}).get('total_calories', 0),
-                    'confidence_score': result.get('food_analysis', {}).get('confidence_metrics', {}).get('overall_confidence', 0),
-                    'etl_stored': result.get('etl_processing', {}).get('status') == 'success'
-                })
-                
-            except Exception as e:
-                batch_results.append({
-                    'file_index': i,
-                    'filename': file.filename,
-                    'status': 'error',
-                    'error': str(e)
-                })
-        
-        # Calculate batch summary
-        successful_analyses = [r for r in batch_results if r['status'] == 'success']
-        total_calories = sum(r.get('total_calories', 0) for r in successful_analyses)
-        
-        batch_summary = {
-            'batch_id': f"batch_{user_id}_{int(datetime.now().timestamp())}",
-            'user_id': user_id,
-            'total_images': len(files),
-            'successful_analyses': len(successful_analyses),
-            'failed_analyses': len(files) - len(successful_analyses),
-            'total_calories_detected': total_calories,
-            'processing_completed_at': datetime.now().isoformat(),
-            
-            'results': batch_results
-        }
+            is_image = (file.content_type or '').startswith('image/')
+            images.append(BatchImage(
+                index=i,
+                filename=file.filename,
+                content_type=file.content_type,
+                data=await file.read() if is_image else b'',
+                meal_type=meal_type_list[i],
+                text_description=description_list[i] if i < len(description_list) else None,
+                dietary_restrictions=restriction_list
+            ))
+        
+        batch_id = engine.submit(user_id, images)
+        
+        if mode == 'async':
+            return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={
+                'batch_id': batch_id,
+                'user_id': user_id,
+                'status': 'processing',
+                'total_images': len(images),
+                'status_url': f"{router.prefix}/batch-analyze/{batch_id}"
+            })
         
-        # Schedule background analytics update
-        background_tasks.add_task(
-            update_user_analytics_cache,
-            user_id,
-            batch_summary['batch_id']
-        )
+        # Schedule background analytics update (runs once the response has been sent)
+        background_tasks.add_task(update_user_analytics_cache, user_id, batch_id)
+        
+        if mode == 'stream':
+            return StreamingResponse(_stream_batch(engine, batch_id), media_type="application/x-ndjson")
         
-        logger.info(f"✅ Batch analysis completed: {len(successful_analyses)}/{len(files)} successful")
+        batch_summary = await engine.wait(batch_id)
+        logger.info(f"✅ Batch analysis completed: {batch_summary['successful_analyses']}/{len(files)} successful")
         return batch_summary
         
     except Exception as e:
@@ -590,6 +591,32 @@ async def batch_analyze_food_images(
             detail=f"Batch analysis failed: {str(e)}"
         )
 
+@router.get("/batch-analyze/{batch_id}",
+            summary="Get batch analysis progress",
+            description="Poll a batch submitted with mode=async for progress and the image results so far.")
+async def get_batch_analysis(
+    batch_id: str,
+    current_user = Depends(get_current_user)
+):
+    """Get progress and results of a batch analysis"""
+    
+    engine = await get_batch_engine()
+    batch_status = engine.get_status(batch_id)
+    
+    if batch_status is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch not found or expired"
+        )
+    
+    if batch_status['user_id'] != current_user.get('user_id') and not current_user.get('is_admin', False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. You can only view your own batches."
+        )
+    
+    return batch_status
+
 @router.get("/system/status",
             summary="Get integrated system status",
             description="Get comprehensive status of the integrated Food Vision + ETL system.")
@@ -655,6 +682,7 @@ async def get_system_metrics(
                 'etl_processing_rate': (stats.get('successful_etl_processes', 0) / 
                                       max(1, stats.get('total_analyses', 1)) * 100)
             },
+            'batch_analysis': batch_engine.get_stats() if batch_engine is not None else None,
             'system_health': {
                 'food_vision_available': system.simplified_vision is not None,
                 'etl_pipeline_active': system.etl_pipeline is not None,
@@ -674,6 +702,38 @@ async def get_system_metrics(
         )
 
 # Helper functions
+async def _analyze_batch_image(system: FoodVisionETLIntegration, user_id: str, image: BatchImage) -> Dict[str, Any]:
+    """Analyze one image of a batch into its batch result entry"""
+    if not (image.content_type or '').startswith('image/'):
+        return {'status': 'error', 'error': 'File is not an image'}
+    
+    result = await system.analyze_and_store_food_image(
+        image_data=image.data,
+        user_id=user_id,
+        meal_type=image.meal_type,
+        text_description=image.text_description,
+        dietary_restrictions=image.dietary_restrictions,
+        use_complete_pipeline=True
+    )
+    
+    return {
+        'analysis_id': result.get('analysis_id'),
+        'status': result.get('status', 'unknown'),
+        'detected_foods_count': len(result.get('food_analysis', {}).get('detected_foods', [])),
+        'total_calories': result.get('food_analysis', {}).get('nutrition_summary', {}).get('total_calories', 0),
+        'confidence_score': result.get('food_analysis', {}).get('confidence_metrics', {}).get('overall_confidence', 0),
+        'etl_stored': result.get('etl_processing', {}).get('status') in ETL_STORED_STATUSES
+    }
+
+async def _stream_batch(engine: BatchAnalysisEngine, batch_id: str):
+    """NDJSON lines: one per image as it finishes, then the batch summary"""
+    async for result in engine.stream(batch_id):
+        yield json.dumps({'event': 'result', **result}, default=str) + "\n"
+    
+    summary = engine.get_status(batch_id)
+    summary.pop('results')
+    yield json.dumps({'event': 'summary', **summary}, default=str) + "\n"
+
 async def update_user_analytics_cache(user_id: str, analysis_id: str):
     """Background task to update user analytics cache"""
     try:
@@ -0,0 +1,457 @@
+"""
+Asyncio Job Scheduler
+=====================
+
+Runs async jobs on cron schedules inside the application's event loop.
+
+- Cron expressions (minute hour day-of-month month day-of-week)
+- Per-job concurrency limits, enforced locally and across replicas with
+  Mongo lease locks that are renewed while a run is in progress; a run
+  whose lease is taken by another owner is stopped
+- Run history persisted to Mongo with durations and row counts
+- A pluggable clock; FakeClock lets tests drive schedules deterministically
+"""
+
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+RUN_HISTORY_COLLECTION = "etl_job_runs"
+LEASE_COLLECTION = "etl_job_leases"
+
+DAY_NAMES = {'sun': 0, 'mon': 1, 'tue': 2, 'wed': 3, 'thu': 4, 'fri': 5, 'sat': 6}
+MONTH_NAMES = {name: i + 1 for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+)}
+
+
+class CronExpression:
+    """Standard five-field cron expression with ranges, steps, lists and names"""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {len(fields)}: {expression!r}")
+        self.expression = expression
+        self.minutes = self._parse(fields[0], 0, 59)
+        self.hours = self._parse(fields[1], 0, 23)
+        self.days = self._parse(fields[2], 1, 31)
+        self.months = self._parse(fields[3], 1, 12, MONTH_NAMES)
+        self.weekdays = {d % 7 for d in self._parse(fields[4], 0, 7, DAY_NAMES)}
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(text: str, low: int, high: int, names: Dict[str, int] = None) -> Set[int]:
+        def value(token: str) -> int:
+            token = token.lower()
+            if names and token[:3] in names:
+                return names[token[:3]]
+            return int(token)
+
+        values = set()
+        for part in text.split(','):
+            step = 1
+            if '/' in part:
+                part, step_text = part.split('/')
+                step = int(step_text)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start_text, end_text = part.split('-')
+                start, end = value(start_text), value(end_text)
+            else:
+                start = value(part)
+                end = high if step > 1 else start
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"Invalid cron field {text!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        # Like cron: when both day fields are restricted, either may match
+        if not self._any_day and not self._any_weekday:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after ``moment``"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment.year + 5
+        while candidate.year <= limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r})"
+
+
+def cron_from_schedule(schedule_type: str, schedule_time: str) -> str:
+    """Translate the legacy daily/hourly/weekly schedule settings to a cron expression"""
+    if schedule_type == 'cron':
+        return schedule_time
+    if schedule_type == 'daily':
+        hour, minute = schedule_time.split(':')
+        return f"{int(minute)} {int(hour)} * * *"
+    if schedule_type == 'hourly':
+        return f"{int(schedule_time)} * * * *"
+    if schedule_type == 'weekly':
+        day, time_str = schedule_time.split(' ')
+        hour, minute = time_str.split(':')
+        return f"{int(minute)} {int(hour)} * * {day.lower()[:3]}"
+    raise ValueError(f"Schedule type {schedule_type!r} has no cron equivalent")
+
+
+class SystemClock:
+    """Wall clock used in production"""
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(max(0.0, seconds))
+
+
+class FakeClock:
+    """Manually advanced clock; sleepers wake in deadline order as time moves"""
+
+    def __init__(self, start: datetime):
+        self._now = start
+        self._sleepers: List[tuple] = []
+
+    def now(self) -> datetime:
+        return self._now
+
+    async def sleep(self, seconds: float):
+        future = asyncio.get_running_loop().create_future()
+        self._sleepers.append((self._now + timedelta(seconds=max(0.0, seconds)), future))
+        try:
+            await future
+        finally:
+            self._sleepers = [s for s in self._sleepers if s[1] is not future]
+
+    @staticmethod
+    async def settle(rounds: int = 50):
+        """Let woken tasks run until they block again"""
+        for _ in range(rounds):
+            await asyncio.sleep(0)
+
+    async def advance(self, seconds: float):
+        target = self._now + timedelta(seconds=seconds)
+        while True:
+            await self.settle()
+            due = [s for s in self._sleepers if s[0] <= target and not s[1].done()]
+            if not due:
+                break
+            self._now = max(self._now, min(deadline for deadline, _ in due))
+            for deadline, future in due:
+                if deadline <= self._now:
+                    future.set_result(None)
+        self._now = target
+        await self.settle()
+
+
+class LeaseLostError(RuntimeError):
+    """Another owner took a lease while a run still held it"""
+
+
+class LeaseLock:
+    """
+    Mongo lease lock shared by all replicas
+
+    A lease document per name records its owner and expiry; it can be taken
+    when missing or expired. Leases expire on their own if a replica dies.
+    """
+
+    def __init__(self, collection, clock, owner: Optional[str] = None):
+        self.collection = collection
+        self.clock = clock
+        self.owner = owner or uuid.uuid4().hex
+
+    async def acquire(self, name: str, ttl_seconds: float) -> bool:
+        """Take or renew the lease; False if another owner holds it"""
+        now = self.clock.now()
+        try:
+            await self.collection.update_one(
+                {"_id": name, "$or": [{"expires_at": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "acquired_at": now, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def release(self, name: str):
+        await self.collection.delete_one({"_id": name, "owner": self.owner})
+
+
+class RunHistory:
+    """Job runs persisted in Mongo"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            await self.collection.create_index([("job_name", 1), ("started_at", DESCENDING)], name="job_started")
+            await self.collection.create_index([("started_at", DESCENDING)], name="started")
+            self._indexes_ready = True
+
+    async def record(self, run: Dict[str, Any]):
+        await self._ensure_indexes()
+        await self.collection.replace_one({"_id": run["_id"]}, run, upsert=True)
+
+    async def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": run_id})
+
+    async def recent(self, limit: int = 50, status: Optional[str] = None,
+                     job_name: Optional[str] = None, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Most recent runs first"""
+        await self._ensure_indexes()
+        query: Dict[str, Any] = {}
+        if status:
+            query["status"] = status
+        if job_name:
+            query["job_name"] = job_name
+        if since:
+            query["finished_at"] = {"$gte": since}
+        cursor = self.collection.find(query).sort("started_at", DESCENDING).limit(limit)
+        return [run async for run in cursor]
+
+    async def summary(self) -> Dict[str, Any]:
+        """Counts and mean duration per status, last finish per status"""
+        await self._ensure_indexes()
+        cursor = self.collection.aggregate([
+            {"$match": {"status": {"$ne": "running"}}},
+            {"$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "total_duration": {"$sum": "$duration_seconds"},
+                "records_processed": {"$sum": "$records_processed"},
+                "last_finished_at": {"$max": "$finished_at"}
+            }}
+        ])
+        return {group["_id"]: group async for group in cursor}
+
+
+JobFunc = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class ScheduledJob:
+    """
+    A job and its schedule
+
+    ``func`` returns a result dict; ``records_processed``, ``errors`` and
+    ``status`` are copied into the run history when present.
+    """
+    name: str
+    cron: Optional[CronExpression]
+    func: JobFunc
+    max_concurrency: int = 1
+    timeout_seconds: float = 3600
+    max_retries: int = 0
+    lease_seconds: float = 300
+    enabled: bool = True
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class AsyncJobScheduler:
+    """Cron scheduler running jobs as tasks on the current event loop"""
+
+    def __init__(self, history: RunHistory, lock: Optional[LeaseLock] = None, clock=None):
+        self.history = history
+        self.clock = clock or SystemClock()
+        self.lock = lock
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self.running = False
+        self._loops: Dict[str, asyncio.Task] = {}
+        self._runs: Set[asyncio.Task] = set()
+        # Lease slots ("job#n") held by runs in this process
+        self._held: Set[str] = set()
+
+    def add_job(self, job: ScheduledJob):
+        self.remove_job(job.name)
+        self.jobs[job.name] = job
+        if self.running:
+            self._start_loop(job)
+
+    def remove_job(self, name: str):
+        self.jobs.pop(name, None)
+        loop_task = self._loops.pop(name, None)
+        if loop_task:
+            loop_task.cancel()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        for job in self.jobs.values():
+            self._start_loop(job)
+
+    async def stop(self, wait: bool = False):
+        """Stop scheduling; optionally wait for runs in progress"""
+        self.running = False
+        for loop_task in self._loops.values():
+            loop_task.cancel()
+        self._loops.clear()
+        if wait and self._runs:
+            await asyncio.gather(*self._runs, return_exceptions=True)
+
+    def next_run_time(self, name: str) -> Optional[datetime]:
+        job = self.jobs.get(name)
+        if not job or not job.cron or not job.enabled:
+            return None
+        return job.cron.next_after(self.clock.now())
+
+    def active_runs(self, name: str) -> int:
+        return sum(1 for slot in self._held if slot.rsplit('#', 1)[0] == name)
+
+    def _start_loop(self, job: ScheduledJob):
+        if job.enabled and job.cron:
+            self._loops[job.name] = asyncio.create_task(self._schedule_loop(job))
+
+    async def _schedule_loop(self, job: ScheduledJob):
+        while self.running:
+            due = job.cron.next_after(self.clock.now())
+            while self.clock.now() < due:
+                await self.clock.sleep((due - self.clock.now()).total_seconds())
+            # Runs are not awaited so a long run never delays the next tick
+            run = asyncio.create_task(self.execute(job.name, trigger='scheduled'))
+            self._runs.add(run)
+            run.add_done_callback(self._runs.discard)
+
+    async def _acquire_slot(self, job: ScheduledJob) -> Optional[str]:
+        for slot in range(job.max_concurrency):
+            name = f"{job.name}#{slot}"
+            if name in self._held:
+                continue
+            # Reserve before awaiting so concurrent local runs pick different slots
+            self._held.add(name)
+            if self.lock is None or await self.lock.acquire(name, job.lease_seconds):
+                return name
+            self._held.discard(name)
+        return None
+
+    async def _renew_lease(self, slot: str, job: ScheduledJob):
+        """Keep a run's lease alive; returns once another owner has taken it"""
+        while True:
+            await self.clock.sleep(job.lease_seconds / 3)
+            try:
+                renewed = await self.lock.acquire(slot, job.lease_seconds)
+            except Exception as e:
+                # The lease stays valid until it expires; try again at the next renewal
+                logger.warning(f"Could not renew lease {slot}: {e}")
+                continue
+            if not renewed:
+                logger.error(f"Lost lease {slot} to another owner; stopping the run")
+                return
+
+    def active_count(self) -> int:
+        return len(self._held)
+
+    async def execute(self, name: str, trigger: str = 'manual') -> Dict[str, Any]:
+        """Run a registered job now"""
+        return await self.run(self.jobs[name], trigger)
+
+    async def run(self, job: ScheduledJob, trigger: str = 'manual') -> Dict[str, Any]:
+        """Run a job, subject to its concurrency limit; returns the persisted run record"""
+        name = job.name
+        started_at = self.clock.now()
+        run = {
+            "_id": f"{name}_{started_at.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}",
+            "job_name": name,
+            "trigger": trigger,
+            "status": "running",
+            "started_at": started_at,
+            "finished_at": None,
+            "duration_seconds": 0.0,
+            "records_processed": 0,
+            "attempts": 0,
+            "errors": [],
+            **job.metadata
+        }
+
+        slot = await self._acquire_slot(job)
+        if slot is None:
+            run.update(status="skipped", finished_at=started_at,
+                       errors=[f"{name} is already running at its concurrency limit of {job.max_concurrency}"])
+            logger.info(f"Skipped ETL job {name}: already running")
+            await self.history.record(run)
+            return run
+
+        renewer = asyncio.create_task(self._renew_lease(slot, job)) if self.lock else None
+        await self.history.record(run)
+        try:
+            for attempt in range(job.max_retries + 1):
+                run["attempts"] = attempt + 1
+                try:
+                    result = await self._run_with_timeout(job, renewer)
+                except LeaseLostError as e:
+                    # Another replica owns the slot now; retrying would run the job twice
+                    run["errors"].append(str(e))
+                    run["status"] = "failed"
+                    break
+                except Exception as e:
+                    logger.error(f"ETL job {name} attempt {attempt + 1} failed: {e}")
+                    run["errors"].append(str(e))
+                    run["status"] = "failed"
+                    continue
+                run["records_processed"] = result.get("records_processed", 0)
+                run["errors"].extend(result.get("errors", []))
+                run["status"] = result.get("status", "success")
+                if run["status"] != "failed":
+                    break
+        finally:
+            if renewer:
+                renewer.cancel()
+            if self.lock:
+                await self.lock.release(slot)
+            self._held.discard(slot)
+            finished_at = self.clock.now()
+            run["finished_at"] = finished_at
+            run["duration_seconds"] = (finished_at - started_at).total_seconds()
+            if run["status"] == "running":
+                run["status"] = "failed"
+            await self.history.record(run)
+            logger.info(f"Completed ETL job {run['_id']}: {run['status']} in {run['duration_seconds']:.2f}s")
+        return run
+
+    async def _run_with_timeout(self, job: ScheduledJob, renewer: Optional[asyncio.Task] = None) -> Dict[str, Any]:
+        """Run the job until it finishes, times out or, when a renewer is given, its lease is lost"""
+        work = asyncio.create_task(job.func())
+        timer = asyncio.create_task(self.clock.sleep(job.timeout_seconds))
+        waiters = {work, timer} if renewer is None else {work, timer, renewer}
+        try:
+            done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            if work not in done:
+                work.cancel()
+                if renewer in done:
+                    raise LeaseLostError("lease lost to another owner")
+                raise TimeoutError(f"timed out after {job.timeout_seconds}s")
+            return work.result()
+        finally:
+            timer.cancel()
+            if not work.done():
+                work.cancel()
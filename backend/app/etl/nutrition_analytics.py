@@ -0,0 +1,369 @@
+"""
+Columnar nutrition analytics
+============================
+
+User nutrition analytics used to walk the same record list once per metric,
+slicing dates and running substring food categorisation again each time.
+NutritionAnalytics reads the records once into NumPy columns (macros, day,
+meal type and hour codes, food codes) and derives every metric from them with
+bincount/argsort. Each distinct food name is categorised once through a
+precompiled, memoized lookup.
+
+The outputs match the per-metric functions they replace field for field,
+including their conventions (trends group by ``date`` falling back to
+``created_at``, meals per day count distinct ``date`` values only).
+
+AnalyticsCache keeps finished reports per (user, date range, data version).
+"""
+
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+# Checked in order; the first category with a keyword in the food name wins
+FOOD_CATEGORY_KEYWORDS = (
+    ('grains', ('rice', 'bread', 'roti', 'noodles', 'pasta')),
+    ('proteins', ('chicken', 'fish', 'meat', 'egg', 'dal', 'beans', 'lentils')),
+    ('vegetables', ('vegetable', 'curry', 'salad', 'greens', 'spinach')),
+    ('fruits', ('fruit', 'banana', 'apple', 'mango', 'orange')),
+    ('dairy', ('milk', 'yogurt', 'cheese', 'curd')),
+    ('snacks', ('biscuit', 'cake', 'chips', 'chocolate')),
+    ('beverages', ('tea', 'coffee', 'juice', 'water')),
+)
+FOOD_CATEGORIES = tuple(name for name, _ in FOOD_CATEGORY_KEYWORDS) + ('other',)
+_CATEGORY_PATTERNS = tuple(
+    re.compile('|'.join(re.escape(keyword) for keyword in keywords)) for _, keywords in FOOD_CATEGORY_KEYWORDS
+)
+
+MACRO_FIELDS = ('calories', 'protein', 'carbs', 'fat')
+SUMMARY_KEYS = ('calories', 'protein_g', 'carbohydrates_g', 'fat_g')
+
+
+@lru_cache(maxsize=65536)
+def food_category(food_name: str) -> int:
+    """Index into FOOD_CATEGORIES for a lower-cased food name"""
+    for index, pattern in enumerate(_CATEGORY_PATTERNS):
+        if pattern.search(food_name):
+            return index
+    return len(FOOD_CATEGORIES) - 1
+
+
+def assess_caloric_intake(avg_calories: float) -> str:
+    """Assess whether caloric intake is appropriate"""
+    if avg_calories < 1200:
+        return 'too_low'
+    elif avg_calories < 1600:
+        return 'low'
+    elif avg_calories <= 2200:
+        return 'appropriate'
+    elif avg_calories <= 2800:
+        return 'high'
+    else:
+        return 'too_high'
+
+
+def assess_macro_balance(protein: float, carbs: float, fat: float, calories: float) -> str:
+    """Assess macronutrient balance"""
+    if calories == 0:
+        return 'insufficient_data'
+
+    protein_pct = (protein * 4 / calories) * 100
+    carbs_pct = (carbs * 4 / calories) * 100
+    fat_pct = (fat * 9 / calories) * 100
+
+    if 15 <= protein_pct <= 35 and 45 <= carbs_pct <= 65 and 20 <= fat_pct <= 35:
+        return 'well_balanced'
+    elif protein_pct > 35:
+        return 'high_protein'
+    elif carbs_pct > 65:
+        return 'high_carbohydrate'
+    elif fat_pct > 35:
+        return 'high_fat'
+    else:
+        return 'needs_adjustment'
+
+
+class NutritionAnalytics:
+    """Nutrition analytics over one user's records, computed from columns built in a single pass"""
+
+    def __init__(self, records: List[Dict], now: datetime = None):
+        self.now = now or datetime.now()
+        self.count = len(records)
+
+        calories, protein, carbs, fat = [], [], [], []
+        day_codes, meal_codes, hour_meal_codes, hours, food_codes = [], [], [], [], []
+        days: Dict[str, int] = {}
+        meal_types: Dict[Any, int] = {}
+        foods: Dict[str, int] = {}
+        raw_foods: Dict[str, int] = {}  # food name as logged -> code of its normalised name
+        logged_dates = set()
+
+        for record in records:
+            nutrition = record.get('total_nutrition', {})
+            calories.append(nutrition.get('calories', 0))
+            protein.append(nutrition.get('protein', 0))
+            carbs.append(nutrition.get('carbs', 0))
+            fat.append(nutrition.get('fat', 0))
+
+            logged_dates.add(record.get('date', '')[:10])
+            day_codes.append(days.setdefault(record.get('date', record.get('created_at', ''))[:10], len(days)))
+
+            meal_code = meal_types.setdefault(record.get('meal_type', 'unknown'), len(meal_types))
+            meal_codes.append(meal_code)
+            created_at = record.get('created_at', '')
+            if created_at and 'T' in created_at:
+                try:
+                    hours.append(int(created_at.split('T')[1][:5][:2]))
+                    hour_meal_codes.append(meal_code)
+                except (ValueError, IndexError):
+                    pass
+
+            for food_item in record.get('food_items', record.get('detected_foods', [])):
+                if isinstance(food_item, dict):
+                    food_name = food_item.get('name', food_item.get('food_name', 'unknown'))
+                elif isinstance(food_item, str):
+                    food_name = food_item
+                else:
+                    continue
+                code = raw_foods.get(food_name)
+                if code is None:
+                    code = raw_foods[food_name] = foods.setdefault(food_name.lower().strip(), len(foods))
+                food_codes.append(code)
+
+        self._days, self._meal_types, self._foods = days, meal_types, foods
+        self.macros = np.array([calories, protein, carbs, fat], dtype=np.float64).reshape(4, self.count)
+        self.day_codes = np.array(day_codes, dtype=np.int64)
+        self.meal_codes = np.array(meal_codes, dtype=np.int64)
+        self.hour_meal_codes = np.array(hour_meal_codes, dtype=np.int64)
+        self.hours = np.array(hours, dtype=np.float64)
+        self.food_codes = np.array(food_codes, dtype=np.int64)
+        self.days_with_data = len(logged_dates)
+
+        self._summary: Optional[Dict[str, Any]] = None
+        self._trends: Optional[Dict[str, Any]] = None
+
+    def summary_statistics(self) -> Dict[str, Any]:
+        if self._summary is None:
+            self._summary = {}
+            for key, column in zip(SUMMARY_KEYS, self.macros):
+                total = float(column.sum()) if self.count else 0
+                self._summary[key] = {
+                    'average': total / self.count if self.count else 0,
+                    'min': float(column.min()) if self.count else 0,
+                    'max': float(column.max()) if self.count else 0,
+                    'total': total
+                }
+        return self._summary
+
+    def nutrition_trends(self) -> Dict[str, Any]:
+        if self._trends is not None:
+            return self._trends
+
+        day_count = len(self._days)
+        if day_count < 2:
+            self._trends = {'status': 'insufficient_data'}
+            return self._trends
+
+        daily = [np.bincount(self.day_codes, weights=column, minlength=day_count) for column in self.macros]
+        meals = np.bincount(self.day_codes, minlength=day_count)
+
+        day_names = list(self._days)
+        order = sorted(range(day_count), key=day_names.__getitem__)
+        mid_point = day_count // 2
+        recent, earlier = order[mid_point:], order[:mid_point]
+        recent_avg_calories = float(daily[0][recent].sum()) / len(recent)
+        earlier_avg_calories = float(daily[0][earlier].sum()) / len(earlier)
+        calorie_trend = ((recent_avg_calories - earlier_avg_calories) / earlier_avg_calories * 100) if earlier_avg_calories > 0 else 0
+
+        self._trends = {
+            'status': 'available',
+            'daily_averages': {
+                'recent_period': {'calories': recent_avg_calories, 'days': len(recent)},
+                'earlier_period': {'calories': earlier_avg_calories, 'days': len(earlier)}
+            },
+            'trends': {
+                'calorie_change_percent': round(calorie_trend, 1),
+                'trend_direction': 'increasing' if calorie_trend > 5 else 'decreasing' if calorie_trend < -5 else 'stable'
+            },
+            'daily_data': {
+                day: {
+                    'calories': float(daily[0][code]),
+                    'protein': float(daily[1][code]),
+                    'carbs': float(daily[2][code]),
+                    'fat': float(daily[3][code]),
+                    'meals': int(meals[code])
+                }
+                for day, code in self._days.items()
+            }
+        }
+        return self._trends
+
+    def meal_patterns(self) -> Dict[str, Any]:
+        meal_types = list(self._meal_types)
+        counts = np.bincount(self.meal_codes, minlength=len(meal_types))
+        hour_counts = np.bincount(self.hour_meal_codes, minlength=len(meal_types))
+        hour_sums = np.bincount(self.hour_meal_codes, weights=self.hours, minlength=len(meal_types))
+
+        return {
+            'meal_frequency': {meal_type: int(counts[code]) for code, meal_type in enumerate(meal_types)},
+            'average_meal_times': {
+                meal_type: float(hour_sums[code] / hour_counts[code])
+                for code, meal_type in enumerate(meal_types) if hour_counts[code]
+            },
+            'meal_regularity': {
+                'total_meals': self.count,
+                'most_common_meal': meal_types[int(np.argmax(counts))] if meal_types else 'none',
+                'meal_diversity': len(meal_types)
+            }
+        }
+
+    def food_preferences(self) -> Dict[str, Any]:
+        food_names = list(self._foods)
+        counts = np.bincount(self.food_codes, minlength=len(food_names))
+        top = np.argsort(-counts, kind='stable')[:10]
+        top_foods = [{'name': food_names[code], 'frequency': int(counts[code])} for code in top]
+
+        category_codes = np.array([food_category(name) for name in food_names], dtype=np.int64)
+        category_counts = np.bincount(category_codes, weights=counts, minlength=len(FOOD_CATEGORIES))
+
+        return {
+            'top_foods': top_foods,
+            'food_categories': {name: int(category_counts[i]) for i, name in enumerate(FOOD_CATEGORIES)},
+            'dietary_patterns': {
+                'total_unique_foods': len(food_names),
+                'most_frequent_food': top_foods[0]['name'] if top_foods else 'none',
+                'food_diversity_score': min(len(food_names) * 10, 100)
+            }
+        }
+
+    def consistency_score(self) -> float:
+        if self.count < 7:
+            return 50.0  # Insufficient data
+
+        first_day = min(self._days)
+        total_days = (self.now - datetime.fromisoformat(first_day + 'T00:00:00')).days + 1
+        return min(len(self._days) / total_days * 100, 100)
+
+    def health_indicators(self) -> Dict[str, Any]:
+        if not self.count:
+            return {'status': 'no_data'}
+
+        summary = self.summary_statistics()
+        avg_calories = summary['calories']['average']
+        avg_protein = summary['protein_g']['average']
+        avg_carbs = summary['carbohydrates_g']['average']
+        avg_fat = summary['fat_g']['average']
+
+        return {
+            'caloric_balance': {
+                'daily_average': avg_calories,
+                'assessment': assess_caloric_intake(avg_calories),
+                'target_range': '1800-2200 calories/day (varies by individual)'
+            },
+            'protein_adequacy': {
+                'daily_average_g': avg_protein,
+                'percentage_of_calories': (avg_protein * 4 / avg_calories * 100) if avg_calories > 0 else 0,
+                'assessment': 'adequate' if avg_protein >= 50 else 'may_need_increase',
+                'target_range': '15-35% of total calories'
+            },
+            'macronutrient_balance': {
+                'protein_percent': (avg_protein * 4 / avg_calories * 100) if avg_calories > 0 else 0,
+                'carbs_percent': (avg_carbs * 4 / avg_calories * 100) if avg_calories > 0 else 0,
+                'fat_percent': (avg_fat * 9 / avg_calories * 100) if avg_calories > 0 else 0,
+                'balance_assessment': assess_macro_balance(avg_protein, avg_carbs, avg_fat, avg_calories)
+            },
+            'meal_consistency': {
+                'meals_per_day': self.count / max(1, self.days_with_data),
+                'consistency_score': self.consistency_score(),
+                'assessment': 'needs_improvement'
+            }
+        }
+
+    def recommendations(self) -> List[str]:
+        if not self.count:
+            return ["Start tracking your meals to get personalized recommendations"]
+
+        recommendations = []
+        avg_calories = self.summary_statistics()['calories']['average']
+        if avg_calories < 1200:
+            recommendations.append("Consider increasing your caloric intake with nutrient-dense foods")
+        elif avg_calories > 2500:
+            recommendations.append("Consider reducing portion sizes or choosing lower-calorie options")
+
+        if self.count / max(1, self.days_with_data) < 2:
+            recommendations.append("Try to eat more regular meals throughout the day")
+
+        if not recommendations:
+            recommendations.append("Keep up the good work with consistent meal tracking!")
+        return recommendations
+
+    def predictions(self) -> Dict[str, Any]:
+        if self.count < 7:
+            return {
+                'status': 'insufficient_data',
+                'message': 'Need at least 7 days of data for predictions'
+            }
+
+        summary = self.summary_statistics()
+        trend_direction = self.nutrition_trends().get('trends', {}).get('trend_direction')
+        return {
+            'status': 'available',
+            'confidence': 'low',  # Simple predictions have low confidence
+            'weekly_projections': {
+                'estimated_weekly_calories': summary['calories']['average'] * 7,
+                'estimated_weekly_protein': summary['protein_g']['average'] * 7,
+                'trend_direction': trend_direction or 'stable'
+            },
+            'health_trajectory': {
+                'current_pattern': 'maintenance' if trend_direction == 'stable' else 'changing',
+                'sustainability_score': 75,
+                'areas_for_improvement': ['meal_consistency', 'nutrient_diversity']
+            },
+            'goal_recommendations': {
+                'weight_management': 'maintain_current_intake' if 1600 <= summary['calories']['average'] <= 2200 else 'adjust_intake',
+                'nutrition_optimization': 'increase_variety',
+                'meal_planning': 'establish_routine'
+            }
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """Every metric, sharing the intermediate results"""
+        return {
+            'summary_statistics': self.summary_statistics(),
+            'nutrition_trends': self.nutrition_trends(),
+            'meal_patterns': self.meal_patterns(),
+            'food_preferences': self.food_preferences(),
+            'health_indicators': self.health_indicators(),
+            'recommendations': self.recommendations(),
+            'predictions': self.predictions(),
+            'total_records': self.count,
+            'days_with_data': self.days_with_data
+        }
+
+
+class AnalyticsCache:
+    """LRU of analytics reports keyed by (user, date range, data version), with a TTL for outside writers"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, report: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, report)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
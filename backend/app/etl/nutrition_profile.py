@@ -0,0 +1,253 @@
+"""
+Rolling per-user nutrition profiles
+===================================
+
+Insight generation compares each new meal with the user's recent intake.
+Instead of downloading and decompressing a week of ETL partitions for every
+analysis, each stored food analysis is folded into a per-user profile document
+(nutrition logs reach ETL through the batch pipeline and are not part of it):
+
+- One bucket per day for the last RETENTION_DAYS days, holding meal count,
+  calories and macros, meal type counts and food counts, updated with a
+  single atomic ``$inc``
+- 7 and 30 day windows (and top foods) are summed from the buckets on read,
+  so the insight path needs one keyed read, served from an in-process LRU
+  in front of Mongo most of the time
+- Buckets that fall out of the window are pruned lazily when a profile is
+  loaded, and a profile can be rebuilt from the ETL food analyses at any time
+  (``python -m app.etl.nutrition_profile --help``)
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+PROFILE_COLLECTION = "nutrition_profiles"
+PROFILE_WINDOWS = (7, 30)
+RETENTION_DAYS = max(PROFILE_WINDOWS)
+MACROS = ('calories', 'protein', 'carbs', 'fat')
+TOP_FOODS = 5
+
+
+def _mongo_key(name: str) -> str:
+    """Field-safe key for a food or meal type name"""
+    return str(name).strip().lower().replace('.', '_').replace('$', '_') or 'unknown'
+
+
+def record_day(record: Dict) -> Optional[str]:
+    """Day of a transformed nutrition log or food analysis (YYYY-MM-DD)"""
+    value = record.get('date') or record.get('created_at')
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, str) and len(value) >= 10:
+        return value[:10]
+    return None
+
+
+def record_delta(record: Dict) -> Dict[str, Any]:
+    """What one record adds to its day bucket"""
+    nutrition = record.get('total_nutrition') or {}
+    foods = record.get('detected_foods') or record.get('food_items') or []
+    return {
+        'meals': 1,
+        'calories': float(nutrition.get('calories', 0) or 0),
+        'protein': float(nutrition.get('protein', 0) or 0),
+        'carbs': float(nutrition.get('carbohydrates', nutrition.get('carbs', 0)) or 0),
+        'fat': float(nutrition.get('fat', 0) or 0),
+        'meal_types': {_mongo_key(record.get('meal_type') or 'unknown'): 1},
+        'foods': dict(Counter(_mongo_key(food.get('name', 'unknown')) for food in foods))
+    }
+
+
+def apply_delta(days: Dict[str, Dict], day: str, delta: Dict[str, Any]):
+    bucket = days.setdefault(day, {})
+    for field in ('meals',) + MACROS:
+        bucket[field] = bucket.get(field, 0) + delta[field]
+    for field in ('meal_types', 'foods'):
+        # Only create what the equivalent $inc creates in Mongo
+        for key, count in delta[field].items():
+            counts = bucket.setdefault(field, {})
+            counts[key] = counts.get(key, 0) + count
+
+
+def _oldest_day(today: date, window_days: int) -> str:
+    return (today - timedelta(days=window_days - 1)).strftime('%Y-%m-%d')
+
+
+def build_days(records: Iterable[Dict], today: date = None) -> Dict[str, Dict]:
+    """Day buckets recomputed from scratch (what the incremental updates must match)"""
+    oldest = _oldest_day(today or date.today(), RETENTION_DAYS)
+    days: Dict[str, Dict] = {}
+    for record in records:
+        day = record_day(record)
+        if day and day >= oldest:
+            apply_delta(days, day, record_delta(record))
+    return days
+
+
+def summarize_window(days: Dict[str, Dict], today: date, window_days: int) -> Dict[str, Any]:
+    oldest = _oldest_day(today, window_days)
+    totals = dict.fromkeys(('meals',) + MACROS, 0)
+    meal_types: Counter = Counter()
+    foods: Counter = Counter()
+    active_days = 0
+    for day, bucket in days.items():
+        if day < oldest:
+            continue
+        active_days += 1
+        for field in totals:
+            totals[field] += bucket.get(field, 0)
+        meal_types.update(bucket.get('meal_types', {}))
+        foods.update(bucket.get('foods', {}))
+    return {
+        'days': window_days,
+        'active_days': active_days,
+        'meals': totals['meals'],
+        'totals': {macro: round(totals[macro], 1) for macro in MACROS},
+        'daily_averages': {macro: round(totals[macro] / window_days, 1) for macro in MACROS},
+        'meal_types': dict(meal_types),
+        'top_foods': [name for name, _ in sorted(foods.items(), key=lambda item: (-item[1], item[0]))[:TOP_FOODS]]
+    }
+
+
+def summarize(user_id: str, days: Dict[str, Dict], today: date = None) -> Dict[str, Any]:
+    today = today or date.today()
+    return {
+        'user_id': user_id,
+        'as_of': today.strftime('%Y-%m-%d'),
+        'windows': {f"{window}d": summarize_window(days, today, window) for window in PROFILE_WINDOWS}
+    }
+
+
+class NutritionProfileStore:
+    """Per-user rolling profiles in Mongo with a write-through LRU in front"""
+
+    def __init__(self, collection, cache_size: int = 1024, cache_ttl_seconds: float = 300):
+        self.collection = collection
+        self.cache_size = cache_size
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # user_id -> (expires_at, days)
+        self.stats = {'cache_hits': 0, 'cache_misses': 0, 'updates': 0}
+
+    async def record(self, record: Dict, today: date = None) -> bool:
+        """Fold one stored analysis or log into its user's profile; False if it is outside the window"""
+        user_id = record.get('user_id')
+        day = record_day(record)
+        if not user_id or not day or day < _oldest_day(today or date.today(), RETENTION_DAYS):
+            return False
+
+        delta = record_delta(record)
+        increments = {f"days.{day}.{field}": delta[field] for field in ('meals',) + MACROS}
+        for field in ('meal_types', 'foods'):
+            for key, count in delta[field].items():
+                increments[f"days.{day}.{field}.{key}"] = count
+        await self.collection.update_one(
+            {'_id': user_id},
+            {'$inc': increments, '$set': {'user_id': user_id, 'updated_at': datetime.now()}},
+            upsert=True
+        )
+        self.stats['updates'] += 1
+
+        cached = self._cache.get(user_id)
+        if cached:
+            apply_delta(cached[1], day, delta)
+        return True
+
+    async def get_days(self, user_id: str, today: date = None) -> Dict[str, Dict]:
+        cached = self._cache.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            self._cache.move_to_end(user_id)
+            self.stats['cache_hits'] += 1
+            return cached[1]
+
+        self.stats['cache_misses'] += 1
+        document = await self.collection.find_one({'_id': user_id}) or {}
+        days = document.get('days', {})
+        oldest = _oldest_day(today or date.today(), RETENTION_DAYS)
+        stale = [day for day in days if day < oldest]
+        if stale:
+            await self.collection.update_one({'_id': user_id}, {'$unset': {f"days.{day}": "" for day in stale}})
+            for day in stale:
+                del days[day]
+        self._remember(user_id, days)
+        return days
+
+    async def get_profile(self, user_id: str, today: date = None) -> Dict[str, Any]:
+        return summarize(user_id, await self.get_days(user_id, today), today)
+
+    async def history(self, user_id: str, days: int = 7, today: date = None) -> Dict[str, Any]:
+        """Recent intake in the shape the insight generator compares meals against"""
+        window = summarize_window(await self.get_days(user_id, today), today or date.today(), min(days, RETENTION_DAYS))
+        if not window['meals']:
+            return {'status': 'no_history', 'days_analyzed': days}
+        return {
+            'status': 'available',
+            'days_analyzed': days,
+            'total_meals_recorded': window['meals'],
+            'avg_daily_calories': window['daily_averages']['calories'],
+            'avg_daily_protein': window['daily_averages']['protein'],
+            'top_foods': window['top_foods'],
+            'data_quality': 'good' if window['meals'] >= days * 2 else 'limited'
+        }
+
+    async def rebuild(self, user_id: str, records: Iterable[Dict], today: date = None) -> Dict[str, Any]:
+        """Replace a profile with one recomputed from the given records"""
+        days = build_days(records, today)
+        await self.collection.replace_one(
+            {'_id': user_id},
+            {'_id': user_id, 'user_id': user_id, 'days': days, 'updated_at': datetime.now()},
+            upsert=True
+        )
+        self._remember(user_id, days)
+        return summarize(user_id, days, today)
+
+    def _remember(self, user_id: str, days: Dict[str, Dict]):
+        self._cache[user_id] = (time.monotonic() + self.cache_ttl_seconds, days)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+async def rebuild_from_etl(store: NutritionProfileStore, retriever, user_ids: List[str] = None,
+                           today: date = None) -> Dict[str, int]:
+    """Rebuild profiles from ETL food analyses (all users found, or only user_ids); returns meals per user
+
+    Only food analyses are read, the records the insight path folds in one at a
+    time, so a rebuilt profile matches what incremental updates would produce.
+    """
+    today = today or date.today()
+    start_date = _oldest_day(today, RETENTION_DAYS)
+    end_date = today.strftime('%Y-%m-%d')
+    by_user: Dict[str, List[Dict]] = {user_id: [] for user_id in user_ids or []}
+    for record in await retriever.retrieve_data('food_analyses', start_date, end_date, user_ids):
+        if record.get('user_id'):
+            by_user.setdefault(record['user_id'], []).append(record)
+
+    rebuilt = {}
+    for user_id, records in by_user.items():
+        profile = await store.rebuild(user_id, records, today)
+        rebuilt[user_id] = profile['windows'][f"{RETENTION_DAYS}d"]['meals']
+    return rebuilt
+
+
+async def _main(args):
+    import motor.motor_asyncio
+    from .azure_efs_etl_pipeline import AzureEFSClient, DietDataRetriever
+    from .config import ETLEnvironment
+
+    config = ETLEnvironment.from_environment()
+    client = motor.motor_asyncio.AsyncIOMotorClient(config.mongodb_uri)
+    store = NutritionProfileStore(client[config.mongodb_database][PROFILE_COLLECTION])
+    retriever = DietDataRetriever(AzureEFSClient(config), config)
+    rebuilt = await rebuild_from_etl(store, retriever, args.user_id or None)
+    print(f"Rebuilt {len(rebuilt)} nutrition profiles ({sum(rebuilt.values())} meals in the last {RETENTION_DAYS} days)")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild rolling nutrition profiles from ETL data")
+    parser.add_argument("--user-id", action="append", help="Only rebuild this user (repeatable); default all users")
+    asyncio.run(_main(parser.parse_args()))
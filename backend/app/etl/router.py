@@ -42,14 +42,16 @@ class ETLJobResponse(BaseModel):
 class ETLScheduleRequest(BaseModel):
     """Request to create/update ETL schedule"""
     job_name: str
-    schedule_type: str = Field(..., pattern="^(daily|hourly|weekly|manual)$")
-    schedule_time: str = Field(..., description="Schedule time (HH:MM for daily, MM for hourly, 'day HH:MM' for weekly)")
+    schedule_type: str = Field(..., pattern="^(daily|hourly|weekly|cron|manual)$")
+    schedule_time: str = Field(..., description="Schedule time (HH:MM for daily, MM for hourly, 'day HH:MM' for weekly, cron expression for cron)")
     data_types: List[str]
     lookback_days: int = Field(1, ge=0, le=30)
     enabled: bool = True
     retry_on_failure: bool = True
     max_retries: int = Field(3, ge=0, le=10)
     timeout_minutes: int = Field(60, ge=5, le=300)
+    max_concurrency: int = Field(1, ge=1, le=10)
+    incremental: bool = False
 
 class DataRetrievalRequest(BaseModel):
     """Request to retrieve data from Azure EFS"""
@@ -71,6 +73,9 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
+def _isoformat(moment: Optional[datetime]) -> Optional[str]:
+    return moment.isoformat() if moment else None
+
 async def get_etl_scheduler() -> ETLScheduler:
     """Get ETL scheduler instance"""
     global etl_scheduler
@@ -149,7 +154,7 @@ async def get_job_status(
     """
     try:
         scheduler = await get_etl_scheduler()
-        job_status = scheduler.monitor.get_job_status(job_id)
+        job_status = await scheduler.monitor.get_job_status(job_id)
         
         if job_status is None:
             raise HTTPException(
@@ -175,7 +180,7 @@ async def get_job_status(
 @router.get("/jobs/history")
 async def get_job_history(
     limit: int = Query(50, ge=1, le=100),
-    status: Optional[str] = Query(None, pattern="^(success|failed|partial|running)$"),
+    status: Optional[str] = Query(None, pattern="^(success|failed|partial|running|skipped)$"),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -183,14 +188,7 @@ async def get_job_history(
     """
     try:
         scheduler = await get_etl_scheduler()
-        job_history = scheduler.monitor.job_history
-        
-        # Filter by status if provided
-        if status:
-            job_history = [job for job in job_history if job.status == status]
-        
-        # Limit results
-        job_history = job_history[-limit:]
+        job_history = await scheduler.monitor.get_job_history(limit=limit, status=status)
         
         return {
             "jobs": [job.to_dict() for job in job_history],
@@ -227,7 +225,9 @@ async def create_etl_schedule(
             enabled=request.enabled,
             retry_on_failure=request.retry_on_failure,
             max_retries=request.max_retries,
-            timeout_minutes=request.timeout_minutes
+            timeout_minutes=request.timeout_minutes,
+            max_concurrency=request.max_concurrency,
+            incremental=request.incremental
         )
         
         scheduler.add_schedule(schedule_config)
@@ -238,10 +238,17 @@ async def create_etl_schedule(
                 "job_name": request.job_name,
                 "schedule_type": request.schedule_type,
                 "schedule_time": request.schedule_time,
-                "enabled": request.enabled
+                "cron": schedule_config.cron,
+                "enabled": request.enabled,
+                "next_run": _isoformat(scheduler.jobs.next_run_time(request.job_name))
             }
         }
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid schedule: {str(e)}"
+        )
     except Exception as e:
         logger.error(f"Failed to create ETL schedule: {e}")
         raise HTTPException(
@@ -270,7 +277,12 @@ async def list_etl_schedules(
                 "enabled": schedule.enabled,
                 "retry_on_failure": schedule.retry_on_failure,
                 "max_retries": schedule.max_retries,
-                "timeout_minutes": schedule.timeout_minutes
+                "timeout_minutes": schedule.timeout_minutes,
+                "max_concurrency": schedule.max_concurrency,
+                "incremental": schedule.incremental,
+                "cron": schedule.cron,
+                "next_run": _isoformat(scheduler.jobs.next_run_time(schedule.job_name)),
+                "active_runs": scheduler.jobs.active_runs(schedule.job_name)
             })
         
         return {
@@ -434,10 +446,10 @@ async def get_etl_metrics(
     """
     try:
         scheduler = await get_etl_scheduler()
-        metrics = scheduler.monitor.get_metrics()
+        metrics = await scheduler.monitor.get_metrics()
         
         # Add additional metrics
-        recent_failures = scheduler.monitor.get_recent_failures(hours=24)
+        recent_failures = await scheduler.monitor.get_recent_failures(hours=24)
         
         enhanced_metrics = {
             **metrics,
@@ -1,5 +1,9 @@
 """
 ETL Scheduler and Monitoring System
+
+Jobs run on cron schedules in the application's event loop (see
+job_scheduler.py); overlapping runs are prevented across replicas with
+Mongo lease locks and every run is recorded in the etl_job_runs collection.
 """
 
 import asyncio
@@ -9,13 +13,21 @@ from typing import Dict, List, Optional, Callable, Any
 from dataclasses import dataclass, asdict
 import json
 from pathlib import Path
-import schedule
-import time
-from concurrent.futures import ThreadPoolExecutor
-import threading
+import motor.motor_asyncio
 
 from .azure_efs_etl_pipeline import DietAgentETLPipeline
 from .config import AzureETLConfig, ETLEnvironment
+from .job_scheduler import (
+    AsyncJobScheduler,
+    CronExpression,
+    LeaseLock,
+    RunHistory,
+    ScheduledJob,
+    SystemClock,
+    cron_from_schedule,
+    LEASE_COLLECTION,
+    RUN_HISTORY_COLLECTION,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,306 +37,231 @@ class ETLJobResult:
     job_id: str
     job_type: str
     start_time: datetime
-    end_time: datetime
-    status: str  # 'success', 'failed', 'partial'
+    end_time: Optional[datetime]
+    status: str  # 'success', 'failed', 'partial', 'skipped', 'running'
     records_processed: int
     data_types: List[str]
     errors: List[str]
     execution_time_seconds: float
     
+    @classmethod
+    def from_run(cls, run: Dict[str, Any]) -> 'ETLJobResult':
+        """Build from a persisted run record"""
+        return cls(
+            job_id=run['_id'],
+            job_type=run.get('trigger', 'scheduled'),
+            start_time=run['started_at'],
+            end_time=run.get('finished_at'),
+            status=run['status'],
+            records_processed=run.get('records_processed', 0),
+            data_types=run.get('data_types', []),
+            errors=run.get('errors', []),
+            execution_time_seconds=run.get('duration_seconds', 0.0)
+        )
+    
     def to_dict(self) -> Dict:
         """Convert to dictionary for storage"""
         result = asdict(self)
         result['start_time'] = self.start_time.isoformat()
-        result['end_time'] = self.end_time.isoformat()
+        result['end_time'] = self.end_time.isoformat() if self.end_time else None
         return result
 
 @dataclass
 class ETLScheduleConfig:
     """Configuration for ETL job scheduling"""
     job_name: str
-    schedule_type: str  # 'daily', 'hourly', 'weekly', 'manual'
-    schedule_time: str  # e.g., "02:00" for daily, "15" for hourly
+    schedule_type: str  # 'daily', 'hourly', 'weekly', 'cron', 'manual'
+    schedule_time: str  # e.g., "02:00" for daily, "15" for hourly, "*/30 * * * *" for cron
     data_types: List[str]
     lookback_days: int = 1
     enabled: bool = True
     retry_on_failure: bool = True
     max_retries: int = 3
     timeout_minutes: int = 60
+    max_concurrency: int = 1  # Runs of this job allowed at once across all replicas
+    incremental: bool = False  # Export from watermarks instead of the lookback window
+    
+    @property
+    def cron(self) -> Optional[str]:
+        if self.schedule_type == 'manual':
+            return None
+        return cron_from_schedule(self.schedule_type, self.schedule_time)
+
+def summarize_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-data-type pipeline results into one job result"""
+    errors = []
+    processed = 0
+    succeeded = 0
+    for result in results:
+        errors.extend(result.get('errors', []))
+        if result.get('error'):
+            errors.append(result['error'])
+        processed += result.get('total_records_processed', 0)
+        if result.get('success'):
+            succeeded += 1
+    
+    if succeeded == len(results):
+        status = 'success'
+    elif succeeded or processed:
+        status = 'partial'
+    else:
+        status = 'failed'
+    return {'status': status, 'records_processed': processed, 'errors': errors}
 
 class ETLJobMonitor:
-    """Monitor and track ETL job executions"""
+    """Monitor and track ETL job executions from the persisted run history"""
     
-    def __init__(self, config: AzureETLConfig):
+    def __init__(self, config: AzureETLConfig, jobs: AsyncJobScheduler):
         self.config = config
-        self.job_history: List[ETLJobResult] = []
-        self.active_jobs: Dict[str, datetime] = {}
-        self.metrics = {
-            'total_jobs_run': 0,
-            'successful_jobs': 0,
-            'failed_jobs': 0,
-            'average_execution_time': 0.0,
-            'last_successful_run': None,
-            'last_failed_run': None
-        }
-    
-    def start_job(self, job_id: str, job_type: str) -> datetime:
-        """Record job start"""
-        start_time = datetime.now()
-        self.active_jobs[job_id] = start_time
-        logger.info(f"Started ETL job {job_id} of type {job_type}")
-        return start_time
-    
-    def complete_job(self, 
-                    job_id: str, 
-                    job_type: str,
-                    start_time: datetime,
-                    status: str,
-                    records_processed: int = 0,
-                    data_types: List[str] = None,
-                    errors: List[str] = None) -> ETLJobResult:
-        """Record job completion"""
-        end_time = datetime.now()
-        execution_time = (end_time - start_time).total_seconds()
-        
-        result = ETLJobResult(
-            job_id=job_id,
-            job_type=job_type,
-            start_time=start_time,
-            end_time=end_time,
-            status=status,
-            records_processed=records_processed,
-            data_types=data_types or [],
-            errors=errors or [],
-            execution_time_seconds=execution_time
-        )
-        
-        # Update metrics
-        self.job_history.append(result)
-        self.active_jobs.pop(job_id, None)
-        
-        self.metrics['total_jobs_run'] += 1
-        if status == 'success':
-            self.metrics['successful_jobs'] += 1
-            self.metrics['last_successful_run'] = end_time.isoformat()
-        else:
-            self.metrics['failed_jobs'] += 1
-            self.metrics['last_failed_run'] = end_time.isoformat()
-        
-        # Update average execution time
-        total_time = sum(job.execution_time_seconds for job in self.job_history)
-        self.metrics['average_execution_time'] = total_time / len(self.job_history)
-        
-        # Keep only last 100 job results
-        if len(self.job_history) > 100:
-            self.job_history = self.job_history[-100:]
-        
-        logger.info(f"Completed ETL job {job_id}: {status} in {execution_time:.2f}s")
-        return result
+        self.jobs = jobs
+        self.history = jobs.history
     
-    def get_job_status(self, job_id: str) -> Optional[str]:
+    async def get_job_status(self, job_id: str) -> Optional[str]:
         """Get status of a specific job"""
-        if job_id in self.active_jobs:
-            return 'running'
-        
-        for job in reversed(self.job_history):
-            if job.job_id == job_id:
-                return job.status
-        
-        return None
+        run = await self.history.get(job_id)
+        return run['status'] if run else None
+    
+    async def get_job_history(self, limit: int = 50, status: Optional[str] = None) -> List[ETLJobResult]:
+        """Most recent runs first"""
+        runs = await self.history.recent(limit=limit, status=status)
+        return [ETLJobResult.from_run(run) for run in runs]
     
-    def get_metrics(self) -> Dict:
+    async def get_metrics(self) -> Dict:
         """Get ETL metrics"""
+        summary = await self.history.summary()
+        successful = summary.get('success', {}).get('count', 0)
+        failed = summary.get('failed', {}).get('count', 0)
+        total = sum(group['count'] for group in summary.values())
+        total_time = sum(group['total_duration'] for group in summary.values())
+        last_success = summary.get('success', {}).get('last_finished_at')
+        last_failure = summary.get('failed', {}).get('last_finished_at')
+        
         return {
-            **self.metrics,
-            'active_jobs': len(self.active_jobs),
-            'job_history_count': len(self.job_history),
-            'success_rate': (
-                self.metrics['successful_jobs'] / self.metrics['total_jobs_run'] 
-                if self.metrics['total_jobs_run'] > 0 else 0
-            ) * 100
+            'total_jobs_run': total,
+            'successful_jobs': successful,
+            'failed_jobs': failed,
+            'skipped_jobs': summary.get('skipped', {}).get('count', 0),
+            'total_records_processed': sum(group['records_processed'] for group in summary.values()),
+            'average_execution_time': total_time / total if total else 0.0,
+            'last_successful_run': last_success.isoformat() if last_success else None,
+            'last_failed_run': last_failure.isoformat() if last_failure else None,
+            'active_jobs': self.jobs.active_count(),
+            'success_rate': (successful / total if total > 0 else 0) * 100
         }
     
-    def get_recent_failures(self, hours: int = 24) -> List[ETLJobResult]:
+    async def get_recent_failures(self, hours: int = 24) -> List[ETLJobResult]:
         """Get recent failed jobs"""
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        return [
-            job for job in self.job_history
-            if job.status == 'failed' and job.end_time > cutoff_time
-        ]
+        cutoff_time = self.jobs.clock.now() - timedelta(hours=hours)
+        runs = await self.history.recent(limit=100, status='failed', since=cutoff_time)
+        return [ETLJobResult.from_run(run) for run in runs]
 
 class ETLScheduler:
     """Schedule and execute ETL jobs"""
     
-    def __init__(self, config: AzureETLConfig):
+    def __init__(self, config: AzureETLConfig, db=None, clock=None, pipeline=None):
         self.config = config
-        self.pipeline = DietAgentETLPipeline(config)
-        self.monitor = ETLJobMonitor(config)
+        self.pipeline = pipeline or DietAgentETLPipeline(config)
+        if db is None:
+            db = motor.motor_asyncio.AsyncIOMotorClient(config.mongodb_uri)[config.mongodb_database]
+        clock = clock or SystemClock()
+        self.jobs = AsyncJobScheduler(
+            history=RunHistory(db[RUN_HISTORY_COLLECTION]),
+            lock=LeaseLock(db[LEASE_COLLECTION], clock),
+            clock=clock
+        )
+        self.monitor = ETLJobMonitor(config, self.jobs)
         self.schedules: List[ETLScheduleConfig] = []
-        self.running = False
-        self.executor = ThreadPoolExecutor(max_workers=config.max_workers)
-        self._schedule_thread = None
+        # Data types of one job run in parallel, up to max_workers at a time
+        self._data_type_slots = asyncio.Semaphore(config.max_workers)
+    
+    @property
+    def running(self) -> bool:
+        return self.jobs.running
     
     def add_schedule(self, schedule_config: ETLScheduleConfig):
-        """Add a scheduled ETL job"""
+        """Add or replace a scheduled ETL job; ValueError for an invalid schedule leaves the current one in place"""
+        cron = schedule_config.cron
+        cron_expression = CronExpression(cron) if cron else None
+        self.schedules = [s for s in self.schedules if s.job_name != schedule_config.job_name]
         self.schedules.append(schedule_config)
-        logger.info(f"Added ETL schedule: {schedule_config.job_name}")
+        self.jobs.add_job(ScheduledJob(
+            name=schedule_config.job_name,
+            cron=cron_expression,
+            func=lambda sc=schedule_config: self._run_etl(sc),
+            max_concurrency=schedule_config.max_concurrency,
+            timeout_seconds=schedule_config.timeout_minutes * 60,
+            max_retries=schedule_config.max_retries if schedule_config.retry_on_failure else 0,
+            enabled=schedule_config.enabled,
+            metadata={'data_types': schedule_config.data_types}
+        ))
+        logger.info(f"Added ETL schedule: {schedule_config.job_name} ({cron})")
     
     def remove_schedule(self, job_name: str):
         """Remove a scheduled ETL job"""
         self.schedules = [s for s in self.schedules if s.job_name != job_name]
+        self.jobs.remove_job(job_name)
         logger.info(f"Removed ETL schedule: {job_name}")
     
     def start_scheduler(self):
-        """Start the ETL scheduler"""
+        """Start the ETL scheduler; must be called from the running event loop"""
         if self.running:
             logger.warning("ETL scheduler is already running")
             return
         
-        self.running = True
         logger.info("Starting ETL scheduler")
-        
-        # Configure scheduled jobs
-        for schedule_config in self.schedules:
-            if not schedule_config.enabled:
-                continue
-            
-            job_func = lambda sc=schedule_config: self._execute_scheduled_job(sc)
-            
-            if schedule_config.schedule_type == 'daily':
-                schedule.every().day.at(schedule_config.schedule_time).do(job_func)
-            elif schedule_config.schedule_type == 'hourly':
-                minute = int(schedule_config.schedule_time)
-                schedule.every().hour.at(f":{minute:02d}").do(job_func)
-            elif schedule_config.schedule_type == 'weekly':
-                day, time_str = schedule_config.schedule_time.split(' ')
-                getattr(schedule.every(), day.lower()).at(time_str).do(job_func)
-            
-            logger.info(f"Scheduled job {schedule_config.job_name}: {schedule_config.schedule_type} at {schedule_config.schedule_time}")
-        
-        # Start scheduler thread
-        self._schedule_thread = threading.Thread(target=self._run_scheduler, daemon=True)
-        self._schedule_thread.start()
+        self.jobs.start()
     
     def stop_scheduler(self):
-        """Stop the ETL scheduler"""
-        self.running = False
-        schedule.clear()
+        """Stop the ETL scheduler; runs in progress finish on their own"""
+        asyncio.ensure_future(self.jobs.stop())
         logger.info("Stopped ETL scheduler")
     
-    def _run_scheduler(self):
-        """Run the scheduler loop"""
-        while self.running:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
-    
-    def _execute_scheduled_job(self, schedule_config: ETLScheduleConfig):
-        """Execute a scheduled ETL job"""
-        job_id = f"{schedule_config.job_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        # Submit job to thread pool
-        future = self.executor.submit(
-            self._run_etl_job,
-            job_id,
-            schedule_config
-        )
-        
-        # Don't wait for completion in scheduler thread
-        logger.info(f"Submitted scheduled ETL job: {job_id}")
+    async def _run_data_type(self, data_type: str, schedule_config: ETLScheduleConfig,
+                             start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        async with self._data_type_slots:
+            if schedule_config.incremental:
+                return await self.pipeline.run_incremental_etl(data_types=[data_type])
+            return await self.pipeline.run_full_etl(
+                start_date=start_date,
+                end_date=end_date,
+                data_types=[data_type]
+            )
     
-    def _run_etl_job(self, job_id: str, schedule_config: ETLScheduleConfig):
-        """Run ETL job with monitoring"""
-        start_time = self.monitor.start_job(job_id, 'scheduled')
+    async def _run_etl(self, schedule_config: ETLScheduleConfig,
+                       start_date: datetime = None, end_date: datetime = None) -> Dict[str, Any]:
+        """Run the pipeline for each data type of a job in parallel"""
+        end_date = end_date or self.jobs.clock.now()
+        start_date = start_date or end_date - timedelta(days=schedule_config.lookback_days)
         
-        try:
-            # Calculate date range
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=schedule_config.lookback_days)
-            
-            # Run ETL pipeline
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                results = loop.run_until_complete(
-                    self.pipeline.run_full_etl(
-                        start_date=start_date,
-                        end_date=end_date,
-                        data_types=schedule_config.data_types
-                    )
-                )
-                
-                # Determine status
-                status = 'success' if results.get('success', False) else 'failed'
-                if results.get('errors') and results.get('data_types_processed'):
-                    status = 'partial'
-                
-                self.monitor.complete_job(
-                    job_id=job_id,
-                    job_type='scheduled',
-                    start_time=start_time,
-                    status=status,
-                    records_processed=results.get('total_records_processed', 0),
-                    data_types=schedule_config.data_types,
-                    errors=results.get('errors', [])
-                )
-                
-            finally:
-                loop.close()
-                
-        except Exception as e:
-            logger.error(f"ETL job {job_id} failed: {e}")
-            self.monitor.complete_job(
-                job_id=job_id,
-                job_type='scheduled',
-                start_time=start_time,
-                status='failed',
-                errors=[str(e)]
-            )
+        results = await asyncio.gather(*(
+            self._run_data_type(data_type, schedule_config, start_date, end_date)
+            for data_type in schedule_config.data_types
+        ))
+        return summarize_results(results)
     
     async def run_manual_job(self, 
                            data_types: List[str],
                            start_date: datetime = None,
                            end_date: datetime = None) -> ETLJobResult:
         """Run manual ETL job"""
-        job_id = f"manual_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        start_time = self.monitor.start_job(job_id, 'manual')
-        
-        try:
-            if not end_date:
-                end_date = datetime.now()
-            if not start_date:
-                start_date = end_date - timedelta(days=1)
-            
-            results = await self.pipeline.run_full_etl(
-                start_date=start_date,
-                end_date=end_date,
-                data_types=data_types
-            )
-            
-            status = 'success' if results.get('success', False) else 'failed'
-            if results.get('errors') and results.get('data_types_processed'):
-                status = 'partial'
-            
-            return self.monitor.complete_job(
-                job_id=job_id,
-                job_type='manual',
-                start_time=start_time,
-                status=status,
-                records_processed=results.get('total_records_processed', 0),
-                data_types=data_types,
-                errors=results.get('errors', [])
-            )
-            
-        except Exception as e:
-            logger.error(f"Manual ETL job {job_id} failed: {e}")
-            return self.monitor.complete_job(
-                job_id=job_id,
-                job_type='manual',
-                start_time=start_time,
-                status='failed',
-                errors=[str(e)]
-            )
+        schedule_config = ETLScheduleConfig(
+            job_name="manual",
+            schedule_type="manual",
+            schedule_time="",
+            data_types=data_types,
+            max_retries=0,
+            max_concurrency=self.config.max_workers
+        )
+        job = ScheduledJob(
+            name="manual",
+            cron=None,
+            func=lambda: self._run_etl(schedule_config, start_date, end_date),
+            max_concurrency=schedule_config.max_concurrency,
+            timeout_seconds=self.config.timeout_seconds,
+            metadata={'data_types': data_types}
+        )
+        run = await self.jobs.run(job, trigger='manual')
+        return ETLJobResult.from_run(run)
 
 class ETLHealthChecker:
     """Health check system for ETL pipeline"""
@@ -340,7 +277,7 @@ class ETLHealthChecker:
             'timestamp': datetime.now().isoformat(),
             'overall_status': 'healthy',
             'components': {},
-            'metrics': self.monitor.get_metrics(),
+            'metrics': await self.monitor.get_metrics(),
             'recommendations': []
         }
         
@@ -377,7 +314,7 @@ class ETLHealthChecker:
             health_status['overall_status'] = 'unhealthy'
         
         # Check recent job performance
-        recent_failures = self.monitor.get_recent_failures(hours=24)
+        recent_failures = await self.monitor.get_recent_failures(hours=24)
         if len(recent_failures) > 0:
             health_status['components']['job_performance'] = {
                 'status': 'warning',
@@ -447,7 +384,8 @@ def create_default_schedules() -> List[ETLScheduleConfig]:
             schedule_time="00",  # At the top of each hour
             data_types=['nutrition_logs'],
             lookback_days=0.5,  # Last 12 hours
-            enabled=False  # Disabled by default
+            enabled=False,  # Disabled by default
+            incremental=True  # Only records added since the previous run
         )
     ]
 
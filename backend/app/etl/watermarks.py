@@ -0,0 +1,221 @@
+"""
+Watermark-based incremental extraction
+======================================
+
+Each ETL source keeps a persisted watermark: the sort position (an order
+field plus ``_id`` as tie-breaker) of the last record that was written to
+Azure EFS. Extraction resumes strictly after it with a keyset query and
+yields bounded chunks, so a run costs O(new data) instead of O(history).
+
+The watermark is advanced with a compare-and-set only after the chunk's
+partition file was written. Partition files are named after the chunk's
+position range, so a run that crashes between write and commit rewrites
+the same file on retry instead of exporting the records twice.
+"""
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_COLLECTION = "etl_watermarks"
+
+# Per data type: source collection and the field that orders new or changed records
+ETL_SOURCES: Dict[str, Dict[str, str]] = {
+    'nutrition_logs': {'collection': 'nutrition_entries', 'order_field': '_id'},
+    'food_analyses': {'collection': 'food_analyses', 'order_field': '_id'},
+    'user_profiles': {'collection': 'user_profiles', 'order_field': 'updated_at'},
+}
+
+WriteChunk = Callable[[List[Dict], Dict, Dict], Awaitable[bool]]
+
+
+@dataclass
+class Watermark:
+    """Last exported position of a source"""
+    source: str
+    order_field: str
+    position: Optional[Dict[str, Any]] = None  # {'value': ..., '_id': ...}
+    records_exported: int = 0
+    updated_at: Optional[datetime] = None
+
+
+@dataclass
+class IncrementalResult:
+    """Outcome of one incremental export of a source"""
+    source: str
+    records_exported: int = 0
+    chunks_written: int = 0
+    watermark: Optional[Dict[str, Any]] = None
+    errors: List[str] = field(default_factory=list)
+
+
+def position_of(record: Dict, order_field: str) -> Dict[str, Any]:
+    return {'value': record.get(order_field), '_id': record['_id']}
+
+
+def chunk_name(source: str, first: Dict, last: Dict) -> str:
+    """Deterministic file name for a chunk, so retries overwrite instead of duplicating"""
+    digest = hashlib.sha1(repr((source, first, last)).encode()).hexdigest()[:12]
+    return f"{source}_delta_{digest}"
+
+
+class WatermarkStore:
+    """Watermarks persisted in Mongo, one document per source"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            await self.collection.create_index("source", unique=True, name="source_unique")
+            self._indexes_ready = True
+
+    async def get(self, source: str, order_field: str) -> Watermark:
+        await self._ensure_indexes()
+        document = await self.collection.find_one({"source": source}, {"_id": 0})
+        if not document:
+            return Watermark(source=source, order_field=order_field)
+        return Watermark(**document)
+
+    async def commit(self, watermark: Watermark, position: Dict[str, Any], records: int) -> bool:
+        """
+        Advance the watermark from its current position to ``position``
+
+        Returns False when another run moved it first; the caller must stop
+        so the same records are not committed twice.
+        """
+        await self._ensure_indexes()
+        try:
+            result = await self.collection.update_one(
+                {"source": watermark.source, "position": watermark.position},
+                {
+                    "$set": {
+                        "order_field": watermark.order_field,
+                        "position": position,
+                        "updated_at": datetime.utcnow()
+                    },
+                    "$inc": {"records_exported": records}
+                },
+                upsert=watermark.position is None
+            )
+        except DuplicateKeyError:
+            return False
+        if result.matched_count == 0 and result.upserted_id is None:
+            return False
+        watermark.position = position
+        watermark.records_exported += records
+        return True
+
+    async def reset(self, source: str):
+        """Forget a source's watermark; the next run re-exports everything"""
+        await self.collection.delete_one({"source": source})
+
+
+class IncrementalExtractor:
+    """Keyset-paginated extraction of records after a source's watermark"""
+
+    def __init__(self, db, store: WatermarkStore, chunk_size: int = 1000):
+        self.db = db
+        self.store = store
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _after(order_field: str, position: Optional[Dict[str, Any]]) -> Dict:
+        if position is None:
+            return {}
+        if order_field == '_id':
+            return {"_id": {"$gt": position['_id']}}
+        return {"$or": [
+            {order_field: {"$gt": position['value']}},
+            {order_field: position['value'], "_id": {"$gt": position['_id']}}
+        ]}
+
+    async def iter_chunks(self, collection_name: str, order_field: str,
+                          position: Optional[Dict[str, Any]]) -> AsyncIterator[List[Dict]]:
+        """Yield sorted chunks of at most chunk_size records after ``position``"""
+        collection = self.db[collection_name]
+        sort = [("_id", 1)] if order_field == '_id' else [(order_field, 1), ("_id", 1)]
+        while True:
+            cursor = collection.find(self._after(order_field, position)).sort(sort).limit(self.chunk_size)
+            chunk = [record async for record in cursor]
+            if not chunk:
+                return
+            yield chunk
+            if len(chunk) < self.chunk_size:
+                return
+            position = position_of(chunk[-1], order_field)
+
+    async def export(self, source: str, collection_name: str, order_field: str,
+                     write_chunk: WriteChunk) -> IncrementalResult:
+        """
+        Export everything after the watermark, committing it after each written chunk
+
+        ``write_chunk(records, first_position, last_position)`` writes one
+        partition file and returns True on success.
+        """
+        watermark = await self.store.get(source, order_field)
+        result = IncrementalResult(source=source, watermark=watermark.position)
+        async for chunk in self.iter_chunks(collection_name, order_field, watermark.position):
+            first, last = position_of(chunk[0], order_field), position_of(chunk[-1], order_field)
+            if not await write_chunk(chunk, first, last):
+                result.errors.append(f"Failed to write {source} chunk ending at {last['_id']}")
+                break
+            if not await self.store.commit(watermark, last, len(chunk)):
+                result.errors.append(f"Watermark for {source} was advanced by another run")
+                break
+            result.records_exported += len(chunk)
+            result.chunks_written += 1
+            result.watermark = last
+        return result
+
+    async def tail_changes(self, source: str, collection_name: str, write_chunk: WriteChunk,
+                           max_wait_seconds: float = 5.0, stop: Optional[asyncio.Event] = None):
+        """
+        Near-real-time export from a Mongo change stream (replica sets only)
+
+        Inserts and updates are buffered up to chunk_size records or
+        max_wait_seconds, written, and the stream's resume token is committed
+        as the watermark so a restart continues where it left off.
+        """
+        watermark = await self.store.get(source, 'resume_token')
+        resume_after = watermark.position['value'] if watermark.position else None
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        stop = stop or asyncio.Event()
+
+        async with self.db[collection_name].watch(
+            pipeline, full_document="updateLookup", resume_after=resume_after
+        ) as stream:
+            while not stop.is_set():
+                buffer: Dict[Any, Dict] = {}
+                deadline = asyncio.get_running_loop().time() + max_wait_seconds
+                token = None
+                while len(buffer) < self.chunk_size and asyncio.get_running_loop().time() < deadline:
+                    change = await stream.try_next()
+                    if change is None:
+                        if stop.is_set():
+                            break
+                        await asyncio.sleep(0.1)
+                        continue
+                    token = stream.resume_token
+                    if change.get("fullDocument"):
+                        # Several updates of one document in a window export its latest state once
+                        buffer[change["documentKey"]["_id"]] = change["fullDocument"]
+                if not buffer:
+                    continue
+                records = list(buffer.values())
+                first = position_of(records[0], '_id')
+                last = {'value': token, '_id': records[-1]['_id']}
+                if not await write_chunk(records, first, last):
+                    logger.error(f"Failed to write change stream chunk for {source}; resuming from last token")
+                    return
+                if not await self.store.commit(watermark, last, len(records)):
+                    logger.error(f"Change stream watermark for {source} was advanced by another consumer")
+                    return
@@ -0,0 +1,266 @@
+"""
+Write-behind ETL sink
+=====================
+
+Real-time ETL writes arrive one record at a time (one analyzed food image),
+and loading each as its own partition file means one upload and one
+partition index rewrite per record. The sink buffers transformed records and
+loads them in batches instead:
+
+- A record is appended to a local spool segment (one per data type) and the
+  caller is acknowledged once it is fsynced; concurrent submits share an
+  fsync (group commit)
+- A segment is sealed when it holds max_batch_records or is max_delay_seconds
+  old, and written as one partition file per (data type, day)
+- Written segments are deleted. Segments left behind by a crash or a failed
+  write are recovered on start, and failed writes are retried
+- Batch filenames derive from the segment id, so writing a recovered
+  segment again replaces the same files instead of duplicating them
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (data_type, partition_key, records, filename) -> success
+WriteBatch = Callable[[str, str, List[Dict], str], Awaitable[bool]]
+
+SPOOL_SUFFIX = ".jsonl"
+
+
+def partition_day(record: Dict) -> str:
+    """Day partition of a transformed record, from its created_at"""
+    created_at = record.get('created_at')
+    if isinstance(created_at, datetime):
+        return created_at.strftime('%Y-%m-%d')
+    if isinstance(created_at, str) and len(created_at) >= 10:
+        return created_at[:10]
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+class _Segment:
+    """Spool file holding the records of one future batch"""
+
+    def __init__(self, data_type: str, segment_id: str, path: Path):
+        self.data_type = data_type
+        self.segment_id = segment_id
+        self.path = path
+        self.entries: List[Tuple[str, Dict]] = []  # (partition_key, record)
+        self.file = None
+        self.synced = 0  # entries known to be on disk
+        self.syncing: Optional[asyncio.Future] = None
+        self.opened_at = time.monotonic()
+        self.written_partitions: Set[str] = set()
+
+
+class WriteBehindSink:
+    """Buffers ETL records in a durable local spool and loads them in batches"""
+
+    def __init__(self,
+                 write_batch: WriteBatch,
+                 spool_dir: str,
+                 max_batch_records: int = 500,
+                 max_delay_seconds: float = 2.0,
+                 retry_seconds: float = 5.0):
+        self.write_batch = write_batch
+        self.spool_dir = Path(spool_dir)
+        self.max_batch_records = max_batch_records
+        self.max_delay_seconds = max_delay_seconds
+        self.retry_seconds = retry_seconds
+
+        self._open: Dict[str, _Segment] = {}
+        self._sealed: List[_Segment] = []
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._retry_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+
+        self.stats = {
+            'records_submitted': 0,
+            'records_written': 0,
+            'batches_written': 0,
+            'segments_flushed': 0,
+            'records_recovered': 0,
+            'write_failures': 0
+        }
+
+    async def start(self) -> int:
+        """Recover spooled segments and start the background flusher; returns records recovered"""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        recovered = 0
+        for path in sorted(self.spool_dir.glob(f"*/*{SPOOL_SUFFIX}")):
+            segment = self._recover_segment(path)
+            recovered += len(segment.entries)
+            self._sealed.append(segment)
+        self.stats['records_recovered'] += recovered
+        if recovered:
+            logger.info(f"Recovered {recovered} spooled ETL records")
+
+        self._stopped = False
+        self._task = asyncio.create_task(self._run())
+        self._wake.set()
+        return recovered
+
+    async def stop(self) -> bool:
+        """Stop the flusher and write everything still buffered; False if some writes failed"""
+        self._stopped = True
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        return await self.flush()
+
+    async def submit(self, data_type: str, record: Dict, partition_key: str = None) -> Dict[str, Any]:
+        """Spool a transformed record; returns once it is durable on local disk"""
+        if self._stopped:
+            raise RuntimeError("Write-behind sink is stopped")
+
+        partition_key = partition_key or partition_day(record)
+        segment = self._open.get(data_type) or self._new_segment(data_type)
+        segment.file.write(json.dumps({'partition_key': partition_key, 'record': record}, default=str) + "\n")
+        segment.entries.append((partition_key, record))
+        position = len(segment.entries)
+        self.stats['records_submitted'] += 1
+        if position >= self.max_batch_records:
+            self._seal(segment)
+
+        await self._sync(segment, position)
+        return {
+            'status': 'queued',
+            'data_type': data_type,
+            'partition_key': partition_key,
+            'segment_id': segment.segment_id
+        }
+
+    async def flush(self) -> bool:
+        """Seal and write all buffered records now; False if some writes failed"""
+        for segment in list(self._open.values()):
+            self._seal(segment)
+        async with self._flush_lock:
+            await self._write_sealed()
+        return not self._sealed
+
+    def get_stats(self) -> Dict[str, Any]:
+        pending = sum(len(s.entries) for s in self._open.values()) + sum(len(s.entries) for s in self._sealed)
+        return {**self.stats, 'records_pending': pending, 'segments_pending': len(self._sealed)}
+
+    def _new_segment(self, data_type: str) -> _Segment:
+        segment_id = f"{time.time_ns()}_{uuid.uuid4().hex[:8]}"
+        directory = self.spool_dir / data_type
+        directory.mkdir(parents=True, exist_ok=True)
+        segment = _Segment(data_type, segment_id, directory / f"{segment_id}{SPOOL_SUFFIX}")
+        segment.file = open(segment.path, 'a', encoding='utf-8')
+        self._open[data_type] = segment
+        self._wake.set()
+        return segment
+
+    def _recover_segment(self, path: Path) -> _Segment:
+        segment = _Segment(path.parent.name, path.stem, path)
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn tail from a crash mid-append; it was never acknowledged
+                    break
+                segment.entries.append((entry['partition_key'], entry['record']))
+        segment.synced = len(segment.entries)
+        return segment
+
+    def _seal(self, segment: _Segment):
+        if self._open.get(segment.data_type) is segment:
+            del self._open[segment.data_type]
+            self._sealed.append(segment)
+            self._wake.set()
+
+    async def _sync(self, segment: _Segment, position: int):
+        while segment.synced < position:
+            if segment.syncing is None:
+                segment.syncing = asyncio.ensure_future(self._fsync(segment))
+            await asyncio.shield(segment.syncing)
+
+    async def _fsync(self, segment: _Segment):
+        target = len(segment.entries)
+        try:
+            segment.file.flush()
+            await asyncio.to_thread(os.fsync, segment.file.fileno())
+            segment.synced = target
+        finally:
+            segment.syncing = None
+
+    async def _close(self, segment: _Segment):
+        if segment.file is None:
+            return
+        while segment.syncing is not None:
+            await asyncio.shield(segment.syncing)
+        if segment.synced < len(segment.entries):
+            await self._fsync(segment)
+        segment.file.close()
+        segment.file = None
+
+    async def _write_sealed(self):
+        while self._sealed:
+            if not await self._write_segment(self._sealed[0]):
+                self.stats['write_failures'] += 1
+                self._retry_at = time.monotonic() + self.retry_seconds
+                return
+            self._sealed.pop(0)
+        self._retry_at = None
+
+    async def _write_segment(self, segment: _Segment) -> bool:
+        await self._close(segment)
+        batches: Dict[str, List[Dict]] = {}
+        for partition_key, record in segment.entries:
+            batches.setdefault(partition_key, []).append(record)
+
+        filename = f"{segment.data_type}_batch_{segment.segment_id}"
+        for partition_key, records in batches.items():
+            if partition_key in segment.written_partitions:
+                continue
+            try:
+                success = await self.write_batch(segment.data_type, partition_key, records, filename)
+            except Exception as e:
+                logger.error(f"Write-behind batch {filename} ({partition_key}) failed: {e}")
+                success = False
+            if not success:
+                return False
+            segment.written_partitions.add(partition_key)
+            self.stats['batches_written'] += 1
+            self.stats['records_written'] += len(records)
+
+        segment.path.unlink(missing_ok=True)
+        self.stats['segments_flushed'] += 1
+        return True
+
+    def _next_timeout(self) -> Optional[float]:
+        deadlines = [s.opened_at + self.max_delay_seconds for s in self._open.values()]
+        if self._sealed:
+            deadlines.append(self._retry_at or 0)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._next_timeout())
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            now = time.monotonic()
+            for segment in list(self._open.values()):
+                if now - segment.opened_at >= self.max_delay_seconds:
+                    self._seal(segment)
+            if self._sealed and (self._retry_at is None or now >= self._retry_at):
+                async with self._flush_lock:
+                    await self._write_sealed()
@@ -283,6 +283,8 @@ class NutritionData(BaseModel):
     carbs: float = Field(default=0, ge=0)
     fat: float = Field(default=0, ge=0)
     fiber: Optional[float] = Field(default=0, ge=0)
+    sugar: Optional[float] = Field(default=None, ge=0)
+    sodium: Optional[float] = Field(default=None, ge=0)
 
 class NutritionLog(BaseModel):
     """Nutrition log entry"""
@@ -320,13 +322,19 @@ class NutritionLogUpdate(BaseModel):
     meals: Optional[List[FoodItem]] = None
     meal_type: Optional[str] = None
     notes: Optional[str] = None
+    ai_insights: Optional[List[str]] = None
 
 class PaginatedNutritionLogs(BaseModel):
-    """Paginated nutrition logs response"""
-    logs: List[NutritionLog]
-    total: int
-    page: int
+    """Paginated nutrition logs response.
+
+    Cursor paging fills ``next_cursor``; offset paging (``page``) fills the totals.
+    """
+    logs: List[Dict[str, Any]]
     per_page: int
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    page: Optional[int] = None
+    total_pages: Optional[int] = None
 
 class UserNutritionPreferences(BaseModel):
     """User nutrition preferences"""
@@ -356,13 +364,29 @@ class WeeklyReportRequest(BaseModel):
 
 class WeeklyReport(BaseModel):
     """Weekly nutrition report"""
+    id: Optional[PyObjectId] = Field(default=None, alias="_id")
+    user_id: Optional[str] = None
+    period: Optional[str] = None
     start_date: str
     end_date: str
     total_logs: int
+    average_daily_calories: float = 0
     average_nutrition: NutritionData
     daily_summaries: List[Dict[str, Any]]
+    nutrition_trends: Optional[NutritionData] = None
     insights: List[str]
     recommendations: List[str]
+    health_score: Optional[float] = None
+    meal_frequency: Dict[str, int] = Field(default={})
+    top_foods: List[str] = Field(default=[])
+    nutrition_goals_met: Dict[str, bool] = Field(default={})
+    data_version: Optional[str] = Field(None, description="Fingerprint of the daily summaries the report was built from")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
 
 class NutritionCalculations:
     """Utility class for nutrition calculations"""
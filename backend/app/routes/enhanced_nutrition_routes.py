@@ -4,29 +4,27 @@ from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from typing import Optional, List, Dict, Any
 import json
 import logging
+import os
+import sys
 from datetime import datetime
 import uuid
 
+from app.core.database import get_database
+
 # Setup logger first
 logger = logging.getLogger(__name__)
 
-# Import expanded food database
+# Shared food knowledge base (backend/food_knowledge, a copy of aiservices/dietaiservices/food_knowledge)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'aiservices', 'dietaiservices'))
 try:
-    import sys
-    import os
-    # Add the data directory to the path
-    sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data'))
-    from expanded_food_database import ADDITIONAL_FOODS
-    EXPANDED_DB_AVAILABLE = True
-    logger.info(f"✅ Expanded food database loaded: {len(ADDITIONAL_FOODS)} additional foods")
-except Exception as e:
-    EXPANDED_DB_AVAILABLE = False
-    ADDITIONAL_FOODS = {}
-    logger.warning(f"⚠️ Could not load expanded food database: {e}")
+    from food_knowledge import KEYWORD, get_food_autocomplete, get_food_knowledge_base
+    FOOD_KNOWLEDGE_AVAILABLE = True
+except ImportError as e:
+    FOOD_KNOWLEDGE_AVAILABLE = False
+    logger.warning(f"⚠️ Food knowledge base not available, text analysis and suggestions are disabled: {e}")
 
 # Import AI Vision Integration
 try:
-    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'aiservices', 'dietaiservices'))
     from ai_vision_integration import router as ai_vision_router
     AI_VISION_AVAILABLE = True
     logger.info("✅ AI Vision integration available")
@@ -81,101 +79,6 @@ class EnhancedNutritionAnalysis:
         self.culturalAuthenticity = 0.0
         self.unknownFoods = []
 
-# Enhanced Food Database (subset for demonstration)
-ENHANCED_FOOD_DATABASE = {
-    'steamed_white_rice': {
-        'category': 'grains', 'subcategory': 'rice', 'cuisine': 'asian',
-        'nutrition': {'calories': 130, 'protein': 2.7, 'carbs': 28, 'fat': 0.3, 'fiber': 0.4, 'sodium': 5, 'sugar': 0.1},
-        'keywords': ['rice', 'steamed rice', 'white rice', 'basmati', 'jasmine'],
-        'culturalOrigin': 'asian', 'healthScore': 6.5, 'processingLevel': 'minimally_processed'
-    },
-    'chicken_curry_sri_lankan': {
-        'category': 'mixed_dish', 'subcategory': 'curry', 'cuisine': 'sri_lankan',
-        'nutrition': {'calories': 165, 'protein': 12, 'carbs': 6.7, 'fat': 10, 'fiber': 1.2, 'sodium': 420, 'sugar': 3},
-        'keywords': ['chicken curry', 'curry', 'sri lankan curry', 'spicy chicken'],
-        'culturalOrigin': 'sri_lankan', 'healthScore': 7.8, 'processingLevel': 'processed'
-    },
-    'kottu_roti': {
-        'category': 'mixed_dish', 'subcategory': 'street_food', 'cuisine': 'sri_lankan',
-        'nutrition': {'calories': 280, 'protein': 15, 'carbs': 35, 'fat': 8, 'fiber': 2.1, 'sodium': 580, 'sugar': 2},
-        'keywords': ['kottu', 'roti kottu', 'chopped roti', 'sri lankan street food'],
-        'culturalOrigin': 'sri_lankan', 'healthScore': 6.8, 'processingLevel': 'processed'
-    },
-    'hoppers_plain': {
-        'category': 'bread', 'subcategory': 'fermented_bread', 'cuisine': 'sri_lankan',
-        'nutrition': {'calories': 95, 'protein': 2, 'carbs': 18, 'fat': 1.5, 'fiber': 0.8, 'sodium': 45, 'sugar': 1},
-        'keywords': ['hoppers', 'appa', 'plain hoppers', 'fermented bread'],
-        'culturalOrigin': 'sri_lankan', 'healthScore': 7.2, 'processingLevel': 'minimally_processed'
-    },
-    'spaghetti_bolognese': {
-        'category': 'pasta', 'subcategory': 'italian_pasta', 'cuisine': 'italian',
-        'nutrition': {'calories': 285, 'protein': 14, 'carbs': 42, 'fat': 8, 'fiber': 3, 'sodium': 380, 'sugar': 6},
-        'keywords': ['spaghetti', 'bolognese', 'pasta', 'meat sauce', 'italian pasta', 'spaghetti bolognese'],
-        'culturalOrigin': 'italian', 'healthScore': 7.2, 'processingLevel': 'processed'
-    },
-    'sushi_roll': {
-        'category': 'sushi', 'subcategory': 'maki', 'cuisine': 'japanese',
-        'nutrition': {'calories': 45, 'protein': 3, 'carbs': 7, 'fat': 1, 'fiber': 0.5, 'sodium': 85, 'sugar': 1},
-        'keywords': ['sushi', 'maki', 'roll', 'japanese', 'sushi roll', 'salmon roll'],
-        'culturalOrigin': 'japanese', 'healthScore': 8.5, 'processingLevel': 'minimally_processed'
-    },
-    'pizza_margherita': {
-        'category': 'pizza', 'subcategory': 'italian_pizza', 'cuisine': 'italian',
-        'nutrition': {'calories': 266, 'protein': 11, 'carbs': 33, 'fat': 10, 'fiber': 2, 'sodium': 640, 'sugar': 4},
-        'keywords': ['pizza', 'margherita', 'italian pizza', 'cheese pizza'],
-        'culturalOrigin': 'italian', 'healthScore': 6.0, 'processingLevel': 'processed'
-    },
-    'pad_thai': {
-        'category': 'noodles', 'subcategory': 'stir_fry', 'cuisine': 'thai',
-        'nutrition': {'calories': 375, 'protein': 15, 'carbs': 50, 'fat': 14, 'fiber': 3, 'sodium': 980, 'sugar': 8},
-        'keywords': ['pad thai', 'thai noodles', 'stir fried noodles', 'thai'],
-        'culturalOrigin': 'thai', 'healthScore': 6.5, 'processingLevel': 'processed'
-    },
-    'quinoa_salad': {
-        'category': 'salad', 'subcategory': 'grain_salad', 'cuisine': 'international',
-        'nutrition': {'calories': 185, 'protein': 8, 'carbs': 32, 'fat': 3.5, 'fiber': 5, 'sodium': 150, 'sugar': 2},
-        'keywords': ['quinoa', 'salad', 'grain salad', 'superfood', 'healthy'],
-        'culturalOrigin': 'international', 'healthScore': 9.5, 'processingLevel': 'whole'
-    },
-    'chicken_breast_grilled': {
-        'category': 'protein', 'subcategory': 'lean_meat', 'cuisine': 'international',
-        'nutrition': {
-            'calories': 165, 'protein': 31, 'carbs': 0, 'fat': 3.6, 'fiber': 0, 'sodium': 74, 'sugar': 0,
-            'vitamins': {'B6': 0.9, 'B12': 0.3, 'niacin': 14.8, 'selenium': 27.6},
-            'minerals': {'phosphorus': 228, 'potassium': 256, 'zinc': 1.0, 'iron': 0.9}
-        },
-        'keywords': ['chicken breast', 'grilled chicken', 'lean protein', 'chicken'],
-        'culturalOrigin': 'international', 'healthScore': 9.0, 'processingLevel': 'minimally_processed'
-    },
-    'broccoli_steamed': {
-        'category': 'vegetables', 'subcategory': 'cruciferous', 'cuisine': 'international',
-        'nutrition': {
-            'calories': 55, 'protein': 3.7, 'carbs': 11, 'fat': 0.6, 'fiber': 5, 'sodium': 41, 'sugar': 2.2,
-            'vitamins': {'C': 89.2, 'K': 202, 'folate': 104, 'A': 623},
-            'minerals': {'potassium': 316, 'calcium': 62, 'iron': 1.4, 'magnesium': 33}
-        },
-        'keywords': ['broccoli', 'steamed broccoli', 'green vegetable', 'cruciferous'],
-        'culturalOrigin': 'international', 'healthScore': 9.8, 'processingLevel': 'whole'
-    },
-    'salmon_grilled': {
-        'category': 'protein', 'subcategory': 'fish', 'cuisine': 'international',
-        'nutrition': {
-            'calories': 231, 'protein': 25.4, 'carbs': 0, 'fat': 13.4, 'fiber': 0, 'sodium': 78, 'sugar': 0,
-            'vitamins': {'B12': 2.8, 'D': 11.1, 'B6': 0.6, 'omega3': 1.8},
-            'minerals': {'selenium': 36.5, 'phosphorus': 252, 'potassium': 628, 'magnesium': 30}
-        },
-        'keywords': ['salmon', 'grilled salmon', 'fish', 'omega 3', 'seafood'],
-        'culturalOrigin': 'international', 'healthScore': 9.5, 'processingLevel': 'minimally_processed'
-    }
-}
-
-# Merge expanded food database with base database
-if EXPANDED_DB_AVAILABLE:
-    ENHANCED_FOOD_DATABASE.update(ADDITIONAL_FOODS)
-    logger.info(f"📊 Total foods in database: {len(ENHANCED_FOOD_DATABASE)} (Base: 12 + Additional: {len(ADDITIONAL_FOODS)})")
-else:
-    logger.info(f"📊 Using base food database: {len(ENHANCED_FOOD_DATABASE)} foods")
-
 def analyze_text_enhanced(text: str, user_context: Dict = None) -> EnhancedNutritionAnalysis:
     """Enhanced text analysis with comprehensive food recognition"""
     analysis = EnhancedNutritionAnalysis()
@@ -198,45 +101,36 @@ def analyze_text_enhanced(text: str, user_context: Dict = None) -> EnhancedNutri
     
     detected_foods = []
     
-    # Search in database
-    for food_key, food_data in ENHANCED_FOOD_DATABASE.items():
-        confidence = 0
+    # Search the food knowledge base: names score 0.9, keywords 0.8
+    matches = get_food_knowledge_base().extract(text) if FOOD_KNOWLEDGE_AVAILABLE else []
+    for match in matches:
+        food = match.food
+        confidence = 0.8 if match.kind == KEYWORD else 0.9
         
-        # Direct name match
-        food_name = food_key.replace('_', ' ')
-        if food_name in text_lower:
-            confidence = 0.9
-        
-        # Keywords match
-        for keyword in food_data['keywords']:
-            if keyword.lower() in text_lower:
-                confidence = max(confidence, 0.8)
-        
-        if confidence > 0.5:
-            # Create enhanced food item
-            nutrition = food_data['nutrition']
-            food_item = EnhancedFoodItem(
-                name=food_name.title(),
-                category=food_data['category'],
-                subcategory=food_data['subcategory'],
-                cuisine=food_data['cuisine'],
-                calories=int(nutrition['calories'] * portion_multiplier),
-                protein=round(nutrition['protein'] * portion_multiplier, 1),
-                carbs=round(nutrition['carbs'] * portion_multiplier, 1),
-                fat=round(nutrition['fat'] * portion_multiplier, 1),
-                fiber=round(nutrition['fiber'] * portion_multiplier, 1),
-                sodium=int(nutrition['sodium'] * portion_multiplier),
-                sugar=round(nutrition['sugar'] * portion_multiplier, 1),
-                vitamins=nutrition.get('vitamins', {}),
-                minerals=nutrition.get('minerals', {}),
-                portion=f"{int(100 * portion_multiplier)}g serving",
-                portionWeight=int(100 * portion_multiplier),
-                confidence=confidence,
-                cookingMethod=cooking_method,
-                culturalOrigin=food_data['culturalOrigin'],
-                healthScore=food_data['healthScore']
-            )
-            detected_foods.append(food_item)
+        # Create enhanced food item
+        nutrition = food.nutrition
+        food_item = EnhancedFoodItem(
+            name=food.name.title(),
+            category=food.category,
+            subcategory=food.subcategory,
+            cuisine=food.cuisine,
+            calories=int(nutrition['calories'] * portion_multiplier),
+            protein=round(nutrition['protein'] * portion_multiplier, 1),
+            carbs=round(nutrition['carbs'] * portion_multiplier, 1),
+            fat=round(nutrition['fat'] * portion_multiplier, 1),
+            fiber=round(nutrition.get('fiber', 0) * portion_multiplier, 1),
+            sodium=int(nutrition.get('sodium', 0) * portion_multiplier),
+            sugar=round(nutrition.get('sugar', 0) * portion_multiplier, 1),
+            vitamins=dict(food.vitamins),
+            minerals=dict(food.minerals),
+            portion=food.serving if portion_multiplier == 1.0 else f"{portion_multiplier:g} x {food.serving}",
+            portionWeight=int(100 * portion_multiplier),
+            confidence=confidence,
+            cookingMethod=cooking_method,
+            culturalOrigin=food.cuisine,
+            healthScore=food.health_score if food.health_score is not None else 5.0
+        )
+        detected_foods.append(food_item)
     
     analysis.foodItems = detected_foods
     
@@ -474,30 +368,62 @@ async def enhanced_food_analysis(
         logger.error(f"Enhanced food analysis failed: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+FOOD_SELECTIONS_COLLECTION = "food_suggestion_selections"
+_selection_counts_loaded = False
+
+async def _food_autocomplete():
+    """Shared autocomplete, ranked with selection counts loaded from MongoDB on first use (retried until it succeeds)"""
+    global _selection_counts_loaded
+    if not FOOD_KNOWLEDGE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Food knowledge base not available")
+    autocomplete = get_food_autocomplete()
+    if not _selection_counts_loaded:
+        try:
+            collection = get_database()[FOOD_SELECTIONS_COLLECTION]
+            counts = {doc['_id']: doc['count'] async for doc in collection.find({}, {'count': 1})}
+            autocomplete.load_popularity(counts)
+            _selection_counts_loaded = True
+        except Exception as e:
+            logger.warning(f"⚠️ Food suggestion popularity not loaded: {e}")
+    return autocomplete
+
 @router.get("/food-suggestions")
-async def get_food_suggestions(query: str):
+async def get_food_suggestions(query: str, limit: int = 10):
     """Get food suggestions for autocomplete"""
     try:
-        query_lower = query.lower()
-        suggestions = []
-        
-        for food_key, food_data in ENHANCED_FOOD_DATABASE.items():
-            food_name = food_key.replace('_', ' ')
-            
-            # Check if query matches food name or keywords
-            if query_lower in food_name or any(query_lower in keyword.lower() for keyword in food_data['keywords']):
-                suggestions.append({
-                    'name': food_name.title(),
-                    'cuisine': food_data['cuisine'],
-                    'category': food_data['category'],
-                    'healthScore': food_data['healthScore']
-                })
-        
-        return {'suggestions': suggestions[:10]}  # Limit to 10 suggestions
+        autocomplete = await _food_autocomplete()
+        suggestions = [
+            {
+                'id': suggestion.food.id,
+                'name': suggestion.food.name.title(),
+                'matched': suggestion.matched,
+                'cuisine': suggestion.food.cuisine,
+                'category': suggestion.food.category,
+                'healthScore': suggestion.food.health_score if suggestion.food.health_score is not None else 5.0
+            }
+            for suggestion in autocomplete.suggest(query, min(max(limit, 1), 25))
+        ]
+        return {'suggestions': suggestions}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Food suggestions failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to get suggestions")
 
+@router.post("/food-suggestions/select")
+async def record_food_suggestion_selection(food_id: str = Form(...)):
+    """Log a picked suggestion so popular foods rank higher"""
+    autocomplete = await _food_autocomplete()
+    if not autocomplete.record_selection(food_id):
+        raise HTTPException(status_code=404, detail="Unknown food")
+    try:
+        await get_database()[FOOD_SELECTIONS_COLLECTION].update_one(
+            {'_id': food_id}, {'$inc': {'count': 1}}, upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Food suggestion selection not persisted: {e}")
+    return {'recorded': True}
+
 # Add to your main FastAPI app
 # app.include_router(router)
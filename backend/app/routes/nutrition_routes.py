@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, status
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Any, List, Optional
 from datetime import datetime, timedelta
+import json
 import logging
 
 from ..auth.dependencies import get_current_user
@@ -13,6 +14,7 @@ from ..models.nutrition_models import (
     NutritionCalculations
 )
 from ..services.nutrition_service import nutrition_service
+from ..services.nutrition_stats_service import nutrition_stats_service
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +24,11 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
+
+def _json_default(value: Any):
+    """Encode datetimes as ISO strings and anything else (e.g. ObjectId) as str"""
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
 # Food Analysis Endpoints
 @router.post("/analyze", response_model=FoodAnalysisResponse)
 async def analyze_food(
@@ -172,36 +179,46 @@ async def create_nutrition_log(
 
 @router.get("/logs", response_model=PaginatedNutritionLogs)
 async def get_nutrition_logs(
-    page: int = Query(1, ge=1, description="Page number"),
+    cursor: Optional[str] = Query(None, description="Continuation token from the previous page's next_cursor"),
+    page: Optional[int] = Query(None, ge=1, description="Page number for offset paging (slower; prefer cursor)"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
+    fields: str = Query("full", pattern="^(summary|full)$", description="Projection profile: summary or full"),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Get paginated nutrition logs for the current user
+    Get nutrition logs for the current user, newest first, one page at a time
     """
     try:
         user_id = current_user.get("user_id") or current_user.get("sub")
         
-        result = await nutrition_service.get_nutrition_logs(
-            user_id=user_id,
-            page=page,
-            per_page=per_page,
-            start_date=start_date,
-            end_date=end_date
-        )
+        if page is not None and cursor is None:
+            result = await nutrition_service.get_nutrition_logs(
+                user_id=user_id,
+                page=page,
+                per_page=per_page,
+                start_date=start_date,
+                end_date=end_date,
+                fields=fields
+            )
+        else:
+            result = await nutrition_service.list_nutrition_logs(
+                user_id=user_id,
+                limit=per_page,
+                cursor=cursor,
+                start_date=start_date,
+                end_date=end_date,
+                fields=fields
+            )
         
-        return PaginatedNutritionLogs(
-            success=True,
-            message="Nutrition logs retrieved successfully",
-            logs=result["logs"],
-            total=result["total"],
-            page=result["page"],
-            per_page=result["per_page"],
-            total_pages=result["total_pages"]
-        )
+        return PaginatedNutritionLogs(**result)
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error getting nutrition logs: {e}")
         raise HTTPException(
@@ -209,6 +226,28 @@ async def get_nutrition_logs(
             detail="Failed to retrieve nutrition logs"
         )
 
+@router.get("/logs/export")
+async def export_nutrition_logs(
+    fields: str = Query("full", pattern="^(summary|full)$", description="Projection profile: summary or full"),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Stream all matching nutrition logs as NDJSON (one JSON document per line)
+    """
+    user_id = current_user.get("user_id") or current_user.get("sub")
+    
+    async def lines():
+        try:
+            async for log in nutrition_service.export_nutrition_logs(user_id, start_date, end_date, fields):
+                yield json.dumps(log, default=_json_default) + "\n"
+        except Exception as e:
+            # Headers are already sent; a truncated stream is all the client can be told
+            logger.error(f"Error exporting nutrition logs: {e}")
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/logs/{log_id}", response_model=ApiResponse)
 async def get_nutrition_log(
     log_id: str,
@@ -513,49 +552,16 @@ async def get_nutrition_overview(
         end_date = datetime.now().strftime("%Y-%m-%d")
         start_date = (datetime.now() - timedelta(days=days-1)).strftime("%Y-%m-%d")
         
-        # Get nutrition logs
-        logs_data = await nutrition_service.get_nutrition_logs(
-            user_id=user_id,
-            per_page=1000,
-            start_date=start_date,
-            end_date=end_date
-        )
+        stats = await nutrition_stats_service.get_overview(user_id, start_date, end_date)
         
-        logs = logs_data["logs"]
-        
-        if not logs:
+        if not stats["total_logs"]:
             return ApiResponse(
                 success=True,
                 message="No data available for the specified period",
-                data={
-                    "total_logs": 0,
-                    "days_tracked": 0,
-                    "average_daily_calories": 0,
-                    "most_common_meal_type": None,
-                    "total_meals_analyzed": 0
-                }
+                data=stats
             )
         
-        # Calculate statistics
-        total_calories = sum(log.total_nutrition.calories for log in logs)
-        days_tracked = len(set(log.date for log in logs))
-        avg_daily_calories = total_calories / days_tracked if days_tracked > 0 else 0
-        
-        # Most common meal type
-        meal_types = [log.meal_type for log in logs]
-        most_common_meal = max(set(meal_types), key=meal_types.count) if meal_types else None
-        
-        # Total meals analyzed
-        total_meals = sum(len(log.meals) for log in logs)
-        
-        stats = {
-            "total_logs": len(logs),
-            "days_tracked": days_tracked,
-            "average_daily_calories": round(avg_daily_calories, 1),
-            "most_common_meal_type": most_common_meal,
-            "total_meals_analyzed": total_meals,
-            "period": f"{start_date} to {end_date}"
-        }
+        stats["period"] = f"{start_date} to {end_date}"
         
         return ApiResponse(
             success=True,
@@ -10,7 +10,7 @@ from pydantic import BaseModel, EmailStr, Field
 from ..core.database import get_database
 from ..services.security_service import security_service
 from ..services.data_aggregation_service import DataAggregationService
-from ..services.otp_service import OTPService
+from ..services.otp_service import OTPService, OTPRateLimitError
 from ..models.security_models import (
     EncryptDataRequest,
     EncryptDataResponse,
@@ -113,6 +113,9 @@ async def request_otp(request: RequestOTPModel):
             "expires_at": otp_result["expires_at"],
             "note": "In production, OTP will be sent to your email/phone. For demo, it's shown here."
         }
+    except OTPRateLimitError:
+        # Answered with 429 by the app-level handler
+        raise
     except RuntimeError as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -148,6 +151,9 @@ async def verify_otp(request: VerifyOTPModel):
         )
         
         return verification_result
+    except OTPRateLimitError:
+        # Answered with 429 by the app-level handler
+        raise
     except RuntimeError as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -248,13 +254,13 @@ async def get_secure_report(request: SecureReportRequestModel):
             }
         
         # Step 4: Encrypt the report
-        encrypted_result = security_service.encrypt_data(
+        encrypted_result = await security_service.encrypt_data_async(
             data=report_data,
             user_id=user_id
         )
         
         # Step 5: Generate decryption token for user convenience
-        decryption_token_info = security_service.generate_decryption_token(
+        decryption_token_info = await security_service.generate_decryption_token_async(
             user_id=user_id,
             expires_in_hours=24
         )
@@ -278,6 +284,9 @@ async def get_secure_report(request: SecureReportRequestModel):
         
     except HTTPException:
         raise
+    except OTPRateLimitError:
+        # Answered with 429 by the app-level handler
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -296,7 +305,7 @@ async def encrypt_data(request: EncryptDataRequest):
     Returns encrypted data that can only be decrypted with the same user_id
     """
     try:
-        encrypted_result = security_service.encrypt_data(
+        encrypted_result = await security_service.encrypt_data_async(
             data=request.data,
             user_id=request.user_id
         )
@@ -319,7 +328,7 @@ async def decrypt_data(request: DecryptDataRequest):
     Returns the original decrypted data
     """
     try:
-        decrypted_data = security_service.decrypt_data(
+        decrypted_data = await security_service.decrypt_data_async(
             encrypted_data=request.encrypted_data,
             user_id=request.user_id
         )
@@ -346,7 +355,7 @@ async def generate_decryption_token(request: GenerateTokenRequest):
     Returns a decryption token that can be used to decrypt data
     """
     try:
-        token_info = security_service.generate_decryption_token(
+        token_info = await security_service.generate_decryption_token_async(
             user_id=request.user_id,
             expires_in_hours=request.expires_in_hours
         )
@@ -372,7 +381,7 @@ async def decrypt_with_token(request: DecryptWithTokenRequest):
     Returns the original decrypted data
     """
     try:
-        decrypted_data = security_service.decrypt_with_token(
+        decrypted_data = await security_service.decrypt_with_token_async(
             encrypted_data=request.encrypted_data,
             decryption_token=request.decryption_token
         )
@@ -422,7 +431,7 @@ async def get_health_report(request: HealthReportRequest):
         
         # If encryption is requested
         if request.encrypt:
-            encrypted_result = security_service.encrypt_data(
+            encrypted_result = await security_service.encrypt_data_async(
                 data=report_data,
                 user_id=request.user_id
             )
@@ -498,7 +507,7 @@ async def get_agent_data(
         
         # Encrypt if requested
         if encrypt:
-            encrypted_result = security_service.encrypt_data(
+            encrypted_result = await security_service.encrypt_data_async(
                 data=agent_data,
                 user_id=user_id
             )
@@ -7,7 +7,7 @@ Step 3: Decrypt Access OTP - NOW WITH REAL HEALTH DATA
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from app.core.database import get_database
-from app.services.otp_service import OTPService
+from app.services.otp_service import OTPService, OTPRateLimitError
 from app.services.real_health_data_service import RealHealthDataService
 
 router = APIRouter(prefix="/api/security/three-step", tags=["Three-Step OTP"])
@@ -65,6 +65,9 @@ async def request_email_verification(
         else:
             raise HTTPException(status_code=400, detail=result.get("message"))
             
+    except OTPRateLimitError:
+        # Answered with 429 by the app-level handler
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to send email verification OTP: {str(e)}")
 
@@ -114,6 +117,9 @@ async def verify_email_verification(
             else:
                 return result
                 
+    except OTPRateLimitError:
+        # Answered with 429 by the app-level handler
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to verify email verification OTP: {str(e)}")
 
@@ -149,6 +155,9 @@ async def request_download_access(
         else:
             raise HTTPException(status_code=400, detail=result.get("message"))
             
+    except OTPRateLimitError:
+        # Answered with 429 by the app-level handler
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to send download access OTP: {str(e)}")
 
@@ -210,6 +219,9 @@ async def verify_download_access(
             else:
                 return result
                 
+    except OTPRateLimitError:
+        # Answered with 429 by the app-level handler
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to verify download access OTP: {str(e)}")
 
@@ -245,6 +257,9 @@ async def request_decrypt_access(
         else:
             raise HTTPException(status_code=400, detail=result.get("message"))
             
+    except OTPRateLimitError:
+        # Answered with 429 by the app-level handler
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to send decrypt access OTP: {str(e)}")
 
@@ -302,6 +317,9 @@ async def verify_decrypt_access(
             else:
                 return result
                 
+    except OTPRateLimitError:
+        # Answered with 429 by the app-level handler
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to verify decrypt access OTP: {str(e)}")
 
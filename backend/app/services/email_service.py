@@ -5,6 +5,8 @@ from email.mime.multipart import MIMEMultipart
 import os
 import logging
 
+from app.services.mail_dispatcher import MailDispatcher, OutgoingMail
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -63,8 +65,18 @@ class EmailService:
 
 email_service = EmailService()
 
+# Shared delivery queue; async callers enqueue instead of opening a connection per message
+mail_dispatcher = MailDispatcher(
+    host=email_service.smtp_server,
+    port=email_service.smtp_port,
+    sender=email_service.sender_email,
+    username=email_service.sender_email,
+    password=email_service.sender_password
+)
+
 
-async def send_otp_email(recipient_email: str, otp_code: str, purpose: str = "verification") -> bool:
+async def send_otp_email(recipient_email: str, otp_code: str, purpose: str = "verification",
+                         expires_in_minutes: int = 10) -> bool:
     """
     Async wrapper for sending OTP emails with purpose-specific templates
     
@@ -72,9 +84,10 @@ async def send_otp_email(recipient_email: str, otp_code: str, purpose: str = "ve
         recipient_email: Email address to send OTP to
         otp_code: The OTP code to send
         purpose: Purpose of OTP ("email_verification", "download_access", "decrypt_access")
+        expires_in_minutes: OTP expiration time shown in the email
     
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if the email was queued for delivery, False otherwise
     """
     try:
         # Create purpose-specific email templates
@@ -102,12 +115,6 @@ async def send_otp_email(recipient_email: str, otp_code: str, purpose: str = "ve
         # Get purpose-specific message or default
         msg_info = purpose_messages.get(purpose, purpose_messages["email_verification"])
         
-        # Create enhanced message
-        message = MIMEMultipart("alternative")
-        message["Subject"] = msg_info["subject"]
-        message["From"] = email_service.sender_email
-        message["To"] = recipient_email
-        
         # Enhanced HTML template
         html = f'''
         <html>
@@ -128,7 +135,7 @@ async def send_otp_email(recipient_email: str, otp_code: str, purpose: str = "ve
                 
                 <div style="background: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px; margin: 20px 0;">
                     <p style="color: #856404; margin: 0; text-align: center;">
-                        ⏰ This code will expire in 10 minutes for security purposes.
+                        ⏰ This code will expire in {expires_in_minutes} minutes for security purposes.
                     </p>
                 </div>
                 
@@ -150,23 +157,21 @@ async def send_otp_email(recipient_email: str, otp_code: str, purpose: str = "ve
 
 Your OTP Code: {otp_code}
 
-This code will expire in 10 minutes for security purposes.
+This code will expire in {expires_in_minutes} minutes for security purposes.
 
 ---
 Healthy Lifestyle Advisor - Automated Security Message
         """.strip()
         
-        message.attach(MIMEText(text, "plain"))
-        message.attach(MIMEText(html, "html"))
-        
-        # Send email manually since we have custom content
-        logger.info(f"Sending {purpose} OTP email to {recipient_email}")
-        with smtplib.SMTP(email_service.smtp_server, email_service.smtp_port) as server:
-            server.starttls()
-            server.login(email_service.sender_email, email_service.sender_password)
-            server.sendmail(email_service.sender_email, recipient_email, message.as_string())
-        logger.info(f"{purpose} OTP email sent successfully to {recipient_email}")
-        return True
+        # A newer code for the same purpose replaces one that is still queued
+        logger.info(f"Queueing {purpose} OTP email to {recipient_email}")
+        return mail_dispatcher.enqueue(OutgoingMail(
+            recipient=recipient_email,
+            subject=msg_info["subject"],
+            text=text,
+            html=html,
+            coalesce_key=f"otp:{purpose}"
+        ))
         
     except Exception as e:
         logger.error(f"Failed to send async OTP email: {e}")
@@ -0,0 +1,304 @@
+"""
+Async mail dispatcher
+Queues outgoing mail in-process and delivers it over a small pool of
+persistent SMTP sessions, so request handlers never wait on an SMTP handshake
+"""
+import asyncio
+import itertools
+import logging
+import os
+import smtplib
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, Dict, Hashable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+MAIL_POOL_SIZE = int(os.getenv("MAIL_POOL_SIZE", "2"))
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", "1000"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "4"))
+MAIL_RETRY_BACKOFF_SECONDS = float(os.getenv("MAIL_RETRY_BACKOFF_SECONDS", "2"))
+
+# An idle session is probed with NOOP before reuse; servers drop idle clients
+SMTP_KEEPALIVE_SECONDS = float(os.getenv("SMTP_KEEPALIVE_SECONDS", "60"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+
+DEAD_LETTER_COLLECTION = "mail_dead_letters"
+
+
+@dataclass
+class OutgoingMail:
+    """A message waiting to be delivered"""
+    recipient: str
+    subject: str
+    text: str
+    html: Optional[str] = None
+    # Queued mails with the same recipient and key collapse into the newest one
+    coalesce_key: Optional[str] = None
+    attempts: int = 0
+    queued_at: datetime = field(default_factory=datetime.utcnow)
+    last_error: Optional[str] = None
+
+    def to_message(self, sender: str) -> str:
+        message = MIMEMultipart("alternative")
+        message["Subject"] = self.subject
+        message["From"] = sender
+        message["To"] = self.recipient
+        message.attach(MIMEText(self.text, "plain"))
+        if self.html:
+            message.attach(MIMEText(self.html, "html"))
+        return message.as_string()
+
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx replies will not succeed on retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+class SMTPSession:
+    """
+    One persistent, authenticated SMTP connection
+
+    All methods block and are meant to run on a worker thread.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = True, keepalive_seconds: float = SMTP_KEEPALIVE_SECONDS,
+                 timeout: float = SMTP_TIMEOUT_SECONDS):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout = timeout
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.connects = 0
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self.connects += 1
+
+    def _is_alive(self) -> bool:
+        if time.monotonic() - self._last_used < self.keepalive_seconds:
+            return True
+        try:
+            return self._smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, sender: str, recipient: str, message: str):
+        if self._smtp is not None and not self._is_alive():
+            self.close()
+        if self._smtp is None:
+            self._connect()
+        try:
+            self._smtp.sendmail(sender, recipient, message)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped the session between sends; reconnect once
+            self.close()
+            self._connect()
+            self._smtp.sendmail(sender, recipient, message)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+
+class MailDispatcher:
+    """
+    Bounded in-process mail queue drained by a pool of SMTP sessions
+
+    enqueue() never blocks: it returns False when the queue is full so the
+    caller can fall back. Failed deliveries are retried with exponential
+    backoff and end up in the dead-letter collection after MAIL_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, host: str, port: int, sender: str, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = True, pool_size: int = MAIL_POOL_SIZE,
+                 queue_size: int = MAIL_QUEUE_SIZE, max_attempts: int = MAIL_MAX_ATTEMPTS,
+                 backoff_seconds: float = MAIL_RETRY_BACKOFF_SECONDS,
+                 keepalive_seconds: float = SMTP_KEEPALIVE_SECONDS,
+                 dead_letters: Optional[Callable[[], object]] = None):
+        self.sender = sender
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.sessions = [
+            SMTPSession(host, port, username, password, use_tls, keepalive_seconds)
+            for _ in range(pool_size)
+        ]
+        self._dead_letters = dead_letters or _default_dead_letters
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[Hashable, OutgoingMail] = {}
+        self._workers: list = []
+        self._retries: Set[asyncio.Task] = set()
+        self._retrying: Dict[Hashable, OutgoingMail] = {}
+        self._ids = itertools.count()
+        self.stats = {"queued": 0, "coalesced": 0, "rejected": 0, "sent": 0, "retried": 0, "dead_lettered": 0}
+
+    def start(self):
+        """Start the worker pool on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._pending.clear()
+        self._retries.clear()
+        self._retrying.clear()
+        self._workers = [asyncio.create_task(self._worker(session)) for session in self.sessions]
+
+    async def stop(self):
+        """Stop the workers and close every SMTP session; undelivered mail is dropped"""
+        for task in [*self._workers, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._retries, return_exceptions=True)
+        self._workers = []
+        self._retries.clear()
+        self._loop = None
+        for session in self.sessions:
+            await asyncio.to_thread(session.close)
+
+    async def join(self):
+        """Wait until every queued mail, including scheduled retries, is sent or dead-lettered"""
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.gather(*self._retries, return_exceptions=True)
+
+    def enqueue(self, mail: OutgoingMail) -> bool:
+        """
+        Queue a mail for delivery
+
+        Returns:
+            False if the queue is full, True otherwise
+        """
+        self.start()
+        key = (mail.recipient.lower(), mail.coalesce_key) if mail.coalesce_key else next(self._ids)
+        # A failed mail waiting for its retry is superseded as well
+        self._retrying.pop(key, None)
+        if key in self._pending:
+            # Not picked up yet: keep the queue position, send the newest content
+            self._pending[key] = mail
+            self.stats["coalesced"] += 1
+            return True
+        try:
+            self._queue.put_nowait(key)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            logger.warning(f"Mail queue full, rejecting mail to {mail.recipient}")
+            return False
+        self._pending[key] = mail
+        self.stats["queued"] += 1
+        return True
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self, session: SMTPSession):
+        while True:
+            key = await self._queue.get()
+            mail = self._pending.pop(key, None)
+            try:
+                if mail is not None:
+                    await self._deliver(session, key, mail)
+            except Exception as e:
+                logger.error(f"Mail worker error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, session: SMTPSession, key: Hashable, mail: OutgoingMail):
+        mail.attempts += 1
+        try:
+            await asyncio.to_thread(session.send, self.sender, mail.recipient, mail.to_message(self.sender))
+        except (smtplib.SMTPException, OSError) as e:
+            mail.last_error = str(e)
+            # The session may be half-broken; start the next mail on a fresh connection
+            await asyncio.to_thread(session.close)
+            if _is_permanent(e) or mail.attempts >= self.max_attempts:
+                await self._dead_letter(mail)
+            else:
+                self._schedule_retry(key, mail)
+            return
+        self.stats["sent"] += 1
+        logger.info(f"Mail sent to {mail.recipient}")
+
+    def _schedule_retry(self, key: Hashable, mail: OutgoingMail):
+        delay = self.backoff_seconds * 2 ** (mail.attempts - 1)
+        logger.warning(f"Mail to {mail.recipient} failed ({mail.last_error}), retrying in {delay:.1f}s")
+        self.stats["retried"] += 1
+        self._retrying[key] = mail
+        task = asyncio.create_task(self._retry_after(delay, key, mail))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _retry_after(self, delay: float, key: Hashable, mail: OutgoingMail):
+        await asyncio.sleep(delay)
+        if self._retrying.get(key) is not mail:
+            # A newer mail for the same recipient and purpose superseded this one
+            return
+        del self._retrying[key]
+        try:
+            self._queue.put_nowait(key)
+        except asyncio.QueueFull:
+            mail.last_error = "queue full on retry"
+            await self._dead_letter(mail)
+            return
+        self._pending[key] = mail
+
+    async def _dead_letter(self, mail: OutgoingMail):
+        self.stats["dead_lettered"] += 1
+        logger.error(f"Mail to {mail.recipient} moved to dead letters after {mail.attempts} attempt(s): {mail.last_error}")
+        try:
+            collection = self._dead_letters()
+            if collection is not None:
+                await collection.insert_one({
+                    "recipient": mail.recipient,
+                    "subject": mail.subject,
+                    "text": mail.text,
+                    "html": mail.html,
+                    "coalesce_key": mail.coalesce_key,
+                    "attempts": mail.attempts,
+                    "error": mail.last_error,
+                    "queued_at": mail.queued_at,
+                    "failed_at": datetime.utcnow()
+                })
+        except Exception as e:
+            logger.error(f"Failed to store dead letter: {e}")
+
+
+def _default_dead_letters():
+    from app.core.database import get_database
+    try:
+        return get_database()[DEAD_LETTER_COLLECTION]
+    except RuntimeError:
+        return None
@@ -1,8 +1,16 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
 from datetime import datetime, timedelta
 from bson import ObjectId
-from pymongo.errors import PyMongoError
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import PyMongoError, DuplicateKeyError
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
 import logging
+import time
 
 from ..core.database import get_database
 from ..models.nutrition_models import (
@@ -13,18 +21,157 @@ from ..models.nutrition_models import (
 
 logger = logging.getLogger(__name__)
 
+# Nutrient fields kept as running totals on each daily summary
+SUMMARY_NUTRIENTS = ("calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium")
+
+# Totals that differ by less than this are treated as equal by the verifier
+SUMMARY_DRIFT_TOLERANCE = 0.01
+
+# Set on summaries whose meal type and food counters cover every log of the day:
+# summaries created by the write path and those rebuilt by the verifier. Summaries
+# from before the counters existed lack it, so overview statistics read the logs
+# for those days instead (verify_daily_summaries(days=...) backfills them)
+SUMMARY_COUNTERS_FIELD = "counters_complete"
+
+# Indexes the nutrition collections rely on, as (collection, keys, create_index options)
+NUTRITION_INDEXES = [
+    ("daily_nutrition_summaries", [("user_id", ASCENDING), ("date", ASCENDING)],
+     {"unique": True, "name": "user_date_unique"}),
+    ("nutrition_logs", [("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+     {"name": "user_date_id"}),
+    # Older deployments stored several reports per period; they are deduplicated first
+    ("weekly_reports", [("user_id", ASCENDING), ("start_date", ASCENDING), ("end_date", ASCENDING)],
+     {"unique": True}),
+]
+
+# Seconds before indexes that could not be created are attempted again
+INDEX_RETRY_SECONDS = 300
+
+# Generated weekly reports kept in memory, keyed by (user_id, start_date, end_date)
+WEEKLY_REPORT_CACHE_SIZE = 256
+
+# Log listing order, newest day first; _id (insertion order) breaks ties within a day.
+# Backed by the (user_id, date, _id) index so a page never scans skipped logs.
+LOG_SORT = [("date", DESCENDING), ("_id", DESCENDING)]
+
+# Fields returned per log for each listing profile (None returns the whole document)
+LOG_PROJECTIONS: Dict[str, Optional[Dict[str, int]]] = {
+    "summary": {
+        "user_id": 1, "date": 1, "meal_type": 1, "total_nutrition": 1, "meals.name": 1,
+        "analysis_method": 1, "confidence_score": 1, "created_at": 1
+    },
+    "full": None
+}
+
+# Documents fetched per round trip when exporting
+LOG_EXPORT_BATCH_SIZE = 500
+
+
+def _encode_key(name: str) -> str:
+    """Make a food or meal-type name safe to use as a Mongo field name"""
+    return name.replace("$", "\uff04").replace(".", "\uff0e")
+
+
+def _decode_key(key: str) -> str:
+    return key.replace("\uff04", "$").replace("\uff0e", ".")
+
+
+def encode_log_cursor(doc: Dict[str, Any]) -> str:
+    """Opaque continuation token for the position just after a listed log"""
+    payload = json.dumps([doc["date"], str(doc["_id"])], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_log_cursor(token: str) -> Tuple[str, ObjectId]:
+    """(date, _id) of the last log on the previous page; ValueError for a malformed token"""
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        date, log_id = json.loads(payload)
+        if not isinstance(date, str):
+            raise ValueError("cursor date is not a string")
+        return date, ObjectId(log_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def _serialize_log(doc: Dict[str, Any]) -> Dict[str, Any]:
+    doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
+def _rollup_counters(meal_type: Optional[str], food_names: List[str], sign: int) -> Dict[str, int]:
+    """Per-day meal-type and food frequency counters (and food item count) contributed by one log"""
+    counters: Dict[str, int] = {"food_item_count": sign * len(food_names)} if food_names else {}
+    if meal_type:
+        key = f"meal_types.{_encode_key(meal_type)}"
+        counters[key] = counters.get(key, 0) + sign
+    for name in food_names:
+        if name:
+            key = f"food_counts.{_encode_key(name)}"
+            counters[key] = counters.get(key, 0) + sign
+    return counters
+
+
 class NutritionService:
     """Service class for handling nutrition data operations"""
     
     def __init__(self):
         self.db = None
+        self._indexes_ready = False
+        self._created_indexes: set = set()
+        self._index_retry_at = 0.0
+        self.weekly_report_cache: Dict[tuple, WeeklyReport] = {}
     
     async def get_db(self):
         """Get database instance"""
-        if not self.db:
-            self.db = await get_database()
+        if self.db is None:
+            self.db = get_database()
+        if not self._indexes_ready:
+            await self._ensure_indexes(self.db)
         return self.db
     
+    async def _ensure_indexes(self, db):
+        """Create the indexes the summary upserts and report lookups rely on.
+        
+        Each index is created on its own so one failure does not hide the others;
+        indexes that failed are retried on a later call, at most every
+        INDEX_RETRY_SECONDS, until all exist.
+        """
+        if time.monotonic() < self._index_retry_at:
+            return
+        for collection, keys, options in NUTRITION_INDEXES:
+            if collection in self._created_indexes:
+                continue
+            try:
+                if collection == "weekly_reports":
+                    await self._dedupe_weekly_reports(db)
+                await db[collection].create_index(keys, **options)
+                self._created_indexes.add(collection)
+            except PyMongoError as e:
+                # Writes still work without the index, only concurrent first writes may duplicate
+                logger.warning(f"Could not create {collection} index {options.get('name', keys)}: {e}")
+        self._indexes_ready = len(self._created_indexes) == len(NUTRITION_INDEXES)
+        if not self._indexes_ready:
+            self._index_retry_at = time.monotonic() + INDEX_RETRY_SECONDS
+    
+    async def _dedupe_weekly_reports(self, db):
+        """Keep the newest stored report per user and period so the period can be made unique"""
+        duplicates = db.weekly_reports.aggregate([
+            {"$sort": {"_id": -1}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "start_date": "$start_date", "end_date": "$end_date"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1}
+            }},
+            {"$match": {"count": {"$gt": 1}}}
+        ])
+        stale = []
+        async for group in duplicates:
+            stale.extend(group["ids"][1:])
+        if stale:
+            await db.weekly_reports.delete_many({"_id": {"$in": stale}})
+            logger.info(f"Removed {len(stale)} duplicate weekly reports")
+    
     # Nutrition Logs Operations
     async def create_nutrition_log(self, user_id: str, log_data: NutritionLogCreate) -> Optional[NutritionLog]:
         """Create a new nutrition log entry"""
@@ -53,11 +200,12 @@ class NutritionService:
             result = await db.nutrition_logs.insert_one(nutrition_log.dict(by_alias=True, exclude={'id'}))
             
             if result.inserted_id:
+                nutrition_log.id = result.inserted_id
+                
                 # Update daily summary
                 await self._update_daily_summary(user_id, nutrition_log)
                 
                 # Return created log with ID
-                nutrition_log.id = result.inserted_id
                 return nutrition_log
             
             return None
@@ -69,33 +217,92 @@ class NutritionService:
             logger.error(f"Error creating nutrition log: {e}")
             return None
     
+    @staticmethod
+    def _log_query(user_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   after: Optional[Tuple[str, ObjectId]] = None) -> Dict[str, Any]:
+        query: Dict[str, Any] = {"user_id": user_id}
+        if start_date or end_date:
+            date_query = {}
+            if start_date:
+                date_query["$gte"] = start_date
+            if end_date:
+                date_query["$lte"] = end_date
+            query["date"] = date_query
+        if after:
+            # Strictly after the cursor in LOG_SORT order
+            date, log_id = after
+            query["$or"] = [{"date": {"$lt": date}}, {"date": date, "_id": {"$lt": log_id}}]
+        return query
+    
+    async def list_nutrition_logs(self, user_id: str, limit: int = 10, cursor: Optional[str] = None,
+                                  start_date: Optional[str] = None, end_date: Optional[str] = None,
+                                  fields: str = "full") -> Dict[str, Any]:
+        """Get one page of nutrition logs by keyset, newest first.
+        
+        Pass the returned ``next_cursor`` back as ``cursor`` for the following page;
+        it is None after the last page. Each page is an index seek, so page N costs
+        the same as page 1. Raises ValueError for an invalid cursor or profile.
+        """
+        if fields not in LOG_PROJECTIONS:
+            raise ValueError(f"Unknown fields profile: {fields}")
+        after = decode_log_cursor(cursor) if cursor else None
+        try:
+            db = await self.get_db()
+            
+            query = self._log_query(user_id, start_date, end_date, after)
+            docs = []
+            # One extra document tells whether another page follows
+            async for doc in db.nutrition_logs.find(query, LOG_PROJECTIONS[fields]).sort(LOG_SORT).limit(limit + 1):
+                docs.append(doc)
+            
+            next_cursor = encode_log_cursor(docs[limit - 1]) if len(docs) > limit else None
+            return {
+                "logs": [_serialize_log(doc) for doc in docs[:limit]],
+                "per_page": limit,
+                "next_cursor": next_cursor
+            }
+            
+        except PyMongoError as e:
+            logger.error(f"Database error listing nutrition logs: {e}")
+            return {"logs": [], "per_page": limit, "next_cursor": None}
+    
+    async def export_nutrition_logs(self, user_id: str, start_date: Optional[str] = None,
+                                    end_date: Optional[str] = None, fields: str = "full") -> AsyncIterator[Dict[str, Any]]:
+        """Stream every matching log in listing order, one batch of documents in memory at a time"""
+        if fields not in LOG_PROJECTIONS:
+            raise ValueError(f"Unknown fields profile: {fields}")
+        db = await self.get_db()
+        cursor = db.nutrition_logs.find(
+            self._log_query(user_id, start_date, end_date), LOG_PROJECTIONS[fields]
+        ).sort(LOG_SORT).batch_size(LOG_EXPORT_BATCH_SIZE)
+        async for doc in cursor:
+            yield _serialize_log(doc)
+    
     async def get_nutrition_logs(self, user_id: str, page: int = 1, per_page: int = 10, 
-                               start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
-        """Get paginated nutrition logs for a user"""
+                               start_date: Optional[str] = None, end_date: Optional[str] = None,
+                               fields: str = "full") -> Dict[str, Any]:
+        """Get offset-paginated nutrition logs for a user.
+        
+        Skipped logs are still scanned, so late pages get slower with history size;
+        prefer ``list_nutrition_logs``.
+        """
+        if fields not in LOG_PROJECTIONS:
+            raise ValueError(f"Unknown fields profile: {fields}")
         try:
             db = await self.get_db()
             
-            # Build query
-            query = {"user_id": user_id}
-            if start_date or end_date:
-                date_query = {}
-                if start_date:
-                    date_query["$gte"] = start_date
-                if end_date:
-                    date_query["$lte"] = end_date
-                query["date"] = date_query
+            query = self._log_query(user_id, start_date, end_date)
             
             # Get total count
             total = await db.nutrition_logs.count_documents(query)
             
             # Get paginated results
             skip = (page - 1) * per_page
-            cursor = db.nutrition_logs.find(query).sort("created_at", -1).skip(skip).limit(per_page)
+            cursor = db.nutrition_logs.find(query, LOG_PROJECTIONS[fields]).sort(LOG_SORT).skip(skip).limit(per_page)
             logs = []
             
             async for doc in cursor:
-                doc['id'] = str(doc['_id'])
-                logs.append(NutritionLog(**doc))
+                logs.append(_serialize_log(doc))
             
             total_pages = (total + per_page - 1) // per_page
             
@@ -149,12 +356,34 @@ class NutritionService:
             
             update_dict["updated_at"] = datetime.utcnow()
             
-            result = await db.nutrition_logs.update_one(
+            # Take the previous version so the summary can be moved by the difference
+            previous = await db.nutrition_logs.find_one_and_update(
                 {"_id": ObjectId(log_id), "user_id": user_id},
-                {"$set": update_dict}
+                {"$set": update_dict},
+                return_document=ReturnDocument.BEFORE
             )
             
-            if result.modified_count > 0:
+            if previous:
+                delta = {}
+                if "total_nutrition" in update_dict:
+                    delta = {
+                        field: (update_dict["total_nutrition"].get(field) or 0)
+                        - (previous.get("total_nutrition", {}).get(field) or 0)
+                        for field in SUMMARY_NUTRIENTS
+                    }
+                
+                # Move the frequency counters from the old meal type/foods to the new ones
+                old_foods = [meal.get("name") for meal in previous.get("meals", [])]
+                new_foods = [meal["name"] for meal in update_dict["meals"]] if "meals" in update_dict else old_foods
+                counters = _rollup_counters(previous.get("meal_type"), old_foods, -1)
+                for key, value in _rollup_counters(update_dict.get("meal_type", previous.get("meal_type")), new_foods, 1).items():
+                    counters[key] = counters.get(key, 0) + value
+                counters = {key: value for key, value in counters.items() if value}
+                
+                if delta or counters:
+                    await self._apply_daily_summary_delta(
+                        user_id, previous["date"], delta, meal_count=0, counters=counters
+                    )
                 return await self.get_nutrition_log_by_id(user_id, log_id)
             
             return None
@@ -168,14 +397,23 @@ class NutritionService:
         try:
             db = await self.get_db()
             
-            result = await db.nutrition_logs.delete_one({
+            deleted = await db.nutrition_logs.find_one_and_delete({
                 "_id": ObjectId(log_id),
                 "user_id": user_id
             })
             
-            if result.deleted_count > 0:
-                # Update daily summary
-                await self._recalculate_daily_summary(user_id, datetime.now().strftime("%Y-%m-%d"))
+            if deleted:
+                # Take the log's totals back out of the summary for the day it was logged
+                delta = {
+                    field: -(deleted.get("total_nutrition", {}).get(field) or 0)
+                    for field in SUMMARY_NUTRIENTS
+                }
+                counters = _rollup_counters(
+                    deleted.get("meal_type"), [meal.get("name") for meal in deleted.get("meals", [])], -1
+                )
+                await self._apply_daily_summary_delta(
+                    user_id, deleted["date"], delta, meal_count=-1, log_id=deleted["_id"], counters=counters
+                )
                 return True
             
             return False
@@ -232,7 +470,12 @@ class NutritionService:
     # Weekly Report Operations
     async def generate_weekly_report(self, user_id: str, start_date: Optional[str] = None, 
                                    end_date: Optional[str] = None) -> Optional[WeeklyReport]:
-        """Generate a comprehensive weekly nutrition report"""
+        """Generate a weekly nutrition report from the daily summaries.
+        
+        Reports are composed from the per-day rollups instead of the raw logs and
+        are only rebuilt when the data version of the week changes; otherwise the
+        cached (in-process or stored) report is returned.
+        """
         try:
             db = await self.get_db()
             
@@ -242,102 +485,167 @@ class NutritionService:
             if not start_date:
                 start_date = (datetime.now() - timedelta(days=6)).strftime("%Y-%m-%d")
             
-            # Get nutrition logs for the period
-            logs_data = await self.get_nutrition_logs(
-                user_id=user_id,
-                per_page=1000,  # Get all logs for the period
-                start_date=start_date,
-                end_date=end_date
-            )
-            logs = logs_data["logs"]
+            summaries = await db.daily_nutrition_summaries.find({
+                "user_id": user_id,
+                "date": {"$gte": start_date, "$lte": end_date}
+            }).sort("date", 1).to_list(length=None)
             
-            if not logs:
+            if not summaries:
                 return None
             
-            # Calculate weekly totals and averages
-            total_nutrition = {
-                'calories': 0.0, 'protein': 0.0, 'carbs': 0.0, 'fat': 0.0,
-                'fiber': 0.0, 'sugar': 0.0, 'sodium': 0.0
-            }
-            
-            meal_frequency = {}
-            top_foods = {}
-            
-            for log in logs:
-                # Add to totals
-                nutrition = log.total_nutrition
-                total_nutrition['calories'] += nutrition.calories
-                total_nutrition['protein'] += nutrition.protein
-                total_nutrition['carbs'] += nutrition.carbs
-                total_nutrition['fat'] += nutrition.fat
-                if nutrition.fiber: total_nutrition['fiber'] += nutrition.fiber
-                if nutrition.sugar: total_nutrition['sugar'] += nutrition.sugar
-                if nutrition.sodium: total_nutrition['sodium'] += nutrition.sodium
-                
-                # Count meal types
-                meal_frequency[log.meal_type] = meal_frequency.get(log.meal_type, 0) + 1
-                
-                # Count foods
-                for meal in log.meals:
-                    top_foods[meal.name] = top_foods.get(meal.name, 0) + 1
-            
-            # Calculate averages
-            num_days = len(set(log.date for log in logs))
-            avg_daily_calories = total_nutrition['calories'] / num_days if num_days > 0 else 0
-            
-            # Get user preferences for goal comparison
             preferences = await self.get_user_nutrition_preferences(user_id)
+            data_version = self._weekly_data_version(summaries, preferences)
             
-            # Calculate health score
-            avg_nutrition = NutritionData(
-                calories=avg_daily_calories,
-                protein=total_nutrition['protein'] / num_days,
-                carbs=total_nutrition['carbs'] / num_days,
-                fat=total_nutrition['fat'] / num_days,
-                fiber=total_nutrition['fiber'] / num_days if total_nutrition['fiber'] else None,
-                sugar=total_nutrition['sugar'] / num_days if total_nutrition['sugar'] else None,
-                sodium=total_nutrition['sodium'] / num_days if total_nutrition['sodium'] else None
-            )
-            
-            health_score = 85  # Default score
-            if preferences:
-                health_score = NutritionCalculations.generate_health_score(avg_nutrition, preferences)
-            
-            # Generate insights and recommendations
-            insights = self._generate_weekly_insights(logs, avg_nutrition, preferences)
-            recommendations = self._generate_weekly_recommendations(logs, avg_nutrition, preferences)
+            cache_key = (user_id, start_date, end_date)
+            cached = self.weekly_report_cache.get(cache_key)
+            if cached and cached.data_version == data_version:
+                return cached
             
-            # Get top foods list
-            top_foods_list = sorted(top_foods.keys(), key=lambda x: top_foods[x], reverse=True)[:10]
-            
-            # Create weekly report
-            weekly_report = WeeklyReport(
-                user_id=user_id,
-                period=f"{start_date} - {end_date}",
-                start_date=start_date,
-                end_date=end_date,
-                average_daily_calories=round(avg_daily_calories, 1),
-                total_logs=len(logs),
-                nutrition_trends=NutritionData(**total_nutrition),
-                insights=insights,
-                recommendations=recommendations,
-                health_score=health_score,
-                meal_frequency=meal_frequency,
-                top_foods=top_foods_list,
-                nutrition_goals_met=self._calculate_goals_achievement(avg_nutrition, preferences)
-            )
-            
-            # Save to database
-            result = await db.weekly_reports.insert_one(weekly_report.dict(by_alias=True, exclude={'id'}))
-            if result.inserted_id:
-                weekly_report.id = result.inserted_id
+            stored = await db.weekly_reports.find_one({
+                "user_id": user_id,
+                "start_date": start_date,
+                "end_date": end_date,
+                "data_version": data_version
+            })
+            if stored:
+                weekly_report = WeeklyReport(**stored)
+            else:
+                summaries = await self._with_log_counters(db, user_id, summaries)
+                weekly_report = self._compose_weekly_report(
+                    user_id, start_date, end_date, summaries, preferences, data_version
+                )
+                
+                # One stored report per user and period, replaced when the data changes
+                result = await db.weekly_reports.find_one_and_update(
+                    {"user_id": user_id, "start_date": start_date, "end_date": end_date},
+                    {"$set": weekly_report.dict(exclude={'id'})},
+                    upsert=True,
+                    projection={"_id": 1},
+                    return_document=ReturnDocument.AFTER
+                )
+                if result:
+                    weekly_report.id = result["_id"]
             
+            self._cache_weekly_report(cache_key, weekly_report)
             return weekly_report
             
         except Exception as e:
             logger.error(f"Error generating weekly report: {e}")
             return None
     
+    async def _with_log_counters(self, db, user_id: str, summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill in the meal type and food counters of summaries that predate them from their logs"""
+        legacy_days = [summary["date"] for summary in summaries if not summary.get(SUMMARY_COUNTERS_FIELD)]
+        if not legacy_days:
+            return summaries
+        
+        counters = {day: {"meal_types": {}, "food_counts": {}} for day in legacy_days}
+        cursor = db.nutrition_logs.find(
+            {"user_id": user_id, "date": {"$in": legacy_days}},
+            {"date": 1, "meal_type": 1, "meals.name": 1}
+        )
+        async for log in cursor:
+            names = [meal.get("name") for meal in log.get("meals") or []]
+            for path, count in _rollup_counters(log.get("meal_type"), names, 1).items():
+                group_name, _, name = path.partition(".")
+                if name:
+                    day_counters = counters[log["date"]][group_name]
+                    day_counters[name] = day_counters.get(name, 0) + count
+        return [{**summary, **counters.get(summary["date"], {})} for summary in summaries]
+    
+    def _compose_weekly_report(self, user_id: str, start_date: str, end_date: str,
+                               summaries: List[Dict[str, Any]],
+                               preferences: Optional[UserNutritionPreferences],
+                               data_version: str) -> WeeklyReport:
+        """Merge daily rollups into a weekly report"""
+        total_nutrition = {field: 0.0 for field in SUMMARY_NUTRIENTS}
+        meal_frequency: Dict[str, int] = {}
+        top_foods: Dict[str, int] = {}
+        daily_summaries = []
+        total_logs = 0
+        
+        for summary in summaries:
+            nutrition = summary.get("total_nutrition", {})
+            for field in SUMMARY_NUTRIENTS:
+                total_nutrition[field] += nutrition.get(field) or 0
+            total_logs += summary.get("meal_count", 0)
+            
+            for key, count in summary.get("meal_types", {}).items():
+                if count > 0:
+                    meal_type = _decode_key(key)
+                    meal_frequency[meal_type] = meal_frequency.get(meal_type, 0) + count
+            for key, count in summary.get("food_counts", {}).items():
+                if count > 0:
+                    food = _decode_key(key)
+                    top_foods[food] = top_foods.get(food, 0) + count
+            
+            daily_summaries.append({
+                "date": summary["date"],
+                "meal_count": summary.get("meal_count", 0),
+                "total_nutrition": {field: round(nutrition.get(field) or 0, 1) for field in SUMMARY_NUTRIENTS}
+            })
+        
+        # Calculate averages
+        num_days = len(summaries)
+        avg_daily_calories = total_nutrition['calories'] / num_days
+        
+        avg_nutrition = NutritionData(
+            calories=avg_daily_calories,
+            protein=total_nutrition['protein'] / num_days,
+            carbs=total_nutrition['carbs'] / num_days,
+            fat=total_nutrition['fat'] / num_days,
+            fiber=total_nutrition['fiber'] / num_days if total_nutrition['fiber'] else None,
+            sugar=total_nutrition['sugar'] / num_days if total_nutrition['sugar'] else None,
+            sodium=total_nutrition['sodium'] / num_days if total_nutrition['sodium'] else None
+        )
+        
+        health_score = 85  # Default score
+        if preferences:
+            health_score = NutritionCalculations.generate_health_score(avg_nutrition, preferences)
+        
+        # Generate insights and recommendations
+        insights = self._generate_weekly_insights(total_logs, avg_nutrition, preferences)
+        recommendations = self._generate_weekly_recommendations(avg_nutrition, preferences)
+        
+        # Get top foods list
+        top_foods_list = sorted(top_foods.keys(), key=lambda x: top_foods[x], reverse=True)[:10]
+        
+        return WeeklyReport(
+            user_id=user_id,
+            period=f"{start_date} - {end_date}",
+            start_date=start_date,
+            end_date=end_date,
+            average_daily_calories=round(avg_daily_calories, 1),
+            total_logs=total_logs,
+            average_nutrition=avg_nutrition,
+            daily_summaries=daily_summaries,
+            nutrition_trends=NutritionData(**total_nutrition),
+            insights=insights,
+            recommendations=recommendations,
+            health_score=health_score,
+            meal_frequency=meal_frequency,
+            top_foods=top_foods_list,
+            nutrition_goals_met=self._calculate_goals_achievement(avg_nutrition, preferences),
+            data_version=data_version
+        )
+    
+    def _weekly_data_version(self, summaries: List[Dict[str, Any]],
+                             preferences: Optional[UserNutritionPreferences]) -> str:
+        """Fingerprint of everything a weekly report is derived from"""
+        parts = [
+            f"{summary['date']}:{summary.get('version', summary.get('updated_at'))}:{summary.get('meal_count')}"
+            for summary in summaries
+        ]
+        parts.append(f"prefs:{getattr(preferences, 'updated_at', None)}")
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+    
+    def _cache_weekly_report(self, cache_key: tuple, weekly_report: WeeklyReport):
+        self.weekly_report_cache.pop(cache_key, None)
+        self.weekly_report_cache[cache_key] = weekly_report
+        if len(self.weekly_report_cache) > WEEKLY_REPORT_CACHE_SIZE:
+            # Dicts keep insertion order, so the first key is the least recently stored
+            del self.weekly_report_cache[next(iter(self.weekly_report_cache))]
+    
     async def get_weekly_reports(self, user_id: str, limit: int = 10) -> List[WeeklyReport]:
         """Get user's weekly reports"""
         try:
@@ -401,92 +709,170 @@ class NutritionService:
     
     # Helper Methods
     async def _update_daily_summary(self, user_id: str, nutrition_log: NutritionLog):
-        """Update daily summary when a new log is added"""
+        """Add a new log to its daily summary with a single atomic upsert"""
+        delta = {
+            field: getattr(nutrition_log.total_nutrition, field, None) or 0
+            for field in SUMMARY_NUTRIENTS
+        }
+        counters = _rollup_counters(
+            nutrition_log.meal_type, [meal.name for meal in nutrition_log.meals], 1
+        )
+        await self._apply_daily_summary_delta(
+            user_id, nutrition_log.date, delta, meal_count=1, log_id=nutrition_log.id, counters=counters
+        )
+    
+    async def _apply_daily_summary_delta(self, user_id: str, date: str, delta: Dict[str, float],
+                                       meal_count: int, log_id: Optional[Any] = None,
+                                       counters: Optional[Dict[str, int]] = None):
+        """Apply a signed nutrition delta to a daily summary.
+        
+        The totals are moved server-side with ``$inc`` so concurrent writers for the
+        same user/day never overwrite each other. Positive meal counts add the log
+        reference, negative ones remove it and drop the summary once it is empty.
+        Every change bumps the summary ``version`` used to invalidate weekly reports.
+        """
         try:
             db = await self.get_db()
             
-            # Get existing summary or create new one
-            date = nutrition_log.date
-            existing_summary = await self.get_daily_summary(user_id, date)
-            
-            if existing_summary:
-                # Update existing summary
-                new_total = NutritionData(
-                    calories=existing_summary.total_nutrition.calories + nutrition_log.total_nutrition.calories,
-                    protein=existing_summary.total_nutrition.protein + nutrition_log.total_nutrition.protein,
-                    carbs=existing_summary.total_nutrition.carbs + nutrition_log.total_nutrition.carbs,
-                    fat=existing_summary.total_nutrition.fat + nutrition_log.total_nutrition.fat,
-                    fiber=(existing_summary.total_nutrition.fiber or 0) + (nutrition_log.total_nutrition.fiber or 0),
-                    sugar=(existing_summary.total_nutrition.sugar or 0) + (nutrition_log.total_nutrition.sugar or 0),
-                    sodium=(existing_summary.total_nutrition.sodium or 0) + (nutrition_log.total_nutrition.sodium or 0)
-                )
-                
-                await db.daily_nutrition_summaries.update_one(
-                    {"_id": existing_summary.id},
-                    {
-                        "$set": {
-                            "total_nutrition": new_total.dict(),
-                            "meal_count": existing_summary.meal_count + 1,
-                            "updated_at": datetime.utcnow()
-                        },
-                        "$push": {"nutrition_logs": nutrition_log.id}
-                    }
-                )
-            else:
-                # Create new summary
-                summary = DailyNutritionSummary(
-                    user_id=user_id,
-                    date=date,
-                    total_nutrition=nutrition_log.total_nutrition,
-                    meal_count=1,
-                    nutrition_logs=[nutrition_log.id]
-                )
-                
-                await db.daily_nutrition_summaries.insert_one(summary.dict(by_alias=True, exclude={'id'}))
+            now = datetime.utcnow()
+            update: Dict[str, Any] = {
+                "$inc": {f"total_nutrition.{field}": value for field, value in delta.items() if value},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"created_at": now, SUMMARY_COUNTERS_FIELD: True}
+            }
+            if meal_count:
+                update["$inc"]["meal_count"] = meal_count
+            if counters:
+                update["$inc"].update(counters)
+            update["$inc"]["version"] = 1
+            if log_id is not None:
+                if meal_count > 0:
+                    update["$addToSet"] = {"nutrition_logs": log_id}
+                elif meal_count < 0:
+                    update["$pull"] = {"nutrition_logs": log_id}
+            
+            summary_filter = {"user_id": user_id, "date": date}
+            try:
+                await db.daily_nutrition_summaries.update_one(summary_filter, update, upsert=meal_count > 0)
+            except DuplicateKeyError:
+                # Two first-writes for the same day raced on the unique index; the loser
+                # retries as a plain update against the document the winner created.
+                await db.daily_nutrition_summaries.update_one(summary_filter, update)
+            
+            if meal_count < 0:
+                await db.daily_nutrition_summaries.delete_one({**summary_filter, "meal_count": {"$lte": 0}})
                 
         except Exception as e:
             logger.error(f"Error updating daily summary: {e}")
     
-    async def _recalculate_daily_summary(self, user_id: str, date: str):
-        """Recalculate daily summary after a log is deleted"""
+    async def verify_daily_summaries(self, user_id: Optional[str] = None, days: int = 7) -> Dict[str, int]:
+        """Reconcile daily summaries against the nutrition logs they are built from.
+        
+        Recomputes the totals for the ``days`` days before today with one aggregation
+        and rewrites only the summaries that drifted (e.g. after a failed delta write)
+        or that predate the meal type and food counters. Today is left alone: its
+        logs are still being inserted, and a log's summary delta lands only after
+        its insert. Every write is conditional on the summary
+        ``version`` read before the logs were aggregated, so a summary that a
+        concurrent delta changed in the meantime is skipped (and checked next run)
+        rather than overwritten or deleted.
+        """
+        result = {"checked": 0, "repaired": 0, "created": 0, "removed": 0, "skipped": 0}
         try:
             db = await self.get_db()
             
-            # Get all logs for the date
-            logs_data = await self.get_nutrition_logs(
-                user_id=user_id,
-                per_page=1000,
-                start_date=date,
-                end_date=date
-            )
-            logs = logs_data["logs"]
-            
-            if logs:
-                # Recalculate totals
-                total_nutrition = NutritionCalculations.calculate_total_nutrition([
-                    meal for log in logs for meal in log.meals
-                ])
+            today = datetime.now()
+            since = (today - timedelta(days=days)).strftime("%Y-%m-%d")
+            match: Dict[str, Any] = {"date": {"$gte": since, "$lt": today.strftime("%Y-%m-%d")}}
+            if user_id:
+                match["user_id"] = user_id
+            
+            # Summaries first: a delta applied after this read bumps the version the
+            # writes below are conditional on
+            actual = {}
+            async for doc in db.daily_nutrition_summaries.find(match):
+                actual[(doc["user_id"], doc["date"])] = doc
+            
+            group: Dict[str, Any] = {
+                "_id": {"user_id": "$user_id", "date": "$date"},
+                "meal_count": {"$sum": 1},
+                "nutrition_logs": {"$push": "$_id"},
+                "meal_types": {"$push": "$meal_type"},
+                "food_names": {"$push": "$meals.name"},
+                "food_item_count": {"$sum": {"$size": {"$ifNull": ["$meals", []]}}}
+            }
+            for field in SUMMARY_NUTRIENTS:
+                group[field] = {"$sum": {"$ifNull": [f"$total_nutrition.{field}", 0]}}
+            
+            expected = {}
+            async for row in db.nutrition_logs.aggregate([{"$match": match}, {"$group": group}]):
+                expected[(row["_id"]["user_id"], row["_id"]["date"])] = row
+            
+            now = datetime.utcnow()
+            for key, row in expected.items():
+                result["checked"] += 1
+                totals = {field: row[field] for field in SUMMARY_NUTRIENTS}
+                doc = actual.get(key)
+                if doc and doc.get(SUMMARY_COUNTERS_FIELD) and doc.get("meal_count") == row["meal_count"] and doc.get(
+                    "food_item_count", 0
+                ) == row["food_item_count"] and all(
+                    abs((doc.get("total_nutrition", {}).get(field) or 0) - totals[field]) <= SUMMARY_DRIFT_TOLERANCE
+                    for field in SUMMARY_NUTRIENTS
+                ):
+                    continue
                 
-                await db.daily_nutrition_summaries.update_one(
-                    {"user_id": user_id, "date": date},
-                    {
-                        "$set": {
-                            "total_nutrition": total_nutrition.dict(),
-                            "meal_count": len(logs),
-                            "nutrition_logs": [log.id for log in logs],
-                            "updated_at": datetime.utcnow()
-                        }
-                    }
-                )
-            else:
-                # Delete summary if no logs
-                await db.daily_nutrition_summaries.delete_one({
-                    "user_id": user_id,
-                    "date": date
-                })
+                counters: Dict[str, Dict[str, int]] = {"meal_types": {}, "food_counts": {}}
+                for meal_type, names in zip(row["meal_types"], row["food_names"]):
+                    for path, count in _rollup_counters(meal_type, names or [], 1).items():
+                        group_name, _, name = path.partition(".")
+                        if name:
+                            counters[group_name][name] = counters[group_name].get(name, 0) + count
                 
+                rebuilt = {
+                    "total_nutrition": totals,
+                    "meal_count": row["meal_count"],
+                    "nutrition_logs": row["nutrition_logs"],
+                    "meal_types": counters["meal_types"],
+                    "food_counts": counters["food_counts"],
+                    "food_item_count": row["food_item_count"],
+                    SUMMARY_COUNTERS_FIELD: True,
+                    "updated_at": now
+                }
+                if doc:
+                    updated = await db.daily_nutrition_summaries.update_one(
+                        {"_id": doc["_id"], "version": doc.get("version")},
+                        {"$set": rebuilt, "$inc": {"version": 1}}
+                    )
+                    result["repaired" if updated.matched_count else "skipped"] += 1
+                    continue
+                try:
+                    await db.daily_nutrition_summaries.insert_one({
+                        "user_id": key[0], "date": key[1], **rebuilt, "version": 1, "created_at": now
+                    })
+                    result["created"] += 1
+                except DuplicateKeyError:
+                    # A log write created the summary after it was read
+                    result["skipped"] += 1
+            
+            for key, doc in actual.items():
+                if key in expected:
+                    continue
+                removed = await db.daily_nutrition_summaries.delete_one({"_id": doc["_id"], "version": doc.get("version")})
+                result["removed" if removed.deleted_count else "skipped"] += 1
+            
+            if result["repaired"] or result["created"] or result["removed"]:
+                logger.warning(f"Daily summary drift reconciled: {result}")
+            
         except Exception as e:
-            logger.error(f"Error recalculating daily summary: {e}")
+            logger.error(f"Error verifying daily summaries: {e}")
+        
+        return result
+    
+    async def run_summary_verifier(self, interval_seconds: int = 3600, days: int = 7):
+        """Periodically reconcile recent daily summaries until cancelled"""
+        while True:
+            await self.verify_daily_summaries(days=days)
+            await asyncio.sleep(interval_seconds)
     
     def _calculate_confidence_score(self, food_items: List[FoodItem]) -> float:
         """Calculate overall confidence score for a list of food items"""
@@ -496,11 +882,11 @@ class NutritionService:
         total_confidence = sum(item.confidence or 0.5 for item in food_items)
         return round(total_confidence / len(food_items), 2)
     
-    def _generate_weekly_insights(self, logs: List[NutritionLog], avg_nutrition: NutritionData, 
+    def _generate_weekly_insights(self, total_logs: int, avg_nutrition: NutritionData, 
                                 preferences: Optional[UserNutritionPreferences]) -> List[str]:
         """Generate weekly insights based on nutrition data"""
         insights = [
-            f"📊 Analyzed {len(logs)} meal entries from the past week",
+            f"📊 Analyzed {total_logs} meal entries from the past week",
             f"🍽️ Average daily calories: {avg_nutrition.calories:.0f} kcal",
             f"🥩 Average daily protein: {avg_nutrition.protein:.1f}g",
             f"🍚 Average daily carbs: {avg_nutrition.carbs:.1f}g",
@@ -518,7 +904,7 @@ class NutritionService:
         
         return insights
     
-    def _generate_weekly_recommendations(self, logs: List[NutritionLog], avg_nutrition: NutritionData, 
+    def _generate_weekly_recommendations(self, avg_nutrition: NutritionData, 
                                       preferences: Optional[UserNutritionPreferences]) -> List[str]:
         """Generate weekly recommendations"""
         recommendations = [
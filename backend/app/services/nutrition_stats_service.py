@@ -0,0 +1,160 @@
+from typing import Optional, Dict, Any, List
+import logging
+import os
+
+from pymongo.errors import PyMongoError
+
+from ..core.database import get_database
+from .nutrition_service import SUMMARY_COUNTERS_FIELD, _decode_key
+
+logger = logging.getLogger(__name__)
+
+# Where overview statistics are aggregated from: "summaries" (the per-user-per-day
+# rollups maintained on every log write, with the raw logs for days whose summary
+# predates the meal type and food counters) or "logs" (the raw nutrition logs)
+NUTRITION_STATS_SOURCE = os.getenv("NUTRITION_STATS_SOURCE", "summaries")
+
+EMPTY_OVERVIEW = {
+    "total_logs": 0,
+    "days_tracked": 0,
+    "average_daily_calories": 0,
+    "most_common_meal_type": None,
+    "total_meals_analyzed": 0
+}
+
+EMPTY_TOTALS = {"total_logs": 0, "days_tracked": 0, "calories": 0, "total_meals": 0}
+
+
+def _most_common_meal_type(counts: Dict[Optional[str], int]) -> Optional[str]:
+    """Meal type with the most logs (None for untyped logs); ties go to a named type, then by name"""
+    counts = {meal_type: count for meal_type, count in counts.items() if count > 0}
+    if not counts:
+        return None
+    return min(counts, key=lambda meal_type: (-counts[meal_type], meal_type is None, meal_type or ""))
+
+
+class NutritionStatsService:
+    """Nutrition statistics computed inside Mongo with aggregation pipelines"""
+
+    def __init__(self, source: str = NUTRITION_STATS_SOURCE):
+        self.db = None
+        self.source = source
+
+    async def get_db(self):
+        """Get database instance"""
+        if self.db is None:
+            self.db = get_database()
+        return self.db
+
+    async def get_overview(self, user_id: str, start_date: str, end_date: str) -> Dict[str, Any]:
+        """Log count, days tracked, average daily calories, most common meal type and
+        food item count for a date range (inclusive, YYYY-MM-DD).
+
+        From the daily summaries this reads at most one small document per day, so
+        a 365-day range costs the same however many logs the user has. Days whose
+        summary predates the meal type and food counters are read from their logs.
+        """
+        try:
+            db = await self.get_db()
+            dates = {"$gte": start_date, "$lte": end_date}
+            if self.source == "logs":
+                totals, meal_types = await self._from_logs(db, user_id, dates)
+            else:
+                totals, meal_types = await self._from_summaries(db, user_id, dates)
+
+            if not totals["total_logs"]:
+                return dict(EMPTY_OVERVIEW)
+
+            days_tracked = totals["days_tracked"]
+            return {
+                "total_logs": totals["total_logs"],
+                "days_tracked": days_tracked,
+                "average_daily_calories": round(totals["calories"] / days_tracked, 1) if days_tracked else 0,
+                "most_common_meal_type": _most_common_meal_type(meal_types),
+                "total_meals_analyzed": totals["total_meals"]
+            }
+
+        except PyMongoError as e:
+            logger.error(f"Database error getting nutrition overview: {e}")
+            raise
+
+    async def _from_logs(self, db, user_id: str, dates: Dict[str, Any]):
+        row = await self._first(db.nutrition_logs.aggregate(self._logs_pipeline(user_id, dates)))
+        totals = row["totals"][0] if row["totals"] else EMPTY_TOTALS
+        return totals, {entry["_id"]: entry["count"] for entry in row["meal_types"]}
+
+    async def _from_summaries(self, db, user_id: str, dates: Dict[str, Any]):
+        row = await self._first(db.daily_nutrition_summaries.aggregate(self._summaries_pipeline(user_id, dates)))
+        totals = row["totals"][0] if row["totals"] else EMPTY_TOTALS
+        meal_types = {_decode_key(entry["_id"]): entry["count"] for entry in row["meal_types"]}
+        # Summaries only count typed logs; the remainder had no meal type
+        meal_types[None] = totals["total_logs"] - sum(meal_types.values())
+
+        if row.get("legacy_dates"):
+            legacy_totals, legacy_meal_types = await self._from_logs(
+                db, user_id, {"$in": row["legacy_dates"][0]["dates"]}
+            )
+            totals = {field: totals[field] + legacy_totals[field] for field in EMPTY_TOTALS}
+            for meal_type, count in legacy_meal_types.items():
+                meal_types[meal_type] = meal_types.get(meal_type, 0) + count
+        return totals, meal_types
+
+    @staticmethod
+    async def _first(cursor) -> Dict[str, Any]:
+        async for row in cursor:
+            return row
+        return {"totals": [], "meal_types": []}
+
+    @staticmethod
+    def _summaries_pipeline(user_id: str, dates: Dict[str, Any]) -> List[Dict[str, Any]]:
+        complete = {"$match": {SUMMARY_COUNTERS_FIELD: True}}
+        return [
+            {"$match": {"user_id": user_id, "date": dates, "meal_count": {"$gt": 0}}},
+            {"$facet": {
+                "totals": [complete, {"$group": {
+                    "_id": None,
+                    "total_logs": {"$sum": "$meal_count"},
+                    "days_tracked": {"$sum": 1},
+                    "calories": {"$sum": {"$ifNull": ["$total_nutrition.calories", 0]}},
+                    "total_meals": {"$sum": {"$ifNull": ["$food_item_count", 0]}}
+                }}],
+                "meal_types": [
+                    complete,
+                    {"$project": {"meal_types": {"$objectToArray": {"$ifNull": ["$meal_types", {}]}}}},
+                    {"$unwind": "$meal_types"},
+                    {"$group": {"_id": "$meal_types.k", "count": {"$sum": "$meal_types.v"}}}
+                ],
+                "legacy_dates": [
+                    {"$match": {SUMMARY_COUNTERS_FIELD: {"$ne": True}}},
+                    {"$group": {"_id": None, "dates": {"$push": "$date"}}}
+                ]
+            }}
+        ]
+
+    @staticmethod
+    def _logs_pipeline(user_id: str, dates: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {"$match": {"user_id": user_id, "date": dates}},
+            {"$facet": {
+                "totals": [
+                    {"$group": {
+                        "_id": "$date",
+                        "logs": {"$sum": 1},
+                        "calories": {"$sum": {"$ifNull": ["$total_nutrition.calories", 0]}},
+                        "meals": {"$sum": {"$size": {"$ifNull": ["$meals", []]}}}
+                    }},
+                    {"$group": {
+                        "_id": None,
+                        "total_logs": {"$sum": "$logs"},
+                        "days_tracked": {"$sum": 1},
+                        "calories": {"$sum": "$calories"},
+                        "total_meals": {"$sum": "$meals"}
+                    }}
+                ],
+                "meal_types": [{"$group": {"_id": "$meal_type", "count": {"$sum": 1}}}]
+            }}
+        ]
+
+
+# Create singleton instance
+nutrition_stats_service = NutritionStatsService()
@@ -2,20 +2,105 @@
 OTP (One-Time Password) Service for secure authentication
 Generates and verifies OTP codes sent to users via email
 """
+import os
 import random
 import string
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 
 # Import email service for sending OTPs
 try:
-    from app.services.email_service import email_service
+    from app.services.email_service import send_otp_email
     EMAIL_ENABLED = True
 except ImportError:
     EMAIL_ENABLED = False
     print("⚠️ Email service not available. OTPs will only be returned in API response.")
 
+OTP_MAX_ATTEMPTS = 5
+
+# Token bucket per identifier: a burst of OTP_RATE_LIMIT_BURST requests, then one per refill interval
+OTP_RATE_LIMIT_BURST = int(os.getenv("OTP_RATE_LIMIT_BURST", "5"))
+OTP_RATE_LIMIT_REFILL_SECONDS = float(os.getenv("OTP_RATE_LIMIT_REFILL_SECONDS", "60"))
+OTP_RATE_LIMIT_MAX_TRACKED = 100000
+
+
+class OTPRateLimitError(Exception):
+    """Raised when an identifier requests OTPs faster than the rate limit allows"""
+    
+    def __init__(self, retry_after_seconds: int):
+        super().__init__(f"Too many OTP requests. Try again in {retry_after_seconds} seconds.")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class OTPRateLimiter:
+    """
+    In-memory token bucket per identifier
+    
+    Checked before any database or email I/O; runs entirely on the event loop
+    thread, so no locking is needed.
+    """
+    
+    def __init__(self, burst: int = OTP_RATE_LIMIT_BURST, refill_seconds: float = OTP_RATE_LIMIT_REFILL_SECONDS,
+                 max_tracked: int = OTP_RATE_LIMIT_MAX_TRACKED):
+        self.burst = burst
+        self.refill_seconds = refill_seconds
+        self.max_tracked = max_tracked
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+    
+    def _tokens(self, key: str, now: float) -> float:
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) / self.refill_seconds)
+    
+    def acquire(self, key: str) -> Optional[int]:
+        """
+        Take one token for the key
+        
+        Returns:
+            None if allowed, otherwise the seconds until the next token
+        """
+        now = time.monotonic()
+        tokens = self._tokens(key, now)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return max(1, int((1 - tokens) * self.refill_seconds + 0.999))
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > self.max_tracked:
+            self._prune(now)
+        return None
+    
+    def _prune(self, now: float):
+        # Full buckets carry no state worth keeping
+        for key in [key for key in self._buckets if self._tokens(key, now) >= self.burst]:
+            del self._buckets[key]
+    
+    def reset(self):
+        self._buckets.clear()
+
+
+otp_rate_limiter = OTPRateLimiter()
+
+_indexes_ready = False
+
+
+async def _ensure_indexes(collection):
+    """Unique (identifier, purpose) for the upsert and a TTL index for expiry (attempted once per process)"""
+    global _indexes_ready
+    _indexes_ready = True
+    try:
+        await collection.create_index(
+            [("identifier", ASCENDING), ("purpose", ASCENDING)],
+            unique=True,
+            name="identifier_purpose_unique"
+        )
+        await collection.create_index("expires_at", expireAfterSeconds=0, name="expires_at_ttl")
+    except PyMongoError as e:
+        # Documents written before the redesign may still hold duplicates; expiry then relies on cleanup_expired_otps
+        print(f"⚠️ Could not create OTP indexes: {e}")
+
 
 class OTPService:
     """Enhanced OTP service for file encryption/decryption workflow"""
@@ -50,6 +135,16 @@ class OTPService:
         Returns:
             Dictionary with OTP code and metadata
         """
+        normalized_identifier = identifier.lower() if identifier_type == "email" else identifier
+        
+        # Throttle before touching the database or the mail queue
+        retry_after = otp_rate_limiter.acquire(normalized_identifier)
+        if retry_after is not None:
+            raise OTPRateLimitError(retry_after)
+        
+        if not _indexes_ready:
+            await _ensure_indexes(self.otp_collection)
+        
         # Generate OTP
         otp_code = self._generate_otp()
         
@@ -57,35 +152,32 @@ class OTPService:
         created_at = datetime.utcnow()
         expires_at = created_at + timedelta(minutes=expires_in_minutes)
         
-        # Store in database
-        otp_document = {
-            "identifier": identifier.lower() if identifier_type == "email" else identifier,
+        # One document per identifier and purpose: a new request replaces the previous code
+        otp_fields = {
             "identifier_type": identifier_type,
             "otp_code": otp_code,
             "created_at": created_at,
             "expires_at": expires_at,
             "verified": False,
             "attempts": 0,
-            "max_attempts": 5,
-            "purpose": purpose  # Track purpose of OTP
+            "max_attempts": OTP_MAX_ATTEMPTS
         }
-        
-        # Delete any existing OTP for this identifier and purpose
-        await self.otp_collection.delete_many({
-            "identifier": otp_document["identifier"],
-            "purpose": purpose
-        })
-        
-        # Insert new OTP
-        await self.otp_collection.insert_one(otp_document)
+        otp_filter = {"identifier": normalized_identifier, "purpose": purpose}
+        try:
+            await self.otp_collection.update_one(otp_filter, {"$set": otp_fields}, upsert=True)
+        except DuplicateKeyError:
+            # Lost the race with a concurrent first request; the document exists now
+            await self.otp_collection.update_one(otp_filter, {"$set": otp_fields})
         
         # Send OTP via email if identifier type is email and email service is enabled
         email_sent = False
         if identifier_type == "email" and self.email_enabled:
             try:
-                email_sent = email_service.send_otp_email(
+                # Queued for the mail dispatcher; never waits on SMTP
+                email_sent = await send_otp_email(
                     recipient_email=identifier,
                     otp_code=otp_code,
+                    purpose=purpose,
                     expires_in_minutes=expires_in_minutes
                 )
             except Exception as e:
@@ -101,7 +193,7 @@ class OTPService:
         }
         
         if email_sent:
-            response["message"] = f"OTP code has been sent to your email: {identifier}"
+            response["message"] = f"OTP code is being sent to your email: {identifier}"
             response["email_sent"] = True
         else:
             response["note"] = "OTP code shown here (in production, sent via email/SMS)"
@@ -134,12 +226,32 @@ class OTPService:
         # Normalize identifier
         normalized_identifier = identifier.lower() if identifier_type == "email" else identifier
         
-        # Find OTP document for specific purpose
-        otp_doc = await self.otp_collection.find_one({
-            "identifier": normalized_identifier,
-            "verified": False,
-            "purpose": purpose
-        })
+        otp_filter = {"identifier": normalized_identifier, "purpose": purpose, "verified": False}
+        
+        # Count the attempt atomically; only a live code with attempts left matches
+        otp_doc = await self.otp_collection.find_one_and_update(
+            {
+                **otp_filter,
+                "expires_at": {"$gt": datetime.utcnow()},
+                "attempts": {"$lt": OTP_MAX_ATTEMPTS}
+            },
+            {"$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        
+        if not otp_doc:
+            # Work out why: no code, an expired one (the TTL monitor runs once a minute) or too many attempts
+            stale_doc = await self.otp_collection.find_one_and_delete(otp_filter)
+            if stale_doc:
+                if datetime.utcnow() > stale_doc["expires_at"]:
+                    return {
+                        "success": False,
+                        "message": "OTP has expired"
+                    }
+                return {
+                    "success": False,
+                    "message": "Maximum verification attempts exceeded"
+                }
         
         # If no OTP found and auto_generate_new is True, create a new one
         if not otp_doc and auto_generate_new:
@@ -169,29 +281,18 @@ class OTPService:
                 "purpose": purpose
             }
         
-        # Check expiration
-        if datetime.utcnow() > otp_doc["expires_at"]:
-            await self.otp_collection.delete_one({"_id": otp_doc["_id"]})
-            return {
-                "success": False,
-                "message": "OTP has expired"
-            }
-        
-        # Check max attempts
-        if otp_doc["attempts"] >= otp_doc["max_attempts"]:
-            await self.otp_collection.delete_one({"_id": otp_doc["_id"]})
-            return {
-                "success": False,
-                "message": "Maximum verification attempts exceeded"
-            }
-        
         # Verify OTP code
         if otp_doc["otp_code"] == otp_code:
-            # Mark as verified
-            await self.otp_collection.update_one(
-                {"_id": otp_doc["_id"]},
+            # Mark as verified; a concurrent request with the same code may have consumed it first
+            result = await self.otp_collection.update_one(
+                {"_id": otp_doc["_id"], "verified": False},
                 {"$set": {"verified": True, "verified_at": datetime.utcnow()}}
             )
+            if result.modified_count == 0:
+                return {
+                    "success": False,
+                    "message": "OTP has already been used"
+                }
             
             # Log successful access
             access_log = {
@@ -216,13 +317,8 @@ class OTPService:
                 "next_message": next_action["message"]
             }
         else:
-            # Increment attempts
-            await self.otp_collection.update_one(
-                {"_id": otp_doc["_id"]},
-                {"$inc": {"attempts": 1}}
-            )
-            
-            remaining = otp_doc["max_attempts"] - (otp_doc["attempts"] + 1)
+            # The attempt was already counted above
+            remaining = OTP_MAX_ATTEMPTS - otp_doc["attempts"]
             return {
                 "success": False,
                 "message": f"Invalid OTP code. {remaining} attempts remaining",
@@ -322,7 +418,7 @@ class OTPService:
         } for log in history]
     
     async def cleanup_expired_otps(self):
-        """Remove expired OTP codes from database"""
+        """Remove expired OTP codes from database (the TTL index normally does this)"""
         result = await self.otp_collection.delete_many({
             "expires_at": {"$lt": datetime.utcnow()}
         })
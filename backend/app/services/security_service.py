@@ -5,13 +5,73 @@ Handles sensitive data protection using Fernet symmetric encryption
 import os
 import base64
 import json
+import asyncio
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, Optional
-from cryptography.fernet import Fernet
+from typing import Dict, Any, Optional, Iterable, Iterator, Tuple
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
 
+# Derived keys kept in memory; each one saves a 100k-iteration PBKDF2 run
+KEY_CACHE_SIZE = int(os.getenv("ENCRYPTION_KEY_CACHE_SIZE", "1024"))
+KEY_CACHE_TTL_SECONDS = int(os.getenv("ENCRYPTION_KEY_CACHE_TTL_SECONDS", "900"))
+
+# Worker threads for key derivation and Fernet work (both release the GIL in OpenSSL)
+CRYPTO_WORKERS = int(os.getenv("ENCRYPTION_WORKERS", "4"))
+
+# Plaintext bytes per token in the streaming format
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Every stream chunk starts with a random per-stream id, its sequence number and
+# a last-chunk flag, so reordered, dropped, truncated or spliced-in chunks from
+# another stream under the same key fail authentication
+STREAM_ID_SIZE = 16
+_CHUNK_HEADER = struct.Struct(f">{STREAM_ID_SIZE}sQB")
+
+
+class DerivedKeyCache:
+    """Thread-safe LRU cache of derived keys with a time-to-live"""
+    
+    def __init__(self, max_size: int = KEY_CACHE_SIZE, ttl_seconds: float = KEY_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key: Tuple, value: bytes):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class SecurityService:
     """Service for encrypting and decrypting sensitive health data"""
@@ -21,12 +81,26 @@ class SecurityService:
         # In production, store this in a secure vault (e.g., Azure Key Vault, AWS Secrets Manager)
         self.master_key = os.getenv("ENCRYPTION_MASTER_KEY", "health-agent-master-key-change-in-production")
         self.salt = os.getenv("ENCRYPTION_SALT", "health-agent-salt").encode()
+        # Bump when the master key is rotated so cached keys are never reused
+        self.key_version = os.getenv("ENCRYPTION_KEY_VERSION", "1")
+        self.key_cache = DerivedKeyCache()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
         
     def _generate_key(self, user_id: str) -> bytes:
         """
         Generate a unique encryption key for each user
         Uses PBKDF2HMAC to derive a key from the master key and user ID
         """
+        cache_key = (user_id, self.salt, self.key_version)
+        key = self.key_cache.get(cache_key)
+        if key is None:
+            key = self._derive_key(user_id)
+            self.key_cache.put(cache_key, key)
+        return key
+    
+    def _derive_key(self, user_id: str) -> bytes:
+        """Run PBKDF2 for a user; always goes through _generate_key so the result is cached"""
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
@@ -153,6 +227,115 @@ class SecurityService:
         except Exception as e:
             raise ValueError(f"Decryption with token failed: {str(e)}. Invalid or expired token.")
 
+    
+    def encrypt_stream(self, chunks: Iterable[bytes], user_id: str) -> Iterator[bytes]:
+        """
+        Encrypt a large payload chunk by chunk
+        
+        Yields one newline-terminated Fernet token per STREAM_CHUNK_SIZE bytes of
+        plaintext, so memory use stays flat regardless of payload size.
+        
+        Args:
+            chunks: Plaintext byte chunks of any size
+            user_id: User identifier for key derivation
+        """
+        fernet = Fernet(self._generate_key(user_id))
+        stream_id = os.urandom(STREAM_ID_SIZE)
+        buffer = b""
+        index = 0
+        pending = None
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= STREAM_CHUNK_SIZE:
+                if pending is not None:
+                    yield self._seal_chunk(fernet, stream_id, index, pending, False)
+                    index += 1
+                pending, buffer = buffer[:STREAM_CHUNK_SIZE], buffer[STREAM_CHUNK_SIZE:]
+        # The last chunk is held back so it can carry the final flag
+        if pending is not None and buffer:
+            yield self._seal_chunk(fernet, stream_id, index, pending, False)
+            index += 1
+            pending = None
+        yield self._seal_chunk(fernet, stream_id, index, buffer if pending is None else pending, True)
+    
+    def decrypt_stream(self, tokens: Iterable[bytes], user_id: str) -> Iterator[bytes]:
+        """
+        Decrypt a payload produced by encrypt_stream
+        
+        Args:
+            tokens: The encrypted stream, split on newlines (e.g. a file object)
+            user_id: User identifier used during encryption
+            
+        Yields:
+            Plaintext chunks in order
+        """
+        fernet = Fernet(self._generate_key(user_id))
+        stream_id = None
+        expected = 0
+        finished = False
+        for token in tokens:
+            token = token.strip()
+            if not token:
+                continue
+            if finished:
+                raise ValueError("Decryption failed: data found after the final chunk")
+            try:
+                plaintext = fernet.decrypt(token)
+            except InvalidToken:
+                raise ValueError("Decryption failed: invalid chunk. Make sure you're using the correct user_id.")
+            chunk_stream_id, index, final = _CHUNK_HEADER.unpack_from(plaintext)
+            if stream_id is None:
+                stream_id = chunk_stream_id
+            elif chunk_stream_id != stream_id:
+                raise ValueError("Decryption failed: chunk belongs to another stream")
+            if index != expected:
+                raise ValueError("Decryption failed: chunks are out of order or missing")
+            expected += 1
+            finished = bool(final)
+            yield plaintext[_CHUNK_HEADER.size:]
+        if not finished:
+            raise ValueError("Decryption failed: stream is truncated")
+    
+    @staticmethod
+    def _seal_chunk(fernet: Fernet, stream_id: bytes, index: int, data: bytes, final: bool) -> bytes:
+        return fernet.encrypt(_CHUNK_HEADER.pack(stream_id, index, final) + data) + b"\n"
+    
+    # Async facade: key derivation and Fernet work run on the crypto thread pool
+    # so a report read never blocks the event loop
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=CRYPTO_WORKERS, thread_name_prefix="crypto")
+        return self._executor
+    
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+    
+    async def encrypt_data_async(self, data: Dict[str, Any], user_id: str) -> Dict[str, str]:
+        """Async version of encrypt_data"""
+        return await self._run(self.encrypt_data, data, user_id)
+    
+    async def decrypt_data_async(self, encrypted_data: str, user_id: str) -> Dict[str, Any]:
+        """Async version of decrypt_data"""
+        return await self._run(self.decrypt_data, encrypted_data, user_id)
+    
+    async def generate_decryption_token_async(self, user_id: str, expires_in_hours: int = 24) -> Dict[str, str]:
+        """Async version of generate_decryption_token"""
+        return await self._run(self.generate_decryption_token, user_id, expires_in_hours)
+    
+    async def decrypt_with_token_async(self, encrypted_data: str, decryption_token: str) -> Dict[str, Any]:
+        """Async version of decrypt_with_token"""
+        return await self._run(self.decrypt_with_token, encrypted_data, decryption_token)
+    
+    def shutdown(self):
+        """Stop the crypto thread pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
 
 # Singleton instance
 security_service = SecurityService()
@@ -0,0 +1,90 @@
+"""
+Motor-style async wrappers around mongomock, shared by the backend tests.
+Collection methods become coroutines that yield to the event loop (so
+concurrent callers interleave like real I/O), find/aggregate return async
+cursors, and each collection counts its calls and the documents read.
+"""
+import asyncio
+
+import mongomock
+
+
+class AsyncCursor:
+    """Async iteration and to_list over a mongomock cursor or aggregation result"""
+
+    def __init__(self, cursor, owner):
+        self.cursor = cursor
+        self.owner = owner
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self.cursor = self.cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self.cursor = self.cursor.limit(count)
+        return self
+
+    def batch_size(self, size):
+        self.cursor = self.cursor.batch_size(size)
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            document = next(self.cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+        self.owner.documents_read += 1
+        return document
+
+    async def to_list(self, length=None):
+        documents = [document async for document in self]
+        return documents if length is None else documents[:length]
+
+
+class AsyncCollection:
+    """Minimal Motor-style wrapper around a mongomock collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = 0
+        self.documents_read = 0
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs), self)
+
+    def aggregate(self, *args, **kwargs):
+        return AsyncCursor(self.collection.aggregate(*args, **kwargs), self)
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            self.calls += 1
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    """Collections by attribute or item; the same wrapper is returned for a name every time"""
+
+    def __init__(self, database=None):
+        self.database = database if database is not None else mongomock.MongoClient().db
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = AsyncCollection(self.database[name])
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
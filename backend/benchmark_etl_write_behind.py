@@ -0,0 +1,151 @@
+"""
+Benchmark for real-time food analysis ETL loading
+Sends a burst of single-record food analyses through DietDataLoader against a
+local filesystem share, first one load per analysis (a partition file and a
+partition index rewrite each) and then through the write-behind sink.
+Reports files and bytes written and request latency.
+
+Usage: python benchmark_etl_write_behind.py [--requests 500] [--concurrency 50] [--batch-records 500] [--delay 2.0]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.etl.azure_efs_etl_pipeline import DietDataLoader, DietDataTransformer, ETLConfig
+from app.etl.write_behind import WriteBehindSink
+
+
+class LocalFileShare:
+    """AzureEFSClient stand-in backed by a local directory, counting what is written"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.files_written = 0
+        self.bytes_written = 0
+
+    async def upload_file(self, local_path: str, remote_path: str, metadata: dict = None) -> bool:
+        target = self.root / remote_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(local_path, target)
+        self.files_written += 1
+        self.bytes_written += os.path.getsize(local_path)
+        return True
+
+    async def download_file(self, remote_path: str, local_path: str) -> bool:
+        source = self.root / remote_path
+        if not source.exists():
+            return False
+        shutil.copyfile(source, local_path)
+        return True
+
+    async def list_files(self, directory_path: str = "") -> list:
+        directory = self.root / directory_path
+        return [{'name': p.name, 'path': f"{directory_path}/{p.name}", 'is_directory': p.is_dir()}
+                for p in directory.iterdir()] if directory.exists() else []
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+def make_analysis(i: int) -> dict:
+    return {
+        '_id': f"analysis_{i}",
+        'user_id': f"user_{i % 50}",
+        'created_at': datetime(2025, 3, 1, 12, i % 60),
+        'detected_foods': [{'name': 'rice', 'confidence': 0.9, 'nutrition': {'calories': 200}}],
+        'total_nutrition': {'calories': 200, 'protein': 4, 'carbs': 45, 'fat': 1},
+        'confidence_score': 0.9,
+        'analysis_method': 'benchmark',
+        'meal_type': 'lunch'
+    }
+
+
+async def burst(handle, requests: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    transformer = DietDataTransformer()
+    latencies = []
+
+    async def request(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await handle(transformer.transform_food_analyses([make_analysis(i)]))
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(request(i) for i in range(requests)))
+    return latencies
+
+
+async def run_per_record(workdir: str, args) -> dict:
+    share = LocalFileShare(os.path.join(workdir, "share"))
+    loader = DietDataLoader(share, ETLConfig(azure_connection_string="", azure_share_name="local"))
+
+    async def handle(transformed):
+        await loader.load_data(transformed, "2025-03-01")
+
+    started = time.perf_counter()
+    latencies = await burst(handle, args.requests, args.concurrency)
+    return {'latencies': latencies, 'drained': time.perf_counter() - started, 'share': share}
+
+
+async def run_write_behind(workdir: str, args) -> dict:
+    share = LocalFileShare(os.path.join(workdir, "share"))
+    loader = DietDataLoader(share, ETLConfig(azure_connection_string="", azure_share_name="local"))
+
+    async def write_batch(data_type, partition_key, records, filename):
+        transformed = {'data_type': data_type, 'total_records': len(records), 'records': records}
+        return await loader.load_data(transformed, partition_key, filename=filename)
+
+    sink = WriteBehindSink(write_batch, os.path.join(workdir, "spool"),
+                           max_batch_records=args.batch_records, max_delay_seconds=args.delay)
+    await sink.start()
+
+    async def handle(transformed):
+        for record in transformed['records']:
+            await sink.submit('food_analyses', record)
+
+    started = time.perf_counter()
+    latencies = await burst(handle, args.requests, args.concurrency)
+    await sink.stop()
+    return {'latencies': latencies, 'drained': time.perf_counter() - started, 'share': share}
+
+
+def report(name: str, result: dict):
+    latencies, share = result['latencies'], result['share']
+    print(name)
+    print(f"  files written:  {share.files_written:10,}")
+    print(f"  bytes written:  {share.bytes_written:10,}")
+    print(f"  latency p50:    {percentile(latencies, 0.50) * 1000:10.2f} ms")
+    print(f"  latency p95:    {percentile(latencies, 0.95) * 1000:10.2f} ms")
+    print(f"  all loaded in:  {result['drained']:10.2f} s")
+
+
+async def main(args):
+    original_dir = os.getcwd()
+    for name, run in (("One load per analysis", run_per_record), ("Write-behind sink", run_write_behind)):
+        with tempfile.TemporaryDirectory() as workdir:
+            # DietDataLoader stages files in ./temp_etl
+            os.chdir(workdir)
+            try:
+                report(f"{name} ({args.requests} requests, concurrency {args.concurrency})", await run(workdir, args))
+            finally:
+                os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--batch-records", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""
+Benchmark for nutrition log listing on a heavy user
+Loads one user's nutrition logs into a scratch database on a real MongoDB
+server (indexes matter, so there is no in-memory stand-in) and times fetching
+page N by offset (count + skip, as the listing used to) and by keyset cursor,
+plus a full NDJSON-style export with the summary profile. The scratch
+database is dropped afterwards.
+
+Usage: python benchmark_nutrition_log_pagination.py [--logs 100000] [--per-page 20] [--mongo-uri mongodb://localhost:27017]
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import motor.motor_asyncio
+
+from app.core.database import MONGO_URI
+from app.services.nutrition_service import NutritionService
+
+USER_ID = "benchmark_user"
+PAGES = [1, 10, 100, 1000, 5000]
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack"]
+FOODS = ["rice", "dal curry", "chicken curry", "roti", "egg hopper", "kottu roti", "string hoppers", "pol sambol"]
+
+
+def make_logs(count: int, user_id: str, seed: int = 3):
+    rng = random.Random(seed)
+    days = max(1, count // 90)
+    for i in range(count):
+        meals = [
+            {"name": name, "calories": round(rng.uniform(50, 600), 1), "protein": 5, "carbs": 30, "fat": 8,
+             "quantity": "1 serving", "confidence": 0.8}
+            for name in rng.sample(FOODS, rng.randint(1, 4))
+        ]
+        yield {
+            "user_id": user_id,
+            "date": (date(2025, 12, 31) - timedelta(days=rng.randrange(days))).isoformat(),
+            "meals": meals,
+            "total_nutrition": {"calories": sum(meal["calories"] for meal in meals), "protein": 20, "carbs": 90,
+                                "fat": 24, "fiber": 6},
+            "meal_type": rng.choice(MEAL_TYPES),
+            "notes": "benchmark log " * 5,
+            "analysis_method": "text",
+            "ai_insights": ["Balanced meal with good protein content"] * 3,
+            "confidence_score": 0.8,
+            "created_at": datetime(2025, 1, 1) + timedelta(minutes=i)
+        }
+
+
+async def timed(coroutine_factory, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coroutine_factory()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+async def main(args):
+    client = motor.motor_asyncio.AsyncIOMotorClient(args.mongo_uri, serverSelectionTimeoutMS=5000)
+    db = client[args.database]
+    service = NutritionService()
+    service.db = db
+    try:
+        await db.nutrition_logs.drop()
+        await service.get_db()  # creates the indexes
+        started = time.perf_counter()
+        batch = []
+        for log in make_logs(args.logs, USER_ID):
+            batch.append(log)
+            if len(batch) == 5000:
+                await db.nutrition_logs.insert_many(batch)
+                batch = []
+        if batch:
+            await db.nutrition_logs.insert_many(batch)
+        print(f"{args.logs:,} logs for one user loaded in {time.perf_counter() - started:.1f} s")
+
+        # Cursors for the pages timed below (collected once, not timed)
+        cursors, cursor, page = {1: None}, None, 1
+        while page < max(PAGES):
+            result = await service.list_nutrition_logs(USER_ID, limit=args.per_page, cursor=cursor, fields="summary")
+            cursor = result["next_cursor"]
+            if cursor is None:
+                break
+            page += 1
+            cursors[page] = cursor
+
+        print(f"{'page':>6}  {'offset (ms)':>12}  {'keyset (ms)':>12}")
+        for page in PAGES:
+            if page not in cursors:
+                break
+            offset = await timed(lambda: service.get_nutrition_logs(
+                USER_ID, page=page, per_page=args.per_page, fields="summary"), args.repeat)
+            keyset = await timed(lambda: service.list_nutrition_logs(
+                USER_ID, limit=args.per_page, cursor=cursors[page], fields="summary"), args.repeat)
+            print(f"{page:>6}  {offset * 1000:>12.2f}  {keyset * 1000:>12.2f}")
+
+        started = time.perf_counter()
+        size = 0
+        async for log in service.export_nutrition_logs(USER_ID, fields="summary"):
+            size += len(json.dumps(log, default=str)) + 1
+        elapsed = time.perf_counter() - started
+        print(f"Export (summary): {args.logs / elapsed:,.0f} logs/s, {size / 1e6:.1f} MB NDJSON")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logs", type=int, default=100000)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--database", default="nutrition_pagination_benchmark")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""
+Micro-benchmark for SecurityService
+Runs mixed encrypt/decrypt calls and reports throughput and event-loop lag,
+first the old way (key derived on every call, on the event loop) and then
+with the derived-key cache and the async thread-pool facade.
+
+Usage: python benchmark_security_service.py [--ops 1000] [--users 20] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.security_service import SecurityService, DerivedKeyCache
+
+# How often the lag probe wakes up
+PROBE_INTERVAL = 0.005
+
+
+async def probe_loop_lag(lags: list, stop: asyncio.Event):
+    """Record how late the event loop wakes a sleeping coroutine"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+def build_workload(service: SecurityService, ops: int, users: int):
+    """Half encrypts, half decrypts of pre-encrypted payloads, in random order"""
+    random.seed(42)
+    user_ids = [f"507f1f77bcf86cd7994390{i:02d}" for i in range(users)]
+    payload = {"health_metrics": {"weight": 70, "height": 175, "bmi": 22.9}, "notes": "x" * 512}
+    encrypted = {user_id: service.encrypt_data(payload, user_id)["encrypted_data"] for user_id in user_ids}
+    workload = []
+    for i in range(ops):
+        user_id = random.choice(user_ids)
+        workload.append(("encrypt", payload, user_id) if i % 2 == 0 else ("decrypt", encrypted[user_id], user_id))
+    random.shuffle(workload)
+    return workload
+
+
+async def run_before(service: SecurityService, workload, concurrency: int):
+    """Sync calls straight on the event loop with no key reuse"""
+    async def call(op, data, user_id):
+        if op == "encrypt":
+            service.encrypt_data(data, user_id)
+        else:
+            service.decrypt_data(data, user_id)
+    await run_concurrently(call, workload, concurrency)
+
+
+async def run_after(service: SecurityService, workload, concurrency: int):
+    """Async facade backed by the crypto thread pool and the derived-key cache"""
+    async def call(op, data, user_id):
+        if op == "encrypt":
+            await service.encrypt_data_async(data, user_id)
+        else:
+            await service.decrypt_data_async(data, user_id)
+    await run_concurrently(call, workload, concurrency)
+
+
+async def run_concurrently(call, workload, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(item):
+        async with semaphore:
+            await call(*item)
+
+    await asyncio.gather(*(bounded(item) for item in workload))
+
+
+async def measure(name: str, runner, service: SecurityService, workload, concurrency: int):
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(lags, stop))
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await runner(service, workload, concurrency)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+
+    print(f"\n{name}")
+    print(f"  {len(workload)} ops in {elapsed:.2f}s -> {len(workload) / elapsed:,.0f} ops/sec")
+    print(f"  event-loop lag p50: {statistics.median(lags) * 1000:.1f} ms, "
+          f"p99: {percentile(lags, 0.99) * 1000:.1f} ms, max: {max(lags) * 1000:.1f} ms")
+
+
+async def main(ops: int, users: int, concurrency: int):
+    print("=" * 60)
+    print("SECURITY SERVICE BENCHMARK")
+    print("=" * 60)
+
+    before = SecurityService()
+    before.key_cache = DerivedKeyCache(max_size=0)
+    await measure("BEFORE: derive per call, on the event loop", run_before, before,
+                  build_workload(before, ops, users), concurrency)
+
+    after = SecurityService()
+    await measure("AFTER: cached keys, crypto thread pool", run_after, after,
+                  build_workload(after, ops, users), concurrency)
+    print(f"  key cache: {after.key_cache.hits} hits, {after.key_cache.misses} misses")
+    after.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.ops, args.users, args.concurrency))
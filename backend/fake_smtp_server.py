@@ -0,0 +1,136 @@
+"""
+Local fake SMTP server for tests
+Speaks enough SMTP (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, NOOP, RSET, QUIT)
+for smtplib, records every accepted message and can inject failures.
+
+Usage:
+    async with FakeSMTPServer() as server:
+        dispatcher = MailDispatcher("127.0.0.1", server.port, ..., use_tls=False)
+        ...
+        assert server.messages[0].recipient == "user@example.com"
+"""
+import asyncio
+import base64
+from dataclasses import dataclass
+from email import message_from_string
+from typing import List, Optional
+
+
+@dataclass
+class ReceivedMail:
+    sender: str
+    recipient: str
+    data: str
+
+    @property
+    def subject(self) -> str:
+        return message_from_string(self.data)["Subject"]
+
+
+class FakeSMTPServer:
+    """In-process SMTP server bound to a random local port"""
+
+    def __init__(self, username: str = "sender@example.com", password: str = "secret"):
+        self.username = username
+        self.password = password
+        self.messages: List[ReceivedMail] = []
+        self.connections = 0
+        self.logins = 0
+        # Reply codes returned for the next DATA commands instead of 250, e.g. [451, 451]
+        self.fail_next: List[int] = []
+        # Close the connection after this many messages on it
+        self.disconnect_after: Optional[int] = None
+        self.port: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        sent_here = 0
+        sender = None
+        recipients: List[str] = []
+
+        async def reply(line: str):
+            writer.write((line + "\r\n").encode())
+            await writer.drain()
+
+        await reply("220 fake.smtp ESMTP ready")
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode().rstrip("\r\n")
+                command = line[:4].upper()
+
+                if command in ("EHLO", "HELO"):
+                    await reply("250-fake.smtp")
+                    await reply("250 AUTH PLAIN LOGIN")
+                elif command == "AUTH":
+                    await self._auth(line, reader, reply)
+                elif command == "MAIL":
+                    sender = line.split(":", 1)[1].strip().strip("<>").split(">")[0]
+                    recipients = []
+                    await reply("250 OK")
+                elif command == "RCPT":
+                    recipients.append(line.split(":", 1)[1].strip().strip("<>").split(">")[0])
+                    await reply("250 OK")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        data_line = (await reader.readline()).decode()
+                        if data_line in (".\r\n", ".\n"):
+                            break
+                        lines.append(data_line[1:] if data_line.startswith("..") else data_line)
+                    if self.fail_next:
+                        code = self.fail_next.pop(0)
+                        await reply(f"{code} Injected failure")
+                        continue
+                    for recipient in recipients:
+                        self.messages.append(ReceivedMail(sender, recipient, "".join(lines)))
+                    await reply("250 OK queued")
+                    sent_here += 1
+                    if self.disconnect_after and sent_here >= self.disconnect_after:
+                        break
+                elif command in ("NOOP", "RSET"):
+                    await reply("250 OK")
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+    async def _auth(self, line: str, reader: asyncio.StreamReader, reply):
+        parts = line.split()
+        mechanism = parts[1].upper() if len(parts) > 1 else ""
+        if mechanism == "PLAIN":
+            if len(parts) > 2:
+                encoded = parts[2]
+            else:
+                await reply("334 ")
+                encoded = (await reader.readline()).decode().strip()
+            _, username, password = base64.b64decode(encoded).decode().split("\0")
+        elif mechanism == "LOGIN":
+            await reply("334 " + base64.b64encode(b"Username:").decode())
+            username = base64.b64decode((await reader.readline()).strip()).decode()
+            await reply("334 " + base64.b64encode(b"Password:").decode())
+            password = base64.b64decode((await reader.readline()).strip()).decode()
+        else:
+            await reply("504 Unrecognized authentication type")
+            return
+        if (username, password) == (self.username, self.password):
+            self.logins += 1
+            await reply("235 Authentication successful")
+        else:
+            await reply("535 Authentication credentials invalid")
@@ -0,0 +1,183 @@
+"""
+The food knowledge base: every food the analyzers know, loaded once per process.
+
+Records come from the versioned ``foods.json`` next to this module (one food
+per line), and are indexed three ways at load time:
+
+- exact names and aliases, for direct lookups of detected labels
+- an inverted index from name words to foods, for ranking partial matches
+- a PhraseMatcher over names, aliases and keywords, for free-text extraction
+
+The knowledge base and its records are read-only, so one instance is safely
+shared by every analyzer (``get_food_knowledge_base``).
+"""
+
+import json
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from .matcher import PhraseMatcher, phrase_key, tokenize
+
+DATA_FILE = Path(__file__).with_name("foods.json")
+
+NAME = "name"
+KEYWORD = "keyword"
+
+
+@dataclass(frozen=True)
+class FoodRecord:
+    """One food; nutrition values are per ``serving``"""
+    id: str
+    name: str
+    category: str
+    cuisine: str
+    serving: str
+    nutrition: Mapping[str, float]
+    aliases: Tuple[str, ...] = ()
+    keywords: Tuple[str, ...] = ()
+    subcategory: str = ''
+    vitamins: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+    minerals: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+    glycemic_index: Optional[int] = None
+    allergens: Tuple[str, ...] = ()
+    preparation_methods: Tuple[str, ...] = ()
+    health_score: Optional[float] = None
+    processing_level: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FoodRecord':
+        values = dict(data)
+        for key in ('nutrition', 'vitamins', 'minerals'):
+            if key in values:
+                values[key] = MappingProxyType(dict(values[key]))
+        for key in ('aliases', 'keywords', 'allergens', 'preparation_methods'):
+            if key in values:
+                values[key] = tuple(values[key])
+        return cls(**values)
+
+
+class FoodMatch(NamedTuple):
+    """A food found in free text; start/end are character offsets"""
+    food: FoodRecord
+    kind: str  # NAME for names and aliases, KEYWORD for keywords
+    start: int
+    end: int
+
+
+class FoodKnowledgeBase:
+    """Immutable, indexed collection of FoodRecords"""
+
+    def __init__(self, records: List[FoodRecord], version: str):
+        self.version = version
+        self._records = tuple(records)
+        self._by_id = {record.id: record for record in self._records}
+        self._by_name: Dict[Tuple[str, ...], FoodRecord] = {}
+        self._name_keys: List[Tuple[frozenset, ...]] = []
+        self._word_index: Dict[str, List[int]] = {}
+
+        phrases: Dict[Tuple[str, ...], Tuple[str, List[int]]] = {}
+        for position, record in enumerate(self._records):
+            keys = [phrase_key(name) for name in (record.name, *record.aliases)]
+            for key in keys:
+                self._by_name.setdefault(key, record)
+                self._add_phrase(phrases, key, NAME, position)
+            for keyword in record.keywords:
+                self._add_phrase(phrases, phrase_key(keyword), KEYWORD, position)
+
+            self._name_keys.append(tuple(frozenset(key) for key in keys))
+            for word in set().union(*keys):
+                self._word_index.setdefault(word, []).append(position)
+
+        self._matcher = PhraseMatcher(
+            (key, (kind, tuple(positions))) for key, (kind, positions) in phrases.items()
+        )
+
+    @staticmethod
+    def _add_phrase(phrases, key, kind, position):
+        # A phrase that names a food is never also a keyword for other foods
+        existing = phrases.get(key)
+        if existing is None or (existing[0] == KEYWORD and kind == NAME):
+            phrases[key] = (kind, [position])
+        elif existing[0] == kind and position not in existing[1]:
+            existing[1].append(position)
+
+    @classmethod
+    def from_file(cls, path: Path = DATA_FILE) -> 'FoodKnowledgeBase':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls([FoodRecord.from_dict(food) for food in data['foods']], data['version'])
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[FoodRecord]:
+        return iter(self._records)
+
+    def get(self, food_id: str) -> Optional[FoodRecord]:
+        return self._by_id.get(food_id)
+
+    def lookup(self, name: str) -> Optional[FoodRecord]:
+        """Food whose name or alias is name (case, underscores and plurals ignored)"""
+        return self._by_name.get(phrase_key(name))
+
+    def search(self, name: str) -> Optional[Tuple[FoodRecord, float]]:
+        """Best food for a detected name, with its word overlap score (1.0 for exact names)"""
+        key = phrase_key(name)
+        exact = self._by_name.get(key)
+        if exact is not None:
+            return exact, 1.0
+        words = frozenset(key)
+        candidates = sorted({position for word in words for position in self._word_index.get(word, ())})
+
+        best, best_score = None, 0.0
+        for position in candidates:
+            score = max(len(words & name_words) / len(words | name_words) for name_words in self._name_keys[position])
+            if score > best_score:
+                best, best_score = self._records[position], score
+        return (best, best_score) if best is not None else None
+
+    def find_all(self, text: str, keywords: bool = True) -> List[FoodMatch]:
+        """Every food mention in text, overlapping mentions included"""
+        tokens = tokenize(text)
+        matches = []
+        for start, end, (kind, positions) in self._matcher.find_all([token for token, _, _ in tokens]):
+            if kind == KEYWORD and not keywords:
+                continue
+            for position in positions:
+                matches.append(FoodMatch(self._records[position], kind, tokens[start][1], tokens[end - 1][2]))
+        return matches
+
+    def extract(self, text: str, keywords: bool = True) -> List[FoodMatch]:
+        """Foods mentioned in text, longest mention first where mentions overlap
+
+        "fried rice and chicken curry" gives fried rice and chicken curry, not
+        also rice, chicken and curry. Each food is reported once.
+        """
+        chosen, seen = [], set()
+        covered_until, last_span = 0, None
+        for match in sorted(self.find_all(text, keywords), key=lambda m: (m.start, m.start - m.end)):
+            span = (match.start, match.end)
+            if match.start < covered_until and span != last_span:
+                continue
+            covered_until, last_span = max(covered_until, match.end), span
+            if match.food.id not in seen:
+                seen.add(match.food.id)
+                chosen.append(match)
+        return chosen
+
+
+_knowledge_base: Optional[FoodKnowledgeBase] = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_food_knowledge_base() -> FoodKnowledgeBase:
+    """The process-wide knowledge base, loaded from foods.json on first use"""
+    global _knowledge_base
+    if _knowledge_base is None:
+        with _knowledge_base_lock:
+            if _knowledge_base is None:
+                _knowledge_base = FoodKnowledgeBase.from_file()
+    return _knowledge_base
@@ -0,0 +1,81 @@
+"""
+Multi-phrase matching over word tokens.
+
+PhraseMatcher is an Aho-Corasick automaton whose alphabet is normalized
+words rather than characters: a meal description is scanned once, token by
+token, and every known food phrase ending at each token is reported,
+however many phrases there are. Matching on whole words also avoids the
+substring false positives of ``name in text`` checks ("rice" in "price",
+"egg" in "eggplant").
+"""
+
+import re
+from typing import Dict, Generic, Iterable, List, Sequence, Tuple, TypeVar
+
+V = TypeVar('V')
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_token(word: str) -> str:
+    """Lowercase word with a plural 's' removed, so "hoppers" matches "hopper" """
+    word = word.lower()
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Normalized tokens of text with their character spans"""
+    return [(normalize_token(m.group()), m.start(), m.end()) for m in _WORD.finditer(text.lower())]
+
+
+def phrase_key(text: str) -> Tuple[str, ...]:
+    """Normalized token sequence used to compare food names"""
+    return tuple(token for token, _, _ in tokenize(text))
+
+
+class PhraseMatcher(Generic[V]):
+    """Aho-Corasick automaton over word tokens; phrases map to values"""
+
+    def __init__(self, phrases: Iterable[Tuple[Sequence[str], V]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[Tuple[int, V]]] = [[]]
+
+        for tokens, value in phrases:
+            node = 0
+            for token in tokens:
+                following = self._goto[node].get(token)
+                if following is None:
+                    following = self._goto[node][token] = len(self._goto)
+                    self._goto.append({})
+                    outputs.append([])
+                node = following
+            if tokens:
+                outputs[node].append((len(tokens), value))
+
+        # Breadth-first failure links; each node also reports the phrases of its suffixes
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for token, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                outputs[child] = outputs[child] + outputs[self._fail[child]]
+                queue.append(child)
+        self._outputs: List[Tuple[Tuple[int, V], ...]] = [tuple(output) for output in outputs]
+
+    def find_all(self, tokens: Sequence[str]) -> List[Tuple[int, int, V]]:
+        """Every (start, end, value) phrase occurrence in tokens, end exclusive, overlaps included"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        matches = []
+        node = 0
+        for position, token in enumerate(tokens):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for length, value in outputs[node]:
+                matches.append((position + 1 - length, position + 1, value))
+        return matches
@@ -37,10 +37,14 @@ from app.routes.mental_health_routes import router as mental_health_router
 from app.routes.diet_messaging_routes import router as diet_messaging_router
 from app.routes.diet_fitness_messaging import router as diet_fitness_messaging_router
 from app.etl.router import router as etl_router
-from app.etl.integrated_food_vision_router import router as integrated_food_vision_router
+from app.etl.integrated_food_vision_router import router as integrated_food_vision_router, shutdown_integrated_system
 
 # Import consumer service for Diet-Fitness messaging
 from app.services.consumer_service import startup_consumers, shutdown_consumers
+from app.services.nutrition_service import nutrition_service
+from app.services.security_service import security_service
+from app.services.email_service import mail_dispatcher
+from app.services.otp_service import OTPRateLimitError
 
 
 
@@ -123,7 +127,8 @@ app.include_router(multi_agent_router)
 app_state = {
     "db_connected": False,
     "startup_time": None,
-    "last_health_check": None
+    "last_health_check": None,
+    "summary_verifier": None
 }
 
 @app.on_event("startup")
@@ -145,6 +150,14 @@ async def startup_event():
         app_state["db_connected"] = False
         print(f"⚠️ Error while connecting to database: {e}")
 
+    # Periodically reconcile daily nutrition summaries against their logs
+    if app_state["db_connected"]:
+        interval = int(os.getenv("SUMMARY_VERIFY_INTERVAL_SECONDS", "3600"))
+        app_state["summary_verifier"] = asyncio.create_task(
+            nutrition_service.run_summary_verifier(interval_seconds=interval)
+        )
+        print("✅ Daily nutrition summary verifier scheduled")
+
     # Start RabbitMQ consumers for Diet-Fitness messaging
     try:
         print("🔄 Starting Diet-Fitness message consumers...")
@@ -170,6 +183,17 @@ async def shutdown_event():
     except Exception as e:
         print(f"⚠️ Error stopping consumers: {e}")
     
+    if app_state["summary_verifier"]:
+        app_state["summary_verifier"].cancel()
+    
+    # Load real-time ETL records still in the write-behind spool
+    try:
+        await shutdown_integrated_system()
+    except Exception as e:
+        print(f"⚠️ Error flushing ETL write-behind buffer: {e}")
+    
+    security_service.shutdown()
+    await mail_dispatcher.stop()
     await close_mongo_connection()
     print("✅ Application shutdown completed successfully")
 
@@ -371,6 +395,19 @@ async def database_exception_handler(request, exc):
         }
     )
 
+@app.exception_handler(OTPRateLimitError)
+async def otp_rate_limit_handler(request, exc):
+    """Reject OTP requests over the per-identifier rate limit"""
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after_seconds)},
+        content={
+            "error": "Too many OTP requests",
+            "detail": str(exc),
+            "retry_after_seconds": exc.retry_after_seconds
+        }
+    )
+
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
     """Handle internal server errors"""
@@ -0,0 +1,117 @@
+"""
+Test script for concurrent batch image analysis
+Uses a fake analyzer with injected per-image latency to check that a batch
+takes about as long as its slowest image, that the concurrency limit holds
+across batches, that failures stay with their image and that results can be
+streamed and polled while a batch is running
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.etl.batch_analysis import BatchAnalysisEngine, BatchImage
+
+
+class FakeAnalyzer:
+    """Sleeps for the latency encoded in the image bytes, failing on b'boom'"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def __call__(self, user_id, image):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if image.data == b'boom':
+                await asyncio.sleep(0.01)
+                raise RuntimeError("vision model unavailable")
+            await asyncio.sleep(float(image.data))
+            return {'status': 'success', 'total_calories': 100, 'user': user_id}
+        finally:
+            self.in_flight -= 1
+
+
+def images(*latencies):
+    return [BatchImage(i, f"meal_{i}.jpg", "image/jpeg", str(latency).encode() if latency != 'boom' else b'boom',
+                       "lunch") for i, latency in enumerate(latencies)]
+
+
+def test_batch_takes_about_as_long_as_its_slowest_image():
+    latencies = [0.05, 0.2, 0.1, 0.15, 0.05, 0.1, 0.2, 0.05, 0.1, 0.15]
+
+    async def run():
+        engine = BatchAnalysisEngine(FakeAnalyzer(), max_concurrency=10)
+        started = time.perf_counter()
+        summary = await engine.wait(engine.submit("user_1", images(*latencies)))
+        return summary, time.perf_counter() - started
+
+    summary, elapsed = asyncio.run(run())
+    assert summary['status'] == 'completed' and summary['successful_analyses'] == 10
+    assert summary['total_calories_detected'] == 1000
+    assert [r['file_index'] for r in summary['results']] == list(range(10))
+    # Sequential analysis would take sum(latencies) = 1.15s
+    assert max(latencies) <= elapsed < max(latencies) + 0.1, elapsed
+
+
+def test_concurrency_limit_is_shared_across_batches():
+    analyzer = FakeAnalyzer()
+
+    async def run():
+        engine = BatchAnalysisEngine(analyzer, max_concurrency=3)
+        batch_ids = [engine.submit(f"user_{i}", images(*[0.02] * 4)) for i in range(3)]
+        summaries = await asyncio.gather(*(engine.wait(batch_id) for batch_id in batch_ids))
+        return summaries, engine.get_stats()
+
+    summaries, stats = asyncio.run(run())
+    assert all(s['successful_analyses'] == 4 for s in summaries)
+    assert analyzer.peak_in_flight == 3 and stats['peak_in_flight'] == 3
+    assert stats['images_analyzed'] == 12 and stats['batches_processing'] == 0
+
+
+def test_failures_stay_with_their_image_and_results_stream_as_they_finish():
+    async def run():
+        engine = BatchAnalysisEngine(FakeAnalyzer(), max_concurrency=4)
+        batch_id = engine.submit("user_1", images(0.15, 'boom', 0.05, 0.1))
+        streamed = [(r['file_index'], r['status']) async for r in engine.stream(batch_id)]
+        return streamed, engine.get_status(batch_id)
+
+    streamed, summary = asyncio.run(run())
+    assert streamed == [(1, 'error'), (2, 'success'), (3, 'success'), (0, 'success')]
+    assert summary['successful_analyses'] == 3 and summary['failed_analyses'] == 1
+    assert summary['results'][1]['error'] == "vision model unavailable"
+
+
+def test_async_batches_can_be_polled_until_done():
+    async def run():
+        engine = BatchAnalysisEngine(FakeAnalyzer(), max_concurrency=2, retention_seconds=0.1)
+        batch_id = engine.submit("user_1", images(0.02, 0.2))
+        await asyncio.sleep(0.1)
+        running = engine.get_status(batch_id)
+        await asyncio.sleep(0.15)
+        done = engine.get_status(batch_id)
+        await asyncio.sleep(0.15)
+        return running, done, engine.get_status(batch_id), engine.get_status("batch_unknown")
+
+    running, done, expired, unknown = asyncio.run(run())
+    assert running['status'] == 'processing' and running['completed_images'] == 1
+    assert running['processing_completed_at'] is None
+    assert done['status'] == 'completed' and done['completed_images'] == 2
+    assert expired is None and unknown is None
+
+
+if __name__ == "__main__":
+    print("Testing concurrent batch image analysis...")
+    test_batch_takes_about_as_long_as_its_slowest_image()
+    print("✓ Batch takes about as long as its slowest image")
+    test_concurrency_limit_is_shared_across_batches()
+    print("✓ Concurrency limit is shared across batches")
+    test_failures_stay_with_their_image_and_results_stream_as_they_finish()
+    print("✓ Failures stay with their image; results stream as they finish")
+    test_async_batches_can_be_polled_until_done()
+    print("✓ Async batches can be polled until done")
+    print("\n🎉 All tests passed!")
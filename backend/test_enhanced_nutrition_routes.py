@@ -0,0 +1,97 @@
+"""
+Test script for the enhanced nutrition routes
+Text analysis and food suggestions from the shared food knowledge base, and
+the fallback when the backend image runs without the knowledge base package.
+The copy shipped in the backend build context matches the aiservices package.
+Suggestion popularity is loaded from MongoDB once, and retried after a failure
+"""
+
+import filecmp
+import importlib
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import mongomock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.routes.enhanced_nutrition_routes as routes
+from async_mongomock import AsyncDatabase
+
+
+def client_for(module):
+    app = FastAPI()
+    app.include_router(module.router)
+    return TestClient(app)
+
+
+def test_routes_load_without_the_knowledge_base():
+    sys.modules['food_knowledge'] = None  # import fails as in an image built without the compose mount
+    try:
+        fallback = importlib.reload(routes)
+        assert not fallback.FOOD_KNOWLEDGE_AVAILABLE
+        assert fallback.analyze_text_enhanced("rice and chicken curry").foodItems == []
+        response = client_for(fallback).get("/api/nutrition/food-suggestions", params={"query": "ric"})
+        assert response.status_code == 503
+    finally:
+        del sys.modules['food_knowledge']
+        importlib.reload(routes)
+
+    assert routes.FOOD_KNOWLEDGE_AVAILABLE
+    names = [food.name for food in routes.analyze_text_enhanced("rice and chicken curry").foodItems]
+    assert "Chicken Curry" in names
+
+
+def test_backend_ships_the_shared_knowledge_base():
+    backend_copy = Path(__file__).parent / "food_knowledge"
+    shared = Path(__file__).parent.parent / "aiservices" / "dietaiservices" / "food_knowledge"
+    # The routes read the copy inside the backend build context, not the aiservices tree
+    assert Path(sys.modules['food_knowledge'].__file__).parent == backend_copy
+    files = sorted(path.name for path in shared.iterdir() if path.is_file())
+    assert files == sorted(path.name for path in backend_copy.iterdir() if path.is_file())
+    _, mismatch, errors = filecmp.cmpfiles(shared, backend_copy, files, shallow=False)
+    assert mismatch == [] and errors == [], f"backend/food_knowledge is out of date: {mismatch + errors}"
+
+
+def test_popularity_load_is_retried_after_a_failure():
+    database = mongomock.MongoClient().db
+    client = client_for(routes)
+    suggestions = client.get("/api/nutrition/food-suggestions", params={"query": "rice"}).json()['suggestions']
+    food_id = suggestions[-1]['id']
+    database[routes.FOOD_SELECTIONS_COLLECTION].insert_one({'_id': food_id, 'count': 50})
+    attempts = []
+
+    def flaky_get_database():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("Database not connected")
+        return AsyncDatabase(database)
+
+    routes._selection_counts_loaded = False
+    get_database = routes.get_database
+    routes.get_database = flaky_get_database
+    try:
+        for _ in range(3):
+            response = client.get("/api/nutrition/food-suggestions", params={"query": "rice"})
+            assert response.status_code == 200
+        # Loaded on the second request, then never read again
+        assert len(attempts) == 2 and routes._selection_counts_loaded
+        assert response.json()['suggestions'][0]['id'] == food_id
+    finally:
+        routes.get_database = get_database
+        routes.get_food_autocomplete().load_popularity({})
+        routes._selection_counts_loaded = False
+
+
+if __name__ == "__main__":
+    print("Testing enhanced nutrition routes...")
+    test_routes_load_without_the_knowledge_base()
+    print("✓ Routes load without the knowledge base")
+    test_backend_ships_the_shared_knowledge_base()
+    print("✓ Backend ships the shared knowledge base")
+    test_popularity_load_is_retried_after_a_failure()
+    print("✓ Popularity load is retried after a failure")
+    print("\n🎉 All tests passed!")
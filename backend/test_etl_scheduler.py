@@ -0,0 +1,246 @@
+"""
+Test script for the asyncio ETL job scheduler
+Drives cron schedules with a fake clock against mongomock: run history,
+lease-based overlap prevention across replicas, concurrency limits and timeouts
+"""
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import mongomock
+
+from app.etl.job_scheduler import (
+    AsyncJobScheduler,
+    CronExpression,
+    FakeClock,
+    LeaseLock,
+    RunHistory,
+    ScheduledJob,
+    cron_from_schedule,
+)
+from async_mongomock import AsyncCollection, AsyncDatabase
+
+
+START = datetime(2025, 1, 6, 8, 59, 30)  # A Monday
+
+
+def make_scheduler(db, clock, owner):
+    return AsyncJobScheduler(
+        history=RunHistory(AsyncCollection(db.etl_job_runs)),
+        lock=LeaseLock(AsyncCollection(db.etl_job_leases), clock, owner=owner),
+        clock=clock
+    )
+
+
+def test_cron_expressions():
+    weekday_business = CronExpression("*/15 9-17 * * mon-fri")
+    assert weekday_business.next_after(datetime(2025, 1, 6, 8, 59)) == datetime(2025, 1, 6, 9, 0)
+    assert weekday_business.next_after(datetime(2025, 1, 10, 17, 45)) == datetime(2025, 1, 13, 9, 0)
+    assert CronExpression("0 2 * * *").next_after(datetime(2025, 12, 31, 2, 0)) == datetime(2026, 1, 1, 2, 0)
+    assert CronExpression("0 0 29 2 *").next_after(datetime(2025, 3, 1)) == datetime(2028, 2, 29)
+    # Day of month OR day of week when both are restricted
+    assert CronExpression("0 0 13 * fri").next_after(datetime(2025, 1, 1)) == datetime(2025, 1, 3)
+    assert cron_from_schedule("weekly", "sunday 03:00") == "0 3 * * sun"
+    assert CronExpression(cron_from_schedule("weekly", "sunday 03:00")).next_after(START) == datetime(2025, 1, 12, 3, 0)
+    for bad in ("* * *", "60 * * * *", "*/0 * * * *"):
+        try:
+            CronExpression(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+
+def test_schedule_runs_and_history_is_persisted():
+    db = mongomock.MongoClient().db
+
+    async def run():
+        clock = FakeClock(START)
+        scheduler = make_scheduler(db, clock, "replica-a")
+
+        async def export():
+            await clock.sleep(30)
+            return {"records_processed": 120}
+
+        scheduler.add_job(ScheduledJob(name="quarter_hourly", cron=CronExpression("*/15 * * * *"), func=export,
+                                       metadata={"data_types": ["nutrition_logs"]}))
+        scheduler.start()
+        await clock.advance(3600)
+        await scheduler.stop(wait=True)
+        return await RunHistory(AsyncCollection(db.etl_job_runs)).summary()
+
+    summary = asyncio.run(run())
+    runs = list(db.etl_job_runs.find().sort("started_at", 1))
+    assert [r["started_at"].strftime("%H:%M") for r in runs] == ["09:00", "09:15", "09:30", "09:45"]
+    assert all(r["status"] == "success" and r["duration_seconds"] == 30 and r["records_processed"] == 120 for r in runs)
+    assert runs[0]["data_types"] == ["nutrition_logs"]
+    assert summary["success"]["count"] == 4 and summary["success"]["records_processed"] == 480
+    assert db.etl_job_leases.count_documents({}) == 0
+
+
+def test_replicas_never_overlap():
+    db = mongomock.MongoClient().db
+    running = []
+    overlaps = []
+
+    async def run():
+        clock = FakeClock(START)
+        replicas = [make_scheduler(db, clock, f"replica-{i}") for i in range(3)]
+
+        async def slow_export():
+            if running:
+                overlaps.append(clock.now())
+            running.append(clock.now())
+            await clock.sleep(90)
+            running.pop()
+            return {"records_processed": 1}
+
+        for replica in replicas:
+            replica.add_job(ScheduledJob(name="every_minute", cron=CronExpression("* * * * *"), func=slow_export))
+            replica.start()
+        await clock.advance(10 * 60)
+        for replica in replicas:
+            await replica.stop(wait=True)
+
+    asyncio.run(run())
+    assert overlaps == []
+    statuses = [r["status"] for r in db.etl_job_runs.find()]
+    # Every tick is attempted by all 3 replicas; a run covers 2 ticks
+    assert statuses.count("success") == 5
+    assert statuses.count("skipped") == 30 - 5
+
+
+def test_per_job_concurrency_limit():
+    db = mongomock.MongoClient().db
+
+    async def run():
+        clock = FakeClock(START)
+        scheduler = make_scheduler(db, clock, "replica-a")
+
+        async def export():
+            await clock.sleep(60)
+            return {}
+
+        job = ScheduledJob(name="manual", cron=None, func=export, max_concurrency=2)
+        runs = [asyncio.create_task(scheduler.run(job)) for _ in range(4)]
+        await clock.settle()
+        active = scheduler.active_runs("manual")
+        await clock.advance(60)
+        return active, [r["status"] for r in await asyncio.gather(*runs)]
+
+    active, statuses = asyncio.run(run())
+    assert active == 2
+    assert sorted(statuses) == ["skipped", "skipped", "success", "success"]
+
+
+def test_timeouts_and_retries():
+    db = mongomock.MongoClient().db
+    attempts = []
+
+    async def run():
+        clock = FakeClock(START)
+        scheduler = make_scheduler(db, clock, "replica-a")
+
+        async def stuck():
+            attempts.append(clock.now())
+            await clock.sleep(3600)
+            return {}
+
+        job = ScheduledJob(name="stuck", cron=None, func=stuck, timeout_seconds=60, max_retries=2)
+        task = asyncio.create_task(scheduler.run(job))
+        await clock.advance(300)
+        return await task
+
+    result = asyncio.run(run())
+    assert result["status"] == "failed" and result["attempts"] == 3
+    assert len(attempts) == 3 and result["duration_seconds"] == 180
+    assert all("timed out" in error for error in result["errors"])
+
+
+def test_run_stops_when_its_lease_is_lost():
+    db = mongomock.MongoClient().db
+    finished = []
+
+    async def run():
+        clock = FakeClock(START)
+        scheduler = make_scheduler(db, clock, "replica-a")
+
+        async def export():
+            await clock.sleep(600)
+            finished.append(clock.now())
+            return {}
+
+        job = ScheduledJob(name="long", cron=None, func=export, lease_seconds=60, max_retries=2)
+        task = asyncio.create_task(scheduler.run(job))
+        await clock.advance(10)
+        # replica-a stalled past its lease and replica-b took the slot over
+        db.etl_job_leases.update_one({"_id": "long#0"}, {"$set": {"owner": "replica-b",
+                                                                   "expires_at": datetime(2025, 1, 7)}})
+        await clock.advance(600)
+        return await task
+
+    result = asyncio.run(run())
+    assert result["status"] == "failed" and result["attempts"] == 1
+    assert result["errors"] == ["lease lost to another owner"] and result["duration_seconds"] == 20
+    assert finished == []
+    # replica-b still owns the lease; replica-a did not release it
+    assert db.etl_job_leases.find_one({"_id": "long#0"})["owner"] == "replica-b"
+
+
+def test_invalid_schedule_keeps_the_current_one():
+    try:
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from app.auth.dependencies import get_current_user
+        from app.etl import router as etl_router
+        from app.etl.config import ETLEnvironment
+        from app.etl.scheduler import ETLScheduler
+    except ImportError as e:
+        print(f"⚠ ETL router dependencies not installed ({e}) - skipping schedule route test")
+        return
+
+    # The routes under test never touch the pipeline, so no Azure share is needed
+    etl_router.etl_scheduler = ETLScheduler(ETLEnvironment.from_environment(), db=AsyncDatabase(),
+                                            clock=FakeClock(START), pipeline=object())
+    app = FastAPI()
+    app.include_router(etl_router.router)
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "admin"}
+    client = TestClient(app)
+    schedule = {"job_name": "nightly", "schedule_type": "daily", "schedule_time": "06:30",
+                "data_types": ["nutrition_logs"]}
+    try:
+        assert client.post("/etl/schedules", json=schedule).status_code == 200
+        for schedule_type, schedule_time in (("daily", "ab:cd"), ("weekly", "monday"), ("cron", "61 * * * *")):
+            response = client.post("/etl/schedules", json={
+                **schedule, "schedule_type": schedule_type, "schedule_time": schedule_time})
+            assert response.status_code == 400, (schedule_time, response.status_code)
+
+        response = client.get("/etl/schedules")
+        assert response.status_code == 200
+        listed = response.json()["schedules"]
+        assert [(s["job_name"], s["cron"]) for s in listed] == [("nightly", "30 6 * * *")]
+        assert listed[0]["next_run"] == "2025-01-07T06:30:00"
+    finally:
+        etl_router.etl_scheduler = None
+
+
+if __name__ == "__main__":
+    print("Testing ETL job scheduler...")
+    test_cron_expressions()
+    print("✓ Cron expressions")
+    test_schedule_runs_and_history_is_persisted()
+    print("✓ Scheduled runs persisted with durations and row counts")
+    test_replicas_never_overlap()
+    print("✓ Lease lock prevents overlapping runs across replicas")
+    test_per_job_concurrency_limit()
+    print("✓ Per-job concurrency limit")
+    test_timeouts_and_retries()
+    print("✓ Timeouts and retries")
+    test_run_stops_when_its_lease_is_lost()
+    print("✓ Run stops when its lease is lost")
+    test_invalid_schedule_keeps_the_current_one()
+    print("✓ Invalid schedule keeps the current one")
+    print("\n🎉 All tests passed!")
@@ -0,0 +1,149 @@
+"""
+Test script for the write-behind ETL sink
+Checks size and time triggered batches (one per data type and day), recovery
+of spooled records after a crash and retries of failed batch writes
+"""
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.etl.write_behind import WriteBehindSink
+
+
+class BatchRecorder:
+    """WriteBatch that keeps batches in memory and can fail on demand"""
+
+    def __init__(self, fail_times: int = 0, fail_partition: str = None):
+        self.batches = []
+        self.fail_times = fail_times
+        self.fail_partition = fail_partition
+
+    async def __call__(self, data_type, partition_key, records, filename):
+        await asyncio.sleep(0)
+        if self.fail_times and partition_key == (self.fail_partition or partition_key):
+            self.fail_times -= 1
+            return False
+        self.batches.append((data_type, partition_key, [r['analysis_id'] for r in records], filename))
+        return True
+
+    def records(self):
+        return sorted(analysis_id for batch in self.batches for analysis_id in batch[2])
+
+
+def analysis(i, day="2025-03-01"):
+    return {'analysis_id': f"a{i:04d}", 'user_id': f"u{i % 7}", 'created_at': f"{day}T12:00:00"}
+
+
+def spooled_files(spool_dir):
+    return list(Path(spool_dir).glob("*/*.jsonl"))
+
+
+def test_size_threshold_writes_one_batch_per_day():
+    recorder = BatchRecorder()
+    with tempfile.TemporaryDirectory() as spool_dir:
+        async def run():
+            sink = WriteBehindSink(recorder, spool_dir, max_batch_records=100, max_delay_seconds=60)
+            await sink.start()
+            days = ["2025-03-01", "2025-03-02"]
+            acks = await asyncio.gather(*(
+                sink.submit('food_analyses', analysis(i, days[i % 2])) for i in range(250)
+            ))
+            await asyncio.sleep(0.05)
+            sealed_batches = len(recorder.batches)
+            await sink.stop()
+            return acks, sealed_batches, sink.get_stats()
+
+        acks, sealed_batches, stats = asyncio.run(run())
+        assert all(ack['status'] == 'queued' for ack in acks)
+        # Two full segments were written without waiting for the timer, each split by day
+        assert sealed_batches == 4
+        assert len(recorder.batches) == 6
+        assert recorder.records() == [f"a{i:04d}" for i in range(250)]
+        assert {batch[1] for batch in recorder.batches} == {"2025-03-01", "2025-03-02"}
+        assert len({batch[3] for batch in recorder.batches}) == 3
+        assert stats['records_written'] == 250 and stats['records_pending'] == 0
+        assert spooled_files(spool_dir) == []
+
+
+def test_time_threshold_flushes_small_bursts():
+    recorder = BatchRecorder()
+    with tempfile.TemporaryDirectory() as spool_dir:
+        async def run():
+            sink = WriteBehindSink(recorder, spool_dir, max_batch_records=100, max_delay_seconds=0.05)
+            await sink.start()
+            for i in range(3):
+                await sink.submit('food_analyses', analysis(i))
+            await asyncio.sleep(0.3)
+            written = list(recorder.batches)
+            await sink.stop()
+            return written
+
+        written = asyncio.run(run())
+        assert len(written) == 1 and written[0][2] == ["a0000", "a0001", "a0002"]
+
+
+def test_spooled_records_recovered_after_crash():
+    with tempfile.TemporaryDirectory() as spool_dir:
+        async def crash():
+            sink = WriteBehindSink(BatchRecorder(), spool_dir, max_batch_records=1000, max_delay_seconds=60)
+            await sink.start()
+            for i in range(20):
+                await sink.submit('food_analyses', analysis(i))
+            # Process dies: no flush, the flusher task is simply dropped
+
+        asyncio.run(crash())
+        [segment] = spooled_files(spool_dir)
+        with open(segment, "a") as f:
+            f.write('{"partition_key": "2025-03-01", "record": {"analysis_')
+
+        recorder = BatchRecorder()
+
+        async def restart():
+            sink = WriteBehindSink(recorder, spool_dir, max_batch_records=1000, max_delay_seconds=60)
+            recovered = await sink.start()
+            await sink.stop()
+            return recovered
+
+        assert asyncio.run(restart()) == 20
+        assert recorder.records() == [f"a{i:04d}" for i in range(20)]
+        assert recorder.batches[0][3] == f"food_analyses_batch_{segment.stem}"
+        assert spooled_files(spool_dir) == []
+
+
+def test_failed_batches_are_retried_without_duplicates():
+    recorder = BatchRecorder(fail_times=2, fail_partition="2025-03-02")
+    with tempfile.TemporaryDirectory() as spool_dir:
+        async def run():
+            sink = WriteBehindSink(recorder, spool_dir, max_batch_records=4, max_delay_seconds=60, retry_seconds=0.05)
+            await sink.start()
+            for i in range(4):
+                await sink.submit('food_analyses', analysis(i, "2025-03-01" if i < 2 else "2025-03-02"))
+            await asyncio.sleep(0.02)
+            pending = sink.get_stats()['segments_pending']
+            await asyncio.sleep(0.3)
+            await sink.stop()
+            return pending, sink.get_stats()
+
+        pending, stats = asyncio.run(run())
+        assert pending == 1
+        assert [batch[1] for batch in recorder.batches] == ["2025-03-01", "2025-03-02"]
+        assert recorder.records() == ["a0000", "a0001", "a0002", "a0003"]
+        assert stats['write_failures'] == 2 and stats['segments_pending'] == 0
+        assert spooled_files(spool_dir) == []
+
+
+if __name__ == "__main__":
+    print("Testing write-behind ETL sink...")
+    test_size_threshold_writes_one_batch_per_day()
+    print("✓ Size threshold writes one batch per data type and day")
+    test_time_threshold_flushes_small_bursts()
+    print("✓ Time threshold flushes small bursts")
+    test_spooled_records_recovered_after_crash()
+    print("✓ Spooled records recovered after a crash")
+    test_failed_batches_are_retried_without_duplicates()
+    print("✓ Failed batches retried without duplicates")
+    print("\n🎉 All tests passed!")
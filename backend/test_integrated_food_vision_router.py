@@ -0,0 +1,73 @@
+"""
+Test script for the integrated food vision router
+Analyses queued in the write-behind sink count as stored: /analyze schedules
+the analytics cache update and batch results report them as stored
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.etl.integrated_food_vision_router as food_vision_router
+from app.auth.dependencies import get_current_user
+from app.etl.batch_analysis import BatchImage
+
+
+class QueuingSystem:
+    """Stands in for FoodVisionETLIntegration with the write-behind acknowledgement"""
+
+    async def analyze_and_store_food_image(self, image_data, user_id, meal_type, text_description=None,
+                                           dietary_restrictions=None, use_complete_pipeline=True):
+        return {
+            'analysis_id': f"analysis_{user_id}",
+            'status': 'success',
+            'food_analysis': {'detected_foods': [{'name': 'rice'}], 'nutrition_summary': {'total_calories': 300}},
+            'etl_processing': {'enabled': True, 'status': 'queued', 'processing_time_seconds': 0.01},
+            'nutrition_insights': {},
+            'performance_metrics': {'total_processing_time_seconds': 0.02}
+        }
+
+
+def test_queued_analysis_schedules_the_analytics_update():
+    updates = []
+
+    async def record_update(user_id, analysis_id):
+        updates.append((user_id, analysis_id))
+
+    app = FastAPI()
+    app.include_router(food_vision_router.router)
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "user_1"}
+    food_vision_router.integrated_system = QueuingSystem()
+    update_user_analytics_cache = food_vision_router.update_user_analytics_cache
+    food_vision_router.update_user_analytics_cache = record_update
+    try:
+        # List fields of the request model are read from the multipart form
+        response = TestClient(app).post("/etl/food-vision/analyze", data={"dietary_restrictions": "vegetarian"},
+                                        files={"file": ("meal.jpg", b"jpeg", "image/jpeg")})
+    finally:
+        food_vision_router.update_user_analytics_cache = update_user_analytics_cache
+        food_vision_router.integrated_system = None
+
+    assert response.status_code == 200
+    assert response.json()['etl_processing']['status'] == 'queued'
+    assert updates == [("user_1", "analysis_user_1")]
+
+
+def test_queued_batch_image_is_reported_as_stored():
+    image = BatchImage(0, "meal.jpg", "image/jpeg", b"jpeg", "lunch")
+    result = asyncio.run(food_vision_router._analyze_batch_image(QueuingSystem(), "user_1", image))
+    assert result['etl_stored'] is True and result['total_calories'] == 300
+
+
+if __name__ == "__main__":
+    print("Testing integrated food vision router...")
+    test_queued_analysis_schedules_the_analytics_update()
+    print("✓ Queued analysis schedules the analytics update")
+    test_queued_batch_image_is_reported_as_stored()
+    print("✓ Queued batch image is reported as stored")
+    print("\n🎉 All tests passed!")
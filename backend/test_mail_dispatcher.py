@@ -0,0 +1,149 @@
+"""
+Test script for the async mail dispatcher
+Runs against the local fake SMTP server, no network access needed
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.mail_dispatcher import MailDispatcher, OutgoingMail
+from fake_smtp_server import FakeSMTPServer
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+
+    async def insert_one(self, document):
+        self.documents.append(document)
+
+
+def make_dispatcher(server: FakeSMTPServer, dead_letters: FakeCollection = None, **kwargs) -> MailDispatcher:
+    return MailDispatcher(
+        "127.0.0.1", server.port, sender="sender@example.com",
+        username=server.username, password=server.password, use_tls=False,
+        dead_letters=lambda: dead_letters, **kwargs
+    )
+
+
+def test_throughput_and_ordering():
+    """A single session delivers mail in FIFO order over one authenticated connection"""
+    async def run():
+        async with FakeSMTPServer() as server:
+            dispatcher = make_dispatcher(server, pool_size=1)
+            started = time.perf_counter()
+            for i in range(200):
+                assert dispatcher.enqueue(OutgoingMail(f"user{i}@example.com", f"Message {i}", "body"))
+            await dispatcher.join()
+            elapsed = time.perf_counter() - started
+            await dispatcher.stop()
+            return server, elapsed
+
+    server, elapsed = asyncio.run(run())
+    assert [mail.subject for mail in server.messages] == [f"Message {i}" for i in range(200)]
+    assert server.connections == 1 and server.logins == 1
+    print(f"  200 messages in {elapsed:.2f}s ({200 / elapsed:,.0f}/s)")
+
+
+def test_enqueue_does_not_block():
+    """Enqueueing is immediate and the queue is bounded"""
+    async def run():
+        async with FakeSMTPServer() as server:
+            dispatcher = make_dispatcher(server, queue_size=3)
+            started = time.perf_counter()
+            accepted = [dispatcher.enqueue(OutgoingMail(f"user{i}@example.com", "Hi", "body")) for i in range(5)]
+            enqueue_time = time.perf_counter() - started
+            await dispatcher.join()
+            await dispatcher.stop()
+            return accepted, enqueue_time, dispatcher.stats
+
+    accepted, enqueue_time, stats = asyncio.run(run())
+    assert accepted == [True, True, True, False, False]
+    assert stats["rejected"] == 2 and stats["sent"] == 3
+    assert enqueue_time < 0.05
+
+
+def test_coalesces_per_recipient():
+    """Repeated OTP requests while queued send only the newest code"""
+    async def run():
+        async with FakeSMTPServer() as server:
+            dispatcher = make_dispatcher(server, pool_size=1)
+            for code in ("111111", "222222", "333333"):
+                dispatcher.enqueue(OutgoingMail("user@example.com", f"OTP {code}", code, coalesce_key="otp:login"))
+            dispatcher.enqueue(OutgoingMail("other@example.com", "OTP 444444", "444444", coalesce_key="otp:login"))
+            await dispatcher.join()
+            await dispatcher.stop()
+            return server, dispatcher.stats
+
+    server, stats = asyncio.run(run())
+    assert [(mail.recipient, mail.subject) for mail in server.messages] == [
+        ("user@example.com", "OTP 333333"),
+        ("other@example.com", "OTP 444444"),
+    ]
+    assert stats["coalesced"] == 2
+
+
+def test_retry_then_dead_letter():
+    """Transient failures are retried with backoff; exhausted and permanent failures are dead-lettered"""
+    async def run():
+        async with FakeSMTPServer() as server:
+            dead_letters = FakeCollection()
+            dispatcher = make_dispatcher(server, dead_letters, pool_size=1, max_attempts=3, backoff_seconds=0.01)
+
+            server.fail_next = [451]
+            dispatcher.enqueue(OutgoingMail("retry@example.com", "Retried", "body"))
+            await dispatcher.join()
+
+            server.fail_next = [451, 451, 451]
+            dispatcher.enqueue(OutgoingMail("flaky@example.com", "Exhausted", "body"))
+            await dispatcher.join()
+
+            server.fail_next = [554]
+            dispatcher.enqueue(OutgoingMail("rejected@example.com", "Rejected", "body"))
+            await dispatcher.join()
+            await dispatcher.stop()
+            return server, dead_letters, dispatcher.stats
+
+    server, dead_letters, stats = asyncio.run(run())
+    assert [mail.subject for mail in server.messages] == ["Retried"]
+    assert [(doc["recipient"], doc["attempts"]) for doc in dead_letters.documents] == [
+        ("flaky@example.com", 3),
+        ("rejected@example.com", 1),
+    ]
+    assert stats["retried"] == 3 and stats["dead_lettered"] == 2
+
+
+def test_reconnects_after_server_disconnect():
+    """A dropped session is re-established transparently"""
+    async def run():
+        async with FakeSMTPServer() as server:
+            server.disconnect_after = 2
+            dispatcher = make_dispatcher(server, pool_size=1)
+            for i in range(5):
+                dispatcher.enqueue(OutgoingMail(f"user{i}@example.com", f"Message {i}", "body"))
+            await dispatcher.join()
+            await dispatcher.stop()
+            return server
+
+    server = asyncio.run(run())
+    assert [mail.subject for mail in server.messages] == [f"Message {i}" for i in range(5)]
+    assert server.connections == 3
+
+
+if __name__ == "__main__":
+    print("Testing mail dispatcher against the fake SMTP server...")
+    test_throughput_and_ordering()
+    print("✓ Throughput and ordering")
+    test_enqueue_does_not_block()
+    print("✓ Non-blocking bounded queue")
+    test_coalesces_per_recipient()
+    print("✓ Per-recipient coalescing")
+    test_retry_then_dead_letter()
+    print("✓ Retry with backoff and dead letters")
+    test_reconnects_after_server_disconnect()
+    print("✓ Reconnect after disconnect")
+    print("\n🎉 All tests passed!")
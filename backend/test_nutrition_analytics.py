@@ -0,0 +1,91 @@
+"""
+Test script for the columnar nutrition analytics engine
+Golden checks against the previous per-metric analytics (kept in the
+benchmark) on random record sets and edge cases, plus the report cache
+"""
+import math
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.etl.nutrition_analytics import AnalyticsCache, NutritionAnalytics, food_category
+from benchmark_nutrition_analytics import FOODS, legacy_report, make_records
+
+NOW = datetime(2025, 3, 31, 20, 0)
+
+
+def assert_close(actual, expected, path="report"):
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected), (path, set(actual) ^ set(expected))
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), (path, actual, expected)
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_close(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float):
+        assert math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9), (path, actual, expected)
+    else:
+        assert actual == expected, (path, actual, expected)
+
+
+def test_matches_per_metric_analytics_on_random_records():
+    for seed in range(30):
+        rng = random.Random(seed)
+        records = make_records(rng.choice([0, 1, 3, 6, 7, 40, 300]), seed=seed, days=rng.choice([1, 2, 14, 90]))
+        for record in records:
+            # Mix in the shapes ETL partitions also contain
+            if rng.random() < 0.1:
+                record['total_nutrition'] = {'calories': rng.randint(0, 900)}
+            if rng.random() < 0.1:
+                record.pop('meal_type')
+            if rng.random() < 0.1:
+                record['food_items'] = [rng.choice(FOODS).upper() + " ", {'food_name': 'Curd'}, 42, {}]
+        assert_close(NutritionAnalytics(records, NOW).report(), legacy_report(records, NOW), f"seed {seed}")
+
+
+def test_edge_cases_match():
+    cases = {
+        'no records': [],
+        'one day': [{'date': '2025-03-30', 'meal_type': 'lunch', 'total_nutrition': {'calories': 500}}] * 8,
+        'tied foods': [{'created_at': '2025-03-30T08:00:00', 'detected_foods': [{'name': n}]} for n in FOODS] * 7,
+        'bad timestamps': [{'created_at': c, 'meal_type': 'snack'} for c in ('2025-03-29Tnoon', '2025-03-30T', '2025-03-30')] * 3,
+        'zero calories': [{'date': f'2025-03-{d:02d}', 'total_nutrition': {'calories': 0}} for d in range(1, 10)]
+    }
+    for name, records in cases.items():
+        assert_close(NutritionAnalytics(records, NOW).report(), legacy_report(records, NOW), name)
+
+
+def test_food_categories_follow_keyword_precedence():
+    # 'chicken fried rice' is a grain because grains are checked before proteins
+    assert [food_category(name) for name in ('chicken fried rice', 'dal curry', 'coconut', 'iced tea')] == [0, 1, 7, 6]
+
+
+def test_analytics_cache_expires_and_evicts():
+    cache = AnalyticsCache(max_entries=2, ttl_seconds=0.05)
+    cache.put(('u1', '2025-03-01', '2025-03-31', 0), {'total_records': 1})
+    cache.put(('u2', '2025-03-01', '2025-03-31', 0), {'total_records': 2})
+    assert cache.get(('u1', '2025-03-01', '2025-03-31', 0)) == {'total_records': 1}
+    cache.put(('u3', '2025-03-01', '2025-03-31', 0), {'total_records': 3})
+    assert cache.get(('u2', '2025-03-01', '2025-03-31', 0)) is None
+    assert cache.get(('u1', '2025-03-01', '2025-03-31', 1)) is None
+    time.sleep(0.06)
+    assert cache.get(('u1', '2025-03-01', '2025-03-31', 0)) is None
+
+
+if __name__ == "__main__":
+    print("Testing columnar nutrition analytics...")
+    test_matches_per_metric_analytics_on_random_records()
+    print("✓ Matches per-metric analytics on 30 random record sets")
+    test_edge_cases_match()
+    print("✓ Edge cases match")
+    test_food_categories_follow_keyword_precedence()
+    print("✓ Food categories follow keyword precedence")
+    test_analytics_cache_expires_and_evicts()
+    print("✓ Analytics cache expires and evicts")
+    print("\n🎉 All tests passed!")
@@ -0,0 +1,157 @@
+"""
+Test script for nutrition log listing
+Keyset pages over a mongomock collection must reproduce the full
+(date, _id) newest-first order without gaps or repeats, also while new logs
+arrive between pages. Also covers projection profiles, cursor validation and
+the NDJSON export through the HTTP routes
+"""
+import asyncio
+import json
+import random
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import mongomock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth.dependencies import get_current_user
+from app.routes.nutrition_routes import router
+from app.services.nutrition_service import NutritionService, nutrition_service
+from async_mongomock import AsyncDatabase
+
+TODAY = date(2025, 3, 31)
+
+
+def insert_logs(database, rng, count, user_id="user_a", days=20):
+    database.nutrition_logs.insert_many([
+        {
+            "user_id": user_id,
+            "date": (TODAY - timedelta(days=rng.randint(0, days - 1))).isoformat(),
+            "meals": [{"name": "rice", "calories": 200.0, "protein": 4, "carbs": 45, "fat": 1, "quantity": "1 cup"}],
+            "total_nutrition": {"calories": 200.0, "protein": 4, "carbs": 45, "fat": 1},
+            "meal_type": rng.choice(["breakfast", "lunch", "dinner"]),
+            "notes": f"log {i}",
+            "created_at": datetime(2025, 3, 1)
+        }
+        for i in range(count)
+    ])
+
+
+def expected_ids(database, user_id="user_a", start_date="0000", end_date="9999"):
+    docs = database.nutrition_logs.find({"user_id": user_id, "date": {"$gte": start_date, "$lte": end_date}})
+    return [str(doc["_id"]) for doc in sorted(docs, key=lambda doc: (doc["date"], doc["_id"]), reverse=True)]
+
+
+async def page_through(service, limit, **kwargs):
+    ids, cursor, pages = [], None, 0
+    while True:
+        result = await service.list_nutrition_logs("user_a", limit=limit, cursor=cursor, **kwargs)
+        ids += [log["id"] for log in result["logs"]]
+        pages += 1
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return ids, pages
+        assert len(result["logs"]) == limit
+
+
+def test_keyset_pages_follow_the_full_order():
+    for seed in range(10):
+        rng = random.Random(seed)
+        database = mongomock.MongoClient().db
+        insert_logs(database, rng, rng.randint(0, 120))
+        insert_logs(database, rng, 30, user_id="user_b")
+        service = NutritionService()
+        service.db = AsyncDatabase(database)
+
+        async def run():
+            limit = rng.randint(1, 25)
+            ids, pages = await page_through(service, limit)
+            assert ids == expected_ids(database)
+            assert pages == max(1, -(-len(ids) // limit))
+
+            start_date = (TODAY - timedelta(days=rng.randint(0, 19))).isoformat()
+            end_date = (TODAY - timedelta(days=rng.randint(0, 5))).isoformat()
+            ids, _ = await page_through(service, limit, start_date=start_date, end_date=end_date)
+            assert ids == expected_ids(database, start_date=start_date, end_date=end_date)
+
+            # Logs added while paging land before the cursor: no repeats, nothing skipped
+            before = expected_ids(database)
+            first = await service.list_nutrition_logs("user_a", limit=limit)
+            insert_logs(database, rng, 5, days=1)
+            ids = [log["id"] for log in first["logs"]]
+            if first["next_cursor"]:
+                rest = await service.list_nutrition_logs("user_a", limit=1000, cursor=first["next_cursor"])
+                ids += [log["id"] for log in rest["logs"]]
+            assert ids == before
+
+        asyncio.run(run())
+
+
+def test_projection_profiles_and_cursor_validation():
+    database = mongomock.MongoClient().db
+    insert_logs(database, random.Random(1), 3)
+    service = NutritionService()
+    service.db = AsyncDatabase(database)
+
+    async def run():
+        summary = (await service.list_nutrition_logs("user_a", fields="summary"))["logs"][0]
+        # analysis_method and confidence_score are in the profile but not in these logs
+        assert set(summary) == {"id", "user_id", "date", "meal_type", "total_nutrition", "meals", "created_at"}
+        assert summary["meals"] == [{"name": "rice"}]
+        full = (await service.list_nutrition_logs("user_a", fields="full"))["logs"][0]
+        assert full["notes"].startswith("log") and full["meals"][0]["quantity"] == "1 cup"
+
+        for bad in ("not-a-cursor", "WyIyMDI1LTAzLTMxIiwiMTIzIl0", "bnVsbA"):
+            try:
+                await service.list_nutrition_logs("user_a", cursor=bad)
+                raise AssertionError(f"cursor {bad!r} was accepted")
+            except ValueError:
+                pass
+
+    asyncio.run(run())
+
+
+def test_routes_page_by_cursor_and_export_ndjson():
+    database = mongomock.MongoClient().db
+    insert_logs(database, random.Random(2), 45)
+    nutrition_service.db = AsyncDatabase(database)
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "user_a"}
+    client = TestClient(app)
+
+    ids, params = [], {"per_page": 20, "fields": "summary"}
+    while True:
+        body = client.get("/nutrition/logs", params=params).json()
+        ids += [log["id"] for log in body["logs"]]
+        if not body["next_cursor"]:
+            break
+        params["cursor"] = body["next_cursor"]
+    assert ids == expected_ids(database) and body["total"] is None
+
+    offset = client.get("/nutrition/logs", params={"page": 3, "per_page": 20}).json()
+    assert offset["total"] == 45 and [log["id"] for log in offset["logs"]] == ids[40:]
+    assert client.get("/nutrition/logs", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/nutrition/logs", params={"fields": "everything"}).status_code == 422
+
+    response = client.get("/nutrition/logs/export", params={"start_date": "2025-03-20"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [log["id"] for log in exported] == expected_ids(database, start_date="2025-03-20")
+    assert exported[0]["created_at"] == "2025-03-01T00:00:00"
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Nutrition Log Listing")
+    test_keyset_pages_follow_the_full_order()
+    print("✅ Keyset pages follow the full order")
+    test_projection_profiles_and_cursor_validation()
+    print("✅ Projection profiles and cursor validation")
+    test_routes_page_by_cursor_and_export_ndjson()
+    print("✅ Routes page by cursor and export NDJSON")
+    print("\n🎉 All nutrition log listing tests passed!")
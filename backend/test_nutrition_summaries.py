@@ -0,0 +1,253 @@
+"""
+Test script for daily nutrition summaries
+The write path (create/update/delete) must keep each day's summary equal to a
+recomputation from its logs, and the verifier must repair drift on past days
+without touching today or overwriting deltas that land while it runs
+"""
+import asyncio
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import mongomock
+
+from app.models.nutrition_models import FoodItem, NutritionLogCreate, NutritionLogUpdate
+from app.services.nutrition_service import NutritionService, _encode_key
+from async_mongomock import AsyncDatabase
+
+FOODS = ["rice", "dal curry", "egg.hopper", "kottu $pecial"]
+MEAL_TYPES = ["breakfast", "lunch", "dinner", None]
+TODAY = date.today().isoformat()
+YESTERDAY = (date.today() - timedelta(days=1)).isoformat()
+EARLIER = (date.today() - timedelta(days=3)).isoformat()
+
+
+def make_service(database):
+    service = NutritionService()
+    service.db = AsyncDatabase(database)
+    return service
+
+
+def random_meals(rng):
+    return [
+        FoodItem(name=name, calories=round(rng.uniform(20, 600), 2), protein=2, carbs=10, fat=3, quantity="1 cup")
+        for name in rng.sample(FOODS, rng.randint(0, 3))
+    ]
+
+
+def recompute(database, user_id, day):
+    logs = list(database.nutrition_logs.find({"user_id": user_id, "date": day}))
+    meal_types, food_counts = {}, {}
+    for log in logs:
+        if log.get("meal_type"):
+            key = _encode_key(log["meal_type"])
+            meal_types[key] = meal_types.get(key, 0) + 1
+        for meal in log["meals"]:
+            key = _encode_key(meal["name"])
+            food_counts[key] = food_counts.get(key, 0) + 1
+    return {
+        "meal_count": len(logs),
+        "calories": round(sum(log["total_nutrition"]["calories"] for log in logs), 6),
+        "food_item_count": sum(len(log["meals"]) for log in logs),
+        "meal_types": meal_types,
+        "food_counts": food_counts
+    }
+
+
+def stored(database, user_id, day):
+    doc = database.daily_nutrition_summaries.find_one({"user_id": user_id, "date": day})
+    if doc is None:
+        return None
+    return {
+        "meal_count": doc["meal_count"],
+        "calories": round(doc.get("total_nutrition", {}).get("calories", 0), 6),
+        "food_item_count": doc.get("food_item_count", 0),
+        "meal_types": {key: count for key, count in doc.get("meal_types", {}).items() if count},
+        "food_counts": {key: count for key, count in doc.get("food_counts", {}).items() if count}
+    }
+
+
+def insert_log(database, user_id, day, calories, meal_type="lunch", names=("rice",)):
+    database.nutrition_logs.insert_one({
+        "user_id": user_id, "date": day, "meal_type": meal_type,
+        "meals": [{"name": name, "calories": calories / len(names)} for name in names],
+        "total_nutrition": {"calories": calories}
+    })
+
+
+def test_write_path_keeps_summaries_consistent():
+    for seed in range(10):
+        rng = random.Random(seed)
+        database = mongomock.MongoClient().db
+        service = make_service(database)
+
+        async def run():
+            logs = []
+            for _ in range(rng.randint(1, 12)):
+                log = await service.create_nutrition_log(
+                    "u", NutritionLogCreate(meals=random_meals(rng), meal_type=rng.choice(MEAL_TYPES)))
+                logs.append(str(log.id))
+            for log_id in rng.sample(logs, len(logs) // 2):
+                await service.update_nutrition_log("u", log_id, NutritionLogUpdate(
+                    meals=random_meals(rng) if rng.random() < 0.7 else None,
+                    meal_type=rng.choice(MEAL_TYPES[:-1]) if rng.random() < 0.5 else None))
+            for log_id in rng.sample(logs, len(logs) // 3):
+                assert await service.delete_nutrition_log("u", log_id)
+
+        asyncio.run(run())
+        assert stored(database, "u", TODAY) == recompute(database, "u", TODAY)
+
+    # The last delete drops the summary
+    database = mongomock.MongoClient().db
+    service = make_service(database)
+
+    async def create_and_delete():
+        log = await service.create_nutrition_log("u", NutritionLogCreate(meals=random_meals(random.Random(1))))
+        await service.delete_nutrition_log("u", str(log.id))
+
+    asyncio.run(create_and_delete())
+    assert database.daily_nutrition_summaries.count_documents({}) == 0
+
+
+def test_verifier_repairs_past_days_only():
+    database = mongomock.MongoClient().db
+    service = make_service(database)
+    insert_log(database, "u", YESTERDAY, 500)
+    insert_log(database, "u", EARLIER, 300, meal_type="dinner", names=("dal curry", "roti"))
+    insert_log(database, "u", TODAY, 200)
+    # Drifted, missing (EARLIER), stale and today's (left to the write path)
+    database.daily_nutrition_summaries.insert_many([
+        {"user_id": "u", "date": YESTERDAY, "meal_count": 1, "total_nutrition": {"calories": 450},
+         "meal_types": {}, "food_counts": {}, "version": 4},
+        {"user_id": "u", "date": (date.today() - timedelta(days=2)).isoformat(), "meal_count": 1,
+         "total_nutrition": {"calories": 100}, "version": 2},
+        {"user_id": "u", "date": TODAY, "meal_count": 7, "total_nutrition": {"calories": 9}, "version": 1}
+    ])
+
+    result = asyncio.run(service.verify_daily_summaries(days=7))
+    assert result == {"checked": 2, "repaired": 1, "created": 1, "removed": 1, "skipped": 0}, result
+    for day in (YESTERDAY, EARLIER):
+        assert stored(database, "u", day) == recompute(database, "u", day)
+    assert database.daily_nutrition_summaries.find_one({"date": YESTERDAY})["version"] == 5
+    assert stored(database, "u", TODAY)["meal_count"] == 7
+
+    # A consistent summary is left alone
+    assert asyncio.run(service.verify_daily_summaries(days=7))["repaired"] == 0
+
+
+def test_verifier_never_overwrites_concurrent_writes():
+    database = mongomock.MongoClient().db
+    service = make_service(database)
+    asyncio.run(service.get_db())  # unique (user_id, date) index
+    insert_log(database, "u", YESTERDAY, 500)
+    insert_log(database, "u", EARLIER, 300)
+    stale_day = (date.today() - timedelta(days=2)).isoformat()
+    database.daily_nutrition_summaries.insert_many([
+        {"user_id": "u", "date": YESTERDAY, "meal_count": 1, "total_nutrition": {"calories": 450}, "version": 1},
+        {"user_id": "u", "date": stale_day, "meal_count": 1, "total_nutrition": {"calories": 80}, "version": 1}
+    ])
+
+    # Between the verifier's summary read and its writes, log writes land: a delta on
+    # yesterday, a first summary for EARLIER and a log plus delta on the "stale" day
+    logs = service.db.nutrition_logs
+    aggregate = logs.aggregate
+
+    def aggregate_with_concurrent_writes(*args, **kwargs):
+        database.daily_nutrition_summaries.update_one(
+            {"user_id": "u", "date": YESTERDAY}, {"$inc": {"total_nutrition.calories": 120, "version": 1}})
+        database.daily_nutrition_summaries.insert_one(
+            {"user_id": "u", "date": EARLIER, "meal_count": 1, "total_nutrition": {"calories": 300}, "version": 1})
+        database.daily_nutrition_summaries.update_one(
+            {"user_id": "u", "date": stale_day}, {"$inc": {"meal_count": 1, "version": 1}})
+        return aggregate(*args, **kwargs)
+
+    logs.aggregate = aggregate_with_concurrent_writes
+    result = asyncio.run(service.verify_daily_summaries(days=7))
+    assert result["skipped"] == 3 and result["repaired"] == result["created"] == result["removed"] == 0, result
+    summaries = {doc["date"]: doc for doc in database.daily_nutrition_summaries.find()}
+    assert summaries[YESTERDAY]["total_nutrition"]["calories"] == 570
+    assert summaries[EARLIER]["total_nutrition"]["calories"] == 300
+    assert summaries[stale_day]["meal_count"] == 2
+
+
+def test_verifier_backfills_summaries_without_counters():
+    database = mongomock.MongoClient().db
+    service = make_service(database)
+    insert_log(database, "u", YESTERDAY, 500, meal_type="dinner", names=("dal curry", "roti"))
+    # Totals match, but the summary was written before the counters existed
+    database.daily_nutrition_summaries.insert_one(
+        {"user_id": "u", "date": YESTERDAY, "meal_count": 1, "total_nutrition": {"calories": 500}, "version": 3})
+
+    assert asyncio.run(service.verify_daily_summaries(days=7))["repaired"] == 1
+    assert stored(database, "u", YESTERDAY) == recompute(database, "u", YESTERDAY)
+    assert asyncio.run(service.verify_daily_summaries(days=7))["repaired"] == 0
+
+
+def test_weekly_report_counts_legacy_days_from_their_logs():
+    database = mongomock.MongoClient().db
+    service = make_service(database)
+    insert_log(database, "u", EARLIER, 300, meal_type="dinner", names=("dal curry", "roti"))
+    insert_log(database, "u", EARLIER, 200, meal_type="dinner", names=("roti",))
+    # Written before the counters existed: totals only
+    database.daily_nutrition_summaries.insert_one(
+        {"user_id": "u", "date": EARLIER, "meal_count": 2, "total_nutrition": {"calories": 500}, "version": 2})
+
+    async def run():
+        await service.create_nutrition_log("u", NutritionLogCreate(
+            meals=[FoodItem(name="rice", calories=250, protein=5, carbs=50, fat=1, quantity="1 cup")],
+            meal_type="lunch"))
+        return await service.generate_weekly_report("u", EARLIER, TODAY)
+
+    report = asyncio.run(run())
+    assert report.total_logs == 3
+    assert report.meal_frequency == {"dinner": 2, "lunch": 1}
+    assert report.top_foods[0] == "roti" and set(report.top_foods) == {"roti", "dal curry", "rice"}
+
+
+def test_indexes_are_created_separately_and_retried():
+    database = mongomock.MongoClient().db
+    service = make_service(database)
+    # Duplicate reports left by older versions, and a duplicated summary that blocks its unique index
+    database.weekly_reports.insert_many([
+        {"user_id": "u", "start_date": EARLIER, "end_date": YESTERDAY, "data_version": str(n)} for n in range(3)
+    ])
+    database.daily_nutrition_summaries.insert_many([
+        {"user_id": "u", "date": YESTERDAY, "meal_count": 1}, {"user_id": "u", "date": YESTERDAY, "meal_count": 1}
+    ])
+
+    asyncio.run(service.get_db())
+    assert [r["data_version"] for r in database.weekly_reports.find()] == ["2"]
+    assert "user_id_1_start_date_1_end_date_1" in database.weekly_reports.index_information()
+    assert "user_date_id" in database.nutrition_logs.index_information()
+    assert "user_date_unique" not in database.daily_nutrition_summaries.index_information()
+    assert not service._indexes_ready
+
+    # Not retried before the retry interval, then only the missing index is created
+    database.daily_nutrition_summaries.delete_one({"date": YESTERDAY})
+    asyncio.run(service.get_db())
+    assert "user_date_unique" not in database.daily_nutrition_summaries.index_information()
+    service._index_retry_at = 0
+    asyncio.run(service.get_db())
+    assert "user_date_unique" in database.daily_nutrition_summaries.index_information()
+    assert service._indexes_ready
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Daily Nutrition Summaries")
+    test_write_path_keeps_summaries_consistent()
+    print("✅ Write path keeps summaries consistent")
+    test_verifier_repairs_past_days_only()
+    print("✅ Verifier repairs past days only")
+    test_verifier_never_overwrites_concurrent_writes()
+    print("✅ Verifier never overwrites concurrent writes")
+    test_verifier_backfills_summaries_without_counters()
+    print("✅ Verifier backfills summaries without counters")
+    test_weekly_report_counts_legacy_days_from_their_logs()
+    print("✅ Weekly report counts legacy days from their logs")
+    test_indexes_are_created_separately_and_retried()
+    print("✅ Indexes are created separately and retried")
+    print("\n🎉 All daily nutrition summary tests passed!")
@@ -0,0 +1,131 @@
+"""
+Test script for the OTP store
+Runs OTPService against mongomock: upsert per identifier/purpose, expiry,
+attempt counting and rate limiting under concurrency
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.otp_service import OTPService, OTPRateLimitError, OTP_MAX_ATTEMPTS, otp_rate_limiter
+import app.services.otp_service as otp_module
+from async_mongomock import AsyncDatabase
+
+
+def make_service() -> OTPService:
+    otp_rate_limiter.reset()
+    otp_module._indexes_ready = False
+    service = OTPService(AsyncDatabase())
+    service.email_enabled = False
+    return service
+
+
+def test_single_document_per_identifier_and_purpose():
+    service = make_service()
+
+    async def run():
+        first = await service.create_otp("User@Example.com", purpose="download_access")
+        second = await service.create_otp("user@example.com", purpose="download_access")
+        await service.create_otp("user@example.com", purpose="decrypt_access")
+        return first, second
+
+    first, second = asyncio.run(run())
+    collection = service.otp_collection.collection
+    assert collection.count_documents({}) == 2
+    stored = collection.find_one({"identifier": "user@example.com", "purpose": "download_access"})
+    assert stored["otp_code"] == second["otp_code"]
+
+    indexes = collection.index_information()
+    assert indexes["expires_at_ttl"]["expireAfterSeconds"] == 0
+    assert indexes["identifier_purpose_unique"]["unique"]
+
+
+def test_expired_code_is_rejected():
+    service = make_service()
+
+    async def run():
+        created = await service.create_otp("user@example.com", purpose="download_access")
+        service.otp_collection.collection.update_one(
+            {"identifier": "user@example.com"},
+            {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+        return await service.verify_otp("user@example.com", created["otp_code"],
+                                        purpose="download_access", auto_generate_new=False)
+
+    # mongomock applies the TTL index on read, like the server's TTL monitor;
+    # either way the expired code is gone and cannot be used
+    result = asyncio.run(run())
+    assert result["success"] is False
+    assert result["message"] in ("OTP has expired", "No download_access OTP found. Please request a new OTP.")
+    assert service.otp_collection.collection.count_documents({}) == 0
+
+
+def test_attempts_are_counted():
+    service = make_service()
+
+    async def run():
+        created = await service.create_otp("user@example.com", purpose="download_access")
+        wrong_code = "000000" if created["otp_code"] != "000000" else "111111"
+        results = []
+        for _ in range(OTP_MAX_ATTEMPTS + 1):
+            results.append(await service.verify_otp("user@example.com", wrong_code,
+                                                    purpose="download_access", auto_generate_new=False))
+        return results
+
+    results = asyncio.run(run())
+    assert [r.get("remaining_attempts") for r in results[:-1]] == list(range(OTP_MAX_ATTEMPTS - 1, -1, -1))
+    assert results[-1]["message"] == "Maximum verification attempts exceeded"
+
+
+def test_code_is_single_use_under_concurrency():
+    service = make_service()
+
+    async def run():
+        created = await service.create_otp("user@example.com", purpose="decrypt_access")
+        return await asyncio.gather(*(
+            service.verify_otp("user@example.com", created["otp_code"], purpose="decrypt_access", auto_generate_new=False)
+            for _ in range(5)
+        ))
+
+    results = asyncio.run(run())
+    assert sum(1 for r in results if r["success"]) == 1
+
+
+def test_rate_limit_rejects_before_io():
+    service = make_service()
+
+    async def request():
+        try:
+            await service.create_otp("attacker@example.com")
+            return None
+        except OTPRateLimitError as e:
+            return e.retry_after_seconds
+
+    async def run():
+        return await asyncio.gather(*(request() for _ in range(50)))
+
+    results = asyncio.run(run())
+    allowed = [r for r in results if r is None]
+    assert len(allowed) == otp_rate_limiter.burst
+    assert all(r >= 1 for r in results if r is not None)
+    # Index setup plus one upsert per allowed request; throttled requests never reach the database
+    assert service.otp_collection.calls == 2 + len(allowed)
+
+
+if __name__ == "__main__":
+    print("Testing OTP store...")
+    test_single_document_per_identifier_and_purpose()
+    print("✓ One document per identifier and purpose, TTL index")
+    test_expired_code_is_rejected()
+    print("✓ Expired codes rejected")
+    test_attempts_are_counted()
+    print("✓ Attempts counted")
+    test_code_is_single_use_under_concurrency()
+    print("✓ Codes are single use under concurrency")
+    test_rate_limit_rejects_before_io()
+    print("✓ Rate limit rejects before any I/O")
+    print("\n🎉 All tests passed!")
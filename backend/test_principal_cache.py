@@ -0,0 +1,196 @@
+"""
+Load test for the authenticated principal cache
+Uses a mocked Motor users collection to count database reads per request
+"""
+import asyncio
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bson import ObjectId
+
+import app.auth.users as users_module
+from app.auth.dependencies import get_current_user
+from app.auth.jwt import create_access_token, get_password_hash, verify_password
+from app.auth.principal_cache import principal_cache
+
+SESSIONS = 50
+CALLS_PER_DASHBOARD = 15
+
+
+class MockUsersCollection:
+    """Stands in for db.users; every find_one is one database read"""
+
+    def __init__(self, users):
+        self.users = {user["_id"]: user for user in users}
+        self.reads = 0
+
+    async def find_one(self, query):
+        self.reads += 1
+        # Simulate a network round trip so concurrent requests overlap
+        await asyncio.sleep(0.005)
+        user = self.users.get(query["_id"])
+        return dict(user) if user else None
+
+    async def update_one(self, query, update):
+        self.users[query["_id"]].update(update.get("$set", {}))
+
+        class Result:
+            modified_count = 1
+        return Result()
+
+
+class MockDatabase:
+    def __init__(self, users):
+        self.users = MockUsersCollection(users)
+
+
+def setup_users():
+    users = [
+        {"_id": ObjectId(), "name": f"User {i}", "email": f"user{i}@example.com",
+         "password": "hashed", "refresh_tokens": [{"token": "r"}]}
+        for i in range(SESSIONS)
+    ]
+    db = MockDatabase(users)
+    users_module.get_database = lambda: db
+    principal_cache.clear()
+    tokens = [create_access_token({"sub": str(user["_id"]), "name": user["name"]}) for user in users]
+    return db, tokens
+
+
+async def load_dashboards(tokens):
+    """Every session fires its dashboard's API calls at once"""
+    return await asyncio.gather(*(
+        get_current_user(token) for token in tokens for _ in range(CALLS_PER_DASHBOARD)
+    ))
+
+
+def test_reads_per_request_drop_for_warm_sessions():
+    db, tokens = setup_users()
+
+    async def run():
+        cold = await load_dashboards(tokens)
+        cold_reads = db.users.reads
+        warm = await load_dashboards(tokens)
+        return cold, cold_reads, warm, db.users.reads - cold_reads
+
+    cold, cold_reads, warm, warm_reads = asyncio.run(run())
+    requests = SESSIONS * CALLS_PER_DASHBOARD
+
+    # Cold: concurrent requests per token share one read
+    assert cold_reads == SESSIONS
+    # Warm: no reads at all
+    assert warm_reads == 0
+    assert all("password" not in user and "refresh_tokens" not in user for user in cold + warm)
+    print(f"  cold: {cold_reads / requests:.3f} reads/request, warm: {warm_reads / requests:.3f} reads/request")
+    print(f"  stats: {principal_cache.stats()}")
+
+
+def test_invalidation_on_profile_update_and_logout():
+    db, tokens = setup_users()
+    user_id = str(next(iter(db.users.users)))
+    token = tokens[0]
+
+    async def run():
+        await get_current_user(token)
+        await users_module.update_user_profile(user_id, {"name": "Renamed"})
+        renamed = await get_current_user(token)
+        reads_after_update = db.users.reads
+
+        await users_module.invalidate_all_refresh_tokens(user_id)
+        await get_current_user(token)
+        return renamed, reads_after_update, db.users.reads
+
+    renamed, reads_after_update, reads_after_logout = asyncio.run(run())
+    assert renamed["name"] == "Renamed"
+    assert reads_after_logout == reads_after_update + 1
+
+
+def test_ttl_bounded_by_token_expiry():
+    """A token that is about to expire is not cached past its expiry"""
+    db, _ = setup_users()
+    user_id = str(next(iter(db.users.users)))
+    token = create_access_token({"sub": user_id}, expires_delta=timedelta(seconds=-1))
+
+    async def run():
+        from app.auth.jwt import decode_token
+        token_data = decode_token(token, verify_exp=False)
+        await principal_cache.get(token_data, users_module.get_user_by_id)
+        await principal_cache.get(token_data, users_module.get_user_by_id)
+
+    asyncio.run(run())
+    assert db.users.reads == 2
+    assert principal_cache.stats()["size"] == 0
+
+
+def test_invalidation_during_a_load_and_pruning():
+    """A load that overlaps an invalidation is not cached, and no per-user state outlives the loads"""
+    db, tokens = setup_users()
+    user_ids = [str(user_id) for user_id in db.users.users]
+
+    async def run():
+        load = asyncio.create_task(get_current_user(tokens[0]))
+        await asyncio.sleep(0)
+        await users_module.update_user_profile(user_ids[0], {"name": "Renamed"})
+        await load
+        # Invalidations without a load in flight leave nothing behind
+        for user_id in user_ids:
+            await users_module.invalidate_all_refresh_tokens(user_id)
+        await get_current_user(tokens[0])
+
+    asyncio.run(run())
+    # The overlapping load, the profile update's read-back and a fresh load afterwards
+    assert db.users.reads == 3
+    assert principal_cache._generations == {} and principal_cache._loading == {}
+
+
+def test_password_change_route():
+    """The route checks the current password, stores the new one and drops cached sessions"""
+    try:
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from app.auth.router import router
+    except ImportError as e:
+        print(f"⚠ Auth router dependencies not installed ({e}) - skipping password change route test")
+        return
+
+    db, tokens = setup_users()
+    user = next(iter(db.users.users.values()))
+    user["password"] = get_password_hash("old-password")
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {tokens[0]}"}
+
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    response = client.post("/auth/change-password", headers=headers,
+                           json={"current_password": "wrong-password", "new_password": "new-password"})
+    assert response.status_code == 400
+    assert verify_password("old-password", user["password"])
+
+    reads = db.users.reads
+    response = client.post("/auth/change-password", headers=headers,
+                           json={"current_password": "old-password", "new_password": "new-password"})
+    assert response.status_code == 200
+    assert verify_password("new-password", user["password"]) and user["refresh_tokens"] == []
+    # The cached principal was dropped, so the next request reads the user again
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    assert db.users.reads > reads + 1
+
+
+if __name__ == "__main__":
+    print("Testing principal cache...")
+    test_reads_per_request_drop_for_warm_sessions()
+    print("✓ Warm sessions skip the database")
+    test_invalidation_on_profile_update_and_logout()
+    print("✓ Invalidation on profile update and logout")
+    test_ttl_bounded_by_token_expiry()
+    print("✓ TTL bounded by token expiry")
+    test_invalidation_during_a_load_and_pruning()
+    print("✓ Overlapping loads not cached; per-user state pruned")
+    test_password_change_route()
+    print("✓ Password change route")
+    print("\n🎉 All tests passed!")
@@ -0,0 +1,119 @@
+"""
+Test script for the SecurityService crypto engine
+Tests the derived-key cache, streaming encryption and the async facade
+"""
+import asyncio
+import io
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.security_service import SecurityService, DerivedKeyCache, STREAM_CHUNK_SIZE
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+
+def test_key_derived_once_per_user():
+    """Repeated calls reuse the cached key"""
+    service = SecurityService()
+    derivations = []
+    derive = service._derive_key
+    service._derive_key = lambda user_id: derivations.append(user_id) or derive(user_id)
+
+    encrypted = service.encrypt_data({"bmi": 22.9}, USER_ID)["encrypted_data"]
+    assert service.decrypt_data(encrypted, USER_ID) == {"bmi": 22.9}
+    assert derivations == [USER_ID]
+
+    # A rotated key version must not reuse the old key
+    service.key_version = "2"
+    service._generate_key(USER_ID)
+    assert derivations == [USER_ID, USER_ID]
+
+
+def test_cache_eviction():
+    """Entries expire after the TTL and the least recently used entry is evicted first"""
+    cache = DerivedKeyCache(max_size=2, ttl_seconds=0.05)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_stream_round_trip():
+    """Multi-chunk payloads decrypt back to the original bytes"""
+    service = SecurityService()
+    payload = bytes(range(256)) * (STREAM_CHUNK_SIZE * 3 // 256) + b"tail"
+    pieces = [payload[i:i + 10000] for i in range(0, len(payload), 10000)]
+
+    encrypted = b"".join(service.encrypt_stream(pieces, USER_ID))
+    assert encrypted.count(b"\n") == 4
+    decrypted = b"".join(service.decrypt_stream(io.BytesIO(encrypted), USER_ID))
+    assert decrypted == payload
+
+    # Empty payloads still produce a final chunk
+    empty = b"".join(service.encrypt_stream([], USER_ID))
+    assert b"".join(service.decrypt_stream(empty.splitlines(), USER_ID)) == b""
+
+
+def test_stream_tampering_detected():
+    """Dropped, reordered or spliced chunks and wrong users are rejected"""
+    service = SecurityService()
+    payload = b"x" * (STREAM_CHUNK_SIZE * 2 + 1)
+    tokens = list(service.encrypt_stream([payload], USER_ID))
+    # Same user key, same length: only the per-stream id tells the streams apart
+    other = list(service.encrypt_stream([b"y" * len(payload)], USER_ID))
+
+    for tampered, user_id in [
+        (tokens[:-1], USER_ID),
+        ([tokens[1], tokens[0], tokens[2]], USER_ID),
+        (tokens, "507f1f77bcf86cd799439012"),
+        ([tokens[0], other[1], other[2]], USER_ID),
+    ]:
+        try:
+            b"".join(service.decrypt_stream(tampered, user_id))
+        except ValueError:
+            continue
+        raise AssertionError("tampered stream decrypted")
+
+
+def test_async_facade():
+    """Async calls run on the crypto pool and match the sync results"""
+    service = SecurityService()
+
+    async def run():
+        encrypted = await service.encrypt_data_async({"score": 95}, USER_ID)
+        results = await asyncio.gather(*(
+            service.decrypt_data_async(encrypted["encrypted_data"], USER_ID) for _ in range(20)
+        ))
+        token = await service.generate_decryption_token_async(USER_ID)
+        by_token = await service.decrypt_with_token_async(encrypted["encrypted_data"], token["decryption_token"])
+        return results, by_token
+
+    results, by_token = asyncio.run(run())
+    assert all(result == {"score": 95} for result in results)
+    assert by_token == {"score": 95}
+    service.shutdown()
+
+
+if __name__ == "__main__":
+    print("Testing SecurityService crypto engine...")
+    test_key_derived_once_per_user()
+    print("✓ Derived keys are cached")
+    test_cache_eviction()
+    print("✓ LRU + TTL eviction")
+    test_stream_round_trip()
+    print("✓ Streaming round trip")
+    test_stream_tampering_detected()
+    print("✓ Stream tampering detected")
+    test_async_facade()
+    print("✓ Async facade")
+    print("\n🎉 All tests passed!")